@@ -341,7 +341,11 @@ class TransactionAdmin(admin.ModelAdmin):
     post_transactions.short_description = "ترحيل القيود المحددة"
 
     def void_transactions(self, request, queryset):
-        count = queryset.filter(status="posted").update(status="cancelled")
+        # cancel() لكل قيد (لا update جماعي) حتى تُنقل آثار القيود من لقطات الأشهر المُقفلة
+        count = 0
+        for transaction in queryset.filter(status="posted"):
+            transaction.cancel(request.user)
+            count += 1
         self.message_user(request, f"تم إلغاء {count} قيد بنجاح")
 
     void_transactions.short_description = "إلغاء القيود المحددة"
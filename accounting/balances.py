@@ -0,0 +1,341 @@
+"""
+أرصدة دفتر الأستاذ: فروقات ذرية + لقطات إقفال شهرية
+====================================================
+كل بند قيد كان يستدعي Account.update_balance(): مجموعان على كل بنود الحساب
+ثم حفظ — حساب الصندوق والمدينين يُعاد جمعهما بالكامل مع كل دفعة. وتقارير
+ميزان المراجعة وقائمة الدخل والميزانية ودفتر الأستاذ تمسح كل البنود المرحّلة
+منذ البداية مع كل طلب، فتبطؤ كل شهر.
+
+الآن:
+- current_balance يُحدَّث بفرق البند فقط (Account.apply_delta) عند الحفظ/الحذف
+- كل شهر مكتمل يُقفل (LedgerPeriod) بلقطة تراكمية لكل حساب له حركة فيه
+  (AccountPeriodBalance)؛ التقارير = آخر لقطة + بنود ما بعد آخر شهر مُقفل
+- القيود المتأخرة المؤرخة في شهر مُقفل (أو ترحيلها/إلغاؤها) تُطبَّق على
+  اللقطات كفروقات بدلاً من إعادة الإقفال
+- rollup(): تجميع أرصدة الشجرة من الفروع إلى الآباء مستوى بمستوى
+
+الاستخدام:
+    totals = posted_totals(as_of=date)                  # {account_id: (debit, credit)}
+    totals = movement_totals(start_date, end_date)      # حركة فترة
+    close_periods()                                     # مهمة ليلية
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Sum
+from django.utils import timezone
+
+logger = logging.getLogger("accounting")
+
+ZERO = Decimal("0.00")
+
+
+# ─── الأشهر ──────────────────────────────────────────────────────────
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(period):
+    return (period.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def period_end(period):
+    return next_month(period) - timedelta(days=1)
+
+
+def closed_through(as_of=None):
+    """آخر شهر مُقفل ينتهي في as_of أو قبله (None إن لم يوجد)"""
+    from .models import LedgerPeriod
+
+    periods = LedgerPeriod.objects.all()
+    if as_of:
+        periods = periods.filter(period__lt=month_start(as_of + timedelta(days=1)))
+    return periods.order_by("-period").values_list("period", flat=True).first()
+
+
+# ─── القراءة ─────────────────────────────────────────────────────────
+
+
+def posted_totals(as_of=None, account_ids=None):
+    """
+    المدين والدائن التراكمي للقيود المرحّلة حتى as_of (شاملاً) لكل حساب:
+    لقطة آخر شهر مُقفل + بنود ما بعده فقط.
+    Returns: {account_id: (debit, credit)}
+    """
+    from .models import AccountPeriodBalance, TransactionLine
+
+    totals = defaultdict(lambda: [ZERO, ZERO])
+
+    cutoff = closed_through(as_of)
+    if cutoff:
+        snapshots = AccountPeriodBalance.objects.filter(period__lte=cutoff)
+        if account_ids is not None:
+            snapshots = snapshots.filter(account_id__in=account_ids)
+        for account_id, debit, credit in (
+            snapshots.order_by("account_id", "-period")
+            .distinct("account_id")
+            .values_list("account_id", "closing_debit", "closing_credit")
+        ):
+            totals[account_id] = [debit, credit]
+
+    lines = TransactionLine.objects.filter(transaction__status="posted")
+    if cutoff:
+        lines = lines.filter(transaction__date__gt=period_end(cutoff))
+    if as_of:
+        lines = lines.filter(transaction__date__lte=as_of)
+    if account_ids is not None:
+        lines = lines.filter(account_id__in=account_ids)
+    for row in lines.values("account_id").annotate(debit=Sum("debit"), credit=Sum("credit")).order_by():
+        entry = totals[row["account_id"]]
+        entry[0] += row["debit"] or ZERO
+        entry[1] += row["credit"] or ZERO
+
+    return {account_id: tuple(entry) for account_id, entry in totals.items()}
+
+
+def movement_totals(start_date=None, end_date=None, account_ids=None):
+    """
+    حركة القيود المرحّلة بين تاريخين (شاملين) = التراكمي حتى النهاية
+    ناقص التراكمي حتى اليوم السابق للبداية.
+    Returns: {account_id: (debit, credit)}
+    """
+    totals = posted_totals(end_date, account_ids)
+    if not start_date:
+        return totals
+
+    before = posted_totals(start_date - timedelta(days=1), account_ids)
+    movements = {}
+    for account_id, (debit, credit) in totals.items():
+        prior_debit, prior_credit = before.get(account_id, (ZERO, ZERO))
+        movements[account_id] = (debit - prior_debit, credit - prior_credit)
+    return movements
+
+
+def rollup(accounts, amounts):
+    """
+    تجميع القيم من الحسابات الفرعية إلى آبائها مستوى بمستوى (من الأعمق للأعلى).
+    accounts: حسابات محمّلة (تكفي pk و parent_id)، amounts: {account_id: Decimal}
+    Returns: {account_id: القيمة شاملة كل الفروع}
+    """
+    parents = {account.pk: account.parent_id for account in accounts}
+    depths = {}
+
+    def depth(account_id):
+        if account_id not in depths:
+            level, parent, seen = 0, parents.get(account_id), {account_id}
+            # حماية من المراجع الدائرية (Account.clean يمنعها لكن البيانات القديمة قد تحويها)
+            while parent in parents and parent not in seen:
+                seen.add(parent)
+                level += 1
+                parent = parents[parent]
+            depths[account_id] = level
+        return depths[account_id]
+
+    totals = {account_id: amounts.get(account_id, ZERO) for account_id in parents}
+    for account_id in sorted(parents, key=depth, reverse=True):
+        parent = parents[account_id]
+        if parent in totals and parent != account_id:
+            totals[parent] += totals[account_id]
+    return totals
+
+
+# ─── الفروقات ────────────────────────────────────────────────────────
+
+
+def apply_period_delta(account_id, day, debit, credit):
+    """
+    أثر بند مرحّل مؤرخ في شهر مُقفل على اللقطات: حركة ذلك الشهر وكل
+    الأرصدة الختامية بعده. البنود في الشهر الحالي (غير المُقفل أبداً) لا تمس شيئاً.
+    """
+    from .models import AccountPeriodBalance
+
+    debit = Decimal(str(debit or 0))
+    credit = Decimal(str(credit or 0))
+    if not account_id or not day or (not debit and not credit):
+        return
+    if day >= month_start(timezone.localdate()):
+        return
+
+    latest = closed_through()
+    period = month_start(day)
+    if not latest or period > latest:
+        return
+
+    rows = AccountPeriodBalance.objects.filter(account_id=account_id)
+    rows.filter(period__gt=period).update(
+        closing_debit=F("closing_debit") + debit,
+        closing_credit=F("closing_credit") + credit,
+    )
+    shift = {
+        "debit": F("debit") + debit,
+        "credit": F("credit") + credit,
+        "closing_debit": F("closing_debit") + debit,
+        "closing_credit": F("closing_credit") + credit,
+    }
+    if rows.filter(period=period).update(**shift):
+        return
+
+    # لا لقطة لهذا الشهر (لم تكن للحساب حركة فيه): تُنشأ من آخر لقطة قبله
+    previous = rows.filter(period__lt=period).order_by("-period").first()
+    try:
+        with transaction.atomic():
+            AccountPeriodBalance.objects.create(
+                account_id=account_id,
+                period=period,
+                debit=debit,
+                credit=credit,
+                closing_debit=(previous.closing_debit if previous else ZERO) + debit,
+                closing_credit=(previous.closing_credit if previous else ZERO) + credit,
+            )
+    except IntegrityError:
+        # أُنشئت بالتوازي بين التحديث والإنشاء
+        rows.filter(period=period).update(**shift)
+
+
+def record_line_saved(line, created):
+    """فرق البند على الرصيد الحالي (دائماً) وعلى اللقطات (إن كان القيد مرحّلاً)"""
+    from .models import Account
+
+    old_account, old_debit, old_credit = (
+        (None, ZERO, ZERO) if created else getattr(line, "_loaded_amounts", (None, ZERO, ZERO))
+    )
+    changes = defaultdict(lambda: [ZERO, ZERO])
+    if old_account:
+        changes[old_account][0] -= old_debit or ZERO
+        changes[old_account][1] -= old_credit or ZERO
+    changes[line.account_id][0] += line.debit or ZERO
+    changes[line.account_id][1] += line.credit or ZERO
+    line._loaded_amounts = (line.account_id, line.debit, line.credit)
+
+    changes = {account_id: amounts for account_id, amounts in changes.items() if any(amounts)}
+    if not changes:
+        return
+    for account_id, (debit, credit) in changes.items():
+        Account.apply_delta(account_id, debit, credit)
+
+    txn = line.transaction
+    if txn.status == "posted":
+        for account_id, (debit, credit) in changes.items():
+            apply_period_delta(account_id, txn.date, debit, credit)
+
+
+def record_line_deleted(line):
+    """عكس أثر البند المحذوف"""
+    from .models import Account, Transaction
+
+    debit, credit = -(line.debit or ZERO), -(line.credit or ZERO)
+    Account.apply_delta(line.account_id, debit, credit)
+    # عند الحذف المتتالي للقيد تُحذف بنوده أولاً فيبقى القيد موجوداً هنا
+    txn = Transaction.objects.filter(pk=line.transaction_id).values("status", "date").first()
+    if txn and txn["status"] == "posted":
+        apply_period_delta(line.account_id, txn["date"], debit, credit)
+
+
+def record_transaction_saved(txn, created):
+    """ترحيل/إلغاء قيد أو تغيير تاريخه وهو مرحّل: نقل أثر بنوده في اللقطات"""
+    old_status, old_date = getattr(txn, "_loaded_state", (None, None))
+    txn._loaded_state = (txn.status, txn.date)
+    if created:
+        return
+
+    was_posted = old_status == "posted"
+    is_posted = txn.status == "posted"
+    if was_posted == is_posted and (not is_posted or old_date == txn.date):
+        return
+
+    for account_id, debit, credit in txn.lines.values_list("account_id", "debit", "credit"):
+        if was_posted:
+            apply_period_delta(account_id, old_date, -debit, -credit)
+        if is_posted:
+            apply_period_delta(account_id, txn.date, debit, credit)
+
+
+# ─── الإقفال ─────────────────────────────────────────────────────────
+
+
+@transaction.atomic
+def close_period(period):
+    """إقفال شهر: لقطة تراكمية لكل حساب له بنود مرحّلة فيه"""
+    from .models import AccountPeriodBalance, LedgerPeriod, TransactionLine
+
+    movements = {
+        row["account_id"]: (row["debit"] or ZERO, row["credit"] or ZERO)
+        for row in TransactionLine.objects.filter(
+            transaction__status="posted",
+            transaction__date__gte=period,
+            transaction__date__lte=period_end(period),
+        )
+        .values("account_id")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+        .order_by()
+    }
+    previous = {
+        account_id: (debit, credit)
+        for account_id, debit, credit in AccountPeriodBalance.objects.filter(
+            account_id__in=list(movements), period__lt=period
+        )
+        .order_by("account_id", "-period")
+        .distinct("account_id")
+        .values_list("account_id", "closing_debit", "closing_credit")
+    }
+
+    snapshots = []
+    for account_id, (debit, credit) in movements.items():
+        prior_debit, prior_credit = previous.get(account_id, (ZERO, ZERO))
+        snapshots.append(
+            AccountPeriodBalance(
+                account_id=account_id,
+                period=period,
+                debit=debit,
+                credit=credit,
+                closing_debit=prior_debit + debit,
+                closing_credit=prior_credit + credit,
+            )
+        )
+    AccountPeriodBalance.objects.bulk_create(snapshots, batch_size=1000)
+    LedgerPeriod.objects.create(period=period)
+    return len(snapshots)
+
+
+def close_periods(until=None):
+    """
+    إقفال كل الأشهر المكتملة غير المُقفلة بالترتيب حتى الشهر السابق لـ until (اليوم).
+    Returns: عدد الأشهر المُقفلة
+    """
+    from .models import TransactionLine
+
+    last = month_start(month_start(until or timezone.localdate()) - timedelta(days=1))
+    latest = closed_through()
+    if latest:
+        period = next_month(latest)
+    else:
+        first = TransactionLine.objects.filter(transaction__status="posted").aggregate(
+            first=Min("transaction__date")
+        )["first"]
+        if not first:
+            return 0
+        period = month_start(first)
+
+    closed = 0
+    while period <= last:
+        count = close_period(period)
+        logger.info(f"📒 إقفال {period:%Y-%m}: {count} حساب")
+        period = next_month(period)
+        closed += 1
+    return closed
+
+
+def rebuild_periods(until=None):
+    """حذف كل اللقطات وإعادة الإقفال من أول قيد (إصلاح)"""
+    from .models import AccountPeriodBalance, LedgerPeriod
+
+    with transaction.atomic():
+        AccountPeriodBalance.objects.all().delete()
+        LedgerPeriod.objects.all().delete()
+    return close_periods(until)
@@ -3,7 +3,7 @@
 Export Utilities
 """
 
-import io
+import importlib.util
 import logging
 from datetime import datetime
 
@@ -14,108 +14,59 @@ logger = logging.getLogger('accounting')
 
 def export_to_excel(data, columns, filename="export", sheet_name="Sheet1"):
     """
-    تصدير البيانات إلى ملف Excel
+    تصدير البيانات إلى ملف Excel (core.exports — كتابة بتدفق بذاكرة ثابتة)
 
     Args:
-        data: قائمة من القواميس أو tuples تحتوي على البيانات
+        data: قائمة أو مولّد من القواميس أو tuples تحتوي على البيانات
         columns: قائمة من القواميس {"header": "عنوان العمود", "key": "مفتاح_البيانات", "width": 20}
         filename: اسم الملف (بدون امتداد)
         sheet_name: اسم الورقة
 
     Returns:
-        HttpResponse مع ملف Excel
+        FileResponse مع ملف Excel
     """
-    try:
-        import openpyxl
-        from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
-        from openpyxl.utils import get_column_letter
-    except ImportError:
+    if importlib.util.find_spec("openpyxl") is None:
         logger.error("openpyxl غير مثبت. قم بتثبيته: pip install openpyxl")
         return HttpResponse("مكتبة openpyxl غير مثبتة", status=500)
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = sheet_name
-    ws.sheet_view.rightToLeft = True  # RTL للعربية
-
-    # أنماط
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    cell_alignment = Alignment(horizontal="right", vertical="center", wrap_text=True)
-    number_alignment = Alignment(horizontal="left", vertical="center")
-    thin_border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
+    from core.exports import workbook_response
 
-    # عنوان التقرير
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(columns))
-    title_cell = ws.cell(row=1, column=1, value=filename)
-    title_cell.font = Font(bold=True, size=14)
-    title_cell.alignment = Alignment(horizontal="center")
+    keys = [col["key"] for col in columns]
 
-    # تاريخ التصدير
-    ws.merge_cells(start_row=2, start_column=1, end_row=2, end_column=len(columns))
-    date_cell = ws.cell(
-        row=2, column=1, value=f"تاريخ التصدير: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    )
-    date_cell.alignment = Alignment(horizontal="center")
-
-    # رؤوس الأعمدة
-    header_row = 4
-    for col_idx, col in enumerate(columns, 1):
-        cell = ws.cell(row=header_row, column=col_idx, value=col["header"])
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-        ws.column_dimensions[get_column_letter(col_idx)].width = col.get("width", 18)
-
-    # البيانات
-    for row_idx, row_data in enumerate(data, header_row + 1):
-        for col_idx, col in enumerate(columns, 1):
+    def rows():
+        for row_data in data:
             if isinstance(row_data, dict):
-                value = row_data.get(col["key"], "")
+                yield row_data
             else:
-                value = row_data[col_idx - 1] if col_idx - 1 < len(row_data) else ""
-
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.border = thin_border
+                yield dict(zip(keys, row_data))
 
-            # محاذاة الأرقام
-            if isinstance(value, (int, float)):
-                cell.alignment = number_alignment
-                cell.number_format = "#,##0.00"
-            else:
-                cell.alignment = cell_alignment
-
-        # تلوين الصفوف بالتناوب
-        if (row_idx - header_row) % 2 == 0:
-            for col_idx in range(1, len(columns) + 1):
-                ws.cell(row=row_idx, column=col_idx).fill = PatternFill(
-                    start_color="F8F9FA", end_color="F8F9FA", fill_type="solid"
-                )
-
-    # إنشاء الاستجابة
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    response = HttpResponse(
-        output.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
     safe_filename = filename.replace(" ", "_")
-    response["Content-Disposition"] = f'attachment; filename="{safe_filename}_{datetime.now().strftime("%Y%m%d")}.xlsx"'
-    return response
+    return workbook_response(
+        [
+            {
+                "title": sheet_name,
+                "heading": filename,
+                "subheading": f"تاريخ التصدير: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                "columns": [
+                    {
+                        "header": col["header"],
+                        "key": col["key"],
+                        "width": col.get("width", 18),
+                        "number": True,
+                    }
+                    for col in columns
+                ],
+                "rows": rows(),
+                "striped": True,
+            }
+        ],
+        f"{safe_filename}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+    )
 
 
 def export_queryset_to_excel(queryset, fields, filename="export"):
     """
-    تصدير queryset مباشرة إلى Excel
+    تصدير queryset مباشرة إلى Excel (الصفوف تُولّد على دفعات أثناء الكتابة)
 
     Args:
         queryset: Django QuerySet
@@ -123,25 +74,27 @@ def export_queryset_to_excel(queryset, fields, filename="export"):
         filename: اسم الملف
 
     Returns:
-        HttpResponse
+        FileResponse
     """
+    from core.exports import batched_objects
+
     columns = [{"header": f[1], "key": f[0], "width": f[2] if len(f) > 2 else 18} for f in fields]
 
-    data = []
-    for obj in queryset:
-        row = {}
-        for field_name, _, *_ in fields:
-            value = obj
-            for part in field_name.split("__"):
-                if value is None:
-                    break
-                value = getattr(value, part, None)
-            if callable(value):
-                value = value()
-            row[field_name] = value if value is not None else ""
-        data.append(row)
-
-    return export_to_excel(data, columns, filename)
+    def rows():
+        for obj in batched_objects(queryset):
+            row = {}
+            for field_name, _, *_ in fields:
+                value = obj
+                for part in field_name.split("__"):
+                    if value is None:
+                        break
+                    value = getattr(value, part, None)
+                if callable(value):
+                    value = value()
+                row[field_name] = value if value is not None else ""
+            yield row
+
+    return export_to_excel(rows(), columns, filename)
 
 
 def export_trial_balance_excel(trial_data, total_debit, total_credit, currency_symbol="ج.م"):
@@ -0,0 +1,27 @@
+"""
+أمر إدارة لإقفال أشهر دفتر الأستاذ بلقطات أرصدة ختامية
+Management command to close ledger periods with balance snapshots
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounting.balances import close_periods, rebuild_periods
+
+
+class Command(BaseCommand):
+    help = "إقفال الأشهر المكتملة بلقطات أرصدة ختامية لكل حساب"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="حذف كل اللقطات وإعادة الإقفال من أول قيد مرحّل",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            self.stdout.write("🔄 إعادة بناء لقطات الأشهر من البداية...")
+            closed = rebuild_periods()
+        else:
+            closed = close_periods()
+        self.stdout.write(self.style.SUCCESS(f"✅ تم إقفال {closed} شهر"))
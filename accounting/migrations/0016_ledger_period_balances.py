@@ -0,0 +1,112 @@
+# Generated by Django 5.1.5 on 2026-10-17 10:00
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounting", "0015_alter_account_customer_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerPeriod",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.DateField(
+                        help_text="أول يوم في الشهر", unique=True, verbose_name="الشهر"
+                    ),
+                ),
+                (
+                    "closed_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="تاريخ الإقفال"),
+                ),
+            ],
+            options={
+                "verbose_name": "فترة مُقفلة",
+                "verbose_name_plural": "الفترات المُقفلة",
+                "ordering": ["-period"],
+            },
+        ),
+        migrations.CreateModel(
+            name="AccountPeriodBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.DateField(verbose_name="الشهر")),
+                (
+                    "debit",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=18,
+                        verbose_name="مدين الشهر",
+                    ),
+                ),
+                (
+                    "credit",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=18,
+                        verbose_name="دائن الشهر",
+                    ),
+                ),
+                (
+                    "closing_debit",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=18,
+                        verbose_name="المدين التراكمي",
+                    ),
+                ),
+                (
+                    "closing_credit",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=18,
+                        verbose_name="الدائن التراكمي",
+                    ),
+                ),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="period_balances",
+                        to="accounting.account",
+                        verbose_name="الحساب",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "رصيد حساب شهري",
+                "verbose_name_plural": "أرصدة الحسابات الشهرية",
+                "indexes": [
+                    models.Index(fields=["period"], name="acc_period_bal_period_idx")
+                ],
+                "unique_together": {("account", "period")},
+            },
+        ),
+    ]
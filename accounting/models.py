@@ -8,7 +8,7 @@ from decimal import Decimal
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import F, Q, Sum
+from django.db.models import Case, F, Q, Sum, Value, When
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -215,10 +215,39 @@ class Account(models.Model):
             return self.opening_balance + credits - debits
 
     def update_balance(self):
-        """تحديث الرصيد الحالي"""
+        """إعادة حساب الرصيد الحالي بالكامل من القيود (إصلاح — المسار العادي apply_delta)"""
         self.current_balance = self.get_balance()
         self.save(update_fields=["current_balance", "updated_at"])
 
+    @classmethod
+    def apply_delta(cls, account_id, debit, credit):
+        """
+        إضافة أثر بند (مدين/دائن) إلى الرصيد الحالي بتحديث ذري واحد (F expression)
+        حسب طبيعة الحساب — بدلاً من إعادة جمع كل بنود الحساب مع كل بند.
+        القيم السالبة تعكس الأثر (حذف بند أو قيمته القديمة).
+        """
+        debit = Decimal(str(debit or 0))
+        credit = Decimal(str(credit or 0))
+        if not account_id or debit == credit:
+            return
+
+        credit_types = AccountType.objects.filter(normal_balance="credit").values("pk")
+        cls.objects.filter(pk=account_id).update(
+            current_balance=F("current_balance")
+            + Case(
+                When(account_type__in=credit_types, then=Value(credit - debit)),
+                default=Value(debit - credit),
+                output_field=models.DecimalField(max_digits=15, decimal_places=2),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_opening_balance = dict(zip(field_names, values)).get("opening_balance")
+        return instance
+
     def save(self, *args, **kwargs):
         from core.utils.general import convert_model_arabic_numbers
         
@@ -228,8 +257,38 @@ class Account(models.Model):
         # التأكد من أن الكود لا يحتوي على مسافات
         if self.code:
             self.code = self.code.strip()
+
+        if self._state.adding:
+            # الرصيد الحالي يبدأ من الافتتاحي ثم تُضاف إليه فروقات البنود
+            if not self.current_balance:
+                self.current_balance = self.opening_balance or Decimal("0.00")
+            super().save(*args, **kwargs)
+            return
+
+        # current_balance يُدار بالفروقات الذرية: الحفظ الكامل لنسخة محمّلة سابقاً
+        # لا يكتب فوقه قيمة قديمة
+        if kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "current_balance"
+            ]
         super().save(*args, **kwargs)
 
+        # تعديل الرصيد الافتتاحي ينعكس على الرصيد الحالي بالفرق
+        loaded = getattr(self, "_loaded_opening_balance", None)
+        if (
+            loaded is not None
+            and "opening_balance" in kwargs["update_fields"]
+            and self.opening_balance != loaded
+        ):
+            difference = Decimal(str(self.opening_balance or 0)) - loaded
+            type(self).objects.filter(pk=self.pk).update(
+                current_balance=F("current_balance") + difference
+            )
+            self.current_balance += difference
+            self._loaded_opening_balance = self.opening_balance
+
 
 class Transaction(models.Model):
     """القيود المحاسبية"""
@@ -420,9 +479,8 @@ class Transaction(models.Model):
             self.posted_at = timezone.now()
             self.save(update_fields=["status", "posted_by", "posted_at", "total_debit", "total_credit"])
 
-            # تحديث أرصدة الحسابات
-            for line in self.lines.select_related('account'):
-                line.account.update_balance()
+            # أرصدة الحسابات الحالية تُحدَّث بالفروقات عند حفظ كل بند (لا تتأثر بالحالة)،
+            # ولقطات الأشهر المُقفلة تُحدَّث من إشارة حفظ القيد (accounting.balances)
 
     def cancel(self, user=None):
         """إلغاء القيد"""
@@ -432,10 +490,6 @@ class Transaction(models.Model):
         self.status = "cancelled"
         self.save(update_fields=["status", "updated_at"])
 
-        # إعادة حساب أرصدة الحسابات المتأثرة
-        for line in self.lines.select_related('account'):
-            line.account.update_balance()
-
     def create_reversal(self, user=None, description=None):
         """إنشاء قيد عكسي"""
         if self.status != "posted":
@@ -465,6 +519,14 @@ class Transaction(models.Model):
         reversal.calculate_totals()
         return reversal
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # الحالة والتاريخ كما حُمّلا — لتطبيق فرق الترحيل/الإلغاء على لقطات الأشهر
+        loaded = dict(zip(field_names, values))
+        instance._loaded_state = (loaded.get("status"), loaded.get("date"))
+        return instance
+
     def save(self, *args, **kwargs):
         # تحويل الأرقام العربية إلى إنجليزية
         from core.utils import convert_model_arabic_numbers
@@ -477,31 +539,17 @@ class Transaction(models.Model):
 
     @classmethod
     def generate_transaction_number(cls):
-        """توليد رقم قيد فريد - يعمل من خلال البحث عن آخر رقم وزيادته"""
-        from django.db import connection
-
-        today = timezone.now()
-        prefix = f"TXN-{today.strftime('%Y%m')}-"
-
-        with connection.cursor() as cursor:
-            # نبحث عن آخر transaction_number يبدأ بالـ prefix ونستخرج الرقم منه
-            cursor.execute(
-                "SELECT transaction_number FROM accounting_transaction "
-                "WHERE transaction_number LIKE %s "
-                "ORDER BY CAST(SUBSTRING(transaction_number FROM %s) AS INTEGER) DESC "
-                "LIMIT 1",
-                [f"{prefix}%", len(prefix) + 1]
-            )
-            row = cursor.fetchone()
-            if row:
-                try:
-                    last_num = int(row[0].split("-")[-1])
-                except (IndexError, ValueError):
-                    last_num = 0
-            else:
-                last_num = 0
-
-        return f"{prefix}{last_num + 1:05d}"
+        """توليد رقم قيد فريد — عداد شهري في core.sequences"""
+        from core.sequences import allocate, max_suffix
+
+        prefix = f"TXN-{timezone.now().strftime('%Y%m')}-"
+        return allocate(
+            "accounting.transaction_number",
+            prefix,
+            render=lambda n: f"{prefix}{n:05d}",
+            seed=lambda: max_suffix(cls.objects, "transaction_number", prefix),
+            taken=lambda value: cls.objects.filter(transaction_number=value).exists(),
+        )
 
 
 class TransactionLine(models.Model):
@@ -550,6 +598,18 @@ class TransactionLine(models.Model):
     def __str__(self):
         return f"{self.account.code}: مدين {self.debit} / دائن {self.credit}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # القيم كما حُمّلت — تعديل البند يطبّق الفرق فقط على الرصيد
+        loaded = dict(zip(field_names, values))
+        instance._loaded_amounts = (
+            loaded.get("account_id"),
+            loaded.get("debit"),
+            loaded.get("credit"),
+        )
+        return instance
+
     def clean(self):
         from django.core.exceptions import ValidationError
 
@@ -559,6 +619,64 @@ class TransactionLine(models.Model):
             raise ValidationError("يجب أن يكون أحد المدين أو الدائن موجباً")
 
 
+class LedgerPeriod(models.Model):
+    """
+    الأشهر المُقفلة في دفتر الأستاذ.
+    تُقفل بالترتيب (accounting.balances.close_periods) ولكل شهر مُقفل لقطة
+    أرصدة ختامية في AccountPeriodBalance.
+    """
+
+    period = models.DateField(_("الشهر"), unique=True, help_text=_("أول يوم في الشهر"))
+    closed_at = models.DateTimeField(_("تاريخ الإقفال"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("فترة مُقفلة")
+        verbose_name_plural = _("الفترات المُقفلة")
+        ordering = ["-period"]
+
+    def __str__(self):
+        return self.period.strftime("%Y-%m")
+
+
+class AccountPeriodBalance(models.Model):
+    """
+    لقطة الحساب في شهر مُقفل (القيود المرحّلة فقط): حركة الشهر والمجموع
+    التراكمي حتى نهايته. تُنشأ للحسابات التي لها حركة في الشهر فقط؛
+    رصيد أي تاريخ = آخر لقطة قبله + البنود بعد نهاية آخر شهر مُقفل.
+    """
+
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name="period_balances",
+        verbose_name=_("الحساب"),
+    )
+    period = models.DateField(_("الشهر"))
+    debit = models.DecimalField(
+        _("مدين الشهر"), max_digits=18, decimal_places=2, default=Decimal("0.00")
+    )
+    credit = models.DecimalField(
+        _("دائن الشهر"), max_digits=18, decimal_places=2, default=Decimal("0.00")
+    )
+    closing_debit = models.DecimalField(
+        _("المدين التراكمي"), max_digits=18, decimal_places=2, default=Decimal("0.00")
+    )
+    closing_credit = models.DecimalField(
+        _("الدائن التراكمي"), max_digits=18, decimal_places=2, default=Decimal("0.00")
+    )
+
+    class Meta:
+        verbose_name = _("رصيد حساب شهري")
+        verbose_name_plural = _("أرصدة الحسابات الشهرية")
+        unique_together = ["account", "period"]
+        indexes = [
+            models.Index(fields=["period"], name="acc_period_bal_period_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.period:%Y-%m}"
+
+
 class TransactionAttachment(models.Model):
     """مرفقات القيد المحاسبي"""
 
@@ -395,6 +395,99 @@ def register_accounting_signals():
 # ============================================
 
 
+def _customer_accounts_parent():
+    """
+    نوع حساب العملاء والحساب الأب 1121 (يُنشأ الأب عند الحاجة)
+    """
+    from .models import Account, AccountType
+
+    # البحث عن نوع حساب العملاء (1200) أو الأصول (1)
+    receivables_type = (
+        AccountType.objects.filter(code_prefix="1200").first()
+        or AccountType.objects.filter(code_prefix="1").first()
+    )
+    if not receivables_type:
+        return None, None
+
+    # البحث عن الحساب الأب 1121 - العملاء
+    parent_account = Account.objects.filter(code="1121").first()
+    if not parent_account:
+        # إنشاء حساب العملاء الرئيسي
+        parent_account = Account.objects.create(
+            code="1121",
+            name="العملاء",
+            name_en="Customers",
+            account_type=receivables_type,
+            is_active=True,
+            allow_transactions=False,  # حساب أب
+        )
+    return receivables_type, parent_account
+
+
+def _customer_account_fields(customer, receivables_type, parent_account):
+    return {
+        "name": f"حساب العميل - {customer.name}",
+        "name_en": f"Customer Account - {customer.name}",
+        "account_type": receivables_type,
+        "parent": parent_account,
+        "customer": customer,
+        "is_customer_account": True,
+        "is_active": True,
+        "allow_transactions": True,
+    }
+
+
+def create_customer_account(customer):
+    """
+    إنشاء حساب للعميل الجديد تحت العملاء (1121)
+    """
+    from .models import Account
+
+    try:
+        receivables_type, parent_account = _customer_accounts_parent()
+        if not receivables_type:
+            return None
+
+        account, _ = Account.objects.get_or_create(
+            code=f"1121{customer.id:05d}",
+            defaults=_customer_account_fields(customer, receivables_type, parent_account),
+        )
+        return account
+    except Exception as e:
+        logger.error(f"Error creating customer account: {e}", exc_info=True)
+        return None
+
+
+def create_customer_accounts(customers):
+    """
+    إنشاء حسابات لعملاء أُضيفوا بـ bulk_create (لا تُطلق post_save)
+    ✅ استعلامان للإعداد + إدراج جماعي بدلاً من get_or_create لكل عميل
+    """
+    from .models import Account
+
+    customers = [customer for customer in customers if customer.pk]
+    if not customers:
+        return 0
+
+    try:
+        receivables_type, parent_account = _customer_accounts_parent()
+        if not receivables_type:
+            return 0
+
+        accounts = [
+            Account(
+                code=f"1121{customer.id:05d}",
+                **_customer_account_fields(customer, receivables_type, parent_account),
+            )
+            for customer in customers
+        ]
+        Account.objects.bulk_create(accounts, batch_size=500, ignore_conflicts=True)
+        return len(accounts)
+    except Exception as e:
+        logger.error(f"Error creating customer accounts in bulk: {e}", exc_info=True)
+        return 0
+
+
 def register_customer_signals():
     """
     تسجيل إشارات العملاء
@@ -402,53 +495,10 @@ def register_customer_signals():
     try:
         from customers.models import Customer
 
-        from .models import Account, AccountType
-
         @receiver(post_save, sender=Customer)
         def customer_saved(sender, instance, created, **kwargs):
             if created:
-                # إنشاء حساب للعميل الجديد
-                try:
-                    # البحث عن نوع حساب العملاء (1200) أو الأصول (1)
-                    receivables_type = (
-                        AccountType.objects.filter(code_prefix="1200").first()
-                        or AccountType.objects.filter(code_prefix="1").first()
-                    )
-
-                    if receivables_type:
-                        # البحث عن الحساب الأب 1121 - العملاء
-                        parent_account = Account.objects.filter(
-                            code="1121"
-                        ).first()
-                        
-                        if not parent_account:
-                            # إنشاء حساب العملاء الرئيسي
-                            parent_account = Account.objects.create(
-                                code="1121",
-                                name="العملاء",
-                                name_en="Customers",
-                                account_type=receivables_type,
-                                is_active=True,
-                                allow_transactions=False,  # حساب أب
-                            )
-
-                        # إنشاء حساب للعميل تحت العملاء
-                        customer_code = f"1121{instance.id:05d}"
-                        Account.objects.get_or_create(
-                            code=customer_code,
-                            defaults={
-                                "name": f"حساب العميل - {instance.name}",
-                                "name_en": f"Customer Account - {instance.name}",
-                                "account_type": receivables_type,
-                                "parent": parent_account,
-                                "customer": instance,
-                                "is_customer_account": True,
-                                "is_active": True,
-                                "allow_transactions": True,
-                            },
-                        )
-                except Exception as e:
-                    logger.error(f"Error creating customer account: {e}", exc_info=True)
+                create_customer_account(instance)
 
         logger.info("Accounting signals registered for customers app")
     except ImportError:
@@ -465,10 +515,13 @@ def register_customer_signals():
 def update_account_balance_on_line_save(sender, instance, created, **kwargs):
     """
     تحديث رصيد الحساب تلقائياً عند حفظ سطر قيد
+    ✅ بفرق السطر فقط (تحديث ذري) بدلاً من إعادة جمع كل بنود الحساب
     """
+    from .balances import record_line_saved
+
     try:
-        if instance.account:
-            instance.account.update_balance()
+        if instance.account_id:
+            record_line_saved(instance, created)
     except Exception as e:
         logger.error(f"Error updating account balance on line save: {e}", exc_info=True)
 
@@ -478,13 +531,28 @@ def update_account_balance_on_line_delete(sender, instance, **kwargs):
     """
     تحديث رصيد الحساب تلقائياً عند حذف سطر قيد
     """
+    from .balances import record_line_deleted
+
     try:
-        if instance.account:
-            instance.account.update_balance()
+        if instance.account_id:
+            record_line_deleted(instance)
     except Exception as e:
         logger.error(f"Error updating account balance on line delete: {e}", exc_info=True)
 
 
+@receiver(post_save, sender='accounting.Transaction')
+def update_period_balances_on_transaction_save(sender, instance, created, **kwargs):
+    """
+    ترحيل/إلغاء قيد مؤرخ في شهر مُقفل: نقل أثر بنوده إلى لقطات الأشهر
+    """
+    from .balances import record_transaction_saved
+
+    try:
+        record_transaction_saved(instance, created)
+    except Exception as e:
+        logger.error(f"Error updating period balances on transaction save: {e}", exc_info=True)
+
+
 # ============================================
 # إشارات مدفوعات التركيبات
 # Installation Payment Signals
@@ -0,0 +1,21 @@
+"""
+مهام Celery للنظام المحاسبي
+Accounting Celery Tasks
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger("accounting")
+
+
+@shared_task(
+    queue="maintenance",
+    name="accounting.tasks.close_ledger_periods",
+)
+def close_ledger_periods():
+    """إقفال الأشهر المكتملة بلقطات أرصدة ختامية (accounting.balances)"""
+    from .balances import close_periods
+
+    return {"status": "success", "closed": close_periods()}
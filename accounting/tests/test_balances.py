@@ -0,0 +1,124 @@
+"""
+اختبارات أرصدة دفتر الأستاذ (فروقات البنود ولقطات الإقفال الشهرية)
+Ledger Balances Tests
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.test import TestCase
+
+from accounting import balances
+from accounting.models import (
+    Account,
+    AccountPeriodBalance,
+    AccountType,
+    LedgerPeriod,
+    Transaction,
+    TransactionLine,
+)
+
+
+class LedgerBalancesTestCase(TestCase):
+    """اختبارات الرصيد بالفروقات والتقارير من اللقطات"""
+
+    def setUp(self):
+        self.asset_type = AccountType.objects.create(
+            name="أصول", category="asset", code_prefix="1", normal_balance="debit"
+        )
+        self.revenue_type = AccountType.objects.create(
+            name="إيرادات", category="revenue", code_prefix="4", normal_balance="credit"
+        )
+        self.cash = Account.objects.create(
+            code="1001", name="نقد", account_type=self.asset_type
+        )
+        self.revenue = Account.objects.create(
+            code="4001", name="إيرادات مبيعات", account_type=self.revenue_type
+        )
+
+    def _post(self, day, amount):
+        txn = Transaction.objects.create(
+            transaction_type="invoice", description="قيد اختبار", date=day
+        )
+        TransactionLine.objects.create(
+            transaction=txn, account=self.cash, debit=amount, credit=Decimal("0")
+        )
+        TransactionLine.objects.create(
+            transaction=txn, account=self.revenue, debit=Decimal("0"), credit=amount
+        )
+        txn.post()
+        return txn
+
+    def _full_scan(self, as_of):
+        totals = {}
+        for account in (self.cash, self.revenue):
+            sums = account.transaction_lines.filter(
+                transaction__status="posted", transaction__date__lte=as_of
+            ).aggregate(debit=Sum("debit"), credit=Sum("credit"))
+            totals[account.pk] = (sums["debit"], sums["credit"])
+        return totals
+
+    def test_line_edit_and_delete_apply_difference(self):
+        txn = self._post(date(2025, 1, 10), Decimal("100.00"))
+        line = txn.lines.get(account=self.cash)
+        line.debit = Decimal("80.00")
+        line.save()
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.current_balance, Decimal("80.00"))
+
+        line.delete()
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.current_balance, Decimal("0.00"))
+        self.assertEqual(self.cash.current_balance, self.cash.get_balance())
+
+    def test_totals_match_full_scan_after_close(self):
+        self._post(date(2025, 1, 10), Decimal("100.00"))
+        self._post(date(2025, 2, 5), Decimal("40.00"))
+        self._post(date(2025, 3, 20), Decimal("15.00"))
+
+        closed = balances.close_periods(until=date(2025, 3, 15))
+
+        self.assertEqual(closed, 2)
+        self.assertEqual(LedgerPeriod.objects.count(), 2)
+        for as_of in (date(2025, 1, 31), date(2025, 2, 14), date(2025, 3, 31)):
+            self.assertEqual(
+                {pk: balances.posted_totals(as_of).get(pk) for pk in (self.cash.pk, self.revenue.pk)},
+                self._full_scan(as_of),
+            )
+        self.assertEqual(
+            balances.movement_totals(date(2025, 2, 1), date(2025, 2, 28))[self.revenue.pk],
+            (Decimal("0.00"), Decimal("40.00")),
+        )
+
+    def test_backdated_posting_updates_closed_snapshots(self):
+        self._post(date(2025, 1, 10), Decimal("100.00"))
+        balances.close_periods(until=date(2025, 3, 1))
+
+        late = self._post(date(2025, 1, 25), Decimal("30.00"))
+        snapshot = AccountPeriodBalance.objects.get(account=self.cash, period=date(2025, 1, 1))
+        self.assertEqual(snapshot.closing_debit, Decimal("130.00"))
+
+        late.cancel()
+        self.assertEqual(
+            balances.posted_totals(date(2025, 2, 28))[self.cash.pk],
+            (Decimal("100.00"), Decimal("0.00")),
+        )
+
+    def test_rollup_by_level(self):
+        parent = Account.objects.create(
+            code="1100", name="النقدية", account_type=self.asset_type, allow_transactions=False
+        )
+        child = Account.objects.create(
+            code="1110", name="صندوق", account_type=self.asset_type, parent=parent
+        )
+        grandchild = Account.objects.create(
+            code="1111", name="صندوق فرعي", account_type=self.asset_type, parent=child
+        )
+        totals = balances.rollup(
+            [parent, child, grandchild],
+            {child.pk: Decimal("10"), grandchild.pk: Decimal("5")},
+        )
+        self.assertEqual(totals[parent.pk], Decimal("15"))
+        self.assertEqual(totals[child.pk], Decimal("15"))
+        self.assertEqual(totals[grandchild.pk], Decimal("5"))
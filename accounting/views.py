@@ -18,6 +18,7 @@ from django.utils import timezone
 from accounts.models import SystemSettings
 from core.audit import log_audit
 
+from .balances import movement_totals, posted_totals, rollup
 from .forms import (
     AccountForm,
     DateRangeFilterForm,
@@ -51,6 +52,19 @@ def get_currency_context():
 # ============================================
 
 
+def _with_totals(accounts, totals):
+    """
+    إرفاق مجاميع القيود المرحّلة (accounting.balances) بالحسابات كـ sum_debit/sum_credit
+    بدلاً من annotate يمسح كل بنود الدفتر
+    """
+    accounts = list(accounts)
+    for account in accounts:
+        account.sum_debit, account.sum_credit = totals.get(
+            account.pk, (Decimal("0"), Decimal("0"))
+        )
+    return accounts
+
+
 @login_required
 def dashboard(request):
     """
@@ -352,12 +366,22 @@ def account_tree(request):
     """
     شجرة الحسابات
     """
+    # الشجرة كاملة باستعلام واحد، ورصيد كل حساب أب = مجموع فروعه مستوى بمستوى
+    accounts = list(Account.objects.order_by("code"))
+    tree_balances = rollup(accounts, {account.pk: account.current_balance for account in accounts})
+    by_id = {account.pk: account for account in accounts}
+    for account in accounts:
+        account.tree_balance = tree_balances[account.pk]
+        account.tree_children = []
+
     # الحسابات الجذرية (بدون أب)
-    root_accounts = (
-        Account.objects.filter(parent__isnull=True, is_active=True)
-        .prefetch_related("children")
-        .order_by("code")
-    )
+    root_accounts = []
+    for account in accounts:
+        parent = by_id.get(account.parent_id)
+        if parent:
+            parent.tree_children.append(account)
+        elif account.parent_id is None and account.is_active:
+            root_accounts.append(account)
 
     context = {
         "root_accounts": root_accounts,
@@ -1007,17 +1031,9 @@ def trial_balance(request):
     total_debit = Decimal("0")
     total_credit = Decimal("0")
 
-    # بناء فلتر التاريخ
-    line_filter = Q(transaction_lines__transaction__status='posted')
-    if start_date:
-        line_filter &= Q(transaction_lines__transaction__date__gte=start_date)
-    if end_date:
-        line_filter &= Q(transaction_lines__transaction__date__lte=end_date)
-
-    # استعلام واحد مع annotate بدلاً من حلقة N+1
-    accounts_with_totals = accounts.annotate(
-        sum_debit=Sum('transaction_lines__debit', filter=line_filter, default=Decimal("0")),
-        sum_credit=Sum('transaction_lines__credit', filter=line_filter, default=Decimal("0")),
+    # حركة الفترة = لقطة آخر شهر مُقفل + بنود ما بعده (بدلاً من مسح الدفتر كاملاً)
+    accounts_with_totals = _with_totals(
+        accounts, movement_totals(start_date, end_date)
     )
 
     for account in accounts_with_totals:
@@ -1086,27 +1102,16 @@ def income_statement(request):
         start_date = form.cleaned_data.get('start_date')
         end_date = form.cleaned_data.get('end_date')
 
-    # فلتر التاريخ
-    date_filter = Q(transaction_lines__transaction__status='posted')
-    if start_date:
-        date_filter &= Q(transaction_lines__transaction__date__gte=start_date)
-    if end_date:
-        date_filter &= Q(transaction_lines__transaction__date__lte=end_date)
+    # حركة الفترة لكل الحسابات (لقطات الأشهر المُقفلة + بنود ما بعدها)
+    totals = movement_totals(start_date, end_date)
 
-    # بناء فلتر بنود القيود
-    line_date_filter = {"transaction__status": "posted"}
-    if start_date:
-        line_date_filter["transaction__date__gte"] = start_date
-    if end_date:
-        line_date_filter["transaction__date__lte"] = end_date
-
-    # الإيرادات (حسابات 4xxx) — استعلام واحد مع annotate
-    revenue_accounts = Account.objects.filter(
-        account_type__code_prefix__startswith="4",
-        is_active=True,
-    ).select_related("account_type").annotate(
-        sum_debit=Sum('transaction_lines__debit', filter=date_filter, default=Decimal("0")),
-        sum_credit=Sum('transaction_lines__credit', filter=date_filter, default=Decimal("0")),
+    # الإيرادات (حسابات 4xxx)
+    revenue_accounts = _with_totals(
+        Account.objects.filter(
+            account_type__code_prefix__startswith="4",
+            is_active=True,
+        ).select_related("account_type"),
+        totals,
     )
 
     revenue_data = []
@@ -1117,13 +1122,13 @@ def income_statement(request):
             revenue_data.append({"account": acc, "balance": abs(balance)})
             total_revenue += abs(balance)
 
-    # المصروفات (حسابات 5xxx) — استعلام واحد مع annotate
-    expense_accounts = Account.objects.filter(
-        account_type__code_prefix__startswith="5",
-        is_active=True,
-    ).select_related("account_type").annotate(
-        sum_debit=Sum('transaction_lines__debit', filter=date_filter, default=Decimal("0")),
-        sum_credit=Sum('transaction_lines__credit', filter=date_filter, default=Decimal("0")),
+    # المصروفات (حسابات 5xxx)
+    expense_accounts = _with_totals(
+        Account.objects.filter(
+            account_type__code_prefix__startswith="5",
+            is_active=True,
+        ).select_related("account_type"),
+        totals,
     )
 
     expense_data = []
@@ -1158,16 +1163,16 @@ def balance_sheet(request):
     """
     الميزانية العمومية - محسّنة باستخدام TransactionLine aggregates
     """
-    # فلتر لبنود القيود المرحّلة فقط
-    line_filter = Q(transaction_lines__transaction__status='posted')
+    # مجاميع القيود المرحّلة: لقطات الأشهر المُقفلة + بنود ما بعدها
+    totals = posted_totals()
 
-    # الأصول (حسابات 1xxx) — استعلام واحد مع annotate
-    asset_accounts = Account.objects.filter(
-        account_type__code_prefix__startswith="1",
-        is_active=True,
-    ).select_related("account_type").order_by("code").annotate(
-        sum_debit=Sum('transaction_lines__debit', filter=line_filter, default=Decimal("0")),
-        sum_credit=Sum('transaction_lines__credit', filter=line_filter, default=Decimal("0")),
+    # الأصول (حسابات 1xxx)
+    asset_accounts = _with_totals(
+        Account.objects.filter(
+            account_type__code_prefix__startswith="1",
+            is_active=True,
+        ).select_related("account_type").order_by("code"),
+        totals,
     )
 
     asset_data = []
@@ -1177,13 +1182,13 @@ def balance_sheet(request):
         asset_data.append({"account": acc, "balance": balance})
         total_assets += balance
 
-    # الخصوم (حسابات 2xxx) — استعلام واحد مع annotate
-    liability_accounts = Account.objects.filter(
-        account_type__code_prefix__startswith="2",
-        is_active=True,
-    ).select_related("account_type").order_by("code").annotate(
-        sum_debit=Sum('transaction_lines__debit', filter=line_filter, default=Decimal("0")),
-        sum_credit=Sum('transaction_lines__credit', filter=line_filter, default=Decimal("0")),
+    # الخصوم (حسابات 2xxx)
+    liability_accounts = _with_totals(
+        Account.objects.filter(
+            account_type__code_prefix__startswith="2",
+            is_active=True,
+        ).select_related("account_type").order_by("code"),
+        totals,
     )
 
     liability_data = []
@@ -1193,13 +1198,13 @@ def balance_sheet(request):
         liability_data.append({"account": acc, "balance": balance})
         total_liabilities += balance
 
-    # حقوق الملكية (حسابات 3xxx) — استعلام واحد مع annotate
-    equity_accounts = Account.objects.filter(
-        account_type__code_prefix__startswith="3",
-        is_active=True,
-    ).select_related("account_type").order_by("code").annotate(
-        sum_debit=Sum('transaction_lines__debit', filter=line_filter, default=Decimal("0")),
-        sum_credit=Sum('transaction_lines__credit', filter=line_filter, default=Decimal("0")),
+    # حقوق الملكية (حسابات 3xxx)
+    equity_accounts = _with_totals(
+        Account.objects.filter(
+            account_type__code_prefix__startswith="3",
+            is_active=True,
+        ).select_related("account_type").order_by("code"),
+        totals,
     )
 
     equity_data = []
@@ -1523,7 +1528,7 @@ def general_ledger(request):
     """
     دفتر الأستاذ العام - يعرض جميع حركات حساب معين مع الرصيد المتراكم
     """
-    from datetime import datetime
+    from datetime import datetime, timedelta
 
     account_id = request.GET.get("account")
     from_date = request.GET.get("from_date", "")
@@ -1556,15 +1561,11 @@ def general_ledger(request):
         if from_date:
             try:
                 from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-                # حساب الرصيد قبل تاريخ البداية
-                prior_totals = TransactionLine.objects.filter(
-                    account=selected_account,
-                    transaction__status="posted",
-                    transaction__date__lt=from_dt,
-                ).aggregate(sum_debit=Sum("debit"), sum_credit=Sum("credit"))
-                running_balance += (prior_totals["sum_debit"] or Decimal("0")) - (
-                    prior_totals["sum_credit"] or Decimal("0")
-                )
+                # حساب الرصيد قبل تاريخ البداية (لقطة آخر شهر مُقفل + ما بعدها)
+                prior_debit, prior_credit = posted_totals(
+                    from_dt - timedelta(days=1), [selected_account.pk]
+                ).get(selected_account.pk, (Decimal("0"), Decimal("0")))
+                running_balance += prior_debit - prior_credit
                 lines_qs = lines_qs.filter(transaction__date__gte=from_dt)
             except ValueError:
                 pass
@@ -1691,14 +1692,11 @@ def export_trial_balance(request):
     """
     from .export_utils import export_trial_balance_excel
 
-    accounts = (
+    accounts = _with_totals(
         Account.objects.filter(is_active=True)
         .select_related("account_type")
-        .order_by("code")
-        .annotate(
-            agg_debit=Sum('transaction_lines__debit', filter=Q(transaction_lines__transaction__status='posted'), default=Decimal("0")),
-            agg_credit=Sum('transaction_lines__credit', filter=Q(transaction_lines__transaction__status='posted'), default=Decimal("0")),
-        )
+        .order_by("code"),
+        posted_totals(),
     )
 
     trial_data = []
@@ -1706,8 +1704,8 @@ def export_trial_balance(request):
     total_credit = Decimal("0")
 
     for account in accounts:
-        debit_total = account.agg_debit or Decimal("0")
-        credit_total = account.agg_credit or Decimal("0")
+        debit_total = account.sum_debit
+        credit_total = account.sum_credit
         balance = account.opening_balance + debit_total - credit_total
 
         debit_balance = balance if balance > 0 else Decimal("0")
@@ -1,34 +1,25 @@
 from django.core.cache import cache
 from django.utils import timezone
 
+from core.layout_context import render_section
+
 from accounts.models import FooterSettings
 from accounts.models import SystemSettings as AccountsSystemSettings
 
 from .models import BranchMessage, CompanyInfo, Department
 
-# ====== Cache TTL Constants ======
-_CACHE_TTL_LONG = 600  # 10 دقائق — بيانات تتغير نادراً
-_CACHE_TTL_SHORT = 60  # 1 دقيقة — بيانات تتغير أحياناً
+# ✅ الكاش والإلغاء بالإصدارات تتم في core.layout_context (قراءة واحدة لكل الأقسام)
+# دوال build_* تبني القيم بدون كاش، والدوال القديمة بنفس الأسماء للتوافق فقط
 
 
 def departments(request):
-    """
-    Context processor to add departments to all templates in a hierarchical
-    structure. Cached per-user for 10 minutes.
-    """
-    if not request.user.is_authenticated:
-        return {
-            "all_departments": [],
-            "parent_departments": [],
-            "user_departments": [],
-            "user_parent_departments": [],
-        }
+    """Context processor: الأقسام بشكل هرمي — عبر خدمة سياق القالب الموحدة"""
+    return render_section(request, "departments")
+
 
+def build_departments(request):
+    """بناء الأقسام بشكل هرمي للمستخدم الحالي (بدون كاش)"""
     user = request.user
-    cache_key = f"ctx_departments_{user.pk}_{user.is_superuser}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
 
     # Get all active departments
     all_departments = list(Department.objects.filter(is_active=True).order_by("order"))
@@ -49,22 +40,21 @@ def departments(request):
             d for d in all_departments if d.id in user_parent_ids
         ]
 
-    result = {
+    return {
         "all_departments": all_departments,
         "parent_departments": parent_departments,
         "user_departments": user_departments,
         "user_parent_departments": user_parent_departments,
     }
-    cache.set(cache_key, result, _CACHE_TTL_LONG)
-    return result
 
 
 def company_info(request):
-    """توفير معلومات الشركة لجميع القوالب — Cached 10 minutes"""
-    cached = cache.get("ctx_company_info")
-    if cached is not None:
-        return cached
+    """توفير معلومات الشركة لجميع القوالب"""
+    return render_section(request, "company_info")
 
+
+def build_company_info(request):
+    """بناء معلومات الشركة (بدون كاش)"""
     try:
         company = CompanyInfo.objects.first()
         if not company:
@@ -94,17 +84,16 @@ def company_info(request):
         except (ValueError, FileNotFoundError):
             company.logo = None
 
-    result = {"company_info": company}
-    cache.set("ctx_company_info", result, _CACHE_TTL_LONG)
-    return result
+    return {"company_info": company}
 
 
 def footer_settings(request):
-    """توفير إعدادات التذييل لجميع القوالب — Cached 10 minutes"""
-    cached = cache.get("ctx_footer_settings")
-    if cached is not None:
-        return cached
+    """توفير إعدادات التذييل لجميع القوالب"""
+    return render_section(request, "footer_settings")
 
+
+def build_footer_settings(request):
+    """بناء إعدادات التذييل (بدون كاش)"""
     try:
         fs = FooterSettings.objects.first()
         if not fs:
@@ -122,18 +111,16 @@ def footer_settings(request):
             right_column_title="تواصل معنا",
         )
 
-    result = {"footer_settings": fs, "current_year": timezone.now().year}
-    cache.set("ctx_footer_settings", result, _CACHE_TTL_LONG)
-    return result
+    return {"footer_settings": fs, "current_year": timezone.now().year}
 
 
 def system_settings(request):
-    """توفير إعدادات النظام لجميع القوالب — Cached 1 hour"""
-    _CACHE_KEY = "ctx_system_settings"
-    cached = cache.get(_CACHE_KEY)
-    if cached is not None:
-        return cached
+    """توفير إعدادات النظام لجميع القوالب"""
+    return render_section(request, "system_settings")
+
 
+def build_system_settings(request):
+    """بناء إعدادات النظام (بدون كاش)"""
     try:
         settings, _created = AccountsSystemSettings.objects.get_or_create(pk=1)
     except Exception:
@@ -143,15 +130,13 @@ def system_settings(request):
             "currency_symbol": "ر.س",
         }
 
-    result = {
+    return {
         "system_settings": settings,
         "currency_code": settings.currency,
         "currency_symbol": settings.CURRENCY_SYMBOLS.get(
             settings.currency, settings.currency
         ),
     }
-    cache.set(_CACHE_KEY, result, 3600)
-    return result
 
 
 def user_context(request):
@@ -168,6 +153,11 @@ def branch_messages(request):
     Context processor to add branch messages to templates.
     Only loads messages for the home page.
     """
+    return render_section(request, "branch_messages")
+
+
+def build_branch_messages(request):
+    """رسائل الفروع للصفحة الرئيسية (QuerySet كسول — لا يُخزَّن)"""
     if request.user.is_authenticated and request.path == "/":
         from django.db.models import Q
 
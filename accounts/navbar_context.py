@@ -1,13 +1,10 @@
 """
 Context processor لعرض قائمة الأقسام والوحدات في navbar
-Cached per-user for 5 minutes to eliminate 2-5 queries per page load.
+الكاش لكل مستخدم مع الإلغاء بالإصدارات يتم عبر core.layout_context.
 """
 
-from django.core.cache import cache
-
 from accounts.models import Department
-
-_NAVBAR_CACHE_TTL = 300  # 5 دقائق
+from core.layout_context import render_section
 
 # روابط مخفية بشكل دائم من الناف بار — لا تتغير حتى لو تغيرت قاعدة البيانات
 _HIDDEN_NAVBAR_URLS = {
@@ -93,16 +90,14 @@ def _is_url_restricted(user, url_name):
 def navbar_departments(request):
     """
     إرجاع الأقسام والوحدات التي يجب عرضها في navbar
-    بناءً على صلاحيات المستخدم وأقسامه — Cached per user
+    بناءً على صلاحيات المستخدم وأقسامه — عبر خدمة سياق القالب الموحدة
     """
-    if not request.user.is_authenticated:
-        return {"navbar_departments": []}
+    return render_section(request, "navbar")
+
 
+def build_navbar_departments(request):
+    """بناء عناصر navbar للمستخدم الحالي (بدون كاش)"""
     user = request.user
-    cache_key = f"ctx_navbar_{user.pk}_{user.is_staff}_{user.is_superuser}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
 
     # Import Warehouse here to avoid circular imports
     from inventory.models import Warehouse
@@ -431,6 +426,4 @@ def navbar_departments(request):
         key: value for key, value in navbar_items.items() if value["units"]
     }
 
-    result = {"navbar_departments": navbar_items_filtered}
-    cache.set(cache_key, result, _NAVBAR_CACHE_TTL)
-    return result
+    return {"navbar_departments": navbar_items_filtered}
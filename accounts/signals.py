@@ -328,8 +328,8 @@ def sync_role_permissions_on_assign(sender, instance, created, **kwargs):
         # مسح كاش الصلاحيات
         from django.core.cache import cache
         cache.delete(f"user_permissions_{user.id}")
-        for suffix in [f"{user.is_staff}_{user.is_superuser}", "True_True", "True_False", "False_False"]:
-            cache.delete(f"ctx_navbar_{user.pk}_{suffix}")
+        from core.layout_context import bump_user_layout_version
+        bump_user_layout_version(user.pk)
     except Exception as e:
         import logging
         logging.getLogger(__name__).warning(f"خطأ في مزامنة صلاحيات الدور: {e}")
@@ -351,8 +351,8 @@ def sync_role_permissions_on_remove(sender, instance, **kwargs):
         # مسح كاش الصلاحيات
         from django.core.cache import cache
         cache.delete(f"user_permissions_{user.id}")
-        for suffix in [f"{user.is_staff}_{user.is_superuser}", "True_True", "True_False", "False_False"]:
-            cache.delete(f"ctx_navbar_{user.pk}_{suffix}")
+        from core.layout_context import bump_user_layout_version
+        bump_user_layout_version(user.pk)
     except Exception as e:
         import logging
         logging.getLogger(__name__).warning(f"خطأ في إزالة صلاحيات الدور: {e}")
@@ -8,7 +8,6 @@ import logging
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.http import JsonResponse
@@ -21,6 +20,7 @@ from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 
 from accounts.models import ROLE_HIERARCHY, Branch, Role, User, UserRole
+from core.layout_context import bump_user_layout_version
 
 logger = logging.getLogger(__name__)
 
@@ -239,8 +239,7 @@ def _handle_user_edit_post(request, user_obj):
     user_obj.user_permissions.set(valid_perm_ids)
 
     # مسح كاش الناف بار لهذا المستخدم
-    for suffix in [f"{user_obj.is_staff}_{user_obj.is_superuser}", "True_True", "True_False", "False_False"]:
-        cache.delete(f"ctx_navbar_{user_obj.pk}_{suffix}")
+    bump_user_layout_version(user_obj.pk)
 
     messages.success(request, _(f"تم تحديث بيانات {user_obj.get_full_name() or user_obj.username} بنجاح"))
     return redirect("accounts:user_manage_edit", pk=user_obj.pk)
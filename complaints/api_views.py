@@ -668,13 +668,15 @@ def clear_complaints_notifications(request):
     API endpoint لمسح جميع إشعارات الشكاوى للمستخدم الحالي - يستخدم النظام الرئيسي الموحد
     """
     try:
+        from notifications.counters import mark_visibilities_read
         from notifications.models import NotificationVisibility
 
-        updated_count = NotificationVisibility.objects.filter(
-            user=request.user,
-            is_read=False,
-            notification__notification_type__startswith="complaint_",
-        ).update(is_read=True)
+        updated_count = mark_visibilities_read(
+            NotificationVisibility.objects.filter(
+                user=request.user,
+                notification__notification_type__startswith="complaint_",
+            )
+        )
 
         return JsonResponse(
             {
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def mark_already_notified(apps, schema_editor):
+    """
+    الفحص الساعي السابق كان قد أرسل إشعارات الشكاوى المتأخرة وقريبة الموعد —
+    تعليمها حتى لا يعيد المجدول الجديد إرسالها عند أول تشغيل.
+    """
+    Complaint = apps.get_model("complaints", "Complaint")
+    now = timezone.now()
+
+    Complaint.objects.filter(status="overdue").update(overdue_notified_at=F("deadline"))
+    Complaint.objects.filter(
+        status__in=["new", "in_progress"], deadline__lte=now + timedelta(hours=24)
+    ).update(deadline_warning_sent_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("complaints", "0015_add_complaint_source_field"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="complaint",
+            name="deadline_warning_sent_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="تاريخ تحذير اقتراب الموعد",
+            ),
+        ),
+        migrations.AddField(
+            model_name="complaint",
+            name="overdue_notified_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="تاريخ إشعار التأخر",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="complaint",
+            index=models.Index(
+                fields=["status", "deadline"], name="complaint_status_deadline_idx"
+            ),
+        ),
+        migrations.RunPython(mark_already_notified, migrations.RunPython.noop),
+    ]
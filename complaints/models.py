@@ -189,6 +189,13 @@ class Complaint(models.Model):
     closed_at = models.DateTimeField(
         null=True, blank=True, verbose_name="تاريخ الإغلاق"
     )
+    # ✅ إشعارات SLA المرسلة (complaints.sla) — تُصفَّر عند تغيير الموعد النهائي
+    deadline_warning_sent_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="تاريخ تحذير اقتراب الموعد"
+    )
+    overdue_notified_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="تاريخ إشعار التأخر"
+    )
 
     # المسؤوليات
     assigned_to = models.ForeignKey(
@@ -263,8 +270,16 @@ class Complaint(models.Model):
             models.Index(fields=["assigned_to"]),
             models.Index(fields=["deadline"]),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["status", "deadline"], name="complaint_status_deadline_idx"),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # الموعد النهائي كما حُمّل — تغييره يعيد تسليح إشعارات SLA
+        instance._loaded_deadline = dict(zip(field_names, values)).get("deadline")
+        return instance
+
     def save(self, *args, **kwargs):
         # إنشاء رقم الشكوى تلقائياً
         if not self.complaint_number:
@@ -352,7 +367,25 @@ class Complaint(models.Model):
                     escalated_by=None,  # تصعيد تلقائي
                 )
 
+        # موعد نهائي جديد = تحذير وإشعار تأخر جديدان
+        update_fields = kwargs.get("update_fields")
+        loaded_deadline = getattr(self, "_loaded_deadline", None)
+        if (
+            loaded_deadline
+            and self.deadline != loaded_deadline
+            and (update_fields is None or "deadline" in update_fields)
+        ):
+            self.deadline_warning_sent_at = None
+            self.overdue_notified_at = None
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "deadline_warning_sent_at",
+                    "overdue_notified_at",
+                }
+
         super().save(*args, **kwargs)
+        self._loaded_deadline = self.deadline
 
     def calculate_business_hours_deadline(
         self, start_time, hours, start_hour, end_hour, working_days
@@ -389,68 +422,22 @@ class Complaint(models.Model):
         return current
 
     def generate_complaint_number(self):
-        """توليد رقم شكوى فريد بناءً على كود العميل مسبوقاً بحرف P"""
-        try:
-            # الحصول على كود العميل
-            customer_code = (
-                self.customer.code
-                if self.customer and self.customer.code
-                else "UNKNOWN"
-            )
-
-            # البحث عن آخر رقم شكوى لهذا العميل
-            last_complaint = (
-                Complaint.objects.filter(
-                    customer=self.customer,
-                    complaint_number__startswith=f"P{customer_code}",
-                )
-                .exclude(pk=self.pk)
-                .order_by("-complaint_number")
-                .first()
-            )
+        """توليد رقم شكوى فريد بناءً على كود العميل مسبوقاً بحرف P (عداد core.sequences)"""
+        from core.sequences import allocate, max_suffix
 
-            if last_complaint:
-                try:
-                    # استخراج الرقم التسلسلي من آخر شكوى
-                    # مثال: P01-0001-001 -> 001
-                    last_num = int(last_complaint.complaint_number.split("-")[-1])
-                    next_num = last_num + 1
-                except (IndexError, ValueError):
-                    next_num = 1
-            else:
-                next_num = 1
-
-            # التأكد من عدم تكرار رقم الشكوى
-            max_attempts = 100
-            for attempt in range(max_attempts):
-                potential_complaint_number = f"P{customer_code}-{next_num:03d}"
-
-                # التحقق من عدم وجود رقم مكرر (باستثناء الشكوى الحالية)
-                if (
-                    not Complaint.objects.filter(
-                        complaint_number=potential_complaint_number
-                    )
-                    .exclude(pk=self.pk)
-                    .exists()
-                ):
-                    return potential_complaint_number
-
-                next_num += 1
-
-            # إذا فشل في العثور على رقم فريد، استخدم UUID
-            import uuid
-
-            return f"P{customer_code}-{str(uuid.uuid4())[:6].upper()}"
-
-        except Exception as e:
-            print(f"Error generating complaint number: {e}")
-            # استخدام طريقة احتياطية في حالة حدوث خطأ
-            import uuid
-            from datetime import datetime
-
-            year = datetime.now().year
-            month = datetime.now().month
-            return f"P-{year}{month:02d}-{uuid.uuid4().hex[:6].upper()}"
+        customer_code = (
+            self.customer.code if self.customer and self.customer.code else "UNKNOWN"
+        )
+        prefix = f"P{customer_code}-"
+        return allocate(
+            "complaints.complaint_number",
+            prefix,
+            render=lambda n: f"{prefix}{n:03d}",
+            seed=lambda: max_suffix(Complaint.objects, "complaint_number", prefix),
+            taken=lambda value: Complaint.objects.filter(complaint_number=value)
+            .exclude(pk=self.pk)
+            .exists(),
+        )
 
     def __str__(self):
         return f"{self.complaint_number} - {self.customer.name}"
@@ -493,7 +493,8 @@ class ComplaintNotificationService:
         """
         try:
             from django.contrib.contenttypes.models import ContentType
-            from notifications.models import Notification, NotificationVisibility
+            from notifications.counters import mark_visibilities_read
+            from notifications.models import NotificationVisibility
 
             ct = ContentType.objects.get_for_model(complaint)
 
@@ -508,7 +509,7 @@ class ComplaintNotificationService:
                 ],
             )
 
-            updated_count = old_visibility.update(is_read=True)
+            updated_count = mark_visibilities_read(old_visibility)
 
             if updated_count > 0:
                 logger.info(
@@ -525,15 +526,17 @@ class ComplaintNotificationService:
         """
         try:
             from django.contrib.contenttypes.models import ContentType
+            from notifications.counters import mark_visibilities_read
             from notifications.models import NotificationVisibility
 
             ct = ContentType.objects.get_for_model(complaint)
 
-            updated_count = NotificationVisibility.objects.filter(
-                is_read=False,
-                notification__content_type=ct,
-                notification__object_id=complaint.pk,
-            ).update(is_read=True)
+            updated_count = mark_visibilities_read(
+                NotificationVisibility.objects.filter(
+                    notification__content_type=ct,
+                    notification__object_id=complaint.pk,
+                )
+            )
 
             if updated_count > 0:
                 logger.info(
@@ -552,6 +555,7 @@ class ComplaintNotificationService:
         try:
             from django.contrib.contenttypes.models import ContentType
             from complaints.models import Complaint
+            from notifications.counters import mark_visibilities_read
             from notifications.models import Notification, NotificationVisibility
 
             ct = ContentType.objects.get_for_model(Complaint)
@@ -563,11 +567,12 @@ class ComplaintNotificationService:
             ).values_list("pk", flat=True))
 
             if resolved_ids:
-                hidden_count = NotificationVisibility.objects.filter(
-                    is_read=False,
-                    notification__content_type=ct,
-                    notification__object_id__in=resolved_ids,
-                ).update(is_read=True)
+                hidden_count = mark_visibilities_read(
+                    NotificationVisibility.objects.filter(
+                        notification__content_type=ct,
+                        notification__object_id__in=resolved_ids,
+                    )
+                )
                 total_hidden += hidden_count
 
             # 2. حذف الإشعارات القديمة جداً (أكثر من days يوم)
@@ -581,6 +586,7 @@ class ComplaintNotificationService:
             old_count = old_notifications.count()
             if old_count > 0:
                 # حذف visibility records أولاً ثم الإشعارات
+                # (post_delete لسجلات الرؤية ينقص عدادات غير المقروء)
                 NotificationVisibility.objects.filter(
                     notification__in=old_notifications
                 ).delete()
@@ -1,11 +1,13 @@
 """
 إشعارات الشكاوى - pre_save فقط لتخزين الحالة السابقة
 جميع الإشعارات الفعلية تمر عبر notifications/signals.py (النظام الرئيسي الموحد)
+post_save يجدول مؤقتات SLA فقط (complaints.sla)
 """
 
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
+from . import sla
 from .models import Complaint
 
 
@@ -32,3 +34,15 @@ def track_complaint_changes(sender, instance, **kwargs):
 
         except Complaint.DoesNotExist:
             pass
+
+
+@receiver(post_save, sender=Complaint)
+def schedule_complaint_sla_timers(sender, instance, created, update_fields=None, **kwargs):
+    """
+    جدولة مؤقتات التحذير والتأخر عند الإنشاء أو تغيّر الموعد النهائي/الحالة.
+    الحفظ الجزئي الذي لا يمس الموعد أو الحالة لا يغيّر المؤقتات.
+    """
+    if not created and update_fields is not None:
+        if not {"deadline", "status"} & set(update_fields):
+            return
+    sla.schedule_on_commit(instance)
@@ -0,0 +1,351 @@
+"""
+مؤقتات SLA للشكاوى (Complaint SLA Timers) في Redis
+===================================================
+كانت check_complaint_deadlines_task تمسح كل الشكاوى المفتوحة كل ساعة،
+تحفظ المتأخرة واحدة واحدة، وتعيد إرسال notify_overdue وتنبيهات التصعيد
+في كل تشغيل لنفس الشكاوى المتأخرة.
+
+الآن:
+- عند إنشاء الشكوى أو تغيّر موعدها/حالتها تُجدول مؤقتاتها (بعد commit)
+  في مجموعة مرتبة واحدة: التحذير قبل الموعد بـ 24 ساعة، والاستحقاق عند الموعد
+- مهمة كل دقيقة (process_due_timers) تسحب المؤقتات المستحقة فقط، تنقل الحالة
+  إلى "متأخرة" بتحديث جماعي واحد، وترسل الإشعارات مرة واحدة لكل شكوى
+- الإشعارات المرسلة تُسجَّل في deadline_warning_sent_at / overdue_notified_at
+  فلا تتكرر حتى يتغيّر الموعد النهائي
+- التحديث الجماعي لا يُطلق post_save، فإشعار مركز الإشعارات الموحد
+  (complaint_overdue) يُضاف للطابور هنا بنفس بيانات إشارة تغيير الحالة
+- reconcile() شبكة أمان ساعية عبر فهرس (status, deadline): تلتقط ما فات
+  (Redis غير متاح أو مؤقتات مفقودة) دون المرور على الشكاوى المُبلَّغ عنها
+
+المفاتيح:
+- crm:complaints:sla:timers  ZSET  "warn:<id>" / "due:<id>" → موعد الإطلاق (timestamp)
+
+الاستخدام:
+    schedule_on_commit(complaint)   # من إشارة post_save
+    process_due_timers()            # كل دقيقة
+    reconcile()                     # كل ساعة
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TIMERS_KEY = "crm:complaints:sla:timers"
+
+# الحالات التي يسري عليها الموعد النهائي (نفس شرط Complaint.save)
+OPEN_STATUSES = ("new", "in_progress")
+# التحذير قبل الموعد النهائي بيوم (نفس نافذة الفحص الساعي السابق)
+WARNING_LEAD = timedelta(hours=24)
+BATCH_SIZE = 500
+
+
+def _redis():
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def _timer_members(complaint_id):
+    return f"warn:{complaint_id}", f"due:{complaint_id}"
+
+
+# ─── الجدولة ─────────────────────────────────────────────────────────
+
+
+def _queue_timers(pipe, complaint_id, deadline, status, warning_sent, overdue_notified=False):
+    warn_member, due_member = _timer_members(complaint_id)
+    # شكوى حُفظت "متأخرة" مباشرة (Complaint.save) ولم يُبلَّغ عنها بعد: مؤقت استحقاق فقط
+    pending_overdue = status == "overdue" and not overdue_notified
+    if deadline is None or (status not in OPEN_STATUSES and not pending_overdue):
+        pipe.zrem(TIMERS_KEY, warn_member, due_member)
+        return
+    # zadd يستبدل موعد العضو إن وُجد — تغيير الموعد النهائي يحرّك المؤقت
+    due_at = deadline.timestamp()
+    pipe.zadd(TIMERS_KEY, {due_member: due_at})
+    if warning_sent or pending_overdue:
+        pipe.zrem(TIMERS_KEY, warn_member)
+    else:
+        pipe.zadd(TIMERS_KEY, {warn_member: due_at - WARNING_LEAD.total_seconds()})
+
+
+def schedule_complaint(complaint_id, deadline, status, warning_sent=False, overdue_notified=False):
+    """
+    (إعادة) جدولة مؤقتات شكوى واحدة — رحلة واحدة إلى Redis.
+    الشكاوى المغلقة/المحلولة تُزال مؤقتاتها.
+    """
+    client = _redis()
+    if client is None:
+        return False
+    try:
+        pipe = client.pipeline(transaction=False)
+        _queue_timers(pipe, complaint_id, deadline, status, warning_sent, overdue_notified)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ فشل جدولة مؤقتات الشكوى {complaint_id}: {e}")
+        return False
+
+
+def schedule_on_commit(complaint):
+    """جدولة مؤقتات الشكوى بعد نجاح المعاملة بالقيم المحفوظة فعلاً"""
+    args = (
+        complaint.pk,
+        complaint.deadline,
+        complaint.status,
+        bool(complaint.deadline_warning_sent_at),
+        bool(complaint.overdue_notified_at),
+    )
+    transaction.on_commit(lambda: schedule_complaint(*args))
+
+
+def schedule_open_complaints(client=None):
+    """
+    بذر مؤقتات كل الشكاوى المفتوحة (بعد النشر أو فقدان بيانات Redis).
+    Returns: عدد الشكاوى المجدولة
+    """
+    from .models import Complaint
+
+    client = client or _redis()
+    if client is None:
+        return 0
+
+    scheduled = 0
+    pipe = client.pipeline(transaction=False)
+    for complaint_id, deadline, status, warning_sent_at in (
+        Complaint.objects.filter(status__in=OPEN_STATUSES, deadline__isnull=False)
+        .order_by()
+        .values_list("pk", "deadline", "status", "deadline_warning_sent_at")
+        .iterator(chunk_size=2000)
+    ):
+        _queue_timers(pipe, complaint_id, deadline, status, bool(warning_sent_at))
+        scheduled += 1
+        if scheduled % BATCH_SIZE == 0:
+            pipe.execute()
+    pipe.execute()
+    return scheduled
+
+
+# ─── التنفيذ ─────────────────────────────────────────────────────────
+
+
+def _claim_due(client, now_ts, limit):
+    """
+    سحب دفعة من المؤقتات المستحقة. العضو يُعالَج فقط إذا نجح حذفه،
+    فلا تعالج مهمتان متزامنتان نفس المؤقت.
+    """
+    members = client.zrangebyscore(TIMERS_KEY, "-inf", now_ts, start=0, num=limit)
+    if not members:
+        return [], [], 0
+
+    pipe = client.pipeline(transaction=False)
+    for member in members:
+        pipe.zrem(TIMERS_KEY, member)
+    removed = pipe.execute()
+
+    warn_ids, due_ids = [], []
+    for member, claimed in zip(members, removed):
+        if not claimed:
+            continue
+        if isinstance(member, bytes):
+            member = member.decode()
+        kind, _, complaint_id = member.partition(":")
+        if not complaint_id.isdigit():
+            continue
+        (warn_ids if kind == "warn" else due_ids).append(int(complaint_id))
+    return warn_ids, due_ids, len(members)
+
+
+def _stamp_unnotified(queryset, field, now):
+    """
+    تعليم الشكاوى التي لم تُرسل لها الإشعار بعد وإرجاع معرفاتها.
+    الصفوف المقفلة لدى عامل آخر تُتخطى — كل شكوى تُبلَّغ مرة واحدة.
+    """
+    from .models import Complaint
+
+    with transaction.atomic():
+        complaint_ids = list(
+            queryset.filter(**{f"{field}__isnull": True})
+            .order_by()
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)
+        )
+        if complaint_ids:
+            Complaint.objects.filter(pk__in=complaint_ids).update(**{field: now})
+    return complaint_ids
+
+
+def mark_overdue(complaint_ids, now=None):
+    """
+    نقل الشكاوى التي تجاوزت موعدها إلى "متأخرة" بتحديث واحد،
+    ثم إشعار المسؤولين ومستخدمي التصعيد مرة واحدة لكل شكوى.
+    Returns: (عدد الشكاوى المنقولة، عدد الشكاوى المُبلَّغ عنها)
+    """
+    from .models import Complaint
+    from .services.notification_service import ComplaintNotificationService
+
+    if not complaint_ids:
+        return 0, 0
+    now = now or timezone.now()
+
+    due = Complaint.objects.filter(pk__in=complaint_ids, deadline__lte=now)
+    old_statuses = dict(due.filter(status__in=OPEN_STATUSES).values_list("pk", "status"))
+    transitioned = due.filter(pk__in=old_statuses, status__in=OPEN_STATUSES).update(
+        status="overdue", updated_at=now, last_activity_at=now
+    )
+    notify_ids = _stamp_unnotified(due.filter(status="overdue"), "overdue_notified_at", now)
+
+    if notify_ids:
+        notification_svc = ComplaintNotificationService()
+        for complaint in Complaint.objects.filter(pk__in=notify_ids).select_related(
+            "assigned_to", "customer", "complaint_type", "assigned_department__manager"
+        ):
+            notification_svc.notify_overdue(complaint)
+            notification_svc.notify_overdue_to_escalation_users(complaint)
+            # الشكاوى التي نُقلت للتو — المنقولة بـ save() أرسلت إشارتها بالفعل
+            if complaint.pk in old_statuses:
+                _queue_status_notification(complaint, old_statuses[complaint.pk])
+
+    return transitioned, len(notify_ids)
+
+
+def _queue_status_notification(complaint, old_status):
+    """
+    نفس إشعار notifications.signals.complaint_status_and_assignment_notification
+    لتغيير الحالة إلى "متأخرة" (التحديث الجماعي لا يمر بـ post_save)
+    """
+    from notifications.signals import queue_notification
+
+    labels = dict(complaint.STATUS_CHOICES)
+    queue_notification(
+        title=f"تغيير حالة الشكوى {complaint.complaint_number}",
+        message=(
+            f'تم تغيير حالة الشكوى من "{labels.get(old_status, old_status)}" '
+            f'إلى "{labels.get(complaint.status, complaint.status)}"'
+        ),
+        notification_type="complaint_overdue",
+        related_object=complaint,
+        priority="high",
+        extra_data={
+            "complaint_number": complaint.complaint_number,
+            "customer_name": complaint.customer.name,
+            "old_status": old_status,
+            "new_status": complaint.status,
+            "url": f"/complaints/{complaint.pk}/",
+            "changed_by": None,
+            "changed_by_username": None,
+        },
+    )
+
+
+def send_deadline_warnings(complaint_ids, now=None):
+    """
+    تحذير المسؤول من اقتراب الموعد النهائي — مرة واحدة لكل موعد.
+    Returns: عدد الشكاوى المُحذَّر عنها
+    """
+    from .models import Complaint
+    from .services.notification_service import ComplaintNotificationService
+
+    if not complaint_ids:
+        return 0
+    now = now or timezone.now()
+
+    approaching = Complaint.objects.filter(
+        pk__in=complaint_ids,
+        status__in=OPEN_STATUSES,
+        deadline__gt=now,
+        deadline__lte=now + WARNING_LEAD,
+    )
+    notify_ids = _stamp_unnotified(approaching, "deadline_warning_sent_at", now)
+
+    if notify_ids:
+        notification_svc = ComplaintNotificationService()
+        for complaint in Complaint.objects.filter(pk__in=notify_ids).select_related(
+            "assigned_to", "customer", "complaint_type"
+        ):
+            hours_remaining = max(1, int((complaint.deadline - now).total_seconds() // 3600))
+            notification_svc.notify_deadline_approaching(complaint, hours_remaining)
+
+    return len(notify_ids)
+
+
+def process_due_timers(limit=BATCH_SIZE):
+    """
+    تنفيذ المؤقتات المستحقة فقط — العمل يتناسب مع عدد الأحداث لا عدد الشكاوى.
+    Returns: dict بالأعداد، أو None إن لم يكن Redis متاحاً
+    """
+    client = _redis()
+    if client is None:
+        return None
+
+    results = {"warnings": 0, "overdue": 0, "notified": 0}
+    while True:
+        now = timezone.now()
+        try:
+            warn_ids, due_ids, fetched = _claim_due(client, time.time(), limit)
+        except Exception as e:
+            logger.warning(f"⚠️ فشل قراءة مؤقتات الشكاوى من Redis: {e}")
+            return None
+
+        results["warnings"] += send_deadline_warnings(warn_ids, now)
+        transitioned, notified = mark_overdue(due_ids, now)
+        results["overdue"] += transitioned
+        results["notified"] += notified
+
+        if fetched < limit:
+            return results
+
+
+def reconcile(now=None):
+    """
+    شبكة أمان: معالجة الشكاوى التي فاتها مؤقتها (Redis متوقف أو فقد بياناته).
+    الاستعلامات تلمس فقط الشكاوى التي لديها حدث معلّق، عبر فهرس (status, deadline).
+    """
+    from .models import Complaint
+
+    now = now or timezone.now()
+
+    client = _redis()
+    if client is not None:
+        try:
+            if not client.exists(TIMERS_KEY):
+                seeded = schedule_open_complaints(client)
+                if seeded:
+                    logger.info(f"⏱️ إعادة بذر مؤقتات {seeded} شكوى مفتوحة")
+        except Exception as e:
+            logger.warning(f"⚠️ فشل بذر مؤقتات الشكاوى: {e}")
+
+    overdue_ids = list(
+        Complaint.objects.filter(deadline__lte=now)
+        .filter(
+            Q(status__in=OPEN_STATUSES)
+            | Q(status="overdue", overdue_notified_at__isnull=True)
+        )
+        .order_by()
+        .values_list("pk", flat=True)
+    )
+    warn_ids = list(
+        Complaint.objects.filter(
+            status__in=OPEN_STATUSES,
+            deadline__gt=now,
+            deadline__lte=now + WARNING_LEAD,
+            deadline_warning_sent_at__isnull=True,
+        )
+        .order_by()
+        .values_list("pk", flat=True)
+    )
+
+    transitioned, notified = mark_overdue(overdue_ids, now)
+    return {
+        "warnings": send_deadline_warnings(warn_ids, now),
+        "overdue": transitioned,
+        "notified": notified,
+    }
@@ -227,56 +227,48 @@ def system_health_check(self):
         return {"success": False, "error": str(e), "message": "فشل في فحص صحة النظام"}
 
 
+@shared_task(
+    queue="maintenance",
+    name="complaints.tasks.process_complaint_timers",
+)
+def process_complaint_timers():
+    """
+    تنفيذ مؤقتات SLA المستحقة (complaints.sla) — كل دقيقة عبر Celery Beat.
+    التحذيرات والانتقال إلى "متأخرة" تتم للشكاوى المستحقة فقط وبإشعار واحد لكل شكوى.
+    """
+    from complaints.sla import process_due_timers
+
+    results = process_due_timers()
+    if results is None:
+        return {"success": False, "message": "Redis غير متاح — المعالجة عبر الفحص الساعي"}
+    if any(results.values()):
+        logger.info(
+            f"⏱️ مؤقتات الشكاوى: {results['warnings']} تحذير، "
+            f"{results['overdue']} متأخرة، {results['notified']} إشعار تأخر"
+        )
+    return {"success": True, "results": results}
+
+
 @shared_task(
     bind=True, max_retries=2, default_retry_delay=120, autoretry_for=(Exception,)
 )
 def check_complaint_deadlines_task(self):
     """
-    مهمة Celery لفحص المواعيد النهائية للشكاوى وإرسال إشعارات
+    شبكة أمان ساعية لمؤقتات SLA: تلتقط الشكاوى التي فاتها مؤقتها في Redis
+    (الإشعارات المرسلة سابقاً لا تتكرر) ثم تنظف الإشعارات القديمة
     يتم تشغيلها كل ساعة عبر Celery Beat
     """
     try:
-        from django.db.models import Q
-        from django.utils import timezone
-
-        from complaints.models import Complaint
         from complaints.services.notification_service import ComplaintNotificationService
+        from complaints.sla import reconcile
 
-        notification_svc = ComplaintNotificationService()
-        results = {"approaching_deadline": 0, "overdue": 0, "escalated": 0}
-
-        # 1. الشكاوى التي يقترب موعدها النهائي (خلال 24 ساعة)
-        deadline_approaching = Complaint.objects.filter(
-            Q(status__in=["new", "in_progress"])
-            & Q(deadline__lte=timezone.now() + timedelta(hours=24))
-            & Q(deadline__gt=timezone.now())
-        ).select_related("assigned_to", "customer", "complaint_type")
-
-        for complaint in deadline_approaching:
-            notification_svc.notify_deadline_approaching(complaint)
-            results["approaching_deadline"] += 1
-
-        # 2. الشكاوى المتأخرة - تحديث حالتها
-        overdue_complaints = Complaint.objects.filter(
-            status__in=["new", "in_progress"],
-            deadline__lt=timezone.now(),
-        ).select_related("assigned_to", "customer", "complaint_type", "assigned_department")
-
-        for complaint in overdue_complaints:
-            if complaint.status != "overdue":
-                complaint.status = "overdue"
-                complaint.save(update_fields=["status", "updated_at"])
-                results["overdue"] += 1
-
-            # إرسال تنبيهات للمستخدمين المعنيين
-            notification_svc.notify_overdue(complaint)
-            notification_svc.notify_overdue_to_escalation_users(complaint)
-
-        # 3. تنظيف الإشعارات القديمة (أكثر من 30 يوم)
-        notification_svc.cleanup_old_notifications(days=30)
+        results = reconcile()
+
+        # تنظيف الإشعارات القديمة (أكثر من 30 يوم)
+        ComplaintNotificationService().cleanup_old_notifications(days=30)
 
         logger.info(
-            f"فحص المواعيد النهائية: {results['approaching_deadline']} اقتراب موعد، "
+            f"فحص المواعيد النهائية: {results['warnings']} اقتراب موعد، "
             f"{results['overdue']} متأخرة"
         )
 
@@ -319,23 +311,21 @@ def auto_create_delay_complaints(self):
     والتركيبات المتأخرة عن مواعيدها المجدولة
 
     يتم تشغيلها يومياً عبر Celery Beat
+
+    ✅ الطلبات/التركيبات التي لها شكوى تأخير مفتوحة تُستبعد داخل نفس الاستعلام
+    (anti-join عبر NOT EXISTS) بدلاً من exists() لكل طلب — يُقرأ فقط ما يحتاج شكوى جديدة
     """
     try:
         from django.contrib.contenttypes.models import ContentType
+        from django.db.models import Exists, OuterRef
 
         from complaints.models import Complaint, ComplaintType
         from installations.models import InstallationSchedule
         from orders.models import Order
 
-        results = {"order_complaints": 0, "installation_complaints": 0, "skipped": 0}
+        results = {"order_complaints": 0, "installation_complaints": 0}
         today = timezone.now().date()
-
-        # ---- 1. طلبات متأخرة عن تاريخ التسليم ----
-        # طلبات لها تاريخ تسليم متوقع مضى عليه أكثر من 3 أيام ولم تُسلَّم
-        delayed_orders = Order.objects.filter(
-            expected_delivery_date__lt=today - timedelta(days=3),
-            order_status__in=["pending", "in_progress", "ready_install"],
-        ).select_related("customer", "branch", "salesperson")
+        open_statuses = ["new", "in_progress", "escalated", "overdue"]
 
         # الحصول على نوع الشكوى الخاص بالتأخير أو إنشاؤه
         delay_type, _ = ComplaintType.objects.get_or_create(
@@ -357,17 +347,27 @@ def auto_create_delay_complaints(self):
 
         order_ct = ContentType.objects.get_for_model(Order)
 
-        for order in delayed_orders:
-            # تجاهل إذا توجد شكوى مفتوحة لنفس الطلب من نوع التأخير
-            existing = Complaint.objects.filter(
-                related_order=order,
-                complaint_type=delay_type,
-                status__in=["new", "in_progress", "escalated", "overdue"],
-            ).exists()
-            if existing:
-                results["skipped"] += 1
-                continue
+        # ---- 1. طلبات متأخرة عن تاريخ التسليم ----
+        # طلبات لها تاريخ تسليم متوقع مضى عليه أكثر من 3 أيام ولم تُسلَّم
+        # ولا توجد لها شكوى تأخير مفتوحة
+        delayed_orders = (
+            Order.objects.filter(
+                expected_delivery_date__lt=today - timedelta(days=3),
+                order_status__in=["pending", "in_progress", "ready_install"],
+            )
+            .filter(
+                ~Exists(
+                    Complaint.objects.filter(
+                        related_order=OuterRef("pk"),
+                        complaint_type=delay_type,
+                        status__in=open_statuses,
+                    )
+                )
+            )
+            .select_related("customer", "branch", "salesperson")
+        )
 
+        for order in delayed_orders:
             days_late = (today - order.expected_delivery_date).days
             Complaint.objects.create(
                 customer=order.customer,
@@ -393,25 +393,26 @@ def auto_create_delay_complaints(self):
         # ---- 2. تركيبات متأخرة عن مواعيدها المجدولة ----
         install_ct = ContentType.objects.get_for_model(InstallationSchedule)
 
-        delayed_installs = InstallationSchedule.objects.filter(
-            scheduled_date__lt=today - timedelta(days=2),
-            status__in=["scheduled", "needs_scheduling"],
-        ).select_related("order", "order__customer")
+        delayed_installs = (
+            InstallationSchedule.objects.filter(
+                scheduled_date__lt=today - timedelta(days=2),
+                status__in=["scheduled", "needs_scheduling"],
+                order__customer__isnull=False,
+            )
+            .filter(
+                ~Exists(
+                    Complaint.objects.filter(
+                        content_type=install_ct,
+                        object_id=OuterRef("pk"),
+                        complaint_type=install_delay_type,
+                        status__in=open_statuses,
+                    )
+                )
+            )
+            .select_related("order", "order__customer")
+        )
 
         for install in delayed_installs:
-            if not install.order or not install.order.customer:
-                continue
-
-            existing = Complaint.objects.filter(
-                content_type=install_ct,
-                object_id=install.pk,
-                complaint_type=install_delay_type,
-                status__in=["new", "in_progress", "escalated", "overdue"],
-            ).exists()
-            if existing:
-                results["skipped"] += 1
-                continue
-
             days_late = (today - install.scheduled_date).days
             Complaint.objects.create(
                 customer=install.order.customer,
@@ -436,8 +437,7 @@ def auto_create_delay_complaints(self):
 
         logger.info(
             f"فحص التأخيرات: {results['order_complaints']} شكوى طلب، "
-            f"{results['installation_complaints']} شكوى تركيب، "
-            f"{results['skipped']} تم تجاهلها"
+            f"{results['installation_complaints']} شكوى تركيب"
         )
         return {"success": True, "results": results}
 
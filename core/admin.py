@@ -10,7 +10,7 @@ from django.utils import timezone
 from django.utils.html import format_html
 
 from .audit import AuditLog, SecurityEvent
-from .models import RecycleBin
+from .models import MaterializedViewState, RecycleBin
 
 
 @admin.register(AuditLog)
@@ -356,6 +356,37 @@ class SecurityEventAdmin(admin.ModelAdmin):
         return super().changelist_view(request, extra_context)
 
 
+@admin.register(MaterializedViewState)
+class MaterializedViewStateAdmin(admin.ModelAdmin):
+    """حالة العروض المادية المُدارة — للقراءة فقط (تُحدَّث من core.materialized_views)"""
+
+    list_display = [
+        "view_name",
+        "last_refreshed_at",
+        "last_duration_ms",
+        "refresh_count",
+        "has_error",
+    ]
+    readonly_fields = [
+        "view_name",
+        "last_refreshed_at",
+        "last_duration_ms",
+        "last_error",
+        "refresh_count",
+        "updated_at",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(boolean=True, description="خطأ")
+    def has_error(self, obj):
+        return bool(obj.last_error)
+
+
 @admin.register(RecycleBin)
 class RecycleBinAdmin(admin.ModelAdmin):
     """
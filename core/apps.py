@@ -5,3 +5,8 @@ class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
     verbose_name = "النظام الأساسي"
+
+    def ready(self):
+        from . import signals
+
+        signals._connect_user_m2m_signals()
@@ -12,6 +12,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.utils import timezone
 
+from core.audit_writer import enqueue_audit_log
+
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
@@ -355,6 +357,7 @@ class AuditMixin(models.Model):
 # =========================================================================
 # Middleware للـ Audit Logging التلقائي
 # =========================================================================
+
 class AuditLoggingMiddleware:
     """
     Middleware لتسجيل جميع العمليات الحساسة وعمليات CRUD التلقائية.
@@ -542,6 +545,7 @@ class AuditLoggingMiddleware:
         # مرحلة ما قبل التنفيذ: التقاط الحالة القديمة للكائن
         # -----------------------------------------------------------
         old_state = None
+        old_repr = ""
         resolved_info = None
         should_log = (
             request.method in ("POST", "PUT", "PATCH", "DELETE")
@@ -553,7 +557,7 @@ class AuditLoggingMiddleware:
         if should_log:
             resolved_info = self._pre_resolve(request)
             if resolved_info and resolved_info.get("model_class") and resolved_info.get("object_id"):
-                old_state = self._snapshot_object(
+                old_state, old_repr = self._capture_state(
                     resolved_info["model_class"], resolved_info["object_id"]
                 )
 
@@ -566,7 +570,13 @@ class AuditLoggingMiddleware:
         # مرحلة ما بعد التنفيذ: التقاط الحالة الجديدة وتسجيل الفرق
         # -----------------------------------------------------------
         if should_log and not getattr(request, "_audit_logged", False):
-            self._log_request(request, response, old_state=old_state, resolved=resolved_info)
+            self._log_request(
+                request,
+                response,
+                old_state=old_state,
+                resolved=resolved_info,
+                old_repr=old_repr,
+            )
 
         return response
 
@@ -577,8 +587,11 @@ class AuditLoggingMiddleware:
             return False
         return any(path.startswith(p) for p in self.SENSITIVE_PATHS)
 
-    def _log_request(self, request, response, old_state=None, resolved=None):
-        """تسجيل الطلب بمعلومات غنية مع تفاصيل التغييرات (قبل/بعد)"""
+    def _log_request(self, request, response, old_state=None, resolved=None, old_repr=""):
+        """
+        تسجيل الطلب بمعلومات غنية مع تفاصيل التغييرات (قبل/بعد).
+        ✅ السجل يُسلَّم لكاتب مؤجَّل (core.audit_writer) بدلاً من INSERT داخل الطلب.
+        """
         try:
             from django.urls import Resolver404, resolve
 
@@ -619,6 +632,7 @@ class AuditLoggingMiddleware:
 
             # ⑤ تحميل حالة الكائن بعد التنفيذ وحساب الفرق
             new_state = None
+            new_repr = ""
             old_value = None
             new_value = None
             changed_fields = None
@@ -632,7 +646,7 @@ class AuditLoggingMiddleware:
                         changed_fields = list(old_state.keys())
                 else:
                     # التعديل أو الإنشاء: التقاط الحالة الجديدة
-                    new_state = self._snapshot_object(model_class, object_id)
+                    new_state, new_repr = self._capture_state(model_class, object_id)
 
                     if old_state and new_state:
                         # حساب الحقول المتغيرة فقط
@@ -648,10 +662,10 @@ class AuditLoggingMiddleware:
                         new_value = new_state
                         changed_fields = list(new_state.keys())
 
-            # ⑥ تحميل repr الكائن (بعد التعديل)
+            # ⑥ repr الكائن (بعد التعديل) — مأخوذ من نفس استعلام الالتقاط
             object_repr = ""
             if model_class and object_id:
-                object_repr = self._load_object_repr(model_class, object_id)
+                object_repr = new_repr or old_repr
                 # في حالة الحذف، نأخذ repr من الحالة القديمة
                 if not object_repr and old_state:
                     # محاولة بناء repr من الحالة القديمة
@@ -674,23 +688,26 @@ class AuditLoggingMiddleware:
                 request.path,
             )
 
-            AuditLog.log(
-                user=request.user,
-                action=action,
-                description=description,
-                severity=severity,
-                app_label=app_label,
-                model_name=model_name,
-                object_id=str(object_id) if object_id else "",
-                object_repr=object_repr,
-                old_value=old_value,
-                new_value=new_value,
-                changed_fields=changed_fields,
-                ip_address=AuditLog._get_client_ip(request),
-                user_agent=request.META.get("HTTP_USER_AGENT", ""),
-                url_path=request.path,
-                http_method=request.method,
-                session_key=getattr(request.session, "session_key", "") or "",
+            enqueue_audit_log(
+                AuditLog(
+                    user=request.user,
+                    username=request.user.username,
+                    action=action,
+                    description=description,
+                    severity=severity,
+                    app_label=app_label,
+                    model_name=model_name,
+                    object_id=str(object_id) if object_id else "",
+                    object_repr=object_repr,
+                    old_value=old_value,
+                    new_value=new_value,
+                    changed_fields=changed_fields,
+                    ip_address=AuditLog._get_client_ip(request),
+                    user_agent=request.META.get("HTTP_USER_AGENT", ""),
+                    url_path=request.path,
+                    http_method=request.method,
+                    session_key=getattr(request.session, "session_key", "") or "",
+                )
             )
         except Exception as e:
             logger.error(f"خطأ في AuditLoggingMiddleware: {e}")
@@ -729,12 +746,29 @@ class AuditLoggingMiddleware:
         التقاط حالة كائن من قاعدة البيانات كقاموس {field_verbose: value}.
         يُستخدم لمقارنة الحالة قبل وبعد التعديل.
         """
+        return self._capture_state(model_class, object_id)[0]
+
+    def _capture_state(self, model_class, object_id):
+        """
+        التقاط الحالة و repr الكائن في استعلام واحد.
+        ✅ العلاقات الأمامية (FK/OneToOne) تُجلب بـ select_related بدلاً من استعلام لكل حقل.
+        يعيد: (state_dict_or_None, object_repr)
+        """
         if not model_class or not object_id:
-            return None
+            return None, ""
         try:
-            instance = model_class.objects.filter(pk=object_id).first()
+            related_fields = [
+                field.name
+                for field in model_class._meta.concrete_fields
+                if field.is_relation and (field.many_to_one or field.one_to_one)
+            ]
+            instance = (
+                model_class.objects.select_related(*related_fields)
+                .filter(pk=object_id)
+                .first()
+            )
             if not instance:
-                return None
+                return None, ""
             data = {}
             for field in instance._meta.concrete_fields:
                 # تجاهل الحقول التقنية التي لا تهم المستخدم
@@ -770,9 +804,9 @@ class AuditLoggingMiddleware:
                         data[label] = value
                     except (TypeError, ValueError):
                         data[label] = str(value)
-            return data
+            return data, str(instance)[:500]
         except Exception:
-            return None
+            return None, ""
 
     def _compute_diff(self, old_state, new_state, model_class=None):
         """
@@ -897,18 +931,6 @@ class AuditLoggingMiddleware:
 
         return None
 
-    def _load_object_repr(self, model_class, object_id):
-        """تحميل التمثيل النصي للكائن من قاعدة البيانات"""
-        if not model_class or not object_id:
-            return ""
-        try:
-            instance = model_class.objects.filter(pk=object_id).first()
-            if instance:
-                return str(instance)[:500]
-        except Exception:
-            pass
-        return ""
-
     def _build_audit_description(
         self, action_label, model_verbose, object_repr, object_id, user, url_name, path
     ):
@@ -0,0 +1,182 @@
+"""
+كاتب سجلات التدقيق المؤجَّل (Buffered Audit Writer)
+
+بدلاً من INSERT متزامن داخل كل طلب، تُبنى كائنات AuditLog في الذاكرة
+وتوضع في طابور محدود الحجم، ويقوم خيط خلفي بحفظها دفعات عبر bulk_create.
+
+- الطابور محدود (MAX_QUEUE_SIZE): عند امتلائه يُسقط السجل ويُزاد عدّاد الإسقاط
+  بدلاً من إبطاء الطلبات أو استهلاك الذاكرة بلا حدود
+- الحفظ كل FLUSH_INTERVAL ثانية أو عند تجمّع BATCH_SIZE سجل
+- يمكن تعطيله (ASYNC=False) فيعود الحفظ متزامناً — مفيد للاختبارات
+
+الإعدادات (settings.AUDIT_WRITER):
+    {"ASYNC": True, "MAX_QUEUE_SIZE": 5000, "BATCH_SIZE": 200, "FLUSH_INTERVAL": 2.0}
+
+الاستخدام:
+    from core.audit_writer import enqueue_audit_log
+    enqueue_audit_log(AuditLog(user=user, action="UPDATE", ...))
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DROPPED_COUNTER_KEY = "audit:writer:dropped"
+
+DEFAULT_WRITER_SETTINGS = {
+    "ASYNC": True,
+    "MAX_QUEUE_SIZE": 5000,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 2.0,
+}
+
+
+def _writer_settings():
+    return {**DEFAULT_WRITER_SETTINGS, **getattr(settings, "AUDIT_WRITER", {})}
+
+
+class AuditLogWriter:
+    """طابور محدود + خيط خلفي يحفظ سجلات التدقيق دفعات"""
+
+    def __init__(self, max_queue_size, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def enqueue(self, entry):
+        """إضافة سجل للطابور — لا يحجب الطلب أبداً"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self._record_drop()
+            return False
+
+    def flush(self):
+        """حفظ كل ما في الطابور الآن (في الخيط الحالي)"""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.dropped,
+            "written": self.written,
+            "alive": bool(self._thread and self._thread.is_alive()),
+        }
+
+    def _ensure_started(self):
+        # بعد fork (gunicorn/celery) لا ينتقل الخيط للعملية الابنة فيُعاد تشغيله
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first] + self._drain(self.batch_size - 1)
+            close_old_connections()
+            self._write(batch)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        from core.audit import AuditLog
+
+        try:
+            AuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+            self.written += len(batch)
+            return len(batch)
+        except Exception as e:
+            logger.error(f"❌ فشل حفظ دفعة سجلات التدقيق ({len(batch)} سجل): {e}")
+            return 0
+
+    def _record_drop(self):
+        self.dropped += 1
+        try:
+            cache.incr(DROPPED_COUNTER_KEY)
+        except ValueError:
+            cache.set(DROPPED_COUNTER_KEY, 1, None)
+        except Exception:
+            pass
+        if self.dropped == 1 or self.dropped % 100 == 0:
+            logger.warning(
+                f"⚠️ طابور سجلات التدقيق ممتلئ — تم إسقاط {self.dropped} سجل حتى الآن"
+            )
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = _writer_settings()
+                _writer = AuditLogWriter(
+                    max_queue_size=config["MAX_QUEUE_SIZE"],
+                    batch_size=config["BATCH_SIZE"],
+                    flush_interval=config["FLUSH_INTERVAL"],
+                )
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def enqueue_audit_log(entry):
+    """
+    تسجيل كائن AuditLog غير محفوظ.
+    في الوضع المتزامن يُحفظ فوراً، وإلا يُضاف للطابور.
+    """
+    if not _writer_settings()["ASYNC"]:
+        try:
+            entry.save()
+            return True
+        except Exception as e:
+            logger.error(f"خطأ في تسجيل سجل التدقيق: {e}")
+            return False
+    return get_audit_writer().enqueue(entry)
+
+
+def get_dropped_count():
+    """إجمالي السجلات المُسقطة عبر كل العمليات (من الكاش)"""
+    try:
+        return cache.get(DROPPED_COUNTER_KEY, 0)
+    except Exception:
+        return 0
@@ -0,0 +1,79 @@
+"""
+مستهلك WebSocket للأحداث الحية (core.realtime)
+"""
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import MAX_TOPICS_PER_CONNECTION, can_subscribe, group_name
+
+
+class LiveEventConsumer(AsyncJsonWebsocketConsumer):
+    """
+    اشتراك في مواضيع الأحداث الحية:
+        → {"action": "subscribe", "topics": ["department:cutting", "branch:3"]}
+        ← {"type": "subscribed", "topics": [...], "denied": [...]}
+        ← {"type": "event", "topic": "...", "event": "...", "data": {...}}
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.topics = set()
+
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        await self.accept()
+        await self._join(f"user:{self.user.pk}")
+
+    async def disconnect(self, close_code):
+        for topic in list(getattr(self, "topics", ())):
+            await self.channel_layer.group_discard(group_name(topic), self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get("action")
+        topics = content.get("topics") or []
+        if not isinstance(topics, list):
+            return
+
+        if action == "subscribe":
+            allowed, denied = [], []
+            for topic in topics[:MAX_TOPICS_PER_CONNECTION]:
+                if not isinstance(topic, str):
+                    continue
+                if topic in self.topics:
+                    allowed.append(topic)
+                elif len(self.topics) < MAX_TOPICS_PER_CONNECTION and await self._can_subscribe(
+                    topic
+                ):
+                    await self._join(topic)
+                    allowed.append(topic)
+                else:
+                    denied.append(topic)
+            await self.send_json({"type": "subscribed", "topics": allowed, "denied": denied})
+
+        elif action == "unsubscribe":
+            for topic in topics:
+                if topic in self.topics and topic != f"user:{self.user.pk}":
+                    self.topics.discard(topic)
+                    await self.channel_layer.group_discard(group_name(topic), self.channel_name)
+
+    async def _join(self, topic):
+        self.topics.add(topic)
+        await self.channel_layer.group_add(group_name(topic), self.channel_name)
+
+    @database_sync_to_async
+    def _can_subscribe(self, topic):
+        return can_subscribe(self.user, topic)
+
+    # Handler for 'live.event' (sent from core.realtime)
+    async def live_event(self, event):
+        await self.send_json(
+            {
+                "type": "event",
+                "topic": event["topic"],
+                "event": event["event"],
+                "data": event["data"],
+            }
+        )
@@ -0,0 +1,14 @@
+"""
+مسارات ملفات Excel المُصدَّرة في الخلفية
+"""
+
+from django.urls import re_path
+
+from . import export_views
+
+app_name = "exports"
+
+urlpatterns = [
+    re_path(r"^(?P<token>[0-9a-f]{32})/status/$", export_views.export_status, name="status"),
+    re_path(r"^(?P<token>[0-9a-f]{32})/download/$", export_views.export_download, name="download"),
+]
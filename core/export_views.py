@@ -0,0 +1,45 @@
+"""
+واجهات ملفات Excel المُصدَّرة في الخلفية (core.exports)
+"""
+
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+
+from .exports import XLSX_CONTENT_TYPE, can_access_job, export_path, get_job
+
+
+def _get_allowed_job(request, token):
+    job = get_job(token)
+    if not can_access_job(request.user, job):
+        raise Http404("التصدير غير موجود")
+    return job
+
+
+@login_required
+def export_status(request, token):
+    """حالة التصدير ونسبة التقدم"""
+    job = _get_allowed_job(request, token)
+    return JsonResponse(
+        {
+            "status": job.get("status", "pending"),
+            "processed": job.get("processed", 0),
+            "total": job.get("total", 0),
+            "error": job.get("error", ""),
+        }
+    )
+
+
+@login_required
+def export_download(request, token):
+    job = _get_allowed_job(request, token)
+    path = export_path(token)
+    if job.get("status") != "ready" or not os.path.exists(path):
+        raise Http404("الملف لم يجهز بعد")
+    return FileResponse(
+        open(path, "rb"),
+        as_attachment=True,
+        filename=job.get("filename") or f"{token}.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
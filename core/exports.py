@@ -0,0 +1,415 @@
+"""
+📊 Exports - محرك تصدير Excel بذاكرة ثابتة
+==========================================
+تصدير أوامر التصنيع وتقارير الإنتاج والتركيبات كان يبني Workbook كاملاً في
+الذاكرة داخل الطلب ويحسب الأمتار بحلقات Python على items.all() لكل طلب —
+تصدير نهاية الشهر (~20 ألف صف) كان يستنفد ذاكرة العامل وينتهي بانتهاء المهلة.
+
+- الكتابة بوضع openpyxl write-only: كل صف يُكتب للملف فور توليده ولا يبقى
+  في الذاكرة، والصفوف تأتي من مولّدات على دفعات (batched_values / batched_objects)
+- المجاميع والبطاقات تُحسب في قاعدة البيانات (aggregate / Subquery) أو تُجمع
+  أثناء الكتابة (totals) — لا مرور ثانٍ على البيانات
+- التصديرات الكبيرة (أكثر من EXPORT_BACKGROUND_ROWS صف) تُنفذ في عامل Celery
+  مع نسبة تقدم، وصفحة انتظار تنزل الملف عند الجاهزية (exports:status / download)
+
+كل تصدير دالة بانية مسجلة في EXPORTS تستقبل (params, user) وتعيد:
+    {
+        "filename": "manufacturing_orders_20260101.xlsx",
+        "count": 20000,                      # عدد الصفوف التقريبي (للتقدم والقرار)
+        "sheets": [{
+            "title": "أوامر التصنيع",
+            "heading": "...", "subheading": "...",
+            "cards": [("إجمالي الأوامر", 120), ...],          # أعلى الجدول
+            "columns": [{"header": "رقم الطلب", "key": "order_number", "width": 15}],
+            "rows": <مولّد قواميس>,                          # "_fill": لون الصف
+            "totals": {"label": "المجموع", "keys": ["meters"]},
+            "footer": lambda totals: [("إجمالي الأمتار", totals["meters"])],
+        }],
+    }
+
+الاستخدام في العروض:
+    return export_response(request, "manufacturing_orders")
+"""
+
+import logging
+import os
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import FileResponse, HttpRequest, QueryDict
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+EXPORT_ROOT = getattr(
+    settings, "EXPORT_ROOT", os.path.join(settings.BASE_DIR, "private_media", "exports")
+)
+EXPORT_TTL = getattr(settings, "EXPORT_TTL", 2 * 24 * 60 * 60)
+EXPORT_BACKGROUND_ROWS = getattr(settings, "EXPORT_BACKGROUND_ROWS", 3000)
+JOB_KEY_PREFIX = "export:job:"
+JOB_TIMEOUT = 6 * 60 * 60
+PROGRESS_EVERY = 500
+BATCH_SIZE = 1000
+
+# اسم التصدير → الدالة البانية (تُحمّل عند الطلب — نفس السجل في الويب والعامل)
+EXPORTS = {
+    "manufacturing_orders": "manufacturing.exports.manufacturing_orders_export",
+    "factory_production_report": "factory_accounting.exports.production_report_export",
+    "installation_report": "installation_accounting.exports.installation_report_export",
+}
+
+STRIPE_COLOR = "F8F9FA"
+
+
+# ─── الكتابة ─────────────────────────────────────────────────────────
+
+
+def _styles():
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    side = Side(style="thin", color="AAAAAA")
+    return {
+        "title": Font(bold=True, size=14, color="2C3E50"),
+        "subtitle": Font(size=11, color="7F8C8D", italic=True),
+        "header_font": Font(bold=True, size=11, color="FFFFFF"),
+        "header_fill": PatternFill(start_color="2C3E50", end_color="2C3E50", fill_type="solid"),
+        "card_font": Font(bold=True, size=11, color="FFFFFF"),
+        "card_fill": PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+        "card_value_font": Font(bold=True, size=13, color="2C3E50"),
+        "card_value_fill": PatternFill(start_color="E8F0FE", end_color="E8F0FE", fill_type="solid"),
+        "total_font": Font(bold=True, size=11),
+        "total_fill": PatternFill(start_color="ECF0F1", end_color="ECF0F1", fill_type="solid"),
+        "border": Border(left=side, right=side, top=side, bottom=side),
+        "center": Alignment(horizontal="center", vertical="center", wrap_text=True),
+    }
+
+
+class _SheetWriter:
+    """كاتب ورقة واحدة بوضع write-only (الصفوف تُكتب بالترتيب ولا تُعدل)"""
+
+    def __init__(self, workbook, sheet, styles, on_row):
+        from openpyxl.utils import get_column_letter
+
+        self.ws = workbook.create_sheet(title=sheet["title"][:31])
+        self.ws.sheet_view.rightToLeft = True
+        self.ws.sheet_view.showGridLines = False
+        self.sheet = sheet
+        self.styles = styles
+        self.on_row = on_row
+        self.columns = sheet["columns"]
+        self.row_number = 0
+        self._fills = {}
+        for index, column in enumerate(self.columns, 1):
+            self.ws.column_dimensions[get_column_letter(index)].width = column.get("width", 18)
+        self._last_column = get_column_letter(max(len(self.columns), 1))
+        # وضع write_only يكتب sheetViews مع أول صف — التجميد يُضبط قبل أي append
+        self.header_row = self._header_row()
+        self.ws.freeze_panes = f"A{self.header_row + 1}"
+
+    def _header_row(self):
+        """رقم صف العناوين: العنوان + العنوان الفرعي + البطاقات (فاصل + صفان) + فاصل"""
+        row = 1 if self.sheet.get("heading") else 0
+        row += 1 if self.sheet.get("subheading") else 0
+        row += 3 if self.sheet.get("cards") else 0
+        return row + 2
+
+    def _fill(self, color):
+        from openpyxl.styles import PatternFill
+
+        if color not in self._fills:
+            self._fills[color] = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        return self._fills[color]
+
+    def cell(self, value, font=None, fill=None, boxed=True, number=False):
+        from openpyxl.cell import WriteOnlyCell
+
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.alignment = self.styles["center"]
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        if boxed:
+            cell.border = self.styles["border"]
+        if number and isinstance(value, (int, float, Decimal)):
+            cell.number_format = "#,##0.00"
+        return cell
+
+    def append(self, cells):
+        self.ws.append(cells)
+        self.row_number += 1
+
+    def write(self):
+        styles = self.styles
+        sheet = self.sheet
+
+        if sheet.get("heading"):
+            self.append([self.cell(sheet["heading"], font=styles["title"], boxed=False)])
+        if sheet.get("subheading"):
+            self.append([self.cell(sheet["subheading"], font=styles["subtitle"], boxed=False)])
+
+        cards = sheet.get("cards") or []
+        if cards:
+            self.append([])
+            self._write_cards(cards)
+        self.append([])
+
+        self.append(
+            [
+                self.cell(column["header"], font=styles["header_font"], fill=styles["header_fill"])
+                for column in self.columns
+            ]
+        )
+        header_row = self.row_number
+        self.ws.auto_filter.ref = f"A{header_row}:{self._last_column}{header_row}"
+
+        totals_spec = sheet.get("totals") or {}
+        totals = {key: 0 for key in totals_spec.get("keys", ())}
+        striped = sheet.get("striped", False)
+
+        for index, row in enumerate(sheet["rows"]):
+            color = row.get("_fill") or (STRIPE_COLOR if striped and index % 2 else None)
+            fill = self._fill(color) if color else None
+            self.append(
+                [
+                    self.cell(row.get(column["key"], ""), fill=fill, number=column.get("number"))
+                    for column in self.columns
+                ]
+            )
+            for key in totals:
+                value = row.get(key)
+                if isinstance(value, (int, float, Decimal)):
+                    totals[key] += value
+            self.on_row()
+
+        if totals_spec:
+            self._write_totals(totals_spec.get("label", "المجموع"), totals)
+
+        footer = sheet.get("footer")
+        if footer:
+            footer_cards = footer(totals)
+            if footer_cards:
+                self.append([])
+                self._write_cards(footer_cards)
+        return totals
+
+    def _write_cards(self, cards):
+        styles = self.styles
+        self.append(
+            [
+                self.cell(label, font=styles["card_font"], fill=styles["card_fill"])
+                for label, _ in cards
+            ]
+        )
+        self.append(
+            [
+                self.cell(
+                    value,
+                    font=styles["card_value_font"],
+                    fill=styles["card_value_fill"],
+                    number=True,
+                )
+                for _, value in cards
+            ]
+        )
+
+    def _write_totals(self, label, totals):
+        styles = self.styles
+        cells = []
+        for index, column in enumerate(self.columns):
+            value = label if index == 0 else totals.get(column["key"], "")
+            cells.append(
+                self.cell(value, font=styles["total_font"], fill=styles["total_fill"], number=True)
+            )
+        self.append(cells)
+
+
+def write_workbook(target, sheets, progress=None):
+    """
+    كتابة الأوراق إلى target (مسار أو ملف) بذاكرة ثابتة.
+    progress: دالة اختيارية تُستدعى بعدد الصفوف المكتوبة كل PROGRESS_EVERY صف
+    Returns: عدد صفوف البيانات المكتوبة
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    styles = _styles()
+    written = [0]
+
+    def on_row():
+        written[0] += 1
+        if progress and written[0] % PROGRESS_EVERY == 0:
+            progress(written[0])
+
+    for sheet in sheets:
+        _SheetWriter(workbook, sheet, styles, on_row).write()
+
+    workbook.save(target)
+    return written[0]
+
+
+def workbook_response(sheets, filename):
+    """تصدير متزامن: الملف يُكتب لملف مؤقت على القرص ثم يُرسل كتدفق"""
+    handle = tempfile.TemporaryFile()
+    write_workbook(handle, sheets)
+    handle.seek(0)
+    return FileResponse(
+        handle, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE
+    )
+
+
+def batched_values(queryset, fields, batch_size=BATCH_SIZE):
+    """
+    صفوف values() بترتيب queryset على دفعات من المفاتيح الأساسية.
+    الاتصال عبر PgBouncer يعطّل المؤشرات من جهة الخادم
+    (DISABLE_SERVER_SIDE_CURSORS) فيحمّل iterator() النتيجة كاملة في الذاكرة.
+    """
+    pks = list(dict.fromkeys(queryset.values_list("pk", flat=True)))
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start : start + batch_size]
+        rows = {row["pk"]: row for row in queryset.filter(pk__in=batch).values("pk", *fields)}
+        for pk in batch:
+            if pk in rows:
+                yield rows[pk]
+
+
+def batched_objects(queryset, batch_size=BATCH_SIZE):
+    """مثل batched_values لكن بكائنات كاملة (مع select/prefetch_related لكل دفعة)"""
+    pks = list(dict.fromkeys(queryset.values_list("pk", flat=True)))
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start : start + batch_size]
+        objects = queryset.filter(pk__in=batch).in_bulk()
+        for pk in batch:
+            if pk in objects:
+                yield objects[pk]
+
+
+# ─── التصديرات المسجلة ───────────────────────────────────────────────
+
+
+def build_export(name, params, user):
+    """تنفيذ الدالة البانية للتصدير name"""
+    return import_string(EXPORTS[name])(params, user)
+
+
+def export_request(params, user):
+    """طلب GET بسيط لإعادة استخدام منطق الفلترة في العروض من داخل العامل"""
+    request = HttpRequest()
+    request.method = "GET"
+    request.GET = params
+    request.user = user
+    return request
+
+
+def _job_key(token):
+    return f"{JOB_KEY_PREFIX}{token}"
+
+
+def export_path(token):
+    return os.path.join(EXPORT_ROOT, f"{token}.xlsx")
+
+
+def get_job(token):
+    return cache.get(_job_key(token)) or {}
+
+
+def set_job(token, **fields):
+    job = get_job(token)
+    job.update(fields)
+    cache.set(_job_key(token), job, JOB_TIMEOUT)
+    return job
+
+
+def can_access_job(user, job):
+    return bool(job) and (user.is_superuser or job.get("user_id") == user.pk)
+
+
+def start_export(name, request, spec):
+    """إرسال التصدير لعامل Celery. Returns: token"""
+    from .tasks import run_export
+
+    token = uuid.uuid4().hex
+    set_job(
+        token,
+        status="pending",
+        name=name,
+        filename=spec["filename"],
+        user_id=request.user.pk,
+        processed=0,
+        total=spec.get("count", 0),
+        error="",
+    )
+    params = {key: request.GET.getlist(key) for key in request.GET}
+    run_export.delay(token, name, params, request.user.pk)
+    return token
+
+
+def run_export_job(token, name, params, user_id):
+    """تنفيذ التصدير في العامل وكتابة الملف إلى EXPORT_ROOT"""
+    query = QueryDict(mutable=True)
+    for key, values in params.items():
+        query.setlist(key, values)
+    user = get_user_model().objects.get(pk=user_id)
+
+    spec = build_export(name, query, user)
+    set_job(token, status="running", total=spec.get("count", 0))
+
+    os.makedirs(EXPORT_ROOT, exist_ok=True)
+    path = export_path(token)
+    tmp_path = f"{path}.tmp"
+    written = write_workbook(
+        tmp_path, spec["sheets"], progress=lambda count: set_job(token, processed=count)
+    )
+    os.replace(tmp_path, path)
+    set_job(token, status="ready", processed=written)
+    return written
+
+
+def export_response(request, name, background_rows=None):
+    """
+    استجابة تصدير موحدة للعروض:
+    - حتى background_rows صف ← ملف فوري (يُكتب على القرص لا في الذاكرة)
+    - أكثر ← تصدير في الخلفية وصفحة تقدم
+    """
+    limit = EXPORT_BACKGROUND_ROWS if background_rows is None else background_rows
+    spec = build_export(name, request.GET, request.user)
+    if spec.get("count", 0) <= limit:
+        return workbook_response(spec["sheets"], spec["filename"])
+
+    token = start_export(name, request, spec)
+    return render(
+        request,
+        "core/export_preparing.html",
+        {
+            "filename": spec["filename"],
+            "total": spec.get("count", 0),
+            "status_url": reverse("exports:status", args=[token]),
+            "download_url": reverse("exports:download", args=[token]),
+        },
+    )
+
+
+def cleanup_exports(max_age=EXPORT_TTL):
+    """حذف ملفات التصدير الأقدم من max_age ثانية. Returns: عدد الملفات المحذوفة"""
+    if not os.path.isdir(EXPORT_ROOT):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(EXPORT_ROOT):
+        path = os.path.join(EXPORT_ROOT, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
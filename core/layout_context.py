@@ -0,0 +1,364 @@
+"""
+🧩 Layout Context - خدمة موحدة لسياق القالب العام (navbar, footer, إشعارات...)
+
+بدلاً من ~10 context processors يقوم كل منها برحلة كاش أو استعلام مستقل،
+تُجمع كل أقسام السياق هنا وتُقرأ جميعها بـ get_many واحد.
+
+- كل قسم له builder (دالة بدون كاش) ومدة كاش ووسوم إصدار (versions)
+- الإصدارات تُرفع من signals (core/signals.py) فيصبح القسم قديماً فوراً
+- الأقسام الخاصة بالمستخدم مرتبطة أيضاً بإصدار خاص بالمستخدم
+- زمن بناء كل قسم يُسجَّل في الكاش (عدد مرات البناء + مجموع/أقصى زمن)
+
+الاستخدام في settings:
+    "core.layout_context.layout_context"
+
+إلغاء قسم بعد تغيير البيانات:
+    bump_layout_version("departments")
+    bump_user_layout_version(user.pk)                   # كل أقسام المستخدم
+    bump_user_layout_version(user.pk, "notifications")  # أقسام وسم واحد للمستخدم فقط
+"""
+
+import logging
+import time
+
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("performance")
+
+VERSION_KEY_PREFIX = "layout:ver:"
+ENTRY_KEY_PREFIX = "layout:ctx:"
+STATS_KEY_PREFIX = "layout:stats:"
+
+# تحذير في السجل إذا تجاوز بناء قسم هذا الزمن
+SLOW_SECTION_MS = 50
+
+
+def _is_authenticated(request):
+    user = getattr(request, "user", None)
+    return bool(user and user.is_authenticated)
+
+
+def _is_admin_path(request):
+    return request.path.startswith("/admin/")
+
+
+def _is_staff(request):
+    return _is_authenticated(request) and (request.user.is_superuser or request.user.is_staff)
+
+
+class LayoutSection:
+    """تعريف قسم من سياق القالب العام"""
+
+    def __init__(
+        self,
+        name,
+        builder,
+        timeout,
+        versions=(),
+        per_user=False,
+        condition=None,
+        default=None,
+        user_versions=(),
+    ):
+        self.name = name
+        self.builder_path = builder
+        self.timeout = timeout
+        self.versions = tuple(versions)
+        self.per_user = per_user
+        # وسوم تُرفع لكل مستخدم على حدة (مثل قراءة إشعار) دون إلغاء أقسام الآخرين
+        self.user_versions = tuple(user_versions)
+        self.condition = condition
+        self.default = default if default is not None else {}
+        self._builder = None
+
+    @property
+    def builder(self):
+        if self._builder is None:
+            self._builder = import_string(self.builder_path)
+        return self._builder
+
+    def applies(self, request):
+        if self.per_user and not _is_authenticated(request):
+            return False
+        return self.condition is None or self.condition(request)
+
+
+# الترتيب مطابق لترتيب context processors السابق (القسم اللاحق يتجاوز المفاتيح المكررة)
+LAYOUT_SECTIONS = [
+    LayoutSection(
+        "departments",
+        "accounts.context_processors.build_departments",
+        timeout=600,
+        versions=("departments",),
+        per_user=True,
+        default={
+            "all_departments": [],
+            "parent_departments": [],
+            "user_departments": [],
+            "user_parent_departments": [],
+        },
+    ),
+    LayoutSection(
+        "company_info",
+        "accounts.context_processors.build_company_info",
+        timeout=600,
+        versions=("company_info",),
+    ),
+    LayoutSection(
+        "footer_settings",
+        "accounts.context_processors.build_footer_settings",
+        timeout=600,
+        versions=("footer_settings",),
+    ),
+    LayoutSection(
+        "system_settings",
+        "accounts.context_processors.build_system_settings",
+        timeout=3600,
+        versions=("system_settings",),
+    ),
+    # رسائل الفروع: QuerySet كسول للصفحة الرئيسية فقط — لا يُخزَّن
+    LayoutSection(
+        "branch_messages",
+        "accounts.context_processors.build_branch_messages",
+        timeout=None,
+        condition=lambda request: _is_authenticated(request) and request.path == "/",
+        default={"branch_messages": []},
+    ),
+    LayoutSection(
+        "navbar",
+        "accounts.navbar_context.build_navbar_departments",
+        timeout=300,
+        versions=("departments", "warehouses"),
+        per_user=True,
+        default={"navbar_departments": []},
+    ),
+    LayoutSection(
+        "notifications",
+        "notifications.context_processors.build_notifications_context",
+        timeout=30,
+        versions=("notifications",),
+        user_versions=("notifications",),
+        per_user=True,
+    ),
+    LayoutSection(
+        "admin_stats",
+        "crm.context_processors.build_admin_stats",
+        timeout=300,
+        versions=("admin_stats", "company_info"),
+        condition=_is_admin_path,
+    ),
+    LayoutSection(
+        "pending_transfers",
+        "inventory.context_processors.build_pending_transfers",
+        timeout=60,
+        versions=("transfers", "warehouses"),
+        per_user=True,
+        default={
+            "pending_transfers_count": 0,
+            "pending_transfers": [],
+            "is_warehouse_manager": False,
+        },
+    ),
+    LayoutSection(
+        "cutting",
+        "cutting.context_processors.build_cutting_notifications",
+        timeout=120,
+        versions=("cutting",),
+        condition=_is_staff,
+    ),
+]
+
+_SECTIONS_BY_NAME = {section.name: section for section in LAYOUT_SECTIONS}
+
+
+# =============================================
+# الإصدارات
+# =============================================
+
+
+def _version_key(name):
+    return f"{VERSION_KEY_PREFIX}{name}"
+
+
+def _user_version_name(user_id, name=None):
+    if name is None:
+        return f"user:{user_id}"
+    return f"{name}:user:{user_id}"
+
+
+def bump_layout_version(*names):
+    """رفع إصدار وسم أو أكثر — كل الأقسام المرتبطة تُعاد بناؤها عند الطلب التالي"""
+    for name in names:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+        except Exception as e:
+            logger.warning(f"Failed to bump layout version {name}: {e}")
+
+
+def bump_user_layout_version(user_id, *names):
+    """
+    إلغاء الأقسام الخاصة بمستخدم واحد: كلها (أقسامه، صلاحياته، أدواره)،
+    أو فقط الأقسام التي تحمل الوسوم names في user_versions
+    """
+    if not user_id:
+        return
+    if names:
+        bump_layout_version(*(_user_version_name(user_id, name) for name in names))
+    else:
+        bump_layout_version(_user_version_name(user_id))
+
+
+# =============================================
+# القراءة والبناء
+# =============================================
+
+
+def _section_versions(section, request):
+    names = list(section.versions)
+    if section.per_user:
+        names.append(_user_version_name(request.user.pk))
+        names.extend(_user_version_name(request.user.pk, name) for name in section.user_versions)
+    return names
+
+
+def _entry_key(section, request):
+    if not section.per_user:
+        return f"{ENTRY_KEY_PREFIX}{section.name}"
+    user = request.user
+    return f"{ENTRY_KEY_PREFIX}{section.name}:{user.pk}:{user.is_staff}:{user.is_superuser}"
+
+
+def _build(section, request, timings):
+    started = time.perf_counter()
+    try:
+        data = section.builder(request)
+    except Exception as e:
+        logger.error(f"Layout section {section.name} failed: {e}")
+        data = dict(section.default)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    timings[section.name] = round(elapsed_ms, 2)
+    if elapsed_ms > SLOW_SECTION_MS:
+        logger.warning(f"Slow layout section {section.name}: {elapsed_ms:.1f}ms")
+    return data
+
+
+def _record_build_stats(timings):
+    """تجميع أزمنة البناء لكل قسم (عند البناء فقط — القراءات من الكاش لا تُكلّف شيئاً)"""
+    for name, elapsed_ms in timings.items():
+        try:
+            for suffix, amount in (("builds", 1), ("total_ms", max(int(elapsed_ms), 1))):
+                key = f"{STATS_KEY_PREFIX}{name}:{suffix}"
+                if not cache.add(key, amount, None):
+                    cache.incr(key, amount)
+            max_key = f"{STATS_KEY_PREFIX}{name}:max_ms"
+            if elapsed_ms > (cache.get(max_key) or 0):
+                cache.set(max_key, elapsed_ms, None)
+        except Exception:
+            pass
+
+
+def get_layout_stats():
+    """إحصائيات البناء لكل قسم مرتبة تنازلياً حسب إجمالي الزمن"""
+    keys = [
+        f"{STATS_KEY_PREFIX}{section.name}:{suffix}"
+        for section in LAYOUT_SECTIONS
+        for suffix in ("builds", "total_ms", "max_ms")
+    ]
+    stored = cache.get_many(keys)
+    stats = []
+    for section in LAYOUT_SECTIONS:
+        builds = stored.get(f"{STATS_KEY_PREFIX}{section.name}:builds", 0)
+        total_ms = stored.get(f"{STATS_KEY_PREFIX}{section.name}:total_ms", 0)
+        stats.append(
+            {
+                "section": section.name,
+                "builds": builds,
+                "total_ms": total_ms,
+                "avg_ms": round(total_ms / builds, 2) if builds else 0,
+                "max_ms": stored.get(f"{STATS_KEY_PREFIX}{section.name}:max_ms", 0),
+            }
+        )
+    return sorted(stats, key=lambda row: row["total_ms"], reverse=True)
+
+
+def resolve_sections(request, sections):
+    """
+    حساب قيم الأقسام المطلوبة: get_many واحد للإصدارات والقيم معاً،
+    ثم بناء الأقسام المفقودة أو القديمة فقط و set_many لكل مدة كاش.
+    """
+    context = {}
+    timings = {}
+    cached_sections = []
+
+    for section in sections:
+        if not section.applies(request):
+            context[section.name] = dict(section.default)
+        elif not section.timeout:
+            context[section.name] = _build(section, request, timings)
+        else:
+            cached_sections.append(section)
+
+    if cached_sections:
+        version_names = {
+            name for section in cached_sections for name in _section_versions(section, request)
+        }
+        entry_keys = {section.name: _entry_key(section, request) for section in cached_sections}
+        try:
+            found = cache.get_many(
+                [_version_key(name) for name in version_names] + list(entry_keys.values())
+            )
+        except Exception:
+            found = {}
+
+        versions = {}
+        for name in version_names:
+            version = found.get(_version_key(name))
+            if version is None:
+                # تهيئة بقيمة زمنية حتى لا يعود إصدار قديم للصلاحية بعد الطرد
+                version = int(time.time() * 1000)
+                if not cache.add(_version_key(name), version, None):
+                    version = cache.get(_version_key(name), version)
+            versions[name] = version
+
+        to_store = {}
+        for section in cached_sections:
+            expected = [versions[name] for name in _section_versions(section, request)]
+            entry = found.get(entry_keys[section.name])
+            if isinstance(entry, dict) and entry.get("v") == expected:
+                context[section.name] = entry["data"]
+                continue
+            data = _build(section, request, timings)
+            context[section.name] = data
+            to_store.setdefault(section.timeout, {})[entry_keys[section.name]] = {
+                "v": expected,
+                "data": data,
+            }
+
+        for timeout, values in to_store.items():
+            try:
+                cache.set_many(values, timeout)
+            except Exception as e:
+                logger.warning(f"Failed to store layout sections: {e}")
+
+    if timings:
+        _record_build_stats(timings)
+    request._layout_timings = {**getattr(request, "_layout_timings", {}), **timings}
+    return context
+
+
+def render_section(request, name):
+    """قيمة قسم واحد — للتوافق مع context processors القديمة"""
+    return resolve_sections(request, [_SECTIONS_BY_NAME[name]])[name]
+
+
+def layout_context(request):
+    """context processor الموحد لكل أقسام القالب العام"""
+    sections = resolve_sections(request, LAYOUT_SECTIONS)
+    context = {}
+    for section in LAYOUT_SECTIONS:
+        context.update(sections[section.name])
+    return context
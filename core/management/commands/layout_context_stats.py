@@ -0,0 +1,47 @@
+"""
+أمر إدارة: عرض تكلفة بناء أقسام سياق القالب العام (core.layout_context)
+=======================================================================
+يعرض لكل قسم عدد مرات إعادة البناء ومجموع/متوسط/أقصى زمن البناء،
+مرتبة من الأعلى تكلفة.
+
+الاستخدام:
+    python manage.py layout_context_stats
+    python manage.py layout_context_stats --reset
+"""
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from core.layout_context import LAYOUT_SECTIONS, STATS_KEY_PREFIX, get_layout_stats
+
+
+class Command(BaseCommand):
+    help = "عرض زمن بناء كل قسم من أقسام سياق القالب العام"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            default=False,
+            help="تصفير الإحصائيات بعد العرض",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'القسم':<20}{'مرات البناء':>14}{'المجموع ms':>14}{'المتوسط ms':>14}{'الأقصى ms':>14}"
+        )
+        for row in get_layout_stats():
+            self.stdout.write(
+                f"{row['section']:<20}{row['builds']:>14}{row['total_ms']:>14}"
+                f"{row['avg_ms']:>14}{round(row['max_ms'], 2):>14}"
+            )
+
+        if options["reset"]:
+            cache.delete_many(
+                [
+                    f"{STATS_KEY_PREFIX}{section.name}:{suffix}"
+                    for section in LAYOUT_SECTIONS
+                    for suffix in ("builds", "total_ms", "max_ms")
+                ]
+            )
+            self.stdout.write(self.style.SUCCESS("✅ تم تصفير الإحصائيات"))
@@ -0,0 +1,94 @@
+"""
+أمر إدارة: إدارة العروض المادية (core.materialized_views)
+=========================================================
+- create: إنشاء العروض (أو غير الموجودة فقط مع --missing-only)
+- refresh: تحديث العروض المتقادمة (أو كلها مع --force، أو عروض محددة بالاسم)
+- status: عرض عمر كل عرض ومدة آخر تحديث وآخر خطأ
+- backfill-rollups: بناء التجميع اليومي للطلبات لعدد من الأيام
+
+الاستخدام:
+    python manage.py materialized_views create --missing-only
+    python manage.py materialized_views refresh --force mv_order_statistics
+    python manage.py materialized_views status
+    python manage.py materialized_views backfill-rollups --days 365
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.materialized_views import (
+    MATERIALIZED_VIEWS,
+    create_all_views,
+    get_view_status,
+    refresh_all_views,
+)
+from core.order_rollups import backfill_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "إنشاء وتحديث ومراقبة العروض المادية والتجميع اليومي للطلبات"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action", choices=["create", "refresh", "status", "backfill-rollups"]
+        )
+        parser.add_argument("views", nargs="*", help="أسماء العروض (refresh فقط)")
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            default=False,
+            help="إنشاء العروض غير الموجودة فقط",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            default=False,
+            help="تحديث العروض حتى لو لم تتجاوز أقصى عمر لها",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="عدد الأيام لبناء التجميع اليومي"
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["views"]) - set(MATERIALIZED_VIEWS)
+        if unknown:
+            raise CommandError(f"عروض غير معروفة: {', '.join(sorted(unknown))}")
+
+        action = options["action"]
+        if action == "create":
+            for view_name, result, error in create_all_views(
+                missing_only=options["missing_only"]
+            ):
+                line = f"{view_name:<32}{result}"
+                if error:
+                    self.stdout.write(self.style.ERROR(f"{line}  {error}"))
+                else:
+                    self.stdout.write(line)
+        elif action == "refresh":
+            results = refresh_all_views(
+                force=options["force"], view_names=options["views"] or None
+            )
+            for view_name, result in results.items():
+                self.stdout.write(f"{view_name:<32}{result}")
+        elif action == "status":
+            self._print_status()
+        else:
+            days = backfill_daily_rollups(options["days"])
+            self.stdout.write(self.style.SUCCESS(f"✅ تم بناء التجميع اليومي لـ {len(days)} يوم"))
+
+    def _print_status(self):
+        self.stdout.write(
+            f"{'العرض':<32}{'موجود':>8}{'العمر (د)':>12}{'الحد (د)':>10}{'المدة ms':>10}"
+        )
+        for row in get_view_status():
+            line = (
+                f"{row['view']:<32}{'نعم' if row['exists'] else 'لا':>8}"
+                f"{str(row['age_minutes'] if row['age_minutes'] is not None else '-'):>12}"
+                f"{row['max_age_minutes']:>10}"
+                f"{str(row['last_duration_ms'] if row['last_duration_ms'] is not None else '-'):>10}"
+            )
+            if row["last_error"]:
+                self.stdout.write(self.style.ERROR(f"{line}  ⚠️ {row['last_error'][:120]}"))
+            elif row["is_stale"]:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
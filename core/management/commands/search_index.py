@@ -0,0 +1,51 @@
+"""
+أمر إدارة: مستندات البحث المفهرسة (core.search)
+===============================================
+- rebuild: إعادة بناء مستندات كل الطلبات والعملاء
+- query: تجربة بحث وعرض عدد النتائج (للتحقق من التطبيع)
+
+الاستخدام:
+    python manage.py search_index rebuild --batch-size 5000
+    python manage.py search_index query "احمد 0100"
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.search import (
+    customer_search_q,
+    order_search_q,
+    rebuild_search_documents,
+    search_terms,
+)
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء وتجربة مستندات البحث للطلبات والعملاء"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["rebuild", "query"])
+        parser.add_argument("query", nargs="?", default="", help="نص البحث (query فقط)")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="عدد السجلات في كل عبارة"
+        )
+
+    def handle(self, *args, **options):
+        if options["action"] == "rebuild":
+            totals = rebuild_search_documents(batch_size=options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ تم بناء {totals['order']} مستند طلب و {totals['customer']} مستند عميل"
+                )
+            )
+            return
+
+        if not options["query"].strip():
+            raise CommandError("أدخل نص البحث")
+
+        from customers.models import Customer
+        from orders.models import Order
+
+        query = options["query"]
+        self.stdout.write(f"الكلمات: {search_terms(query)}")
+        self.stdout.write(f"الطلبات: {Order.objects.filter(order_search_q(query)).count()}")
+        self.stdout.write(f"العملاء: {Customer.objects.filter(customer_search_q(query)).count()}")
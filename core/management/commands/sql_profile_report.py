@@ -0,0 +1,66 @@
+"""
+أمر إدارة: أسوأ المسارات حسب مُحلِّل الاستعلامات (core.sql_profiler)
+===================================================================
+يعرض لكل مسار متوسط الزمن وزمن قاعدة البيانات/بايثون/القوالب وعدد
+الاستعلامات لكل طلب، مع أكثر الاستعلامات المكررة (N+1) ومصدرها في الكود.
+
+الاستخدام:
+    python manage.py sql_profile_report
+    python manage.py sql_profile_report --limit 10 --order-by duplicate_queries
+    python manage.py sql_profile_report --reset
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.sql_profiler import ORDERINGS, get_endpoint_report, reset_profiles
+
+
+class Command(BaseCommand):
+    help = "عرض أسوأ المسارات حسب قياسات مُحلِّل الاستعلامات"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="عدد المسارات")
+        parser.add_argument(
+            "--order-by", choices=ORDERINGS, default="total_ms", help="الترتيب حسب متوسط"
+        )
+        parser.add_argument(
+            "--examples", type=int, default=3, help="عدد الاستعلامات المكررة لكل مسار"
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            default=False,
+            help="حذف كل القياسات المجمّعة",
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            count = reset_profiles()
+            self.stdout.write(self.style.SUCCESS(f"✅ تم حذف قياسات {count} مسار"))
+            return
+
+        rows = get_endpoint_report(
+            limit=options["limit"],
+            order_by=options["order_by"],
+            examples=options["examples"],
+        )
+        if not rows:
+            self.stdout.write("لا توجد قياسات بعد.")
+            return
+
+        self.stdout.write(
+            f"{'المسار':<50}{'عيّنات':>8}{'الزمن':>10}{'DB':>10}{'بايثون':>10}"
+            f"{'قوالب':>10}{'استعلامات':>11}{'مكررة':>8}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint'][:49]:<50}{row['samples']:>8}{row['avg_total_ms']:>10}"
+                f"{row['avg_db_ms']:>10}{row['avg_python_ms']:>10}{row['avg_template_ms']:>10}"
+                f"{row['avg_queries']:>11}{row['avg_duplicate_queries']:>8}"
+            )
+            for duplicate in row.get("duplicates", []):
+                self.stdout.write(
+                    self.style.WARNING(f"    ×{duplicate['avg_repeats']}  {duplicate['sql'][:160]}")
+                )
+                for frame in duplicate["origin"]:
+                    self.stdout.write(f"        {frame}")
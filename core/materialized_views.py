@@ -1,23 +1,33 @@
 """
-📊 PostgreSQL Materialized Views - عروض مادية لتحسين الأداء 1000%
+📊 PostgreSQL Materialized Views - عروض مادية مُدارة
 
 Materialized Views هي جداول محسوبة مسبقاً تخزن نتائج الاستعلامات المعقدة
 مما يجعل الوصول إليها فوري بدلاً من حساب النتائج في كل طلب.
 
-الفوائد:
-1. تقليل وقت الاستعلام من ثوان إلى ميلي ثانية
-2. تقليل الضغط على قاعدة البيانات
-3. تحسين تجربة المستخدم
+الإدارة:
+- السجل MATERIALIZED_VIEWS يحدد كل عرض وأقصى عمر مسموح له قبل التحديث
+- التحديث بـ REFRESH MATERIALIZED VIEW CONCURRENTLY (كل عرض له UNIQUE INDEX)
+  عبر مهمة Celery الدورية core.tasks.refresh_materialized_views
+- حالة كل عرض (آخر تحديث، المدة، آخر خطأ) في MaterializedViewState
+- عروض الطلبات تُبنى من التجميع اليومي التزايدي (core.order_rollups)
+- دوال القراءة تعود لاستعلامات حية إذا كان العرض غير موجود
 
 الاستخدام:
-1. تشغيل هذا الملف لإنشاء الـ Views: python manage.py shell < core/materialized_views.py
-2. تشغيل التحديث الدوري: python -c "from core.materialized_views import refresh_all_views; refresh_all_views()"
+    python manage.py materialized_views create --missing-only
+    python manage.py materialized_views refresh [--force] [mv_order_statistics ...]
+    python manage.py materialized_views status
+    python manage.py materialized_views backfill-rollups --days 365
 """
 
 import logging
+import time
+from datetime import timedelta
 
 from django.core.cache import cache
-from django.db import connection, transaction
+from django.db import connection
+from django.db.models import Avg, Count, DecimalField, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 logger = logging.getLogger("performance")
 
@@ -26,21 +36,21 @@ logger = logging.getLogger("performance")
 # =============================================
 
 CREATE_ORDER_STATISTICS_VIEW = """
--- إحصائيات الطلبات حسب الفرع والحالة
+-- إحصائيات الطلبات حسب الفرع والحالة (من التجميع اليومي core_dailyorderrollup)
 DROP MATERIALIZED VIEW IF EXISTS mv_order_statistics CASCADE;
 
 CREATE MATERIALIZED VIEW mv_order_statistics AS
 SELECT 
     branch_id,
     order_status,
-    DATE_TRUNC('day', created_at) as order_date,
-    COUNT(*) as order_count,
+    day as order_date,
+    SUM(order_count) as order_count,
     COALESCE(SUM(total_amount), 0) as total_amount,
     COALESCE(SUM(paid_amount), 0) as paid_amount,
-    COALESCE(AVG(total_amount), 0) as avg_order_value
-FROM orders_order
-WHERE created_at >= CURRENT_DATE - INTERVAL '365 days'
-GROUP BY branch_id, order_status, DATE_TRUNC('day', created_at);
+    COALESCE(SUM(total_amount) / NULLIF(SUM(order_count), 0), 0) as avg_order_value
+FROM core_dailyorderrollup
+WHERE day >= CURRENT_DATE - INTERVAL '365 days'
+GROUP BY branch_id, order_status, day;
 
 CREATE UNIQUE INDEX idx_mv_order_stats_unique 
 ON mv_order_statistics (branch_id, order_status, order_date);
@@ -51,25 +61,25 @@ CREATE INDEX idx_mv_order_stats_date ON mv_order_statistics (order_date);
 """
 
 CREATE_DAILY_ORDER_SUMMARY_VIEW = """
--- ملخص الطلبات اليومي
+-- ملخص الطلبات اليومي (من التجميع اليومي core_dailyorderrollup)
 DROP MATERIALIZED VIEW IF EXISTS mv_daily_order_summary CASCADE;
 
 CREATE MATERIALIZED VIEW mv_daily_order_summary AS
 SELECT 
-    DATE_TRUNC('day', o.created_at) as order_date,
-    o.branch_id,
+    r.day as order_date,
+    r.branch_id,
     b.name as branch_name,
-    COUNT(*) as total_orders,
-    COUNT(CASE WHEN o.order_status = 'completed' THEN 1 END) as completed_orders,
-    COUNT(CASE WHEN o.order_status = 'pending' THEN 1 END) as pending_orders,
-    COUNT(CASE WHEN o.order_status = 'cancelled' THEN 1 END) as cancelled_orders,
-    COALESCE(SUM(o.total_amount), 0) as total_sales,
-    COALESCE(SUM(o.paid_amount), 0) as total_collected,
-    COALESCE(SUM(o.total_amount) - SUM(o.paid_amount), 0) as total_remaining
-FROM orders_order o
-LEFT JOIN accounts_branch b ON o.branch_id = b.id
-WHERE o.created_at >= CURRENT_DATE - INTERVAL '365 days'
-GROUP BY DATE_TRUNC('day', o.created_at), o.branch_id, b.name;
+    SUM(r.order_count) as total_orders,
+    SUM(CASE WHEN r.order_status = 'completed' THEN r.order_count ELSE 0 END) as completed_orders,
+    SUM(CASE WHEN r.order_status = 'pending' THEN r.order_count ELSE 0 END) as pending_orders,
+    SUM(CASE WHEN r.order_status = 'cancelled' THEN r.order_count ELSE 0 END) as cancelled_orders,
+    COALESCE(SUM(r.total_amount), 0) as total_sales,
+    COALESCE(SUM(r.paid_amount), 0) as total_collected,
+    COALESCE(SUM(r.total_amount) - SUM(r.paid_amount), 0) as total_remaining
+FROM core_dailyorderrollup r
+LEFT JOIN accounts_branch b ON r.branch_id = b.id
+WHERE r.day >= CURRENT_DATE - INTERVAL '365 days'
+GROUP BY r.day, r.branch_id, b.name;
 
 CREATE UNIQUE INDEX idx_mv_daily_summary_unique 
 ON mv_daily_order_summary (order_date, branch_id);
@@ -217,7 +227,7 @@ CREATE INDEX idx_mv_sp_perf_month ON mv_salesperson_performance (month DESC);
 """
 
 CREATE_INVENTORY_SUMMARY_VIEW = """
--- ملخص المخزون
+-- ملخص المخزون (من أرصدة inventory_stockbalance للمستودعات النشطة)
 DROP MATERIALIZED VIEW IF EXISTS mv_inventory_summary CASCADE;
 
 CREATE MATERIALIZED VIEW mv_inventory_summary AS
@@ -227,70 +237,149 @@ SELECT
     p.code as product_code,
     p.category_id,
     p.minimum_stock,
-    COALESCE(
-        (SELECT st.running_balance 
-         FROM inventory_stocktransaction st 
-         WHERE st.product_id = p.id 
-         ORDER BY st.transaction_date DESC, st.id DESC 
-         LIMIT 1), 0
-    ) as current_stock,
+    COALESCE(sb.current_stock, 0) as current_stock,
     CASE 
-        WHEN COALESCE(
-            (SELECT st.running_balance 
-             FROM inventory_stocktransaction st 
-             WHERE st.product_id = p.id 
-             ORDER BY st.transaction_date DESC, st.id DESC 
-             LIMIT 1), 0
-        ) <= 0 THEN 'out_of_stock'
-        WHEN COALESCE(
-            (SELECT st.running_balance 
-             FROM inventory_stocktransaction st 
-             WHERE st.product_id = p.id 
-             ORDER BY st.transaction_date DESC, st.id DESC 
-             LIMIT 1), 0
-        ) <= p.minimum_stock THEN 'low_stock'
+        WHEN COALESCE(sb.current_stock, 0) <= 0 THEN 'out_of_stock'
+        WHEN COALESCE(sb.current_stock, 0) <= p.minimum_stock THEN 'low_stock'
         ELSE 'in_stock'
     END as stock_status
-FROM inventory_product p;
+FROM inventory_product p
+LEFT JOIN (
+    SELECT b.product_id, SUM(b.quantity) as current_stock
+    FROM inventory_stockbalance b
+    JOIN inventory_warehouse w ON w.id = b.warehouse_id
+    WHERE w.is_active AND NOT w.is_deleted
+    GROUP BY b.product_id
+) sb ON sb.product_id = p.id;
 
 CREATE UNIQUE INDEX idx_mv_inventory_product ON mv_inventory_summary (product_id);
 CREATE INDEX idx_mv_inventory_status ON mv_inventory_summary (stock_status);
 CREATE INDEX idx_mv_inventory_category ON mv_inventory_summary (category_id);
 """
 
+# =============================================
+# سجل العروض المُدارة
+# =============================================
+
+# الاسم → (SQL الإنشاء، أقصى عمر بالدقائق قبل اعتبار العرض قديماً)
+MATERIALIZED_VIEWS = {
+    "mv_order_statistics": (CREATE_ORDER_STATISTICS_VIEW, 10),
+    "mv_daily_order_summary": (CREATE_DAILY_ORDER_SUMMARY_VIEW, 10),
+    "mv_customer_statistics": (CREATE_CUSTOMER_STATISTICS_VIEW, 60),
+    "mv_installation_statistics": (CREATE_INSTALLATION_STATISTICS_VIEW, 30),
+    "mv_manufacturing_statistics": (CREATE_MANUFACTURING_STATISTICS_VIEW, 30),
+    "mv_product_sales": (CREATE_PRODUCT_SALES_VIEW, 60),
+    "mv_salesperson_performance": (CREATE_SALESPERSON_PERFORMANCE_VIEW, 60),
+    "mv_inventory_summary": (CREATE_INVENTORY_SUMMARY_VIEW, 15),
+}
+
+# العروض المبنية على core_dailyorderrollup — يُحدَّث التجميع قبلها
+ROLLUP_BACKED_VIEWS = {"mv_order_statistics", "mv_daily_order_summary"}
+
+_EXISTS_CACHE_TTL = 60
+_RESULT_CACHE_TTL = 300
+
+
+def _check_view_name(view_name):
+    if view_name not in MATERIALIZED_VIEWS:
+        raise ValueError(f"Unknown materialized view: {view_name}")
+    return view_name
+
+
+def view_exists(view_name: str) -> bool:
+    """هل العرض موجود ومعبأ؟ (مخزنة دقيقة واحدة)"""
+    if connection.vendor != "postgresql":
+        return False
+
+    cache_key = f"mv_exists:{view_name}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT ispopulated FROM pg_matviews WHERE matviewname = %s", [view_name]
+            )
+            row = cursor.fetchone()
+        exists = bool(row and row[0])
+    except Exception as e:
+        logger.warning(f"Failed to check materialized view {view_name}: {e}")
+        exists = False
+
+    cache.set(cache_key, exists, _EXISTS_CACHE_TTL)
+    return exists
+
+
+def _view_cache_key(view_name, *parts):
+    """مفتاح نتائج مرتبط بإصدار العرض — كل تحديث للعرض يُبطل نتائجه المخزنة"""
+    version = cache.get(f"mv_version:{view_name}", 0)
+    return ":".join([view_name, str(version), *[str(part) for part in parts]])
+
+
+def _bump_view_version(view_name):
+    key = f"mv_version:{view_name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time()), None)
+    except Exception:
+        pass
+
+
+def _record_state(view_name, duration_ms, error=""):
+    from .models import MaterializedViewState
+
+    state, _ = MaterializedViewState.objects.get_or_create(view_name=view_name)
+    state.last_duration_ms = int(duration_ms)
+    state.last_error = error
+    if not error:
+        state.last_refreshed_at = timezone.now()
+        state.refresh_count += 1
+    state.save()
+
+
 # =============================================
 # Functions لإدارة Materialized Views
 # =============================================
 
 
-def create_all_views():
+def create_view(view_name: str):
+    """إنشاء (أو إعادة إنشاء) عرض واحد مع فهارسه الفريدة"""
+    sql, _max_age = MATERIALIZED_VIEWS[_check_view_name(view_name)]
+    started = time.monotonic()
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+    cache.delete(f"mv_exists:{view_name}")
+    _bump_view_version(view_name)
+    _record_state(view_name, (time.monotonic() - started) * 1000)
+    logger.info(f"Created materialized view: {view_name}")
+
+
+def create_all_views(missing_only=False):
     """
     إنشاء جميع Materialized Views
 
-    يجب تشغيل هذا مرة واحدة عند الإعداد الأولي
+    missing_only: إنشاء العروض غير الموجودة فقط (آمن للتشغيل عند كل نشر)
     """
-    views = [
-        ("Order Statistics", CREATE_ORDER_STATISTICS_VIEW),
-        ("Daily Order Summary", CREATE_DAILY_ORDER_SUMMARY_VIEW),
-        ("Customer Statistics", CREATE_CUSTOMER_STATISTICS_VIEW),
-        ("Installation Statistics", CREATE_INSTALLATION_STATISTICS_VIEW),
-        ("Manufacturing Statistics", CREATE_MANUFACTURING_STATISTICS_VIEW),
-        ("Product Sales", CREATE_PRODUCT_SALES_VIEW),
-        ("Salesperson Performance", CREATE_SALESPERSON_PERFORMANCE_VIEW),
-        ("Inventory Summary", CREATE_INVENTORY_SUMMARY_VIEW),
-    ]
+    if any(name in ROLLUP_BACKED_VIEWS for name in MATERIALIZED_VIEWS):
+        from .models import DailyOrderRollup
+        from .order_rollups import backfill_daily_rollups
 
-    results = []
+        if not DailyOrderRollup.objects.exists():
+            backfill_daily_rollups(365)
 
-    with connection.cursor() as cursor:
-        for name, sql in views:
-            try:
-                cursor.execute(sql)
-                results.append((name, "SUCCESS", None))
-                logger.info(f"Created materialized view: {name}")
-            except Exception as e:
-                results.append((name, "FAILED", str(e)))
-                logger.error(f"Failed to create materialized view {name}: {e}")
+    results = []
+    for view_name in MATERIALIZED_VIEWS:
+        if missing_only and view_exists(view_name):
+            results.append((view_name, "EXISTS", None))
+            continue
+        try:
+            create_view(view_name)
+            results.append((view_name, "SUCCESS", None))
+        except Exception as e:
+            results.append((view_name, "FAILED", str(e)))
+            logger.error(f"Failed to create materialized view {view_name}: {e}")
 
     return results
 
@@ -301,124 +390,174 @@ def refresh_view(view_name: str, concurrently: bool = True):
 
     Args:
         view_name: اسم الـ view
-        concurrently: تحديث بدون قفل (يتطلب UNIQUE INDEX)
+        concurrently: تحديث بدون قفل القراءة (يتطلب UNIQUE INDEX وعرضاً معبأً)
     """
+    _check_view_name(view_name)
+    started = time.monotonic()
     try:
         with connection.cursor() as cursor:
             if concurrently:
-                cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}")
+                try:
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}")
+                except Exception as e:
+                    # عرض غير معبأ أو بلا فهرس فريد: تحديث عادي مرة واحدة
+                    logger.warning(f"Concurrent refresh of {view_name} failed, retrying: {e}")
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW {view_name}")
             else:
                 cursor.execute(f"REFRESH MATERIALIZED VIEW {view_name}")
-
-        # مسح الكاش المرتبط
-        cache.delete_pattern(f"{view_name}:*")
-
-        logger.info(f"Refreshed materialized view: {view_name}")
-        return True
     except Exception as e:
+        _record_state(view_name, (time.monotonic() - started) * 1000, error=str(e))
         logger.error(f"Failed to refresh {view_name}: {e}")
         return False
 
+    _bump_view_version(view_name)
+    _record_state(view_name, (time.monotonic() - started) * 1000)
+    logger.info(f"Refreshed materialized view: {view_name}")
+    return True
+
+
+def get_view_status():
+    """حالة كل عرض: موجود؟ عمره؟ متقادم؟ آخر خطأ"""
+    from .models import MaterializedViewState
+
+    states = {state.view_name: state for state in MaterializedViewState.objects.all()}
+    now = timezone.now()
+    status = []
+    for view_name, (_sql, max_age) in MATERIALIZED_VIEWS.items():
+        state = states.get(view_name)
+        refreshed_at = state.last_refreshed_at if state else None
+        age_minutes = (now - refreshed_at).total_seconds() / 60 if refreshed_at else None
+        status.append(
+            {
+                "view": view_name,
+                "exists": view_exists(view_name),
+                "last_refreshed_at": refreshed_at,
+                "age_minutes": round(age_minutes, 1) if age_minutes is not None else None,
+                "max_age_minutes": max_age,
+                "is_stale": age_minutes is None or age_minutes > max_age,
+                "last_duration_ms": state.last_duration_ms if state else None,
+                "last_error": state.last_error if state else "",
+            }
+        )
+    return status
 
-def refresh_all_views():
+
+def refresh_all_views(force=False, view_names=None):
     """
-    تحديث جميع Materialized Views
+    تحديث العروض المتقادمة فقط (أو كلها مع force)
 
-    يُنصح بتشغيل هذا كل 5-15 دقيقة عبر Celery أو Cron
+    يُحدِّث التجميع اليومي للطلبات أولاً (اليوم + الأيام المتغيّرة فقط)
+    ثم العروض التي تجاوزت أقصى عمر لها.
     """
-    views = [
-        "mv_order_statistics",
-        "mv_daily_order_summary",
-        "mv_customer_statistics",
-        "mv_installation_statistics",
-        "mv_manufacturing_statistics",
-        "mv_product_sales",
-        "mv_salesperson_performance",
-        "mv_inventory_summary",
-    ]
+    from .order_rollups import refresh_daily_rollups
 
+    selected = set(view_names or MATERIALIZED_VIEWS)
     results = {}
 
-    for view in views:
-        try:
-            refresh_view(view, concurrently=True)
-            results[view] = "SUCCESS"
-        except Exception as e:
-            # إذا فشل التحديث المتزامن، جرب بدونه
-            try:
-                refresh_view(view, concurrently=False)
-                results[view] = "SUCCESS (non-concurrent)"
-            except Exception as e2:
-                results[view] = f"FAILED: {e2}"
-
-    logger.info(f"Refreshed all views: {results}")
+    if selected & ROLLUP_BACKED_VIEWS:
+        days = refresh_daily_rollups()
+        results["daily_order_rollups"] = f"{len(days)} days"
+
+    for status in get_view_status():
+        view_name = status["view"]
+        if view_name not in selected:
+            continue
+        if not status["exists"]:
+            results[view_name] = "MISSING"
+            continue
+        if not force and not status["is_stale"]:
+            results[view_name] = "FRESH"
+            continue
+        results[view_name] = "SUCCESS" if refresh_view(view_name) else "FAILED"
+
+    logger.info(f"Refreshed materialized views: {results}")
     return results
 
 
+# =============================================
+# دوال القراءة (مع الرجوع لاستعلامات حية)
+# =============================================
+
+
+def _fetch_dicts(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _money():
+    return DecimalField(max_digits=18, decimal_places=2)
+
+
 def get_order_statistics(branch_id=None, days=30):
     """
     الحصول على إحصائيات الطلبات من Materialized View
-
-    أسرع 100x من الاستعلام المباشر
+    (أو من التجميع اليومي إذا لم يكن العرض موجوداً)
     """
-    cache_key = f"mv_order_stats:{branch_id}:{days}"
+    cache_key = _view_cache_key("mv_order_statistics", branch_id, days)
     cached = cache.get(cache_key)
-
     if cached:
         return cached
 
-    from datetime import timedelta
-
-    from django.utils import timezone
-
-    cutoff_date = timezone.now().date() - timedelta(days=days)
+    cutoff_date = timezone.localdate() - timedelta(days=days)
 
-    with connection.cursor() as cursor:
+    if view_exists("mv_order_statistics"):
         sql = """
             SELECT 
                 order_status,
                 SUM(order_count) as total_orders,
                 SUM(total_amount) as total_amount,
                 SUM(paid_amount) as paid_amount,
-                AVG(avg_order_value) as avg_order_value
+                SUM(total_amount) / NULLIF(SUM(order_count), 0) as avg_order_value
             FROM mv_order_statistics
             WHERE order_date >= %s
         """
         params = [cutoff_date]
-
         if branch_id:
             sql += " AND branch_id = %s"
             params.append(branch_id)
-
         sql += " GROUP BY order_status"
+        results = _fetch_dicts(sql, params)
+    else:
+        from .models import DailyOrderRollup
 
-        cursor.execute(sql, params)
-        columns = [col[0] for col in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-    # تخزين في الكاش لمدة 5 دقائق
-    cache.set(cache_key, results, 300)
-
+        rows = DailyOrderRollup.objects.filter(day__gte=cutoff_date)
+        if branch_id:
+            rows = rows.filter(branch_id=branch_id)
+        results = [
+            {
+                **row,
+                "avg_order_value": (
+                    row["total_amount"] / row["total_orders"] if row["total_orders"] else 0
+                ),
+            }
+            for row in rows.values("order_status")
+            .annotate(
+                total_orders=Sum("order_count"),
+                total_amount=Sum("total_amount"),
+                paid_amount=Sum("paid_amount"),
+            )
+            .order_by()
+        ]
+
+    cache.set(cache_key, results, _RESULT_CACHE_TTL)
     return results
 
 
 def get_daily_summary(branch_id=None, days=30):
     """
     الحصول على الملخص اليومي من Materialized View
+    (أو من التجميع اليومي إذا لم يكن العرض موجوداً)
     """
-    cache_key = f"mv_daily_summary:{branch_id}:{days}"
+    cache_key = _view_cache_key("mv_daily_order_summary", branch_id, days)
     cached = cache.get(cache_key)
-
     if cached:
         return cached
 
-    from datetime import timedelta
+    cutoff_date = timezone.localdate() - timedelta(days=days)
 
-    from django.utils import timezone
-
-    cutoff_date = timezone.now().date() - timedelta(days=days)
-
-    with connection.cursor() as cursor:
+    if view_exists("mv_daily_order_summary"):
         sql = """
             SELECT 
                 order_date,
@@ -434,33 +573,52 @@ def get_daily_summary(branch_id=None, days=30):
             WHERE order_date >= %s
         """
         params = [cutoff_date]
-
         if branch_id:
             sql += " AND branch_id = %s"
             params.append(branch_id)
-
         sql += " ORDER BY order_date DESC"
+        results = _fetch_dicts(sql, params)
+    else:
+        from .models import DailyOrderRollup
 
-        cursor.execute(sql, params)
-        columns = [col[0] for col in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-    cache.set(cache_key, results, 300)
+        rows = DailyOrderRollup.objects.filter(day__gte=cutoff_date)
+        if branch_id:
+            rows = rows.filter(branch_id=branch_id)
+
+        def count_status(status):
+            return Coalesce(Sum("order_count", filter=Q(order_status=status)), Value(0))
+
+        results = list(
+            rows.values("day", "branch_id")
+            .annotate(
+                order_date=F("day"),
+                branch_name=Max("branch__name"),
+                total_orders=Sum("order_count"),
+                completed_orders=count_status("completed"),
+                pending_orders=count_status("pending"),
+                cancelled_orders=count_status("cancelled"),
+                total_sales=Sum("total_amount"),
+                total_collected=Sum("paid_amount"),
+            )
+            .order_by("-day")
+        )
+        for row in results:
+            row["total_remaining"] = row["total_sales"] - row["total_collected"]
 
+    cache.set(cache_key, results, _RESULT_CACHE_TTL)
     return results
 
 
 def get_top_customers(branch_id=None, limit=20):
     """
-    الحصول على أفضل العملاء من Materialized View
+    الحصول على أفضل العملاء من Materialized View (أو استعلام حي)
     """
-    cache_key = f"mv_top_customers:{branch_id}:{limit}"
+    cache_key = _view_cache_key("mv_customer_statistics", branch_id, limit)
     cached = cache.get(cache_key)
-
     if cached:
         return cached
 
-    with connection.cursor() as cursor:
+    if view_exists("mv_customer_statistics"):
         sql = """
             SELECT 
                 customer_id,
@@ -475,88 +633,160 @@ def get_top_customers(branch_id=None, limit=20):
             WHERE total_orders > 0
         """
         params = []
-
         if branch_id:
             sql += " AND branch_id = %s"
             params.append(branch_id)
-
         sql += f" ORDER BY total_spent DESC LIMIT {int(limit)}"
+        results = _fetch_dicts(sql, params)
+    else:
+        from customers.models import Customer
 
-        cursor.execute(sql, params)
-        columns = [col[0] for col in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-    cache.set(cache_key, results, 300)
+        customers = Customer.objects.filter(status="active")
+        if branch_id:
+            customers = customers.filter(branch_id=branch_id)
+        results = list(
+            customers.annotate(
+                customer_id=F("id"),
+                customer_name=F("name"),
+                customer_phone=F("phone"),
+                total_orders=Count("customer_orders"),
+                total_spent=Coalesce(
+                    Sum("customer_orders__total_amount"), Value(0), output_field=_money()
+                ),
+                total_paid=Coalesce(
+                    Sum("customer_orders__paid_amount"), Value(0), output_field=_money()
+                ),
+                last_order_date=Max("customer_orders__created_at"),
+            )
+            .filter(total_orders__gt=0)
+            .order_by("-total_spent")
+            .values(
+                "customer_id",
+                "customer_name",
+                "customer_phone",
+                "total_orders",
+                "total_spent",
+                "total_paid",
+                "last_order_date",
+            )[: int(limit)]
+        )
+        for row in results:
+            row["avg_order_value"] = row["total_spent"] / row["total_orders"]
 
+    cache.set(cache_key, results, _RESULT_CACHE_TTL)
     return results
 
 
 def get_top_products(category_id=None, limit=20):
     """
-    الحصول على أفضل المنتجات مبيعاً من Materialized View
+    الحصول على أفضل المنتجات مبيعاً من Materialized View (أو استعلام حي)
     """
-    cache_key = f"mv_top_products:{category_id}:{limit}"
+    cache_key = _view_cache_key("mv_product_sales", category_id, limit)
     cached = cache.get(cache_key)
-
     if cached:
         return cached
 
-    with connection.cursor() as cursor:
-        sql = """
-            SELECT 
-                product_id,
-                product_name,
-                product_code,
-                category_name,
-                times_ordered,
-                total_quantity_sold,
-                total_revenue,
-                avg_price,
-                last_sold_date
-            FROM mv_product_sales
-        """
-        params = []
+    if not view_exists("mv_product_sales"):
+        results = _live_top_products(category_id, limit)
+        cache.set(cache_key, results, _RESULT_CACHE_TTL)
+        return results
+
+    sql = """
+        SELECT 
+            product_id,
+            product_name,
+            product_code,
+            category_name,
+            times_ordered,
+            total_quantity_sold,
+            total_revenue,
+            avg_price,
+            last_sold_date
+        FROM mv_product_sales
+    """
+    params = []
+    if category_id:
+        sql += " WHERE category_id = %s"
+        params.append(category_id)
+    sql += f" ORDER BY total_revenue DESC LIMIT {int(limit)}"
+    results = _fetch_dicts(sql, params)
+
+    cache.set(cache_key, results, _RESULT_CACHE_TTL)
+    return results
 
-        if category_id:
-            sql += " WHERE category_id = %s"
-            params.append(category_id)
 
-        sql += f" ORDER BY total_revenue DESC LIMIT {int(limit)}"
+def _live_top_products(category_id, limit):
+    """نفس تجميع mv_product_sales (بنود آخر 365 يوماً) باستعلام حي — أبطأ لكنه صحيح"""
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(
+        order__created_at__gte=timezone.localdate() - timedelta(days=365)
+    )
+    if category_id:
+        items = items.filter(product__category_id=category_id)
+
+    return list(
+        items.values("product_id")
+        .annotate(
+            product_name=F("product__name"),
+            product_code=F("product__code"),
+            category_name=F("product__category__name"),
+            times_ordered=Count("order_id", distinct=True),
+            total_quantity_sold=Sum("quantity"),
+            total_revenue=Coalesce(
+                Sum(F("quantity") * F("unit_price"), output_field=_money()),
+                Value(0),
+                output_field=_money(),
+            ),
+            avg_price=Avg("unit_price"),
+            last_sold_date=Max("order__order_date"),
+        )
+        .order_by("-total_revenue")[: int(limit)]
+    )
 
-        cursor.execute(sql, params)
-        columns = [col[0] for col in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-    cache.set(cache_key, results, 300)
+def _live_inventory_rows():
+    from inventory.models import Product
 
-    return results
+    return Product.objects.with_stock(per_warehouse=False).annotate(
+        current_stock=F("stock_total")
+    )
 
 
 def get_inventory_status():
     """
-    الحصول على حالة المخزون من Materialized View
+    الحصول على حالة المخزون من Materialized View (أو من أرصدة StockBalance)
     """
-    cache_key = "mv_inventory_status"
+    cache_key = _view_cache_key("mv_inventory_summary", "status")
     cached = cache.get(cache_key)
-
     if cached:
         return cached
 
-    with connection.cursor() as cursor:
-        cursor.execute(
+    if view_exists("mv_inventory_summary"):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT 
+                    stock_status,
+                    COUNT(*) as count
+                FROM mv_inventory_summary
+                GROUP BY stock_status
             """
-            SELECT 
-                stock_status,
-                COUNT(*) as count
-            FROM mv_inventory_summary
-            GROUP BY stock_status
-        """
-        )
-
-        results = {row[0]: row[1] for row in cursor.fetchall()}
-
-    cache.set(cache_key, results, 300)
-
+            )
+            results = {row[0]: row[1] for row in cursor.fetchall()}
+    else:
+        products = _live_inventory_rows()
+        results = {
+            "out_of_stock": products.filter(current_stock__lte=0).count(),
+            "low_stock": products.filter(
+                current_stock__gt=0, current_stock__lte=F("minimum_stock")
+            ).count(),
+            "in_stock": products.filter(current_stock__gt=0)
+            .filter(current_stock__gt=F("minimum_stock"))
+            .count(),
+        }
+
+    cache.set(cache_key, results, _RESULT_CACHE_TTL)
     return results
 
 
@@ -564,14 +794,13 @@ def get_low_stock_products(limit=50):
     """
     الحصول على المنتجات منخفضة المخزون
     """
-    cache_key = f"mv_low_stock:{limit}"
+    cache_key = _view_cache_key("mv_inventory_summary", "low", limit)
     cached = cache.get(cache_key)
-
     if cached:
         return cached
 
-    with connection.cursor() as cursor:
-        cursor.execute(
+    if view_exists("mv_inventory_summary"):
+        results = _fetch_dicts(
             f"""
             SELECT 
                 product_id,
@@ -589,68 +818,29 @@ def get_low_stock_products(limit=50):
                 END,
                 current_stock ASC
             LIMIT {int(limit)}
-        """
+        """,
+            [],
         )
-
-        columns = [col[0] for col in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-    cache.set(cache_key, results, 300)
-
+    else:
+        results = []
+        rows = (
+            _live_inventory_rows()
+            .filter(current_stock__lte=F("minimum_stock"))
+            .order_by("current_stock")
+            .values("id", "name", "code", "current_stock", "minimum_stock")[: int(limit)]
+        )
+        for row in rows:
+            results.append(
+                {
+                    "product_id": row["id"],
+                    "product_name": row["name"],
+                    "product_code": row["code"],
+                    "current_stock": row["current_stock"],
+                    "minimum_stock": row["minimum_stock"],
+                    "stock_status": "out_of_stock" if row["current_stock"] <= 0 else "low_stock",
+                }
+            )
+        results.sort(key=lambda row: row["stock_status"] != "out_of_stock")
+
+    cache.set(cache_key, results, _RESULT_CACHE_TTL)
     return results
-
-
-# =============================================
-# Celery Task للتحديث الدوري (اختياري)
-# =============================================
-
-
-def setup_celery_task():
-    """
-    إعداد مهمة Celery للتحديث الدوري
-
-    أضف هذا إلى ملف celery.py أو tasks.py
-    """
-    task_code = '''
-from celery import shared_task
-from core.materialized_views import refresh_all_views
-
-@shared_task(name='refresh_materialized_views')
-def refresh_materialized_views_task():
-    """تحديث Materialized Views كل 5 دقائق"""
-    return refresh_all_views()
-
-# أضف هذا إلى CELERY_BEAT_SCHEDULE في settings.py:
-# 'refresh-materialized-views': {
-#     'task': 'refresh_materialized_views',
-#     'schedule': crontab(minute='*/5'),
-# },
-'''
-    return task_code
-
-
-# =============================================
-# Script للتشغيل المباشر
-# =============================================
-
-if __name__ == "__main__":
-    import django
-
-    django.setup()
-
-    print("Creating Materialized Views...")
-    results = create_all_views()
-
-    for name, status, error in results:
-        if status == "SUCCESS":
-            print(f"✅ {name}: {status}")
-        else:
-            print(f"❌ {name}: {status} - {error}")
-
-    print("\nRefreshing all views...")
-    refresh_results = refresh_all_views()
-
-    for view, status in refresh_results.items():
-        print(f"  {view}: {status}")
-
-    print("\nDone!")
@@ -0,0 +1,110 @@
+# Generated by Django 5.1.5 on 2026-10-17 10:00
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0064_user_can_issue_promo_code"),
+        ("core", "0003_auditlog_app_label_auditlog_changed_fields_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaterializedViewState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "view_name",
+                    models.CharField(max_length=100, unique=True, verbose_name="اسم العرض"),
+                ),
+                (
+                    "last_refreshed_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="آخر تحديث"),
+                ),
+                (
+                    "last_duration_ms",
+                    models.PositiveIntegerField(default=0, verbose_name="مدة آخر تحديث (ms)"),
+                ),
+                ("last_error", models.TextField(blank=True, verbose_name="آخر خطأ")),
+                (
+                    "refresh_count",
+                    models.PositiveIntegerField(default=0, verbose_name="عدد مرات التحديث"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="تاريخ التعديل")),
+            ],
+            options={
+                "verbose_name": "حالة عرض مادي",
+                "verbose_name_plural": "حالات العروض المادية",
+                "ordering": ["view_name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyOrderRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="اليوم")),
+                ("order_status", models.CharField(max_length=30, verbose_name="حالة الطلب")),
+                ("order_count", models.PositiveIntegerField(default=0, verbose_name="عدد الطلبات")),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=18,
+                        verbose_name="المبلغ الإجمالي",
+                    ),
+                ),
+                (
+                    "paid_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=18,
+                        verbose_name="المبلغ المدفوع",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="تاريخ التعديل")),
+                (
+                    "branch",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="accounts.branch",
+                        verbose_name="الفرع",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "تجميع يومي للطلبات",
+                "verbose_name_plural": "التجميعات اليومية للطلبات",
+                "ordering": ["-day"],
+                "indexes": [
+                    models.Index(fields=["day", "branch"], name="core_rollup_day_branch_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.1.5 on 2026-10-17 12:00
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def build_search_documents(apps, schema_editor):
+    """
+    بناء المستندات للبيانات الحالية حتى لا يعود البحث فارغاً بعد النشر —
+    بالنماذج التاريخية وعلى دفعات (search_index rebuild يعيد البناء لاحقاً عند الحاجة)
+    """
+    from core.search import rebuild_search_documents
+
+    rebuild_search_documents(registry=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_materializedviewstate_dailyorderrollup"),
+        ("customers", "0023_alter_customer_phone_alter_customer_phone2"),
+        ("external_sales", "0001_initial"),
+        ("orders", "0106_draftorder_promo_discount_amount_and_more"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name="OrderSearchDocument",
+            fields=[
+                (
+                    "order",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="orders.order",
+                        verbose_name="الطلب",
+                    ),
+                ),
+                ("document", models.TextField(blank=True, verbose_name="نص البحث")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="تاريخ التعديل")),
+            ],
+            options={
+                "verbose_name": "مستند بحث طلب",
+                "verbose_name_plural": "مستندات بحث الطلبات",
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["document"],
+                        name="core_order_search_trgm",
+                        opclasses=["gin_trgm_ops"],
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CustomerSearchDocument",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="customers.customer",
+                        verbose_name="العميل",
+                    ),
+                ),
+                ("document", models.TextField(blank=True, verbose_name="نص البحث")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="تاريخ التعديل")),
+            ],
+            options={
+                "verbose_name": "مستند بحث عميل",
+                "verbose_name_plural": "مستندات بحث العملاء",
+                "indexes": [
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["document"],
+                        name="core_customer_search_trgm",
+                        opclasses=["gin_trgm_ops"],
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_ordersearchdocument_customersearchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NumberSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("scope", models.CharField(max_length=100, verbose_name="النطاق")),
+                ("prefix", models.CharField(blank=True, max_length=100, verbose_name="البادئة")),
+                ("last_value", models.PositiveBigIntegerField(default=0, verbose_name="آخر قيمة")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="تاريخ التعديل")),
+            ],
+            options={
+                "verbose_name": "عداد تسلسلي",
+                "verbose_name_plural": "العدادات التسلسلية",
+                "ordering": ["scope", "prefix"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "prefix"), name="core_sequence_scope_prefix"
+                    )
+                ],
+            },
+        ),
+    ]
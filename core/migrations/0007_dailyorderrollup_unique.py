@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import Q
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_numbersequence"),
+    ]
+
+    operations = [
+        # إزالة أي صفوف مكررة من إعادة بناء متزامنة سابقة (البيانات مشتقة ويعاد بناؤها)
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM core_dailyorderrollup a
+                USING core_dailyorderrollup b
+                WHERE a.id < b.id
+                  AND a.day = b.day
+                  AND a.order_status = b.order_status
+                  AND a.branch_id IS NOT DISTINCT FROM b.branch_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="dailyorderrollup",
+            constraint=models.UniqueConstraint(
+                condition=Q(branch__isnull=False),
+                fields=("day", "branch", "order_status"),
+                name="core_rollup_day_branch_status_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyorderrollup",
+            constraint=models.UniqueConstraint(
+                condition=Q(branch__isnull=True),
+                fields=("day", "order_status"),
+                name="core_rollup_day_nobranch_status_uniq",
+            ),
+        ),
+    ]
@@ -2,7 +2,9 @@ import logging
 from decimal import Decimal
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
 logger = logging.getLogger(__name__)
@@ -148,3 +150,164 @@ class RecycleBin(models.Model):
         verbose_name = _("سلة المحذوفات")
         verbose_name_plural = _("سلة المحذوفات")
         app_label = 'core'
+
+
+# ─── Materialized Views & Rollups ────────────────────────────────────
+
+
+class MaterializedViewState(models.Model):
+    """
+    حالة كل Materialized View مُدار (core.materialized_views):
+    آخر تحديث ومدته وآخر خطأ — لحساب التقادم (staleness) وعرضه.
+    """
+
+    view_name = models.CharField(_("اسم العرض"), max_length=100, unique=True)
+    last_refreshed_at = models.DateTimeField(_("آخر تحديث"), null=True, blank=True)
+    last_duration_ms = models.PositiveIntegerField(_("مدة آخر تحديث (ms)"), default=0)
+    last_error = models.TextField(_("آخر خطأ"), blank=True)
+    refresh_count = models.PositiveIntegerField(_("عدد مرات التحديث"), default=0)
+    updated_at = models.DateTimeField(_("تاريخ التعديل"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("حالة عرض مادي")
+        verbose_name_plural = _("حالات العروض المادية")
+        ordering = ["view_name"]
+
+    def __str__(self):
+        return self.view_name
+
+
+class DailyOrderRollup(models.Model):
+    """
+    تجميع يومي للطلبات لكل (يوم، فرع، حالة) — يُحدَّث تزايدياً للأيام المتغيّرة فقط.
+    العروض المادية للطلبات تُبنى منه بدلاً من مسح orders_order لسنة كاملة.
+    """
+
+    day = models.DateField(_("اليوم"))
+    branch = models.ForeignKey(
+        "accounts.Branch",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name=_("الفرع"),
+    )
+    order_status = models.CharField(_("حالة الطلب"), max_length=30)
+    order_count = models.PositiveIntegerField(_("عدد الطلبات"), default=0)
+    total_amount = models.DecimalField(
+        _("المبلغ الإجمالي"),
+        max_digits=18,
+        decimal_places=CURRENCY_DECIMAL_PLACES,
+        default=Decimal("0.00"),
+    )
+    paid_amount = models.DecimalField(
+        _("المبلغ المدفوع"),
+        max_digits=18,
+        decimal_places=CURRENCY_DECIMAL_PLACES,
+        default=Decimal("0.00"),
+    )
+    updated_at = models.DateTimeField(_("تاريخ التعديل"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("تجميع يومي للطلبات")
+        verbose_name_plural = _("التجميعات اليومية للطلبات")
+        ordering = ["-day"]
+        indexes = [
+            models.Index(fields=["day", "branch"], name="core_rollup_day_branch_idx"),
+        ]
+        # صف واحد لكل (يوم، فرع، حالة) حتى مع إعادة بناء متزامنة لنفس اليوم؛
+        # قيدان جزئيان لأن NULL في branch لا يتعارض مع NULL في قيد عادي
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "branch", "order_status"],
+                condition=Q(branch__isnull=False),
+                name="core_rollup_day_branch_status_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "order_status"],
+                condition=Q(branch__isnull=True),
+                name="core_rollup_day_nobranch_status_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.branch_id} - {self.order_status}"
+
+
+class OrderSearchDocument(models.Model):
+    """
+    مستند بحث الطلب — كل الحقول القابلة للبحث (الطلب، العميل، البائع، الفرع)
+    في نص واحد مُطبَّع عليه فهرس trigram. يُبنى في core.search.
+    """
+
+    order = models.OneToOneField(
+        "orders.Order",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+        verbose_name=_("الطلب"),
+    )
+    document = models.TextField(_("نص البحث"), blank=True)
+    updated_at = models.DateTimeField(_("تاريخ التعديل"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("مستند بحث طلب")
+        verbose_name_plural = _("مستندات بحث الطلبات")
+        indexes = [
+            GinIndex(
+                fields=["document"], opclasses=["gin_trgm_ops"], name="core_order_search_trgm"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}"
+
+
+class CustomerSearchDocument(models.Model):
+    """مستند بحث العميل (الاسم، الكود، الهواتف، البريد، كود المصمم)"""
+
+    customer = models.OneToOneField(
+        "customers.Customer",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+        verbose_name=_("العميل"),
+    )
+    document = models.TextField(_("نص البحث"), blank=True)
+    updated_at = models.DateTimeField(_("تاريخ التعديل"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("مستند بحث عميل")
+        verbose_name_plural = _("مستندات بحث العملاء")
+        indexes = [
+            GinIndex(
+                fields=["document"], opclasses=["gin_trgm_ops"], name="core_customer_search_trgm"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id}"
+
+
+class NumberSequence(models.Model):
+    """
+    عداد الأرقام التسلسلية لكل (نطاق، بادئة) — أرقام الطلبات والعقود والشكاوى...
+    يُزاد بعبارة واحدة في core.sequences بدلاً من البحث عن آخر رقم.
+    """
+
+    scope = models.CharField(_("النطاق"), max_length=100)
+    prefix = models.CharField(_("البادئة"), max_length=100, blank=True)
+    last_value = models.PositiveBigIntegerField(_("آخر قيمة"), default=0)
+    updated_at = models.DateTimeField(_("تاريخ التعديل"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("عداد تسلسلي")
+        verbose_name_plural = _("العدادات التسلسلية")
+        ordering = ["scope", "prefix"]
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "prefix"], name="core_sequence_scope_prefix"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.prefix} = {self.last_value}"
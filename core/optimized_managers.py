@@ -13,7 +13,7 @@ from decimal import Decimal
 
 from django.core.cache import cache
 from django.db import models
-from django.db.models import F, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models import F, Max, Prefetch, Q, Sum
 
 logger = logging.getLogger("performance")
 
@@ -39,41 +39,19 @@ class OptimizedProductManager(models.Manager):
         إضافة معلومات المخزون للمنتجات بدون N+1
 
         يضيف الحقول:
-        - stock_total: إجمالي المخزون
-        - last_transaction_date: تاريخ آخر حركة
+        - stock_total: إجمالي المخزون (من جدول StockBalance)
         """
-        from inventory.models import StockTransaction
+        from inventory.managers import stock_total_expression
 
-        # Subquery لآخر رصيد لكل منتج
-        latest_balance_subquery = (
-            StockTransaction.objects.filter(product=OuterRef("pk"))
-            .order_by("-transaction_date", "-id")
-            .values("running_balance")[:1]
-        )
-
-        # نستخدم annotation بدلاً من property
-        return self.annotate(
-            stock_total=Subquery(
-                latest_balance_subquery, output_field=models.DecimalField()
-            )
-        )
+        return self.annotate(stock_total=stock_total_expression())
 
     def with_stock_by_warehouse(self):
         """
-        إضافة معلومات المخزون مع تفصيل المستودعات
+        إضافة معلومات المخزون مع تفصيل المستودعات (product.active_stock_balances)
         """
-        from inventory.models import StockTransaction, Warehouse
+        from inventory.managers import stock_balances_prefetch
 
-        # هذا أكثر تعقيداً - نستخدم Raw SQL أو نعمل prefetch
-        return self.prefetch_related(
-            Prefetch(
-                "transactions",
-                queryset=StockTransaction.objects.filter(warehouse__is_active=True)
-                .order_by("warehouse", "-transaction_date", "-id")
-                .distinct("warehouse"),
-                to_attr="latest_transactions_by_warehouse",
-            )
-        )
+        return self.with_stock_info().prefetch_related(stock_balances_prefetch())
 
     def active_with_stock(self):
         """منتجات نشطة مع مخزون > 0"""
@@ -0,0 +1,156 @@
+"""
+📅 Daily Order Rollups - تجميع يومي تزايدي للطلبات
+
+بدلاً من أن يعيد كل تحديث للعروض المادية مسح orders_order لسنة كاملة،
+يُحفظ لكل (يوم، فرع، حالة) صف واحد في DailyOrderRollup، ويُعاد حساب
+الأيام المتغيّرة فقط:
+
+- اليوم الحالي والسابق في كل دورة
+- الأيام التي تغيّرت طلباتها (تُسجَّل من signals في مجموعة Redis)
+
+الاستخدام:
+    mark_order_day_dirty(order.created_at)
+    refresh_daily_rollups()                 # اليوم + الأيام المتغيّرة
+    refresh_daily_rollups(days=[date(...)]) # أيام محددة
+    backfill_daily_rollups(365)             # بناء أولي
+"""
+
+import logging
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger("performance")
+
+DIRTY_DAYS_KEY = "crm:rollups:orders:dirty_days"
+# مفتاح أول لقفل advisory الخاص بإعادة بناء يوم (المفتاح الثاني = ترتيب اليوم)
+ROLLUP_LOCK_NAMESPACE = 8801
+
+
+def _redis():
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def _local_day(value):
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def mark_order_day_dirty(value):
+    """تسجيل يوم تغيّرت طلباته لإعادة تجميعه في الدورة القادمة"""
+    if not value:
+        return
+    client = _redis()
+    if client is None:
+        return
+    try:
+        client.sadd(DIRTY_DAYS_KEY, _local_day(value).isoformat())
+    except Exception as e:
+        logger.warning(f"Failed to mark rollup day dirty: {e}")
+
+
+def _pop_dirty_days(limit=400):
+    client = _redis()
+    if client is None:
+        return set()
+    try:
+        members = client.spop(DIRTY_DAYS_KEY, limit) or []
+    except Exception as e:
+        logger.warning(f"Failed to read dirty rollup days: {e}")
+        return set()
+    days = set()
+    for member in members:
+        if isinstance(member, bytes):
+            member = member.decode()
+        try:
+            days.add(date.fromisoformat(member))
+        except ValueError:
+            continue
+    return days
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    return start, start + timedelta(days=1)
+
+
+def rebuild_rollup_day(day):
+    """إعادة حساب صفوف يوم واحد: استعلام مجمّع واحد على نطاق اليوم (يستخدم فهرس created_at)"""
+    from orders.models import Order
+
+    from .models import DailyOrderRollup
+
+    start, end = _day_bounds(day)
+    money = DecimalField(max_digits=18, decimal_places=2)
+    rows = (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values("branch_id", "order_status")
+        .annotate(
+            order_count=Count("id"),
+            total=Coalesce(Sum("total_amount"), Value(0), output_field=money),
+            paid=Coalesce(Sum("paid_amount"), Value(0), output_field=money),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # إعادة البناء المتزامنة لنفس اليوم تنتظر بعضها بدل التعارض على القيد الفريد
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(%s, %s)",
+                    [ROLLUP_LOCK_NAMESPACE, day.toordinal()],
+                )
+        DailyOrderRollup.objects.filter(day=day).delete()
+        DailyOrderRollup.objects.bulk_create(
+            [
+                DailyOrderRollup(
+                    day=day,
+                    branch_id=row["branch_id"],
+                    order_status=row["order_status"] or "",
+                    order_count=row["order_count"],
+                    total_amount=row["total"],
+                    paid_amount=row["paid"],
+                )
+                for row in rows
+            ]
+        )
+
+
+def refresh_daily_rollups(days=None):
+    """
+    تحديث التجميعات اليومية للأيام المحددة، أو (افتراضياً) اليوم وأمس والأيام المتغيّرة.
+    يعيد قائمة الأيام التي أعيد حسابها.
+    """
+    if days is None:
+        today = timezone.localdate()
+        days = {today, today - timedelta(days=1)} | _pop_dirty_days()
+
+    refreshed = []
+    for day in sorted(days):
+        try:
+            rebuild_rollup_day(day)
+            refreshed.append(day)
+        except Exception as e:
+            logger.error(f"Failed to rebuild order rollup for {day}: {e}")
+            mark_order_day_dirty(day)
+    return refreshed
+
+
+def backfill_daily_rollups(days_back=365):
+    """بناء التجميعات لفترة كاملة (مرة واحدة عند الإعداد أو بعد تعديل جماعي)"""
+    today = timezone.localdate()
+    return refresh_daily_rollups(
+        days=[today - timedelta(days=offset) for offset in range(days_back + 1)]
+    )
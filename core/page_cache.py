@@ -0,0 +1,267 @@
+"""
+🗂️ Page Cache - كاش الصفحات الآمن مع الإلغاء بالوسوم (tags)
+
+بديل PerformanceCacheMiddleware الذي كان يخزّن كائنات HttpResponse كاملة
+بـ pickle ولا يُلغى أبداً عند تغيّر البيانات.
+
+المميزات:
+- تخزين الجسم مضغوطاً (zlib) مع الـ headers فقط — لا pickle للاستجابة
+- وسوم (tags) لكل مسار؛ كل وسم له رقم إصدار يُرفع عند تغيّر النموذج المرتبط
+  (عبر signals في orders/signals.py) فتصبح كل الصفحات المرتبطة قديمة فوراً
+- ETag + 304 Not Modified
+- قفل single-flight يمنع تزاحم إعادة البناء (stampede) على نفس المفتاح
+- المفتاح لكل جلسة (session) فلا تُعرض صفحة مستخدم/فرع لمستخدم آخر
+
+الاستخدام:
+    # إلغاء الصفحات المرتبطة بعد نجاح المعاملة
+    invalidate_tags_on_commit("orders")
+
+    # كاش جزء من صفحة بنفس آلية الوسوم
+    html = cached_fragment("orders:stats", ("orders",), 300, build_stats_html)
+"""
+
+import hashlib
+import logging
+import re
+import time
+import zlib
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+
+logger = logging.getLogger("performance")
+
+TAG_KEY_PREFIX = "pagecache:tag:"
+ENTRY_KEY_PREFIX = "pagecache:entry:"
+
+# (نمط المسار، مدة الكاش بالثواني، الوسوم)
+# يمكن تجاوزها من الإعدادات عبر PAGE_CACHE_RULES
+DEFAULT_PAGE_CACHE_RULES = [
+    (r"^/orders/all/", 300, ("orders",)),
+    # قائمة أوامر التصنيع فقط — صفحات التفاصيل والاستلام والعناصر تتغير بكتابات
+    # (عناصر التصنيع، استلام الأقمشة، التقطيع) لا تمر كلها عبر الوسوم
+    (r"^/manufacturing/orders/$", 300, ("manufacturing", "orders")),
+    (r"^/installations/installation-list/", 300, ("installations", "orders")),
+]
+
+# headers لا تُخزَّن مع الصفحة
+_SKIP_HEADERS = {"set-cookie", "content-length", "x-cache", "vary"}
+
+SINGLE_FLIGHT_LOCK_SECONDS = 30
+SINGLE_FLIGHT_WAIT_SECONDS = 2.0
+SINGLE_FLIGHT_POLL_SECONDS = 0.1
+
+
+def _tag_key(tag: str) -> str:
+    return f"{TAG_KEY_PREFIX}{tag}"
+
+
+def get_tag_versions(tags: Iterable[str]) -> dict:
+    """
+    إصدارات الوسوم الحالية في رحلة واحدة للكاش (get_many).
+    الوسم غير الموجود يُهيّأ بقيمة زمنية حتى لا يعود لإصدار قديم بعد الطرد من Redis.
+    """
+    tags = list(tags)
+    if not tags:
+        return {}
+
+    stored = cache.get_many([_tag_key(tag) for tag in tags])
+    versions = {}
+    for tag in tags:
+        version = stored.get(_tag_key(tag))
+        if version is None:
+            version = int(time.time() * 1000)
+            if not cache.add(_tag_key(tag), version, None):
+                version = cache.get(_tag_key(tag), version)
+        versions[tag] = version
+    return versions
+
+
+def invalidate_tags(*tags: str) -> None:
+    """رفع إصدار الوسوم — كل صفحة/جزء مخزّن بإصدار أقدم يُعتبر منتهياً"""
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate page cache tag {tag}: {e}")
+
+
+def invalidate_tags_on_commit(*tags: str) -> None:
+    """إلغاء الوسوم بعد نجاح المعاملة الحالية (فوراً إن لم تكن هناك معاملة)"""
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def _is_fresh(entry, versions: dict) -> bool:
+    return isinstance(entry, dict) and entry.get("tags") == versions
+
+
+def cached_fragment(key: str, tags: Iterable[str], timeout: int, builder: Callable):
+    """
+    كاش جزء من صفحة (نص أو قيمة قابلة للتخزين) مرتبط بوسوم.
+    builder يُستدعى فقط عند عدم وجود نسخة صالحة.
+    """
+    tags = tuple(tags)
+    entry_key = f"{ENTRY_KEY_PREFIX}fragment:{key}"
+    versions = get_tag_versions(tags)
+
+    entry = cache.get(entry_key)
+    if _is_fresh(entry, versions):
+        return entry["value"]
+
+    value = builder()
+    cache.set(entry_key, {"tags": versions, "value": value}, timeout)
+    return value
+
+
+class PageCacheMiddleware:
+    """
+    ميدلوير كاش الصفحات الآمن
+
+    يُخزّن صفحات GET الناجحة للمسارات المعرّفة في PAGE_CACHE_RULES فقط،
+    ويتحقق من إصدارات الوسوم في كل قراءة.
+    """
+
+    def __init__(self, get_response: Callable):
+        self.get_response = get_response
+        self.rules = [
+            (re.compile(pattern), timeout, tuple(tags))
+            for pattern, timeout, tags in getattr(
+                settings, "PAGE_CACHE_RULES", DEFAULT_PAGE_CACHE_RULES
+            )
+        ]
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        rule = self._match_rule(request)
+        if rule is None or not self._is_cacheable_request(request):
+            return self.get_response(request)
+
+        timeout, tags = rule
+        entry_key = self._build_cache_key(request)
+        versions = get_tag_versions(tags)
+
+        entry = cache.get(entry_key)
+        if _is_fresh(entry, versions):
+            return self._respond_from_entry(request, entry, "HIT")
+
+        # single-flight: طلب واحد فقط يعيد بناء الصفحة، والبقية تنتظر النسخة
+        lock_key = f"{entry_key}:lock"
+        if not cache.add(lock_key, 1, SINGLE_FLIGHT_LOCK_SECONDS):
+            entry = self._wait_for_entry(entry_key, versions)
+            if entry is not None:
+                return self._respond_from_entry(request, entry, "HIT")
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+            if self._is_cacheable_response(response):
+                entry = self._build_entry(response, versions)
+                cache.set(entry_key, entry, timeout)
+                response["ETag"] = entry["etag"]
+                response["X-Cache"] = "MISS"
+                if self._etag_matches(request, entry["etag"]):
+                    return self._not_modified(entry)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def _match_rule(self, request: HttpRequest):
+        for pattern, timeout, tags in self.rules:
+            if pattern.match(request.path):
+                return timeout, tags
+        return None
+
+    def _is_cacheable_request(self, request: HttpRequest) -> bool:
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if "no_cache" in request.GET:
+            return False
+        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+            return False
+
+        user = getattr(request, "user", None)
+        if not user or not user.is_authenticated:
+            return False
+
+        session = getattr(request, "session", None)
+        if session is None or not session.session_key:
+            return False
+
+        # رسائل Django المعلّقة يجب أن تُعرض (وتُستهلك) في صفحة حيّة
+        storage = getattr(request, "_messages", None)
+        if storage is not None and len(storage):
+            return False
+
+        return True
+
+    def _is_cacheable_response(self, response: HttpResponse) -> bool:
+        if response.status_code != 200 or response.streaming:
+            return False
+        if response.cookies:
+            return False
+        if not response.get("Content-Type", "").startswith("text/html"):
+            return False
+        cache_control = response.get("Cache-Control", "")
+        return "no-store" not in cache_control and "no-cache" not in cache_control
+
+    def _build_cache_key(self, request: HttpRequest) -> str:
+        """مفتاح لكل جلسة + مسار + query string — الجلسة تحدد المستخدم والفرع ورمز CSRF"""
+        raw = "|".join(
+            [
+                request.session.session_key,
+                request.path,
+                request.GET.urlencode(),
+            ]
+        )
+        return f"{ENTRY_KEY_PREFIX}{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    def _build_entry(self, response: HttpResponse, versions: dict) -> dict:
+        body = response.content
+        return {
+            "tags": versions,
+            "status": response.status_code,
+            "headers": [
+                (name, value)
+                for name, value in response.items()
+                if name.lower() not in _SKIP_HEADERS
+            ],
+            "body": zlib.compress(body),
+            "etag": f'"{hashlib.md5(body).hexdigest()}"',
+        }
+
+    def _wait_for_entry(self, entry_key: str, versions: dict):
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+            entry = cache.get(entry_key)
+            if _is_fresh(entry, versions):
+                return entry
+        return None
+
+    @staticmethod
+    def _etag_matches(request: HttpRequest, etag: str) -> bool:
+        if_none_match = request.headers.get("If-None-Match", "")
+        return etag in [value.strip() for value in if_none_match.split(",")]
+
+    def _not_modified(self, entry: dict) -> HttpResponse:
+        response = HttpResponseNotModified()
+        response["ETag"] = entry["etag"]
+        response["X-Cache"] = "HIT"
+        return response
+
+    def _respond_from_entry(self, request: HttpRequest, entry: dict, state: str):
+        if self._etag_matches(request, entry["etag"]):
+            return self._not_modified(entry)
+
+        response = HttpResponse(zlib.decompress(entry["body"]), status=entry["status"])
+        for name, value in entry["headers"]:
+            response[name] = value
+        response["ETag"] = entry["etag"]
+        response["Vary"] = "Cookie"
+        response["X-Cache"] = state
+        return response
@@ -0,0 +1,212 @@
+"""
+📄 PDF Service - توليد PDF خارج الطلب مع تخزين حسب المحتوى
+==========================================================
+ملف PDF لخط إنتاج بعدة مئات من الطلبات كان يشغل عامل gunicorn 20–40 ثانية،
+وكل إعادة طباعة لنفس المستند تعيد التوليد بالكامل.
+
+- المفتاح (token) = بصمة SHA-256 لـ HTML المُولَّد + CSS + base_url، أي القالب
+  مع بياناته. نفس المستند ← نفس الملف ← إعادة الطباعة فورية
+- القوالب التي تطبع وقت الطباعة (HTML يتغير كل دقيقة) تمرر token من
+  document_key(اسم القالب، بيانات مطبَّعة) — ويُتخطى الرندر نفسه إن كان مخزناً
+- الملفات تُحفظ في PDF_CACHE_ROOT (خارج MEDIA العامة) وتُحذف بعد PDF_CACHE_TTL
+- المستندات الكبيرة: prepare_pdf يرسل التوليد لعامل Celery (الخطوط والأنماط
+  محملة مسبقاً فيه — core.utils.pdf.warm_up) ويعيد صفحة انتظار تتابع الحالة
+  ثم تنزل الملف (pdf:status / pdf:download)
+
+الاستخدام:
+    pdf_bytes = render_cached(html_string, extra_css, base_url)            # متزامن
+    return pdf_response_or_prepare(request, html_string, filename, large=True)
+
+    token = document_key("app/report.html", line.pk, params, data_version)
+    if cached_pdf_exists(token):
+        return file_response(token, filename)
+    return pdf_response_or_prepare(request, render_html(), filename, token=token)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse
+from django.shortcuts import render
+from django.urls import reverse
+
+from .utils.pdf import build_pdf
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_ROOT = getattr(
+    settings, "PDF_CACHE_ROOT", os.path.join(settings.BASE_DIR, "private_media", "pdf_cache")
+)
+PDF_CACHE_TTL = getattr(settings, "PDF_CACHE_TTL", 7 * 24 * 60 * 60)
+JOB_KEY_PREFIX = "pdf:job:"
+JOB_TIMEOUT = 60 * 60
+
+
+def fingerprint(html_string, extra_css="", base_url=None):
+    """بصمة المستند: نفس القالب ونفس البيانات ← نفس البصمة"""
+    digest = hashlib.sha256()
+    for part in (html_string, extra_css or "", base_url or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def document_key(template_name, *parts):
+    """بصمة مستند من اسم القالب وبياناته المطبَّعة (JSON مرتب) بدلاً من HTML"""
+    encoded = json.dumps(
+        [template_name, *parts], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def cache_path(token):
+    return os.path.join(PDF_CACHE_ROOT, token[:2], f"{token}.pdf")
+
+
+def cached_pdf_exists(token):
+    return os.path.exists(cache_path(token))
+
+
+def _touch(token):
+    """مدة الصلاحية تُحسب من آخر استخدام"""
+    try:
+        os.utime(cache_path(token))
+    except OSError:
+        pass
+
+
+def _store(token, pdf_bytes):
+    path = cache_path(token)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # كتابة ذرية: لا يرى القارئ ملفاً نصف مكتوب
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(pdf_bytes)
+    os.replace(tmp_path, path)
+
+
+def render_to_cache(token, html_string, extra_css="", base_url=None):
+    """توليد المستند وحفظه (إن لم يكن موجوداً)"""
+    if cached_pdf_exists(token):
+        _touch(token)
+        return cache_path(token)
+    started = time.monotonic()
+    _store(token, build_pdf(html_string, extra_css=extra_css, base_url=base_url))
+    logger.info(f"📄 PDF {token[:12]} في {time.monotonic() - started:.1f}s")
+    return cache_path(token)
+
+
+def render_cached(html_string, extra_css="", base_url=None):
+    """PDF من الذاكرة المؤقتة أو بتوليده الآن (متزامن)"""
+    token = fingerprint(html_string, extra_css, base_url)
+    with open(render_to_cache(token, html_string, extra_css, base_url), "rb") as handle:
+        return handle.read()
+
+
+# ─── التوليد غير المتزامن ────────────────────────────────────────────
+
+
+def _job_key(token):
+    return f"{JOB_KEY_PREFIX}{token}"
+
+
+def get_job(token):
+    job = cache.get(_job_key(token)) or {}
+    if cached_pdf_exists(token):
+        job["status"] = "ready"
+    return job
+
+
+def set_job(token, **fields):
+    job = cache.get(_job_key(token)) or {}
+    job.update(fields)
+    cache.set(_job_key(token), job, JOB_TIMEOUT)
+    return job
+
+
+def prepare_pdf(html_string, filename, user_id, extra_css="", base_url=None, token=None):
+    """
+    تجهيز PDF في الخلفية. Returns: token
+    إذا كان المستند مخزناً يصبح جاهزاً فوراً دون إرسال مهمة.
+    token: مفتاح document_key (وإلا بصمة HTML)
+    """
+    token = token or fingerprint(html_string, extra_css, base_url)
+    allowed = set((cache.get(_job_key(token)) or {}).get("user_ids", [])) | {user_id}
+    if cached_pdf_exists(token):
+        set_job(token, status="ready", filename=filename, user_ids=sorted(allowed))
+        return token
+
+    job = get_job(token)
+    set_job(token, filename=filename, user_ids=sorted(allowed))
+    if job.get("status") != "pending":
+        set_job(token, status="pending", error="")
+        from .tasks import render_pdf_document
+
+        render_pdf_document.delay(token, html_string, extra_css, base_url)
+    return token
+
+
+def can_access_job(user, job):
+    return user.is_superuser or user.pk in job.get("user_ids", [])
+
+
+def file_response(token, filename):
+    _touch(token)
+    response = FileResponse(open(cache_path(token), "rb"), content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def pdf_response_or_prepare(
+    request, html_string, filename, extra_css="", base_url=None, large=False, token=None
+):
+    """
+    استجابة PDF موحدة للعروض:
+    - مخزن مسبقاً ← تنزيل فوري
+    - مستند كبير ← تجهيز في الخلفية وصفحة انتظار
+    - غير ذلك ← توليد متزامن (مع التخزين)
+    token: مفتاح document_key (وإلا بصمة HTML)
+    """
+    token = token or fingerprint(html_string, extra_css, base_url)
+    if cached_pdf_exists(token):
+        return file_response(token, filename)
+
+    if large:
+        token = prepare_pdf(
+            html_string, filename, request.user.pk, extra_css, base_url, token=token
+        )
+        return render(
+            request,
+            "core/pdf_preparing.html",
+            {
+                "filename": filename,
+                "status_url": reverse("pdf:status", args=[token]),
+                "download_url": reverse("pdf:download", args=[token]),
+            },
+        )
+
+    render_to_cache(token, html_string, extra_css, base_url)
+    return file_response(token, filename)
+
+
+def cleanup_pdf_cache(max_age=PDF_CACHE_TTL):
+    """حذف الملفات الأقدم من max_age ثانية. Returns: عدد الملفات المحذوفة"""
+    if not os.path.isdir(PDF_CACHE_ROOT):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for directory, _, files in os.walk(PDF_CACHE_ROOT):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
@@ -0,0 +1,14 @@
+"""
+مسارات ملفات PDF المُجهزة في الخلفية
+"""
+
+from django.urls import re_path
+
+from . import pdf_views
+
+app_name = "pdf"
+
+urlpatterns = [
+    re_path(r"^(?P<token>[0-9a-f]{64})/status/$", pdf_views.pdf_status, name="status"),
+    re_path(r"^(?P<token>[0-9a-f]{64})/download/$", pdf_views.pdf_download, name="download"),
+]
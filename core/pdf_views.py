@@ -0,0 +1,30 @@
+"""
+واجهات ملفات PDF المُجهزة في الخلفية (core.pdf_service)
+"""
+
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+
+from .pdf_service import can_access_job, file_response, get_job
+
+
+def _get_allowed_job(request, token):
+    job = get_job(token)
+    if not job or not can_access_job(request.user, job):
+        raise Http404("المستند غير موجود")
+    return job
+
+
+@login_required
+def pdf_status(request, token):
+    """حالة التجهيز: pending / ready / failed"""
+    job = _get_allowed_job(request, token)
+    return JsonResponse({"status": job.get("status", "pending"), "error": job.get("error", "")})
+
+
+@login_required
+def pdf_download(request, token):
+    job = _get_allowed_job(request, token)
+    if job.get("status") != "ready":
+        raise Http404("المستند لم يجهز بعد")
+    return file_response(token, job.get("filename") or f"{token[:12]}.pdf")
@@ -1,149 +1,29 @@
 """
 🛡️ Performance Middleware - ميدلوير تحسين الأداء
 يقوم بـ:
-1. Smart Caching للصفحات
+1. Smart Caching للصفحات (core.page_cache)
 2. Query Monitoring & Logging
 3. Response Time Tracking
 4. Automatic N+1 Detection
 """
 
-import hashlib
 import logging
-import re
 import time
 from typing import Callable
 
 from django.conf import settings
-from django.core.cache import cache
 from django.db import connection, reset_queries
 from django.http import HttpRequest, HttpResponse
 
-logger = logging.getLogger("performance")
-
-
-class PerformanceCacheMiddleware:
-    """
-    ميدلوير الكاش الذكي للأداء
-
-    المميزات:
-    - كاش تلقائي للصفحات GET
-    - تجاهل صفحات معينة (admin, login, etc.)
-    - vary by user/branch
-    - ETag support
-    """
-
-    # صفحات لا يتم كاشها أبداً
-    NEVER_CACHE_PATHS = [
-        r"^/admin/",
-        r"^/accounts/login/",
-        r"^/accounts/logout/",
-        r"^/api/.*",  # API يتم كاشه بشكل منفصل
-        r".*\?.*no_cache=",
-    ]
-
-    # صفحات يتم كاشها لفترة قصيرة (1 دقيقة)
-    SHORT_CACHE_PATHS = [
-        (r"^/orders/wizard/", 60),
-        (r"^/notifications/", 30),
-    ]
-
-    # صفحات يتم كاشها لفترة متوسطة (5 دقائق)
-    MEDIUM_CACHE_PATHS = [
-        (r"^/installations/installation-list/", 300),
-        (r"^/orders/order-list/", 300),
-        (r"^/manufacturing/", 300),
-    ]
-
-    # صفحات يتم كاشها لفترة طويلة (30 دقيقة)
-    LONG_CACHE_PATHS = [
-        (r"^/reports/", 1800),
-        (r"^/statistics/", 1800),
-    ]
-
-    def __init__(self, get_response: Callable):
-        self.get_response = get_response
-
-    def __call__(self, request: HttpRequest) -> HttpResponse:
-        # تجاهل غير GET
-        if request.method != "GET":
-            return self.get_response(request)
-
-        # تجاهل AJAX requests للـ polling
-        if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-            if "poll" in request.path or "status" in request.path:
-                return self.get_response(request)
-
-        # فحص إذا كان المسار في قائمة عدم الكاش
-        for pattern in self.NEVER_CACHE_PATHS:
-            if re.match(pattern, request.path):
-                return self.get_response(request)
-
-        # تحديد مدة الكاش
-        cache_timeout = self._get_cache_timeout(request.path)
-        if cache_timeout == 0:
-            return self.get_response(request)
-
-        # بناء مفتاح الكاش
-        cache_key = self._build_cache_key(request)
-
-        # محاولة جلب من الكاش
-        cached_response = cache.get(cache_key)
-        if cached_response is not None:
-            # إضافة header للتوضيح
-            response = cached_response
-            response["X-Cache"] = "HIT"
-            return response
-
-        # تنفيذ الطلب
-        response = self.get_response(request)
+from core.page_cache import PageCacheMiddleware
+from core.sql_profiler import normalize_sql
 
-        # تخزين فقط للاستجابات الناجحة
-        if response.status_code == 200 and not response.streaming:
-            try:
-                cache.set(cache_key, response, cache_timeout)
-                response["X-Cache"] = "MISS"
-            except Exception as e:
-                logger.warning(f"Failed to cache response: {e}")
-
-        return response
-
-    def _get_cache_timeout(self, path: str) -> int:
-        """تحديد مدة الكاش بناءً على المسار"""
-        for pattern, timeout in self.SHORT_CACHE_PATHS:
-            if re.match(pattern, path):
-                return timeout
-
-        for pattern, timeout in self.MEDIUM_CACHE_PATHS:
-            if re.match(pattern, path):
-                return timeout
-
-        for pattern, timeout in self.LONG_CACHE_PATHS:
-            if re.match(pattern, path):
-                return timeout
-
-        # افتراضي: 2 دقيقة
-        return 120
-
-    def _build_cache_key(self, request: HttpRequest) -> str:
-        """بناء مفتاح الكاش"""
-        parts = [
-            "page",
-            request.path,
-        ]
-
-        # إضافة query string
-        if request.GET:
-            qs_hash = hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:8]
-            parts.append(qs_hash)
+logger = logging.getLogger("performance")
 
-        # vary by user
-        if hasattr(request, "user") and request.user.is_authenticated:
-            parts.append(f"u:{request.user.id}")
-            # vary by branch if available
-            if hasattr(request.user, "branch_id") and request.user.branch_id:
-                parts.append(f"b:{request.user.branch_id}")
 
-        return ":".join(parts)
+# ✅ الكاش القديم كان يخزّن HttpResponse كاملاً بـ pickle دون أي إلغاء عند تغيّر البيانات.
+# أصبح اسماً بديلاً لكاش الصفحات الآمن (وسوم + ETag + single-flight) للتوافق مع الإعدادات القديمة.
+PerformanceCacheMiddleware = PageCacheMiddleware
 
 
 class QueryMonitorMiddleware:
@@ -249,14 +129,11 @@ class QueryMonitorMiddleware:
 
     def _find_duplicate_queries(self, queries: list) -> dict:
         """البحث عن الاستعلامات المكررة (N+1 pattern)"""
-        # نستخدم pattern matching للتعرف على استعلامات متشابهة
+        # نفس توحيد الاستعلامات المستخدم في core.sql_profiler
         query_patterns = {}
 
         for q in queries:
-            sql = q.get("sql", "")
-            # تبسيط الاستعلام للمقارنة
-            simplified = re.sub(r"\d+", "N", sql)
-            simplified = re.sub(r"'[^']*'", "'X'", simplified)
+            simplified = normalize_sql(q.get("sql", ""))
 
             if simplified not in query_patterns:
                 query_patterns[simplified] = 0
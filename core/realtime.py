@@ -0,0 +1,375 @@
+"""
+📡 Realtime - بث أحداث حية عبر WebSocket بدلاً من استطلاع الصفحات
+==================================================================
+الصفحات (لوحات التركيبات والتقطيع، عداد الإشعارات...) كانت تعيد تحميل
+الإحصائيات كاملة كل 5–30 ثانية من كل تبويب مفتوح. الآن تشترك الصفحة في
+مواضيع عبر /ws/live/ (core.consumers.LiveEventConsumer) وتُحدّث نفسها فقط
+عند وصول حدث.
+
+المواضيع:
+    user:<id>                      — خاص بالمستخدم (اشتراك تلقائي)
+    branch:<id>                    — أحداث فرع
+    department:<name>              — أحداث قسم (orders, installations, ...)
+    object:<app_label.model>:<pk>  — أحداث كائن واحد (صفحة تفاصيل)
+
+الاشتراك في branch/department/object يمر بـ can_subscribe (صلاحيات المستخدم):
+- مواضيع الأقسام (orders, installations, manufacturing) تحمل أحداث كل الفروع —
+  للأدوار التي ترى القسم كاملاً فقط؛ مدير الفرع/المنطقة عبر branch:<id>
+  (live_topics يختار للصفحة المواضيع المناسبة)، والبائع عبر user:<id> لطلباته
+- مواضيع كائنات التركيب والتصنيع تتبع صلاحية رؤية الطلب المرتبط لأدوار
+  الفرع، وأوامر التقطيع تتبع مستودعات المستخدم (نفس فحوص صفحات HTTP)
+الأحداث فروقات صغيرة (المعرف والحالة) وليست بيانات كاملة.
+
+الاستخدام:
+    publish(["department:cutting"], "cutting_order.changed", {"id": 5, "status": "completed"})
+    send_now("user:7", "notifications.unread", {"count": 3})  # خارج المعاملات
+"""
+
+import logging
+import re
+import threading
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+GROUP_PREFIX = "live."
+MAX_TOPICS_PER_CONNECTION = 50
+
+TOPIC_RE = re.compile(
+    r"^(user:\d+|branch:\d+|department:[a-z_]+|object:[a-z_]+\.[a-z_]+:\d+)$"
+)
+
+# القسم → (صلاحية Django للعرض أو None، أعلام الأدوار التي ترى القسم كاملاً)
+# موضوع القسم للأعلام فقط؛ الصلاحية تفتح مواضيع كائنات الطلبات المرئية للمستخدم —
+# view_* تُمنح للبائعين ومديري الفروع أيضاً
+DEPARTMENTS = {
+    "orders": (None, ("is_factory_manager",)),
+    "installations": (
+        "installations.view_installationschedule",
+        ("is_installation_manager", "is_traffic_manager"),
+    ),
+    "manufacturing": (
+        "manufacturing.view_manufacturingorder",
+        ("is_factory_manager", "is_factory_accountant", "is_factory_receiver"),
+    ),
+    "cutting": (
+        "cutting.view_cuttingorder",
+        ("is_warehouse_staff", "is_factory_manager", "is_factory_receiver"),
+    ),
+}
+
+# أدوار ترى طلبات فرعها فقط (أو الفروع المُدارة) — كائنات القسم المرئية لها فقط
+BRANCH_SCOPED_FLAGS = ("is_branch_manager", "is_region_manager")
+
+# أدوار ترى أحداث فرعها كاملة (غيرها يرى طلباته فقط كما في get_user_orders_queryset)
+BRANCH_WIDE_FLAGS = (
+    "is_branch_manager",
+    "is_installation_manager",
+    "is_inspection_manager",
+    "is_traffic_manager",
+    "is_warehouse_staff",
+    "is_factory_accountant",
+    "is_factory_receiver",
+)
+
+# موضوع الكائن → القسم الذي يحكم صلاحية رؤيته
+OBJECT_DEPARTMENTS = {
+    "orders.order": "orders",
+    "installations.installationschedule": "installations",
+    "manufacturing.manufacturingorder": "manufacturing",
+    "cutting.cuttingorder": "cutting",
+}
+
+
+def group_name(topic):
+    """اسم مجموعة Channels للموضوع (الأحرف المسموحة فقط: حروف، أرقام، - _ .)"""
+    return GROUP_PREFIX + topic.replace(":", ".")
+
+
+# ============================================
+# الصلاحيات
+# ============================================
+
+
+def _sees_everything(user):
+    return user.is_superuser or getattr(user, "is_sales_manager", False)
+
+
+def can_access_branch(user, branch_id):
+    if _sees_everything(user) or getattr(user, "is_factory_manager", False):
+        return True
+    if user.branch_id == branch_id:
+        return any(getattr(user, flag, False) for flag in BRANCH_WIDE_FLAGS)
+    if getattr(user, "is_region_manager", False):
+        return user.managed_branches.filter(pk=branch_id).exists()
+    return False
+
+
+def can_access_department(user, department):
+    """موضوع القسم يحمل أحداث كل الفروع — للأدوار التي ترى القسم كاملاً فقط"""
+    if department not in DEPARTMENTS:
+        return False
+    if _sees_everything(user):
+        return True
+    _, role_flags = DEPARTMENTS[department]
+    return any(getattr(user, flag, False) for flag in role_flags)
+
+
+def _can_view_department_objects(user, department):
+    """دور أو صلاحية تفتح كائنات القسم (كلها أو ما يخص طلباته المرئية)"""
+    if can_access_department(user, department):
+        return True
+    if any(getattr(user, flag, False) for flag in BRANCH_SCOPED_FLAGS):
+        return True
+    permission, _ = DEPARTMENTS[department]
+    return permission is not None and user.has_perm(permission)
+
+
+def _can_view_order(user, order_id):
+    from orders.models import Order
+    from orders.permissions import can_user_view_order
+
+    order = Order.objects.filter(pk=order_id).first() if order_id else None
+    return order is not None and can_user_view_order(user, order)
+
+
+def _can_view_warehouse(user, warehouse_id):
+    """نفس user_has_warehouse_access في صفحات التقطيع"""
+    from inventory.models import Warehouse
+
+    if not user.is_superuser and getattr(user, "is_warehouse_staff", False):
+        return user.get_all_assigned_warehouses().filter(pk=warehouse_id).exists()
+    return Warehouse.objects.filter(pk=warehouse_id, is_active=True).exists()
+
+
+def can_access_object(user, label, pk):
+    department = OBJECT_DEPARTMENTS.get(label)
+    if department is None:
+        return False
+    if label == "orders.order":
+        return _can_view_order(user, pk)
+    if not _can_view_department_objects(user, department):
+        return False
+
+    from django.apps import apps
+
+    instance = apps.get_model(label).objects.filter(pk=pk).first()
+    if instance is None:
+        return False
+    if label == "cutting.cuttingorder":
+        return _can_view_warehouse(user, instance.warehouse_id)
+    if can_access_department(user, department):
+        return True
+    return _can_view_order(user, instance.order_id)
+
+
+def can_subscribe(user, topic):
+    """هل يحق للمستخدم الاشتراك في الموضوع (يُستدعى من المستهلك)"""
+    if not user or not user.is_authenticated or not TOPIC_RE.match(topic):
+        return False
+    kind, _, rest = topic.partition(":")
+    if kind == "user":
+        return int(rest) == user.pk
+    if kind == "branch":
+        return can_access_branch(user, int(rest))
+    if kind == "department":
+        return can_access_department(user, rest)
+    label, _, pk = rest.rpartition(":")
+    return can_access_object(user, label, int(pk))
+
+
+def live_topics(user, departments):
+    """
+    مواضيع صفحة تعرض أقساماً: موضوع القسم لمن يراه كاملاً،
+    وإلا مواضيع الفروع المتاحة له (فرعه أو الفروع المُدارة)
+    """
+    topics = [
+        f"department:{department}"
+        for department in departments
+        if can_access_department(user, department)
+    ]
+    if len(topics) == len(departments):
+        return topics
+
+    branch_ids = set()
+    if user.branch_id:
+        branch_ids.add(user.branch_id)
+    if getattr(user, "is_region_manager", False):
+        branch_ids.update(user.managed_branches.values_list("pk", flat=True))
+    topics.extend(
+        f"branch:{branch_id}"
+        for branch_id in sorted(branch_ids)
+        if can_access_branch(user, branch_id)
+    )
+    return topics[:MAX_TOPICS_PER_CONNECTION]
+
+
+# ============================================
+# النشر
+# ============================================
+
+_pending = threading.local()
+
+
+def _pending_events():
+    events = getattr(_pending, "events", None)
+    if events is None:
+        events = _pending.events = {}
+    return events
+
+
+def send_now(topic, event, data):
+    """إرسال فوري لحدث (بعد التأكيد أو خارج المعاملات)"""
+    try:
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            group_name(topic),
+            {"type": "live.event", "topic": topic, "event": event, "data": data},
+        )
+    except Exception as e:
+        # البث تحسين فقط — الصفحات تعود للاستطلاع إذا لم يصل الحدث
+        logger.debug(f"Live event {event} → {topic} not sent: {e}")
+
+
+def publish(topics, event, data):
+    """
+    نشر حدث بعد نجاح المعاملة. الحفظ المتكرر لنفس الكائن في المعاملة نفسها
+    يُرسل مرة واحدة بآخر حالة.
+    """
+    events = _pending_events()
+    for topic in topics:
+        if topic:
+            events[(topic, event, data.get("id"))] = data
+    transaction.on_commit(flush_events)
+
+
+def flush_events():
+    events = _pending_events()
+    if not events:
+        return
+    _pending.events = {}
+    for (topic, event, _), data in events.items():
+        send_now(topic, event, data)
+
+
+# ============================================
+# أحداث النماذج (تُربط في core.signals)
+# ============================================
+
+
+def _object_topic(instance):
+    return f"object:{instance._meta.label_lower}:{instance.pk}"
+
+
+def order_event(instance, deleted=False):
+    data = {
+        "id": instance.pk,
+        "order_number": instance.order_number,
+        "order_status": instance.order_status,
+        "tracking_status": instance.tracking_status,
+        "deleted": deleted,
+    }
+    topics = ["department:orders", _object_topic(instance)]
+    if instance.branch_id:
+        topics.append(f"branch:{instance.branch_id}")
+    # البائع يرى طلباته فقط — يستقبلها على موضوعه الخاص
+    for user_id in _order_owner_ids(instance):
+        topics.append(f"user:{user_id}")
+    return topics, "order.changed", data
+
+
+def _order_owner_ids(order):
+    """منشئ الطلب ومستخدم البائع المُسند (نفس من يرى الطلب في can_user_view_order)"""
+    owners = {order.created_by_id}
+    if order.salesperson_id:
+        from accounts.models import Salesperson
+
+        owners.add(
+            Salesperson.objects.filter(pk=order.salesperson_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    return sorted(user_id for user_id in owners if user_id)
+
+
+def _order_branch_topic(order_id):
+    from orders.models import Order
+
+    branch_id = (
+        Order.all_objects.filter(pk=order_id).values_list("branch_id", flat=True).first()
+        if order_id
+        else None
+    )
+    return f"branch:{branch_id}" if branch_id else None
+
+
+def installation_event(instance, deleted=False):
+    data = {
+        "id": instance.pk,
+        "order_id": instance.order_id,
+        "status": instance.status,
+        "scheduled_date": str(instance.scheduled_date) if instance.scheduled_date else None,
+        "deleted": deleted,
+    }
+    topics = [
+        "department:installations",
+        _object_topic(instance),
+        f"object:orders.order:{instance.order_id}",
+        _order_branch_topic(instance.order_id),
+    ]
+    return topics, "installation.changed", data
+
+
+def manufacturing_event(instance, deleted=False):
+    data = {
+        "id": instance.pk,
+        "order_id": instance.order_id,
+        "status": instance.status,
+        "deleted": deleted,
+    }
+    topics = [
+        "department:manufacturing",
+        _object_topic(instance),
+        f"object:orders.order:{instance.order_id}",
+        _order_branch_topic(instance.order_id),
+    ]
+    return topics, "manufacturing_order.changed", data
+
+
+def cutting_event(instance, deleted=False):
+    data = {
+        "id": instance.pk,
+        "order_id": instance.order_id,
+        "warehouse_id": instance.warehouse_id,
+        "status": instance.status,
+        "deleted": deleted,
+    }
+    topics = ["department:cutting", _object_topic(instance)]
+    if instance.order_id:
+        topics.append(f"object:orders.order:{instance.order_id}")
+    return topics, "cutting_order.changed", data
+
+
+LIVE_EVENT_SOURCES = {
+    "orders.Order": order_event,
+    "installations.InstallationSchedule": installation_event,
+    "manufacturing.ManufacturingOrder": manufacturing_event,
+    "cutting.CuttingOrder": cutting_event,
+}
+
+
+def publish_model_event(sender, instance, deleted=False):
+    builder = LIVE_EVENT_SOURCES.get(sender._meta.label)
+    if builder is None:
+        return
+    try:
+        topics, event, data = builder(instance, deleted=deleted)
+        publish(topics, event, data)
+    except Exception as e:
+        logger.debug(f"Live event for {sender._meta.label} #{instance.pk} skipped: {e}")
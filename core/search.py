@@ -0,0 +1,270 @@
+"""
+🔎 Search - بحث مفهرس للطلبات والعملاء (pg_trgm)
+================================================
+قوائم الطلبات والتركيبات والتصنيع والعملاء كانت تبني OR من 12–17 شرط
+icontains على جداول مربوطة (العميل، البائع، الفرع) — لا يمكن لأي فهرس B-tree
+خدمتها فتتحول كل عملية بحث إلى مسح كامل للجداول.
+
+الآن لكل طلب ولكل عميل "مستند بحث" واحد (OrderSearchDocument /
+CustomerSearchDocument) يجمع كل الحقول القابلة للبحث في نص واحد مُطبَّع،
+عليه فهرس GIN بـ gin_trgm_ops يخدم LIKE '%...%' مباشرة.
+
+- التطبيع (normalize_search_text) يوحّد الألف (أ إ آ ٱ → ا) والياء (ى → ي)
+  والتاء المربوطة (ة → ه) والهمزات على الواو/الياء، ويحول الأرقام العربية
+  والفارسية إلى لاتينية ويحذف التشكيل والتطويل ويصغّر الحروف اللاتينية
+- المستندات تُبنى بعبارة SQL واحدة (INSERT ... SELECT ... ON CONFLICT) بنفس
+  التطبيع عبر translate() — للسجلات المتأثرة بعد كل معاملة (core.signals)
+  ولكل الجداول في rebuild_search_documents
+- كل كلمة في البحث يجب أن تظهر في المستند (AND)
+- كلمات أقصر من 3 أحرف لا يخدمها فهرس trigram (مسح كامل) فتُتجاهل؛ البحث
+  بها وحدها يطابق المعرفات حرفياً (رقم الطلب، كود العميل، الهاتف) بفهارس B-tree
+
+الاستخدام في القوائم:
+    orders.filter(order_search_q(search))
+    installations.filter(order_search_q(search, "order__"))
+    customers.filter(customer_search_q(search))
+"""
+
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# ─── التطبيع ────────────────────────────────────────────────────────
+
+FOLD_FROM = "أإآٱىةؤئ٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹"
+FOLD_TO = "اااايهوي01234567890123456789"
+# التشكيل (فتحتان ... سكون) والتطويل — تُحذف
+STRIP_CHARS = "".join(chr(code) for code in range(0x064B, 0x0653)) + "ـ"
+
+_FOLD_TABLE = str.maketrans(FOLD_FROM, FOLD_TO, STRIP_CHARS)
+
+# translate() في PostgreSQL تحذف الأحرف الزائدة في from بدون مقابل في to
+SQL_FOLD_FROM = FOLD_FROM + STRIP_CHARS
+SQL_FOLD_TO = FOLD_TO
+
+# أقصر كلمة يخدمها فهرس gin_trgm_ops (الـ trigram ثلاثة أحرف)
+MIN_TERM_LENGTH = 3
+MAX_TERMS = 6
+
+# معرفات الطلب التي يُطابقها البحث القصير حرفياً
+ORDER_EXACT_FIELDS = (
+    "order_number",
+    "contract_number",
+    "contract_number_2",
+    "contract_number_3",
+    "invoice_number",
+    "invoice_number_2",
+    "invoice_number_3",
+    "customer__code",
+    "customer__phone",
+)
+
+
+def normalize_search_text(value):
+    """تطبيع نص للبحث — مطابق لتطبيع المستندات في SQL"""
+    if not value:
+        return ""
+    return str(value).lower().translate(_FOLD_TABLE)
+
+
+def search_terms(query):
+    """كلمات البحث بعد التطبيع (بحد أقصى MAX_TERMS)"""
+    terms = [term for term in normalize_search_text(query).split() if len(term) >= MIN_TERM_LENGTH]
+    return terms[:MAX_TERMS]
+
+
+# ─── واجهة الاستعلام ─────────────────────────────────────────────────
+
+
+def _short_terms(query):
+    """كلمات أقصر من MIN_TERM_LENGTH — لا يخدمها الفهرس لكنها تضيّق نتائج البحث"""
+    terms = [term for term in normalize_search_text(query).split() if len(term) < MIN_TERM_LENGTH]
+    return terms[:MAX_TERMS]
+
+
+def _matching_documents(model, query):
+    documents = model.objects.all()
+    for term in search_terms(query):
+        documents = documents.filter(document__contains=term)
+    # بعد الكلمات الطويلة (الفهرس) — فحص contains على الصفوف المطابقة فقط
+    for term in _short_terms(query):
+        documents = documents.filter(document__contains=term)
+    return documents
+
+
+def _exact_q(query, prefix, fields):
+    """بحث قصير (كلمات أقل من MIN_TERM_LENGTH): مطابقة حرفية للمعرفات"""
+    value = " ".join(str(query or "").translate(_FOLD_TABLE).split())
+    if not value:
+        return Q()
+    condition = Q(pk__in=[])
+    for field in fields:
+        condition |= Q(**{f"{prefix}{field}": value})
+    return condition
+
+
+def order_search_q(query, prefix=""):
+    """
+    شرط Q للطلبات المطابقة للبحث.
+    prefix: مسار الطلب من النموذج المستعلم ("order__" للتركيبات والتصنيع)
+    """
+    from .models import OrderSearchDocument
+
+    if not search_terms(query):
+        return _exact_q(query, prefix, ORDER_EXACT_FIELDS)
+    return Q(**{f"{prefix}id__in": _matching_documents(OrderSearchDocument, query).values("order_id")})
+
+
+def customer_search_q(query, prefix=""):
+    """شرط Q للعملاء المطابقين للبحث"""
+    from .models import CustomerSearchDocument
+
+    if not search_terms(query):
+        return _exact_q(query, prefix, ("code", "phone"))
+    return Q(
+        **{f"{prefix}id__in": _matching_documents(CustomerSearchDocument, query).values("customer_id")}
+    )
+
+
+# ─── بناء المستندات ──────────────────────────────────────────────────
+
+
+def _tables(registry=None):
+    """أسماء الجداول — registry: سجل النماذج التاريخي عند الاستدعاء من ترحيل"""
+    if registry is None:
+        from django.apps import apps as registry
+
+    def table(label):
+        return registry.get_model(label)._meta.db_table
+
+    return {
+        "order_doc": table("core.OrderSearchDocument"),
+        "customer_doc": table("core.CustomerSearchDocument"),
+        "order": table("orders.Order"),
+        "customer": table("customers.Customer"),
+        "salesperson": table("accounts.Salesperson"),
+        "branch": table("accounts.Branch"),
+        "decorator": table("external_sales.DecoratorEngineerProfile"),
+    }
+
+
+ORDER_DOCUMENT_SQL = """
+    INSERT INTO {order_doc} (order_id, document, updated_at)
+    SELECT o.id,
+           translate(lower(concat_ws(' ',
+               o.order_number, c.name, c.code, c.phone, c.phone2, c.email, c.address,
+               c.location_type, sp.name, b.name,
+               o.contract_number, o.contract_number_2, o.contract_number_3,
+               o.invoice_number, o.invoice_number_2, o.invoice_number_3,
+               o.notes, o.selected_types::text, o.order_status,
+               o.order_date::date::text, o.expected_delivery_date::text
+           )), %s, %s),
+           now()
+    FROM {order} o
+    LEFT JOIN {customer} c ON c.id = o.customer_id
+    LEFT JOIN {salesperson} sp ON sp.id = o.salesperson_id
+    LEFT JOIN {branch} b ON b.id = o.branch_id
+    WHERE {where}
+    ON CONFLICT (order_id) DO UPDATE
+        SET document = EXCLUDED.document, updated_at = EXCLUDED.updated_at
+"""
+
+CUSTOMER_DOCUMENT_SQL = """
+    INSERT INTO {customer_doc} (customer_id, document, updated_at)
+    SELECT c.id,
+           translate(lower(concat_ws(' ',
+               c.name, c.code, c.phone, c.phone2, c.email, d.designer_code
+           )), %s, %s),
+           now()
+    FROM {customer} c
+    LEFT JOIN {decorator} d ON d.customer_id = c.id
+    WHERE {where}
+    ON CONFLICT (customer_id) DO UPDATE
+        SET document = EXCLUDED.document, updated_at = EXCLUDED.updated_at
+"""
+
+# مفتاح التسجيل → (قالب SQL، شرط WHERE على المعرفات)
+DOCUMENT_SOURCES = {
+    "order": (ORDER_DOCUMENT_SQL, "o.id = ANY(%s)"),
+    "order_customer": (ORDER_DOCUMENT_SQL, "o.customer_id = ANY(%s)"),
+    "order_salesperson": (ORDER_DOCUMENT_SQL, "o.salesperson_id = ANY(%s)"),
+    "order_branch": (ORDER_DOCUMENT_SQL, "o.branch_id = ANY(%s)"),
+    "customer": (CUSTOMER_DOCUMENT_SQL, "c.id = ANY(%s)"),
+}
+
+
+def refresh_documents(source, ids, tables=None):
+    """إعادة بناء مستندات السجلات المحددة بعبارة واحدة"""
+    ids = [int(pk) for pk in ids if pk]
+    if not ids:
+        return 0
+    template, where = DOCUMENT_SOURCES[source]
+    sql = template.format(where=where, **(tables or _tables()))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [SQL_FOLD_FROM, SQL_FOLD_TO, ids])
+        return cursor.rowcount
+
+
+def rebuild_search_documents(batch_size=5000, registry=None):
+    """
+    إعادة بناء كل المستندات على دفعات (بعد الترحيل أو التحديثات الجماعية).
+    المعرفات تُقرأ دفعة بعد دفعة (pk > آخر معرف) فلا يُحمَّل الجدول في الذاكرة.
+    registry: سجل النماذج التاريخي (apps) عند الاستدعاء من ترحيل
+    """
+    if registry is None:
+        from django.apps import apps as registry
+
+    tables = _tables(registry)
+    totals = {}
+    for source, label in (("order", "orders.Order"), ("customer", "customers.Customer")):
+        model = registry.get_model(label)
+        totals[source] = 0
+        last_id = 0
+        while True:
+            ids = list(
+                model._base_manager.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            totals[source] += refresh_documents(source, ids, tables)
+            last_id = ids[-1]
+    return totals
+
+
+# ─── التسجيل المؤجل (بعد نجاح المعاملة) ──────────────────────────────
+
+_pending = threading.local()
+
+
+def _pending_sources():
+    pending = getattr(_pending, "sources", None)
+    if pending is None:
+        pending = _pending.sources = {}
+    return pending
+
+
+def mark_search_dirty(source, pk):
+    """تسجيل سجل لإعادة بناء مستنده بعد نجاح المعاملة (مرة واحدة لكل سجل)"""
+    if not pk:
+        return
+    _pending_sources().setdefault(source, set()).add(pk)
+    transaction.on_commit(flush_search_documents)
+
+
+def flush_search_documents():
+    pending = _pending_sources()
+    if not pending:
+        return
+    _pending.sources = {}
+    for source, ids in pending.items():
+        try:
+            refresh_documents(source, ids)
+        except Exception as e:
+            # مستند قديم يُصحَّح في إعادة البناء الدورية — لا نُفشل الحفظ
+            logger.error(f"❌ فشل تحديث مستندات البحث ({source}): {e}")
@@ -0,0 +1,119 @@
+"""
+🔢 Sequences - مُخصِّص أرقام تسلسلية بدون سباق
+===============================================
+توليد أرقام الطلبات والعقود والشكاوى وأكواد العملاء والتقطيع وأرقام القيود
+كان يبحث عن "آخر رقم" بترتيب نصي (-0010 قبل -0009 بعد تجاوز الخانات) ثم
+يجرب حتى 100 مرشح بـ exists() ويلجأ لـ UUID/أرقام عشوائية — حتى 100 استعلام
+لكل حفظ وتكرار عند الإرسال المتزامن.
+
+الآن لكل (نطاق، بادئة) صف عداد في NumberSequence يُزاد بعبارة واحدة
+(UPDATE ... RETURNING). قفل الصف حتى نهاية المعاملة يمنع إعطاء نفس الرقم
+لطلبين متزامنين، ولا يُستهلك رقم إذا أُلغيت المعاملة.
+
+- أول استخدام لبادئة يبدأ من أكبر رقم موجود فعلاً (seed) — مقارنة رقمية لا نصية
+- إذا وُجد الرقم المُولَّد مسبقاً (إدخال يدوي، استيراد جماعي) يُعاد ضبط العداد
+  على أكبر رقم موجود مرة واحدة ثم يُكمل
+
+الاستخدام:
+    number = allocate(
+        "orders.order_number", f"{code}-",
+        render=lambda n: f"{code}-{n:04d}",
+        seed=lambda: max_suffix(Order.all_objects, "order_number", f"{code}-"),
+        taken=lambda value: Order.all_objects.filter(order_number=value).exists(),
+    )
+"""
+
+import logging
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+MAX_RESYNC_ATTEMPTS = 5
+
+
+class SequenceExhausted(Exception):
+    """لم يُعثر على رقم حر بعد إعادة المزامنة"""
+
+
+def _table():
+    from .models import NumberSequence
+
+    return NumberSequence._meta.db_table
+
+
+def next_value(scope, prefix="", seed=None):
+    """
+    القيمة التالية لعداد (scope, prefix) — استعلام واحد بعد أول استخدام.
+    seed: دالة تُرجع أكبر رقم مستخدم حالياً (تُستدعى فقط عند إنشاء العداد)
+    """
+    table = _table()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET last_value = last_value + 1, updated_at = now() "
+            "WHERE scope = %s AND prefix = %s RETURNING last_value",
+            [scope, prefix],
+        )
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+
+        start = int(seed() or 0) if seed else 0
+        # إنشاء متزامن لنفس العداد: الطرف الثاني يزيد الصف الذي أنشأه الأول
+        cursor.execute(
+            f"INSERT INTO {table} (scope, prefix, last_value, updated_at) "
+            "VALUES (%s, %s, %s, now()) "
+            "ON CONFLICT (scope, prefix) DO UPDATE "
+            f"SET last_value = GREATEST({table}.last_value, EXCLUDED.last_value - 1) + 1, "
+            "updated_at = now() "
+            "RETURNING last_value",
+            [scope, prefix, start + 1],
+        )
+        return cursor.fetchone()[0]
+
+
+def advance_to(scope, prefix, value):
+    """رفع العداد إلى value على الأقل ثم إرجاع القيمة التالية"""
+    table = _table()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (scope, prefix, last_value, updated_at) "
+            "VALUES (%s, %s, %s, now()) "
+            "ON CONFLICT (scope, prefix) DO UPDATE "
+            f"SET last_value = GREATEST({table}.last_value, EXCLUDED.last_value - 1) + 1, "
+            "updated_at = now() "
+            "RETURNING last_value",
+            [scope, prefix, int(value) + 1],
+        )
+        return cursor.fetchone()[0]
+
+
+def allocate(scope, prefix, render, seed=None, taken=None):
+    """
+    رقم جديد منسق بـ render(n).
+    taken: دالة اختيارية تتحقق من أن الرقم غير مستخدم (أرقام أُسندت خارج العداد)
+    """
+    value = render(next_value(scope, prefix, seed))
+    if taken is None:
+        return value
+
+    for _ in range(MAX_RESYNC_ATTEMPTS):
+        if not taken(value):
+            return value
+        # العداد متأخر عن البيانات — مزامنة مع أكبر رقم موجود
+        current = int(seed() or 0) if seed else 0
+        logger.warning(f"⚠️ العداد {scope}:{prefix} متأخر ({value} مستخدم) — مزامنة إلى {current}")
+        value = render(advance_to(scope, prefix, current))
+
+    raise SequenceExhausted(f"{scope}:{prefix}")
+
+
+def max_suffix(queryset, field, prefix):
+    """أكبر رقم في نهاية القيم التي تبدأ بـ prefix (مقارنة رقمية)"""
+    highest = 0
+    values = queryset.filter(**{f"{field}__startswith": prefix}).values_list(field, flat=True)
+    for value in values.iterator():
+        tail = (value or "")[len(prefix) :]
+        if tail.isdigit():
+            highest = max(highest, int(tail))
+    return highest
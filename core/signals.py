@@ -0,0 +1,170 @@
+"""
+إشارات النظام الأساسي — رفع إصدارات أقسام سياق القالب العام (core.layout_context)
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .layout_context import bump_layout_version, bump_user_layout_version
+from .realtime import LIVE_EVENT_SOURCES, publish_model_event
+
+logger = logging.getLogger(__name__)
+
+# النموذج → وسوم الإصدار التي تتأثر بتغييره
+LAYOUT_VERSION_SOURCES = {
+    "accounts.Department": ("departments",),
+    "accounts.CompanyInfo": ("company_info",),
+    "accounts.FooterSettings": ("footer_settings",),
+    "accounts.SystemSettings": ("system_settings",),
+    "inventory.Warehouse": ("warehouses",),
+    "inventory.StockTransfer": ("transfers",),
+    "notifications.Notification": ("notifications",),
+    "cutting.CuttingOrder": ("cutting",),
+    "customers.Customer": ("admin_stats",),
+    "orders.Order": ("admin_stats",),
+    "inspections.Inspection": ("admin_stats",),
+    "manufacturing.ManufacturingOrder": ("admin_stats",),
+}
+
+
+def _bump_layout_versions(sender, **kwargs):
+    names = LAYOUT_VERSION_SOURCES.get(sender._meta.label)
+    if names:
+        transaction.on_commit(lambda: bump_layout_version(*names))
+
+
+for _label in LAYOUT_VERSION_SOURCES:
+    post_save.connect(
+        _bump_layout_versions, sender=_label, dispatch_uid=f"layout_version_save_{_label}"
+    )
+    post_delete.connect(
+        _bump_layout_versions, sender=_label, dispatch_uid=f"layout_version_delete_{_label}"
+    )
+
+
+def _bump_user_on_commit(user_id):
+    transaction.on_commit(lambda: bump_user_layout_version(user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid="layout_version_user_save")
+def bump_layout_on_user_save(sender, instance, **kwargs):
+    """تغيّر أدوار/صلاحيات المستخدم يلغي أقسامه الخاصة فقط"""
+    _bump_user_on_commit(instance.pk)
+
+
+@receiver(post_save, sender="accounts.UserRole", dispatch_uid="layout_version_user_role_save")
+@receiver(post_delete, sender="accounts.UserRole", dispatch_uid="layout_version_user_role_delete")
+def bump_layout_on_user_role_change(sender, instance, **kwargs):
+    _bump_user_on_commit(instance.user_id)
+
+
+@receiver(
+    post_save,
+    sender="notifications.NotificationVisibility",
+    dispatch_uid="layout_version_notification_visibility_save",
+)
+@receiver(
+    post_delete,
+    sender="notifications.NotificationVisibility",
+    dispatch_uid="layout_version_notification_visibility_delete",
+)
+def bump_layout_on_notification_visibility(sender, instance, **kwargs):
+    """قراءة/إخفاء إشعار تلغي قسم إشعارات المستلم وحده، لا التخطيط المخزّن لكل المستخدمين"""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_user_layout_version(user_id, "notifications"))
+
+
+def _bump_layout_on_user_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """تغيّر أقسام/مجموعات/صلاحيات المستخدم (من أي طرف للعلاقة)"""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        _bump_user_on_commit(instance.pk)
+    else:
+        for user_id in pk_set or ():
+            _bump_user_on_commit(user_id)
+        if action == "post_clear":
+            # لا نعرف المستخدمين المتأثرين بعد المسح — إلغاء عام
+            transaction.on_commit(lambda: bump_layout_version("departments"))
+
+
+def _connect_user_m2m_signals():
+    from django.contrib.auth import get_user_model
+
+    user_model = get_user_model()
+    for field_name in ("departments", "groups", "user_permissions"):
+        try:
+            through = user_model._meta.get_field(field_name).remote_field.through
+        except Exception:
+            continue
+        m2m_changed.connect(
+            _bump_layout_on_user_m2m,
+            sender=through,
+            dispatch_uid=f"layout_version_user_{field_name}",
+        )
+
+
+# =============================================
+# التجميع اليومي للطلبات (core.order_rollups)
+# =============================================
+
+
+@receiver(post_save, sender="orders.Order", dispatch_uid="order_rollup_day_save")
+@receiver(post_delete, sender="orders.Order", dispatch_uid="order_rollup_day_delete")
+def mark_order_rollup_day(sender, instance, **kwargs):
+    """تسجيل يوم الطلب لإعادة تجميعه في دورة التحديث القادمة"""
+    from .order_rollups import mark_order_day_dirty
+
+    created_at = instance.created_at
+    transaction.on_commit(lambda: mark_order_day_dirty(created_at))
+
+
+# =============================================
+# الأحداث الحية عبر WebSocket (core.realtime)
+# =============================================
+
+
+def _publish_live_save(sender, instance, **kwargs):
+    publish_model_event(sender, instance)
+
+
+def _publish_live_delete(sender, instance, **kwargs):
+    publish_model_event(sender, instance, deleted=True)
+
+
+for _label in LIVE_EVENT_SOURCES:
+    post_save.connect(_publish_live_save, sender=_label, dispatch_uid=f"live_event_save_{_label}")
+    post_delete.connect(
+        _publish_live_delete, sender=_label, dispatch_uid=f"live_event_delete_{_label}"
+    )
+
+
+# =============================================
+# مستندات البحث (core.search)
+# =============================================
+
+# النموذج → [(مصدر المستند، حقل المعرف في السجل)]
+SEARCH_DOCUMENT_SOURCES = {
+    "orders.Order": (("order", "pk"),),
+    "customers.Customer": (("customer", "pk"), ("order_customer", "pk")),
+    "external_sales.DecoratorEngineerProfile": (("customer", "customer_id"),),
+    "accounts.Salesperson": (("order_salesperson", "pk"),),
+    "accounts.Branch": (("order_branch", "pk"),),
+}
+
+
+def _mark_search_documents(sender, instance, **kwargs):
+    from .search import mark_search_dirty
+
+    for source, attr in SEARCH_DOCUMENT_SOURCES.get(sender._meta.label, ()):
+        mark_search_dirty(source, getattr(instance, attr, None))
+
+
+for _label in SEARCH_DOCUMENT_SOURCES:
+    post_save.connect(
+        _mark_search_documents, sender=_label, dispatch_uid=f"search_document_save_{_label}"
+    )
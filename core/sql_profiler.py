@@ -0,0 +1,388 @@
+"""
+🔬 SQL Profiler - مُحلِّل استعلامات بالعيّنات مع تقارير دائمة لكل مسار
+
+بدلاً من تسجيل عدد الاستعلامات في السجل فقط (QueryMonitorMiddleware) أو في
+ذاكرة عملية واحدة (PerformanceMetrics)، يُقاس جزء من الطلبات (SAMPLE_RATE)
+وتُجمَّع النتائج في Redis لكل اسم مسار (url name) عبر كل العمال:
+
+- عدد الاستعلامات وزمن قاعدة البيانات وزمن القوالب وزمن بايثون
+- بصمات الاستعلامات المكررة (N+1) مع مثال على مصدرها في الكود (stack)
+
+القياس يتم عبر connection.execute_wrapper (بدون force_debug_cursor)،
+والطلبات غير المختارة لا تتحمل أي تكلفة تقريباً.
+يمكن للموظفين فرض القياس لطلب معيّن بإضافة ?_profile=1.
+
+الإعدادات (settings.SQL_PROFILER):
+    {"ENABLED": True, "SAMPLE_RATE": 0.05, "DUPLICATE_THRESHOLD": 3,
+     "STACK_DEPTH": 6, "RETENTION_SECONDS": 7 * 24 * 3600}
+
+التقارير:
+    python manage.py sql_profile_report --limit 20 --order-by db_ms
+    /monitoring/sql-profile/
+"""
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("performance")
+
+KEY_PREFIX = "crm:sqlprof:"
+ENDPOINTS_KEY = f"{KEY_PREFIX}endpoints"
+SQL_TEXT_KEY = f"{KEY_PREFIX}sql"
+
+DEFAULT_PROFILER_SETTINGS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 0.05,
+    "DUPLICATE_THRESHOLD": 3,
+    "STACK_DEPTH": 6,
+    "RETENTION_SECONDS": 7 * 24 * 3600,
+}
+
+# حقول التجميع لكل مسار (مجاميع — المتوسطات تُحسب عند القراءة)
+FLOAT_FIELDS = ("total_ms", "db_ms", "template_ms", "python_ms")
+INT_FIELDS = ("samples", "queries", "duplicate_queries")
+
+ORDERINGS = ("total_ms", "db_ms", "python_ms", "template_ms", "queries", "duplicate_queries")
+
+_IGNORED_PREFIXES = ("/static/", "/media/", "/favicon.ico", "/health")
+_PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+_THIS_FILE = str(Path(__file__).resolve())
+
+_local = threading.local()
+
+
+def profiler_settings():
+    return {**DEFAULT_PROFILER_SETTINGS, **getattr(settings, "SQL_PROFILER", {})}
+
+
+def _endpoint_key(name):
+    return f"{KEY_PREFIX}ep:{name}"
+
+
+def _duplicates_key(name):
+    return f"{KEY_PREFIX}dups:{name}"
+
+
+def _origins_key(name):
+    return f"{KEY_PREFIX}origins:{name}"
+
+
+def get_profiler_client():
+    """اتصال Redis الخام للكاش الافتراضي، أو None إن لم يكن متاحاً"""
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+# =============================================
+# بصمة الاستعلام
+# =============================================
+
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """توحيد شكل الاستعلام: القيم الثابتة وقوائم IN تُستبدل بعناصر نائبة"""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def fingerprint_sql(sql):
+    """(بصمة قصيرة، النص الموحَّد) — الاستعلامات المتشابهة تحمل البصمة نفسها"""
+    normalized = normalize_sql(sql)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12], normalized
+
+
+def _origin_stack(depth):
+    """أقرب إطارات كود المشروع التي أطلقت الاستعلام (بدون Django والمكتبات)"""
+    frames = []
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        filename = frame.filename
+        if (
+            filename == _THIS_FILE
+            or not filename.startswith(_PROJECT_ROOT)
+            or "site-packages" in filename
+            or "/venv/" in filename
+        ):
+            continue
+        frames.append(f"{filename[len(_PROJECT_ROOT) + 1:]}:{frame.lineno} in {frame.name}")
+        if len(frames) >= depth:
+            break
+    return frames
+
+
+# =============================================
+# قياس طلب واحد
+# =============================================
+
+
+class RequestProfile:
+    """يُسجّل استعلامات طلب واحد عبر connection.execute_wrapper"""
+
+    def __init__(self, stack_depth):
+        self.stack_depth = stack_depth
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.fingerprints = {}
+        self.sql_text = {}
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self._record(sql)
+
+    def _record(self, sql):
+        self.query_count += 1
+        fingerprint, normalized = fingerprint_sql(sql)
+        count = self.fingerprints.get(fingerprint, 0) + 1
+        self.fingerprints[fingerprint] = count
+        if count == 1:
+            self.sql_text[fingerprint] = normalized[:1000]
+        elif count == 2:
+            # المصدر يُلتقط عند أول تكرار فقط — تكلفة traceback مرة لكل بصمة
+            self.origins[fingerprint] = _origin_stack(self.stack_depth)
+
+    def duplicates(self, threshold):
+        """البصمات التي تكررت threshold مرة أو أكثر: {بصمة: عدد}"""
+        return {fp: count for fp, count in self.fingerprints.items() if count >= threshold}
+
+
+def _install_template_timer():
+    """تغليف Template.render لقالب Django لقياس زمن القوالب للطلب المُقاس فقط"""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "_sql_profiler", False):
+        return
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        profile = getattr(_local, "profile", None)
+        if profile is None:
+            return original_render(self, context, request)
+        # القوالب المتداخلة (render_to_string داخل قالب) لا تُحسب مرتين
+        if getattr(_local, "rendering", False):
+            return original_render(self, context, request)
+        _local.rendering = True
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            _local.rendering = False
+            profile.template_ms += (time.perf_counter() - started) * 1000
+
+    render._sql_profiler = True
+    Template.render = render
+
+
+# =============================================
+# التخزين والتقارير
+# =============================================
+
+
+def save_profile(endpoint, profile, total_ms):
+    """إضافة قياس طلب إلى مجاميع المسار — رحلة واحدة إلى Redis"""
+    client = get_profiler_client()
+    if client is None:
+        return False
+
+    config = profiler_settings()
+    duplicates = profile.duplicates(config["DUPLICATE_THRESHOLD"])
+    duplicate_queries = sum(count - 1 for count in duplicates.values())
+    python_ms = max(total_ms - profile.db_ms - profile.template_ms, 0.0)
+    retention = config["RETENTION_SECONDS"]
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd(ENDPOINTS_KEY, endpoint)
+        endpoint_key = _endpoint_key(endpoint)
+        pipe.hincrby(endpoint_key, "samples", 1)
+        pipe.hincrby(endpoint_key, "queries", profile.query_count)
+        pipe.hincrby(endpoint_key, "duplicate_queries", duplicate_queries)
+        for field, value in (
+            ("total_ms", total_ms),
+            ("db_ms", profile.db_ms),
+            ("template_ms", profile.template_ms),
+            ("python_ms", python_ms),
+        ):
+            pipe.hincrbyfloat(endpoint_key, field, round(value, 3))
+        pipe.hset(endpoint_key, "last_seen", time.time())
+        pipe.expire(endpoint_key, retention)
+
+        if duplicates:
+            for fingerprint, count in duplicates.items():
+                pipe.hincrby(_duplicates_key(endpoint), fingerprint, count)
+                pipe.hsetnx(SQL_TEXT_KEY, fingerprint, profile.sql_text[fingerprint])
+                origin = profile.origins.get(fingerprint)
+                if origin:
+                    pipe.hset(_origins_key(endpoint), fingerprint, json.dumps(origin))
+            pipe.expire(_duplicates_key(endpoint), retention)
+            pipe.expire(_origins_key(endpoint), retention)
+        pipe.expire(ENDPOINTS_KEY, retention)
+        pipe.expire(SQL_TEXT_KEY, retention)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to store SQL profile for {endpoint}: {e}")
+        return False
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def get_endpoint_report(limit=20, order_by="total_ms", examples=3):
+    """
+    أسوأ المسارات مرتبة حسب متوسط order_by لكل طلب، مع أكثر الاستعلامات
+    المكررة لكل مسار (النص الموحَّد، متوسط التكرار، ومثال على مصدره).
+    """
+    if order_by not in ORDERINGS:
+        raise ValueError(f"order_by must be one of {ORDERINGS}")
+
+    client = get_profiler_client()
+    if client is None:
+        return []
+
+    endpoints = sorted(_decode(name) for name in client.smembers(ENDPOINTS_KEY))
+    if not endpoints:
+        return []
+
+    pipe = client.pipeline(transaction=False)
+    for endpoint in endpoints:
+        pipe.hgetall(_endpoint_key(endpoint))
+    raw_stats = pipe.execute()
+
+    rows = []
+    for endpoint, raw in zip(endpoints, raw_stats):
+        data = {_decode(key): _decode(value) for key, value in raw.items()}
+        samples = int(data.get("samples") or 0)
+        if not samples:
+            continue
+        row = {"endpoint": endpoint, "samples": samples}
+        for field in FLOAT_FIELDS + INT_FIELDS[1:]:
+            total = float(data.get(field) or 0)
+            row[f"avg_{field}"] = round(total / samples, 2)
+        rows.append(row)
+
+    rows.sort(key=lambda row: row[f"avg_{order_by}"], reverse=True)
+    rows = rows[:limit]
+
+    if examples and rows:
+        pipe = client.pipeline(transaction=False)
+        for row in rows:
+            pipe.hgetall(_duplicates_key(row["endpoint"]))
+            pipe.hgetall(_origins_key(row["endpoint"]))
+        raw_examples = pipe.execute()
+
+        fingerprints = set()
+        for row, raw_dups, raw_origins in zip(rows, raw_examples[0::2], raw_examples[1::2]):
+            dups = sorted(
+                ((_decode(fp), int(count)) for fp, count in raw_dups.items()),
+                key=lambda item: item[1],
+                reverse=True,
+            )[:examples]
+            origins = {_decode(fp): _decode(value) for fp, value in raw_origins.items()}
+            row["duplicates"] = [
+                {
+                    "fingerprint": fp,
+                    "avg_repeats": round(count / row["samples"], 1),
+                    "origin": json.loads(origins[fp]) if fp in origins else [],
+                }
+                for fp, count in dups
+            ]
+            fingerprints.update(fp for fp, _count in dups)
+
+        sql_text = {}
+        if fingerprints:
+            ordered = sorted(fingerprints)
+            sql_text = dict(zip(ordered, map(_decode, client.hmget(SQL_TEXT_KEY, ordered))))
+        for row in rows:
+            for duplicate in row["duplicates"]:
+                duplicate["sql"] = sql_text.get(duplicate["fingerprint"]) or ""
+
+    return rows
+
+
+def reset_profiles():
+    """حذف كل القياسات المجمّعة"""
+    client = get_profiler_client()
+    if client is None:
+        return 0
+    endpoints = [_decode(name) for name in client.smembers(ENDPOINTS_KEY)]
+    keys = [ENDPOINTS_KEY, SQL_TEXT_KEY]
+    for endpoint in endpoints:
+        keys += [_endpoint_key(endpoint), _duplicates_key(endpoint), _origins_key(endpoint)]
+    client.delete(*keys)
+    return len(endpoints)
+
+
+# =============================================
+# الميدلوير
+# =============================================
+
+
+class SQLProfilerMiddleware:
+    """
+    قياس عيّنة من الطلبات وتجميعها لكل اسم مسار.
+    الطلبات غير المختارة تمر مباشرة دون أي تغليف.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = profiler_settings()
+        if self.config["ENABLED"]:
+            _install_template_timer()
+
+    def _should_sample(self, request):
+        if not self.config["ENABLED"] or request.path.startswith(_IGNORED_PREFIXES):
+            return False
+        if request.GET.get("_profile") == "1":
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated and user.is_staff:
+                return True
+        return random.random() < self.config["SAMPLE_RATE"]
+
+    def __call__(self, request):
+        if not self._should_sample(request):
+            return self.get_response(request)
+
+        profile = RequestProfile(self.config["STACK_DEPTH"])
+        started = time.perf_counter()
+        _local.profile = profile
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.view_name:
+            save_profile(match.view_name, profile, total_ms)
+            response["X-Query-Count"] = str(profile.query_count)
+        return response
@@ -132,3 +132,105 @@ def cleanup_old_audit_logs(self):
     except Exception as exc:
         logger.error(f"❌ فشل تنظيف سجلات التدقيق: {exc}")
         raise self.retry(exc=exc)
+
+
+@shared_task(
+    queue="maintenance",
+    name="core.tasks.refresh_materialized_views",
+    soft_time_limit=600,
+)
+def refresh_materialized_views(force=False):
+    """
+    تحديث التجميع اليومي للطلبات ثم العروض المادية المتقادمة فقط
+    (كل عرض له أقصى عمر في core.materialized_views.MATERIALIZED_VIEWS)
+    """
+    from django.core.cache import cache
+
+    from core.materialized_views import refresh_all_views
+
+    # منع تشغيلين متداخلين إذا استغرقت دورة أطول من الفاصل الزمني
+    lock_key = "mv:refresh:lock"
+    if not cache.add(lock_key, 1, 600):
+        return {"status": "skipped"}
+    try:
+        return {"status": "success", "views": refresh_all_views(force=force)}
+    finally:
+        cache.delete(lock_key)
+
+
+@shared_task(
+    queue="maintenance",
+    name="core.tasks.rebuild_search_documents",
+    soft_time_limit=1800,
+)
+def rebuild_search_documents():
+    """
+    إعادة بناء مستندات البحث ليلياً — تصحح ما فات الإشارات
+    (update() الجماعي، الاستيراد بالـ COPY، التعديل المباشر في قاعدة البيانات)
+    """
+    from core.search import rebuild_search_documents as rebuild
+
+    return {"status": "success", "documents": rebuild()}
+
+
+@shared_task(
+    name="core.tasks.render_pdf_document",
+    queue="file_uploads",
+    soft_time_limit=300,
+)
+def render_pdf_document(token, html_string, extra_css="", base_url=None):
+    """
+    توليد PDF كبير خارج الطلب (core.pdf_service.prepare_pdf).
+    عامل Celery يحتفظ بالخطوط والأنماط المحللة بين المهام.
+    """
+    from core.pdf_service import render_to_cache, set_job
+
+    try:
+        render_to_cache(token, html_string, extra_css, base_url)
+        set_job(token, status="ready", error="")
+        return {"status": "ready", "token": token}
+    except Exception as exc:
+        logger.error(f"❌ فشل توليد PDF {token[:12]}: {exc}")
+        set_job(token, status="failed", error=str(exc)[:500])
+        return {"status": "failed", "token": token}
+
+
+@shared_task(
+    queue="maintenance",
+    name="core.tasks.cleanup_pdf_cache",
+)
+def cleanup_pdf_cache():
+    """حذف ملفات PDF المخزنة التي لم تُستخدم خلال PDF_CACHE_TTL"""
+    from core.pdf_service import cleanup_pdf_cache as cleanup
+
+    return {"status": "success", "removed": cleanup()}
+
+
+@shared_task(
+    name="core.tasks.run_export",
+    queue="file_uploads",
+    soft_time_limit=1800,
+    time_limit=1900,
+)
+def run_export(token, name, params, user_id):
+    """تنفيذ تصدير Excel كبير خارج الطلب (core.exports.export_response)"""
+    from core.exports import run_export_job, set_job
+
+    try:
+        written = run_export_job(token, name, params, user_id)
+        return {"status": "ready", "token": token, "rows": written}
+    except Exception as exc:
+        logger.error(f"❌ فشل تصدير {name} ({token[:8]}): {exc}")
+        set_job(token, status="failed", error=str(exc)[:500])
+        return {"status": "failed", "token": token}
+
+
+@shared_task(
+    queue="maintenance",
+    name="core.tasks.cleanup_export_files",
+)
+def cleanup_export_files():
+    """حذف ملفات التصدير الأقدم من EXPORT_TTL"""
+    from core.exports import cleanup_exports
+
+    return {"status": "success", "removed": cleanup_exports()}
@@ -0,0 +1,24 @@
+"""
+Template tags للأحداث الحية (core.realtime)
+"""
+
+import json
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.realtime import live_topics
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def live_topics_json(context, *departments):
+    """
+    مواضيع LiveEvents.subscribe للصفحة كمصفوفة JSON:
+    موضوع القسم لمن يراه كاملاً وإلا مواضيع فروعه
+    """
+    user = context.get("user")
+    if user is None or not user.is_authenticated:
+        return "[]"
+    return mark_safe(json.dumps(live_topics(user, departments)))
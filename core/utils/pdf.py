@@ -4,11 +4,15 @@ WARN-002: خط Noto Naskh Arabic لا يمكن تحميله في weasyprint.
 
 يوفر هذا الملف:
 - دالة get_arabic_font_css(): تُرجع CSS مع @font-face للخطوط العربية
-- دالة get_font_config(): تُرجع كائن FontConfiguration
+- دالة get_font_config(): تُرجع كائن FontConfiguration (واحد لكل عملية)
+- دالة get_stylesheet(css): ورقة أنماط مُحللة مسبقاً (مخزنة لكل عملية)
 - دالة build_pdf(html_string, extra_css=""): تنشئ PDF مع دعم الخطوط العربية
+
+تحميل الخطوط وتحليل @font-face يتم مرة واحدة لكل عملية (gunicorn/Celery)
+بدلاً من كل طلب. للتخزين المؤقت والتوليد خارج الطلب: core.pdf_service
 """
 
-from io import BytesIO
+from functools import lru_cache
 
 ARABIC_FONT_CSS = """
 @font-face {
@@ -55,12 +59,27 @@ def get_arabic_font_css(extra_css: str = "") -> str:
     return PDF_BASE_CSS + ("\n" + extra_css if extra_css else "")
 
 
+@lru_cache(maxsize=1)
 def get_font_config():
-    """إرجاع كائن FontConfiguration من weasyprint."""
+    """إرجاع كائن FontConfiguration من weasyprint (مشترك داخل العملية)."""
     from weasyprint.text.fonts import FontConfiguration
+
     return FontConfiguration()
 
 
+@lru_cache(maxsize=32)
+def get_stylesheet(css: str):
+    """ورقة أنماط مُحللة مع تسجيل خطوطها — تُحلل مرة واحدة لكل نص CSS."""
+    from weasyprint import CSS
+
+    return CSS(string=css, font_config=get_font_config())
+
+
+def warm_up():
+    """تحميل الخطوط وتحليل الأنماط الأساسية مسبقاً (عند بدء عامل Celery)."""
+    get_stylesheet(get_arabic_font_css())
+
+
 def build_pdf(
     html_string: str,
     extra_css: str = "",
@@ -77,14 +96,10 @@ def build_pdf(
     Returns:
         bytes: محتوى ملف PDF
     """
-    from weasyprint import CSS, HTML
-
-    font_config = get_font_config()
-    full_css = get_arabic_font_css(extra_css)
+    from weasyprint import HTML
 
     html_obj = HTML(string=html_string, base_url=base_url)
-    pdf_bytes = html_obj.write_pdf(
-        stylesheets=[CSS(string=full_css, font_config=font_config)],
-        font_config=font_config,
+    return html_obj.write_pdf(
+        stylesheets=[get_stylesheet(get_arabic_font_css(extra_css))],
+        font_config=get_font_config(),
     )
-    return pdf_bytes
@@ -13,12 +13,18 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 
 import accounts.routing
+import core.routing
 
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
         "websocket": AllowedHostsOriginValidator(
-            AuthMiddlewareStack(URLRouter(accounts.routing.websocket_urlpatterns))
+            AuthMiddlewareStack(
+                URLRouter(
+                    accounts.routing.websocket_urlpatterns
+                    + core.routing.websocket_urlpatterns
+                )
+            )
         ),
     }
 )
@@ -6,6 +6,7 @@ import os
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # تعيين إعدادات Django الافتراضية لـ Celery
@@ -114,6 +115,11 @@ app.conf.update(
             "schedule": crontab(hour=2, minute=0),  # يومياً في الساعة 2 صباحاً
             "options": {"queue": "maintenance"},
         },
+        "rebuild-dirty-running-balances": {
+            "task": "inventory.tasks.rebuild_dirty_running_balances",
+            "schedule": crontab(hour=2, minute=30),  # يومياً الساعة 2:30 صباحاً
+            "options": {"queue": "maintenance"},
+        },
         "sync-official-fabric-warehouses": {
             "task": "inventory.tasks.sync_official_fabric_warehouses",
             "schedule": crontab(
@@ -127,6 +133,64 @@ app.conf.update(
             "schedule": crontab(hour=3, minute=30),  # يومياً الساعة 3:30 صباحاً
             "options": {"queue": "maintenance"},
         },
+        # نقل الحضور من Redis إلى UserSession/OnlineUser دفعات
+        "flush-user-presence": {
+            "task": "user_activity.tasks.flush_presence_task",
+            "schedule": 60.0,  # كل دقيقة
+            "options": {"queue": "maintenance"},
+        },
+        # تحديث التجميعات اليومية والعروض المادية المتقادمة
+        "refresh-materialized-views": {
+            "task": "core.tasks.refresh_materialized_views",
+            "schedule": 300.0,  # كل 5 دقائق
+            "options": {"queue": "maintenance"},
+        },
+        "drain-cloudflare-outbox": {
+            "task": "public.tasks.drain_cloudflare_outbox",
+            "schedule": 60.0,  # كل دقيقة
+            "options": {"queue": "maintenance"},
+        },
+        "reconcile-unread-notification-counters": {
+            "task": "notifications.tasks.reconcile_unread_counters",
+            "schedule": 900.0,  # كل 15 دقيقة
+            "options": {"queue": "maintenance"},
+        },
+        # تشغيل جدولات التقارير المستحقة وحفظ لقطاتها
+        "run-due-report-schedules": {
+            "task": "reports.tasks.run_due_report_schedules",
+            "schedule": 900.0,  # كل 15 دقيقة
+            "options": {"queue": "maintenance"},
+        },
+        # إعادة بناء مستندات البحث لتصحيح التحديثات الجماعية التي تتجاوز الإشارات
+        "rebuild-search-documents": {
+            "task": "core.tasks.rebuild_search_documents",
+            "schedule": crontab(hour=4, minute=15),  # يومياً الساعة 4:15 صباحاً
+            "options": {"queue": "maintenance"},
+        },
+        # حذف ملفات PDF المخزنة غير المستخدمة (core.pdf_service)
+        "cleanup-pdf-cache": {
+            "task": "core.tasks.cleanup_pdf_cache",
+            "schedule": crontab(hour=4, minute=45),  # يومياً الساعة 4:45 صباحاً
+            "options": {"queue": "maintenance"},
+        },
+        # حذف ملفات Excel المُصدَّرة في الخلفية (core.exports)
+        "cleanup-export-files": {
+            "task": "core.tasks.cleanup_export_files",
+            "schedule": crontab(hour=4, minute=50),  # يومياً الساعة 4:50 صباحاً
+            "options": {"queue": "maintenance"},
+        },
+        # إقفال أشهر دفتر الأستاذ المكتملة بلقطات أرصدة (accounting.balances)
+        "close-ledger-periods": {
+            "task": "accounting.tasks.close_ledger_periods",
+            "schedule": crontab(hour=0, minute=30),  # يومياً الساعة 12:30 بعد منتصف الليل
+            "options": {"queue": "maintenance"},
+        },
+        # تنفيذ مؤقتات SLA المستحقة للشكاوى (complaints.sla)
+        "process-complaint-timers": {
+            "task": "complaints.tasks.process_complaint_timers",
+            "schedule": 60.0,  # كل دقيقة
+            "options": {"queue": "maintenance"},
+        },
     },
 )
 
@@ -309,6 +373,19 @@ try:
 except ImportError as e:
     logger.error(f"❌ فشل في تحميل inventory.tasks_optimized: {e}")
 
+
+
+@worker_process_init.connect
+def warm_up_pdf_renderer(**kwargs):
+    """تحميل خطوط وأنماط PDF مرة واحدة لكل عملية عامل بدلاً من كل مهمة"""
+    try:
+        from core.utils.pdf import warm_up
+
+        warm_up()
+    except Exception as e:
+        logger.warning(f"⚠️ تعذر تهيئة مولد PDF مسبقاً: {e}")
+
+
 logger.info("تم تهيئة Celery بنجاح")
 logger.info(f"Broker URL: {app.conf.broker_url}")
 logger.info(f"Result Backend: {app.conf.result_backend}")
@@ -2,14 +2,16 @@
 Context processors لإضافة بيانات إضافية للقوالب
 """
 
+from core.layout_context import render_section
+
 
 def admin_stats(request):
-    """إضافة إحصائيات للوحة التحكم"""
+    """إضافة إحصائيات للوحة التحكم — مخزنة ومُلغاة بالإصدارات عبر core.layout_context"""
+    return render_section(request, "admin_stats")
 
-    # التحقق من أن المستخدم في لوحة التحكم
-    if not request.path.startswith("/admin/"):
-        return {}
 
+def build_admin_stats(request):
+    """حساب إحصائيات لوحة التحكم (بدون كاش)"""
     try:
         # استيراد النماذج
         from accounts.models import CompanyInfo
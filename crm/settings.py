@@ -454,6 +454,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.sql_profiler.SQLProfilerMiddleware",  # ✅ قياس عيّنة من الطلبات (استعلامات/قوالب) لكل مسار
     "axes.middleware.AxesMiddleware",
     # SEC-001: حماية لوحة الإدارة من الوصول غير المصرح (IP restriction)
     "accounts.middleware.admin_protection.AdminIPRestrictionMiddleware",
@@ -464,6 +465,8 @@ MIDDLEWARE = [
     "accounts.middleware.current_user.CurrentUserMiddleware",
     "user_activity.middleware.UserSessionTrackingMiddleware",
     "core.audit.AuditLoggingMiddleware",
+    # كاش الصفحات الآمن: مسارات محددة فقط، يُلغى بالوسوم من signals
+    "core.page_cache.PageCacheMiddleware",
 ]
 
 # ✅ FIX C-4: تعطيل CSRF لـ API فقط في وضع التطوير الصريح (ليس مجرد DEBUG)
@@ -498,19 +501,14 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
-                "accounts.context_processors.departments",
-                "accounts.context_processors.company_info",
-                "accounts.context_processors.footer_settings",
-                "accounts.context_processors.system_settings",
-                "accounts.context_processors.branch_messages",
                 # ✅ FIX H-6: حذف notifications_context المكرر من accounts
                 # accounts.context_processors.notifications_context ← محذوف (مكرر)
                 # accounts.context_processors.admin_notifications_context ← محذوف (كود ميت)
-                "accounts.navbar_context.navbar_departments",
-                "notifications.context_processors.notifications_context",
-                "crm.context_processors.admin_stats",
-                "inventory.context_processors.pending_transfers",
-                "cutting.context_processors.cutting_notifications",
+                # ✅ سياق القالب الموحد: departments, company_info, footer_settings,
+                # system_settings, branch_messages, navbar_departments,
+                # notifications_context, admin_stats, pending_transfers,
+                # cutting_notifications — قراءة كاش واحدة (get_many) وإلغاء بالإصدارات
+                "core.layout_context.layout_context",
             ],
         },
     },
@@ -1039,6 +1037,23 @@ SECURITY_SETTINGS = {
     "AUDIT_LOGGING_ENABLED": True,
 }
 
+# كاتب سجلات التدقيق المؤجَّل (core.audit_writer)
+AUDIT_WRITER = {
+    "ASYNC": True,
+    "MAX_QUEUE_SIZE": 5000,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 2.0,
+}
+
+# مُحلِّل الاستعلامات بالعيّنات (core.sql_profiler)
+SQL_PROFILER = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 0.05,
+    "DUPLICATE_THRESHOLD": 3,
+    "STACK_DEPTH": 6,
+    "RETENTION_SECONDS": 7 * 24 * 3600,
+}
+
 # Large Operations Config
 LARGE_OPERATIONS_CONFIG = {
     "MAX_UPLOAD_SIZE": 2 * 1024 * 1024 * 1024,
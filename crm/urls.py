@@ -116,10 +116,15 @@ urlpatterns = [
     path("board-level/", include("board_dashboard.urls", namespace="board_dashboard")),
     # سجل التدقيق الشامل
     path("audit/", include("core.urls", namespace="audit")),
+    # ملفات PDF المُجهزة في الخلفية
+    path("pdf/", include("core.pdf_urls", namespace="pdf")),
+    # ملفات Excel المُصدَّرة في الخلفية
+    path("exports/", include("core.export_urls", namespace="exports")),
     # المبيعات الخارجية
     path("external-sales/", include("external_sales.urls", namespace="external_sales")),
     # لوحة مراقبة النظام
     path("monitoring/", views.monitoring_dashboard, name="monitoring_dashboard"),
+    path("monitoring/sql-profile/", views.sql_profile_report, name="sql_profile_report"),
     # API مراقبة النظام وقاعدة البيانات
     path(
         "api/monitoring/status/",
@@ -292,6 +292,34 @@ def monitoring_dashboard(request):
     )
 
 
+@staff_member_required
+def sql_profile_report(request):
+    """
+    أسوأ المسارات حسب قياسات مُحلِّل الاستعلامات (core.sql_profiler)
+    """
+    from core.sql_profiler import ORDERINGS, get_endpoint_report
+
+    order_by = request.GET.get("order_by", "total_ms")
+    if order_by not in ORDERINGS:
+        order_by = "total_ms"
+    try:
+        limit = min(max(int(request.GET.get("limit", 30)), 1), 200)
+    except ValueError:
+        limit = 30
+
+    return render(
+        request,
+        "monitoring/sql_profile.html",
+        {
+            "title": "تقرير أداء المسارات",
+            "rows": get_endpoint_report(limit=limit, order_by=order_by),
+            "order_by": order_by,
+            "orderings": ORDERINGS,
+            "limit": limit,
+        },
+    )
+
+
 def chat_gone_view(request):
     """
     إرجاع 410 Gone لطلبات الدردشة القديمة مع headers لمنع إعادة المحاولة
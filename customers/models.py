@@ -626,64 +626,20 @@ class Customer(SoftDeleteMixin, models.Model):
         super().save(*args, **kwargs)
 
     def generate_unique_code(self):
-        """توليد كود عميل فريد بشكل تسلسلي صحيح"""
-        try:
-            # الحصول على كود الفرع
-            branch_code = self.branch.code if self.branch else "00"
-
-            # استرجاع جميع الأكواد التي تبدأ بكود الفرع الحالي
-            # نستخدم values_list لتقليل استهلاك الذاكرة
-            existing_codes = Customer.objects.filter(
-                code__startswith=f"{branch_code}-"
-            ).values_list("code", flat=True)
-
-            max_sequence = 0
-
-            # البحث عن أكبر رقم تسلسلي صحيح
-            for code in existing_codes:
-                try:
-                    # تقسيم الكود: BRANCH-SEQUENCENO
-                    parts = code.split("-")
-                    # نتأكد أن الكود يتكون من جزئين وأن الجزء الثاني رقمي بالكامل
-                    if len(parts) >= 2:
-                        sequence_part = parts[-1]
-                        if sequence_part.isdigit():
-                            sequence = int(sequence_part)
-                            if sequence > max_sequence:
-                                max_sequence = sequence
-                except (IndexError, ValueError):
-                    continue
-
-            # الرقم التالي هو الأكبر + 1
-            next_sequence = max_sequence + 1
-
-            # محاولات للتأكد من عدم التكرار (حماية إضافية)
-            # في حال وجود تضارب لحظي في إنشاء العملاء
-            max_attempts = 100
-            for _ in range(max_attempts):
-                new_code = f"{branch_code}-{next_sequence:04d}"
-                
-                # التحقق إذا كان الكود موجوداً بالفعل
-                # نستثني العميل الحالي في حالة التعديل (رغم أن هذا الكود يستخدم عند الإنشاء عادة)
-                qs = Customer.objects.filter(code=new_code)
-                if self.pk:
-                    qs = qs.exclude(pk=self.pk)
-                
-                if not qs.exists():
-                    return new_code
-                
-                next_sequence += 1
-
-            # في حالة نادرة جداً من الفشل المستمر (مثل سباق عالي جداً)، نلجأ لمؤقت زمني لضمان الفرادة
-            # لكن نحافظ على الصيغة الرقمية قدر الإمكـان
-            import time
-            timestamp_seq = int(time.time() * 1000) % 1000000
-            return f"{branch_code}-{timestamp_seq:06d}"
-
-        except Exception:
-            # Fallback آمن جداً
-            import uuid
-            return f"ERR-{str(uuid.uuid4())[:8]}"
+        """توليد كود عميل فريد بشكل تسلسلي صحيح (عداد core.sequences لكل فرع)"""
+        from core.sequences import allocate, max_suffix
+
+        branch_code = self.branch.code if self.branch else "00"
+        prefix = f"{branch_code}-"
+        return allocate(
+            "customers.code",
+            prefix,
+            render=lambda n: f"{prefix}{n:04d}",
+            seed=lambda: max_suffix(Customer.all_objects, "code", prefix),
+            taken=lambda value: Customer.all_objects.filter(code=value)
+            .exclude(pk=self.pk)
+            .exists(),
+        )
 
     @property
     def branch_code(self):
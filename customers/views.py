@@ -13,6 +13,7 @@ from django.views.generic import TemplateView
 
 logger = logging.getLogger(__name__)
 
+from core.search import customer_search_q
 from orders.models import Order
 
 from .forms import CustomerForm, CustomerNoteForm, CustomerSearchForm
@@ -95,17 +96,8 @@ def customer_list(request):
 
         # تحسين استعلام البحث
         if search:
-            # استخدام استعلامات منفصلة لتحسين الأداء
-            name_query = Q(name__icontains=search)
-            code_query = Q(code__icontains=search)
-            phone_query = Q(phone__icontains=search) | Q(phone2__icontains=search)
-            email_query = Q(email__icontains=search)
-            # البحث بكود مهندس الديكور (DEC-XXXX)
-            designer_code_query = Q(decorator_profile__designer_code__icontains=search)
-
-            customers = customers.filter(
-                name_query | code_query | phone_query | email_query | designer_code_query
-            )
+            # مستند البحث المفهرس: الاسم، الكود، الهواتف، البريد، كود المصمم (DEC-XXXX)
+            customers = customers.filter(customer_search_q(search))
 
         # استخدام الفهارس للتصفية
         if category:
@@ -1081,11 +1073,7 @@ def customer_api(request):
 
     # إذا كان هناك مصطلح بحث، تطبيق التصفية
     if search_term:
-        customers = customers.filter(
-            Q(name__icontains=search_term)
-            | Q(phone__icontains=search_term)
-            | Q(email__icontains=search_term)
-        )
+        customers = customers.filter(customer_search_q(search_term))
 
     # ترتيب النتائج
     customers = customers.select_related("branch").order_by("name")
@@ -0,0 +1,224 @@
+"""
+توزيع أوامر التقطيع المؤجَّل (Cutting Allocation Collector)
+==========================================================
+كل حركة مخزون كانت تطلق auto_fix_on_stock_change: استعلامَي بحث، ثم إصلاح
+كل أمر تقطيع متأثر، وكل فحص مستودع يمر على المستودعات النشطة واحداً واحداً
+بحثاً عن آخر running_balance. استلام 300 ثوب في إذن واحد = آلاف الاستعلامات
+وإعادة إصلاح نفس أوامر التقطيع مئات المرات.
+
+الآن:
+- المنتجات المتأثرة تُجمع في مجموعة خاصة بالخيط وتُعالج مرة واحدة بعد
+  نجاح المعاملة (نفس نمط orders.recompute)
+- أرصدة كل المنتجات المعنية تُقرأ من StockBalance باستعلام مجمّع واحد،
+  واختيار المستودع يتم في الذاكرة
+- bulk_allocation(): وضع جماعي للتحويلات والرفع — لا جدولة حتى نهاية الكتلة
+
+الاستخدام:
+    mark_products_changed([product_id])           # من إشارة StockTransaction
+    with bulk_allocation():
+        ...  # حركات مخزون كثيرة — معالجة واحدة عند الخروج
+    process_products(product_ids)                 # فوري (الرفع الجماعي)
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+ACTIVE_CUTTING_STATUSES = ("pending", "in_progress", "partially_completed")
+ACTIVE_ORDER_STATUSES = ("pending", "processing", "confirmed")
+
+
+# ─── الأرصدة واختيار المستودع ───────────────────────────────────────
+
+
+def load_balances(product_ids):
+    """
+    أرصدة المنتجات في كل المستودعات باستعلام واحد.
+    Returns: {product_id: {warehouse_id: quantity}}
+    """
+    from inventory.models import StockBalance
+
+    ids = {product_id for product_id in product_ids if product_id}
+    if not ids:
+        return {}
+
+    balances = defaultdict(dict)
+    for product_id, warehouse_id, quantity in StockBalance.objects.filter(
+        product_id__in=ids
+    ).values_list("product_id", "warehouse_id", "quantity"):
+        balances[product_id][warehouse_id] = quantity
+    return dict(balances)
+
+
+def active_warehouses():
+    """المستودعات النشطة {id: Warehouse}"""
+    from inventory.models import Warehouse
+
+    return Warehouse.objects.filter(is_active=True).in_bulk()
+
+
+def pick_warehouse(product_balances, warehouses):
+    """
+    المستودع صاحب أكبر رصيد موجب من بين warehouses ({id: Warehouse}).
+    عند التساوي يُختار الأقدم (أصغر id) ليبقى الاختيار ثابتاً.
+    Returns: (warehouse, quantity) أو (None, 0)
+    """
+    best_warehouse = None
+    best_quantity = 0
+    for warehouse_id, quantity in sorted((product_balances or {}).items()):
+        if quantity > best_quantity and warehouse_id in warehouses:
+            best_warehouse = warehouses[warehouse_id]
+            best_quantity = quantity
+    return best_warehouse, best_quantity
+
+
+# ─── التجميع حتى نهاية المعاملة ─────────────────────────────────────
+
+
+def _pending_products():
+    pending = getattr(_pending, "products", None)
+    if pending is None:
+        pending = _pending.products = set()
+    return pending
+
+
+def mark_products_changed(product_ids):
+    """تسجيل منتجات تغيّر مخزونها لإعادة توزيع أوامر تقطيعها بعد نجاح المعاملة"""
+    ids = {product_id for product_id in product_ids if product_id}
+    if not ids:
+        return
+
+    _pending_products().update(ids)
+    if getattr(_pending, "bulk_depth", 0):
+        return
+    # كل تسجيل يضيف callback خفيفاً؛ أول callback ينفَّذ يفرّغ المجموعة كاملة
+    transaction.on_commit(flush_allocation)
+
+
+@contextmanager
+def bulk_allocation():
+    """
+    وضع جماعي: الحركات داخل الكتلة تُسجَّل فقط، وتُجدول معالجة واحدة عند
+    الخروج (بعد commit المعاملة الخارجية إن وُجدت، أو فوراً بدونها).
+    """
+    _pending.bulk_depth = getattr(_pending, "bulk_depth", 0) + 1
+    try:
+        yield
+    finally:
+        _pending.bulk_depth -= 1
+        if not _pending.bulk_depth and _pending_products():
+            transaction.on_commit(flush_allocation)
+
+
+def flush_allocation():
+    """معالجة كل المنتجات المسجّلة — مرة واحدة لكل منتج"""
+    pending = getattr(_pending, "products", None)
+    if not pending:
+        return 0
+
+    product_ids = set(pending)
+    pending.clear()
+    try:
+        return process_products(product_ids)
+    except Exception as e:
+        logger.error(f"❌ فشل إعادة توزيع أوامر التقطيع لـ {len(product_ids)} منتج: {e}")
+        return 0
+
+
+# ─── المعالجة ────────────────────────────────────────────────────────
+
+
+def process_products(product_ids):
+    """
+    إعادة تقييم أوامر التقطيع بعد تغيّر مخزون المنتجات:
+    1. إصلاح كل أمر تقطيع نشط يحتوي أحدها — مرة واحدة للأمر
+    2. توزيع عناصر الطلبات النشطة التي ليس لها أمر تقطيع (حُذف سابقاً لنقص المخزون)
+    Returns: عدد أوامر التقطيع والعناصر التي تمت معالجتها
+    """
+    from inventory.models import Warehouse
+    from orders.models import OrderItem
+
+    from .auto_fix import auto_fix_cutting_order_items, is_service_product
+    from .models import CuttingOrder, CuttingOrderItem
+    from .signals import allocate_order_item, create_operation_log
+
+    product_ids = {product_id for product_id in product_ids if product_id}
+    if not product_ids:
+        return 0
+
+    cutting_order_ids = set(
+        CuttingOrderItem.objects.filter(
+            order_item__product_id__in=product_ids,
+            cutting_order__status__in=ACTIVE_CUTTING_STATUSES,
+        ).values_list("cutting_order_id", flat=True)
+    )
+    unallocated_items = list(
+        OrderItem.objects.filter(
+            product_id__in=product_ids,
+            order__status__in=ACTIVE_ORDER_STATUSES,
+            cutting_items__isnull=True,
+        )
+        .select_related("order", "product", "product__category")
+        .distinct()
+    )
+    if not cutting_order_ids and not unallocated_items:
+        return 0
+
+    # أرصدة كل منتجات أوامر التقطيع المتأثرة (لا المنتجات المتغيّرة فقط)
+    # لأن الإصلاح يفحص كل عناصر الأمر
+    balance_product_ids = set(product_ids)
+    balance_product_ids.update(
+        CuttingOrderItem.objects.filter(cutting_order_id__in=cutting_order_ids).values_list(
+            "order_item__product_id", flat=True
+        )
+    )
+    balances = load_balances(balance_product_ids)
+    warehouses = active_warehouses()
+
+    processed = 0
+    for cutting_order in CuttingOrder.objects.filter(id__in=cutting_order_ids).select_related(
+        "order", "warehouse"
+    ):
+        try:
+            results = auto_fix_cutting_order_items(
+                cutting_order,
+                trigger_source="stock_change",
+                balances=balances,
+                warehouses=warehouses,
+            )
+            if results.get("needs_fix"):
+                create_operation_log(cutting_order, results, trigger_source="stock_change")
+            processed += 1
+        except Exception as e:
+            logger.error(
+                f"❌ خطأ في معالجة تحديث المخزون للتقطيع {cutting_order.id}: {str(e)}"
+            )
+
+    # queryset واحد مقيَّم مرة واحدة ومشترك بين كل العناصر
+    warehouse_queryset = Warehouse.objects.filter(is_active=True)
+    for order_item in unallocated_items:
+        if "inspection" in order_item.order.get_selected_types_list():
+            continue
+        if is_service_product(order_item.product):
+            continue
+        # قد يكون وُزّع منذ الاستعلام (إشارة عنصر طلب أخرى في نفس الدورة)
+        if CuttingOrderItem.objects.filter(order_item=order_item).exists():
+            continue
+        try:
+            allocate_order_item(order_item, warehouses=warehouse_queryset, balances=balances)
+            processed += 1
+        except Exception as e:
+            logger.error(f"❌ خطأ في إنشاء قطع للطلب {order_item.order_id}: {str(e)}")
+
+    if processed:
+        logger.info(
+            f"🧵 إعادة توزيع التقطيع: {len(product_ids)} منتج، {processed} أمر/عنصر"
+        )
+    return processed
@@ -11,7 +11,7 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 
-from inventory.models import Product, StockTransaction, Warehouse
+from inventory.models import Product, StockBalance
 
 from .models import CuttingOrder, CuttingOrderItem
 
@@ -37,41 +37,35 @@ def is_service_product(product):
 def get_product_warehouse(product):
     """
     Get the warehouse with the highest stock for this product
+    (single grouped StockBalance query)
     """
-    best_warehouse = None
-    best_stock = 0
+    from .allocation import active_warehouses, load_balances, pick_warehouse
 
-    for warehouse in Warehouse.objects.filter(is_active=True):
-        last_trans = (
-            StockTransaction.objects.filter(product=product, warehouse=warehouse)
-            .order_by("-transaction_date", "-id")
-            .first()
-        )
-
-        if last_trans and last_trans.running_balance > best_stock:
-            best_stock = last_trans.running_balance
-            best_warehouse = warehouse
-
-    return best_warehouse, best_stock
+    return pick_warehouse(load_balances([product.id]).get(product.id), active_warehouses())
 
 
 def get_product_stock_in_warehouse(product, warehouse):
     """
     Get stock balance for product in specific warehouse
     """
-    last_trans = (
-        StockTransaction.objects.filter(product=product, warehouse=warehouse)
-        .order_by("-transaction_date", "-id")
+    balance = (
+        StockBalance.objects.filter(product=product, warehouse=warehouse)
+        .values_list("quantity", flat=True)
         .first()
     )
 
-    return last_trans.running_balance if last_trans else 0
+    return balance if balance is not None else 0
 
 
-def get_items_needing_fix(cutting_order):
+def get_items_needing_fix(cutting_order, balances=None, warehouses=None):
     """
     Analyze cutting order items and categorize issues
 
+    Args:
+        balances: {product_id: {warehouse_id: quantity}} preloaded by the caller
+            (cutting.allocation.load_balances) — loaded once per order otherwise
+        warehouses: active warehouses {id: Warehouse}
+
     Returns:
         dict: {
             'needs_fix': bool,
@@ -86,17 +80,28 @@ def get_items_needing_fix(cutting_order):
     service_items = []
     duplicate_items = {}
 
+    from .allocation import active_warehouses, load_balances, pick_warehouse
+
+    items = list(cutting_order.items.select_related("order_item__product"))
+
     # Check for duplicates first
     items_by_order_item = defaultdict(list)
-    for item in cutting_order.items.all():
+    for item in items:
         items_by_order_item[item.order_item_id].append(item)
 
     for order_item_id, items in items_by_order_item.items():
         if len(items) > 1:
             duplicate_items[order_item_id] = items
 
+    if balances is None:
+        balances = load_balances(
+            item.order_item.product_id for item in items if item.order_item
+        )
+    if warehouses is None:
+        warehouses = active_warehouses()
+
     # Analyze each item
-    for item in cutting_order.items.all():
+    for item in items:
         if not item.order_item or not item.order_item.product:
             continue
 
@@ -115,8 +120,9 @@ def get_items_needing_fix(cutting_order):
         current_warehouse = cutting_order.warehouse
 
         # Get correct warehouse for product
-        best_warehouse, best_stock = get_product_warehouse(product)
-        current_stock = get_product_stock_in_warehouse(product, current_warehouse)
+        product_balances = balances.get(product.id, {})
+        best_warehouse, best_stock = pick_warehouse(product_balances, warehouses)
+        current_stock = product_balances.get(current_warehouse.id, 0)
 
         # If product is in different warehouse
         if best_warehouse and best_warehouse.id != current_warehouse.id:
@@ -313,19 +319,23 @@ def move_items_to_correct_warehouse(items_by_warehouse, cutting_order):
 
 
 @transaction.atomic
-def auto_fix_cutting_order_items(cutting_order, trigger_source="auto"):
+def auto_fix_cutting_order_items(
+    cutting_order, trigger_source="auto", balances=None, warehouses=None
+):
     """
     Main auto-fix function - automatically correct cutting order items
 
     Args:
         cutting_order: CuttingOrder instance
         trigger_source: 'auto' (signal) or 'manual' (admin action)
+        balances / warehouses: preloaded lookups shared across orders
+            (see get_items_needing_fix)
 
     Returns:
         dict: Results with counts and details
     """
     # التحقق مما إذا كان الإصلاح مطلوباً
-    issues = get_items_needing_fix(cutting_order)
+    issues = get_items_needing_fix(cutting_order, balances=balances, warehouses=warehouses)
 
     # تحديث حقل needs_fix للأداء
     if cutting_order.needs_fix != issues["needs_fix"]:
@@ -1,26 +1,17 @@
-from django.core.cache import cache
+from core.layout_context import render_section
 
 from .models import CuttingOrder
 
-_CUTTING_CACHE_TTL = 120  # 2 دقائق
-
 
 def cutting_notifications(request):
-    """Add cutting order notification count to context — Cached 2 min"""
-    if not request.user.is_authenticated:
-        return {}
-
-    if not (request.user.is_superuser or request.user.is_staff):
-        return {}
+    """Add cutting order notification count to context — via the layout context service"""
+    return render_section(request, "cutting")
 
-    cached = cache.get("ctx_cutting_pending_fix")
-    if cached is not None:
-        return cached
 
+def build_cutting_notifications(request):
+    """عدد أوامر القص التي تحتاج إصلاحاً (بدون كاش)"""
     pending_fix_count = CuttingOrder.objects.filter(
         status__in=["pending", "in_progress", "partially_completed"], needs_fix=True
     ).count()
 
-    result = {"cutting_orders_pending_fix": pending_fix_count}
-    cache.set("ctx_cutting_pending_fix", result, _CUTTING_CACHE_TTL)
-    return result
+    return {"cutting_orders_pending_fix": pending_fix_count}
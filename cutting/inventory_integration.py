@@ -10,7 +10,8 @@ from django.contrib.auth.models import User
 from django.db import transaction
 from django.utils import timezone
 
-from inventory.models import Product, StockTransaction
+from inventory.models import Product, StockBalance, StockTransaction
+from inventory.running_balance import schedule_running_balance_recalculation
 from inventory.models import Warehouse as InventoryWarehouse
 from django.contrib.contenttypes.models import ContentType
 
@@ -308,68 +309,27 @@ class InventoryIntegrationService:
     def _get_current_stock(product, warehouse):
         """الحصول على المخزون الحالي للمنتج في المستودع"""
         try:
-            # حساب الرصيد الحالي من آخر معاملة
-            last_transaction = (
-                StockTransaction.objects.filter(product=product, warehouse=warehouse)
-                .order_by("-transaction_date", "-id")
+            # الرصيد المجمّع صحيح دائماً حتى قبل إعادة حساب running_balance المؤجلة
+            balance = (
+                StockBalance.objects.filter(product=product, warehouse=warehouse)
+                .values_list("quantity", flat=True)
                 .first()
             )
-
-            if last_transaction:
-                return last_transaction.running_balance
-            else:
-                return Decimal("0")
+            return balance if balance is not None else Decimal("0")
         except Exception:
             return Decimal("0")
 
     @staticmethod
     def _update_running_balance(transaction):
-        """تحديث الرصيد المتحرك للمعاملة"""
+        """
+        تحديث الرصيد المتحرك للمعاملة.
+        الحساب يتم في StockTransaction.save()؛ هنا نضمن فقط إعادة حساب السلسلة
+        جماعياً مرة واحدة عند نجاح المعاملة بدلاً من حفظ كل معاملة لاحقة.
+        """
         try:
-            # الحصول على آخر رصيد
-            previous_transaction = (
-                StockTransaction.objects.filter(
-                    product=transaction.product,
-                    warehouse=transaction.warehouse,
-                    transaction_date__lt=transaction.transaction_date,
-                )
-                .order_by("-transaction_date", "-id")
-                .first()
-            )
-
-            previous_balance = (
-                previous_transaction.running_balance
-                if previous_transaction
-                else Decimal("0")
+            schedule_running_balance_recalculation(
+                transaction.product_id, transaction.warehouse_id
             )
-
-            # حساب الرصيد الجديد
-            if transaction.transaction_type == "in":
-                new_balance = previous_balance + transaction.quantity
-            else:  # out, transfer, adjustment
-                new_balance = previous_balance - transaction.quantity
-
-            transaction.running_balance = new_balance
-            transaction.save()
-
-            # تحديث الأرصدة للمعاملات اللاحقة
-            subsequent_transactions = StockTransaction.objects.filter(
-                product=transaction.product,
-                warehouse=transaction.warehouse,
-                transaction_date__gt=transaction.transaction_date,
-            ).order_by("transaction_date", "id")
-
-            current_balance = new_balance
-            for trans in subsequent_transactions:
-                if trans.transaction_type == "in":
-                    current_balance += trans.quantity
-                else:
-                    current_balance -= trans.quantity
-
-                if trans.running_balance != current_balance:
-                    trans.running_balance = current_balance
-                    trans.save()
-
         except Exception as e:
             logger.error(f"خطأ في تحديث الرصيد المتحرك: {str(e)}")
 
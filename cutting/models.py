@@ -144,20 +144,43 @@ class CuttingOrder(SoftDeleteMixin, models.Model):
 
         if not self.cutting_code:
             if self.order and self.order.order_number:
-                # استخدام رقم الطلب الأساسي مع إضافة C
-                base_number = self.order.order_number
-                # التحقق من عدم وجود كود مكرر
-                counter = 1
-                cutting_code = f"C-{base_number}"
-                while CuttingOrder.objects.filter(cutting_code=cutting_code).exists():
-                    cutting_code = f"C-{base_number}-{counter}"
-                    counter += 1
-                self.cutting_code = cutting_code
+                # استخدام رقم الطلب الأساسي مع إضافة C (ثم C-<رقم>-1, -2 ... للأوامر التالية)
+                self.cutting_code = self.generate_cutting_code(self.order.order_number)
             else:
                 # في حالة عدم وجود طلب، استخدم الطريقة القديمة
                 self.cutting_code = f"CUT-{uuid.uuid4().hex[:8].upper()}"
         super().save(*args, **kwargs)
 
+    def generate_cutting_code(self, base_number):
+        """كود تقطيع فريد لرقم الطلب (عداد core.sequences لكل طلب)"""
+        from core.sequences import allocate
+
+        base_code = f"C-{base_number}"
+
+        def render(n):
+            return base_code if n == 1 else f"{base_code}-{n - 1}"
+
+        def seed():
+            used = 0
+            codes = CuttingOrder.objects.filter(cutting_code__startswith=base_code)
+            for code in codes.values_list("cutting_code", flat=True):
+                tail = code[len(base_code) :]
+                if tail == "":
+                    used = max(used, 1)
+                elif tail[1:].isdigit() and tail[0] == "-":
+                    used = max(used, int(tail[1:]) + 1)
+            return used
+
+        return allocate(
+            "cutting.cutting_code",
+            base_code,
+            render=render,
+            seed=seed,
+            taken=lambda value: CuttingOrder.objects.filter(cutting_code=value)
+            .exclude(pk=self.pk)
+            .exists(),
+        )
+
     @property
     def _items_stats(self):
         """إحصائيات العناصر في query واحدة"""
@@ -11,6 +11,7 @@ from manufacturing.models import ManufacturingSettings
 from orders.contract_models import CurtainFabric
 from orders.models import Order, OrderItem
 
+from .allocation import load_balances, mark_products_changed, pick_warehouse
 from .models import CuttingOrder, CuttingOrderItem
 
 logger = logging.getLogger(__name__)
@@ -91,6 +92,11 @@ def create_cutting_orders_on_order_save(sender, instance, created, **kwargs):
                         f"📦 توزيع {instance.items.count()} عنصر موجود على أوامر التقطيع..."
                     )
 
+                    # أرصدة كل منتجات الطلب باستعلام واحد
+                    balances = load_balances(
+                        instance.items.values_list("product_id", flat=True)
+                    )
+
                     for order_item in instance.items.all():
                         # تحقق من عدم توزيع العنصر مسبقاً
                         if CuttingOrderItem.objects.filter(
@@ -99,7 +105,7 @@ def create_cutting_orders_on_order_save(sender, instance, created, **kwargs):
                             continue
 
                         target_warehouse = determine_warehouse_for_item(
-                            order_item, active_warehouses
+                            order_item, active_warehouses, balances=balances
                         )
 
                         if target_warehouse:
@@ -178,6 +184,7 @@ def create_cutting_orders_on_order_save(sender, instance, created, **kwargs):
 
                 # البحث عن عناصر جديدة غير موزعة
                 active_warehouses = Warehouse.objects.filter(is_active=True)
+                balances = load_balances(instance.items.values_list("product_id", flat=True))
                 distributed_count = 0
 
                 for order_item in instance.items.all():
@@ -187,7 +194,7 @@ def create_cutting_orders_on_order_save(sender, instance, created, **kwargs):
 
                     # العنصر جديد - يجب توزيعه
                     target_warehouse = determine_warehouse_for_item(
-                        order_item, active_warehouses
+                        order_item, active_warehouses, balances=balances
                     )
 
                     if target_warehouse:
@@ -239,8 +246,12 @@ def create_cutting_orders_on_order_save(sender, instance, created, **kwargs):
         transaction.on_commit(distribute_new_items)
 
 
-def determine_warehouse_for_item(order_item, warehouses):
-    """تحديد المستودع المناسب لعنصر الطلب بناءً على المخزون الفعلي"""
+def determine_warehouse_for_item(order_item, warehouses, balances=None):
+    """تحديد المستودع المناسب لعنصر الطلب بناءً على المخزون الفعلي
+
+    balances: أرصدة محملة مسبقاً {product_id: {warehouse_id: quantity}}
+    (cutting.allocation.load_balances) — وإلا تُقرأ باستعلام واحد للمنتج
+    """
 
     if not order_item.product:
         logger.warning(f"عنصر الطلب {order_item.id} لا يحتوي على منتج محدد")
@@ -264,31 +275,17 @@ def determine_warehouse_for_item(order_item, warehouses):
         return None  # إرجاع None لمنع إنشاء أمر تقطيع
 
     try:
-        from inventory.models import StockTransaction
-
-        # البحث عن المستودعات التي تحتوي على المنتج بناءً على آخر المعاملات
-        warehouse_stocks = {}
-
-        for warehouse in warehouses:
-            # حساب المخزون الحالي للمنتج في هذا المستودع
-            latest_transaction = (
-                StockTransaction.objects.filter(
-                    product=order_item.product, warehouse=warehouse
-                )
-                .order_by("-transaction_date")
-                .first()
-            )
-
-            if latest_transaction and latest_transaction.running_balance > 0:
-                warehouse_stocks[warehouse] = latest_transaction.running_balance
+        # الرصيد الحالي في كل المستودعات من StockBalance (استعلام واحد)
+        if balances is None:
+            balances = load_balances([product.id])
+        best_warehouse, best_quantity = pick_warehouse(
+            balances.get(product.id), {warehouse.id: warehouse for warehouse in warehouses}
+        )
 
-        if warehouse_stocks:
+        if best_warehouse:
             # اختيار المستودع الذي يحتوي على أكبر كمية
-            best_warehouse = max(
-                warehouse_stocks.keys(), key=lambda w: warehouse_stocks[w]
-            )
             logger.info(
-                f"📦 تم اختيار مستودع {best_warehouse.name} للمنتج {order_item.product.name} (كمية متاحة: {warehouse_stocks[best_warehouse]})"
+                f"📦 تم اختيار مستودع {best_warehouse.name} للمنتج {order_item.product.name} (كمية متاحة: {best_quantity})"
             )
             return best_warehouse
 
@@ -384,6 +381,108 @@ def determine_warehouse_for_item(order_item, warehouses):
     return None
 
 
+def allocate_order_item(order_item, warehouses=None, balances=None):
+    """
+    إضافة عنصر طلب إلى أمر التقطيع الخاص بمستودعه (أو إنشاء الأمر).
+    مشتركة بين handle_order_item_creation وإعادة التوزيع بعد حركات المخزون
+    (cutting.allocation) التي تمرر المستودعات والأرصدة محملة مسبقاً.
+    """
+    if warehouses is None:
+        warehouses = Warehouse.objects.filter(is_active=True)
+
+    current_order = order_item.order
+
+    # التحقق من وجود أوامر تقطيع للطلب
+    existing_cutting_orders = CuttingOrder.objects.filter(order=current_order)
+
+    if existing_cutting_orders.exists():
+        # التحقق من عدم وجود العنصر بالفعل في أوامر التقطيع
+        if CuttingOrderItem.objects.filter(order_item=order_item).exists():
+            logger.info(
+                f"⏭️ العنصر {order_item.pk} موجود بالفعل في أمر تقطيع - تخطي"
+            )
+            return
+
+        # إضافة العنصر الجديد لأمر التقطيع المناسب
+        target_warehouse = determine_warehouse_for_item(
+            order_item, warehouses, balances=balances
+        )
+
+        if target_warehouse:
+            cutting_order = existing_cutting_orders.filter(
+                warehouse=target_warehouse
+            ).first()
+
+            if cutting_order:
+                CuttingOrderItem.objects.create(
+                    cutting_order=cutting_order,
+                    order_item=order_item,
+                    status="pending",
+                )
+                logger.info(
+                    f"✅ تم إضافة عنصر جديد لأمر التقطيع {cutting_order.cutting_code}"
+                )
+            else:
+                # إنشاء أمر تقطيع جديد لهذا المستودع
+                cutting_order = CuttingOrder.objects.create(
+                    order=current_order,
+                    warehouse=target_warehouse,
+                    status="pending",
+                    notes=f"أمر تقطيع تلقائي للطلب {current_order.order_number} - مستودع {target_warehouse.name}",
+                )
+
+                CuttingOrderItem.objects.create(
+                    cutting_order=cutting_order,
+                    order_item=order_item,
+                    status="pending",
+                )
+                logger.info(
+                    f"✅ تم إنشاء أمر تقطيع جديد {cutting_order.cutting_code} للمستودع {target_warehouse.name}"
+                )
+        else:
+            # المنتج غير موجود في أي مستودع - تخطي إنشاء أمر تقطيع
+            product_info = (
+                f"{order_item.product.name} (كود: {order_item.product.code})"
+                if order_item.product
+                else "غير محدد"
+            )
+            logger.warning(
+                f"⏭️ تخطي العنصر {product_info} - المنتج غير موجود في أي مستودع نشط"
+            )
+    else:
+        # لا يوجد أمر تقطيع - ننشئ واحد جديد (للطلبات القديمة أو حالات خاصة)
+        logger.info(
+            f"📦 لا يوجد أمر تقطيع للطلب {current_order.order_number} - إنشاء أمر جديد"
+        )
+
+        # تحديد المستودع المناسب
+        target_warehouse = determine_warehouse_for_item(
+            order_item, warehouses, balances=balances
+        )
+
+        if target_warehouse:
+            cutting_order = CuttingOrder.objects.create(
+                order=current_order,
+                warehouse=target_warehouse,
+                status="pending",
+                notes=f"أمر تقطيع تلقائي للطلب {current_order.order_number} (تم إنشاؤه عند إضافة عنصر)",
+            )
+
+            CuttingOrderItem.objects.create(
+                cutting_order=cutting_order, order_item=order_item, status="pending"
+            )
+            logger.info(
+                f"✅ تم إنشاء أمر تقطيع {cutting_order.cutting_code} وإضافة العنصر"
+            )
+        else:
+            product_info = (
+                f"{order_item.product.name} (كود: {order_item.product.code})"
+                if order_item.product
+                else "غير محدد"
+            )
+            logger.warning(f"⏭️ تخطي العنصر {product_info} - لا يوجد مستودع مناسب")
+
+
 @receiver(post_save, sender=OrderItem)
 def handle_order_item_creation(sender, instance, created, **kwargs):
     """معالجة إنشاء عناصر الطلب وإنشاء أوامر التقطيع إذا لزم الأمر
@@ -446,97 +545,7 @@ def handle_order_item_creation(sender, instance, created, **kwargs):
                 logger.warning(f"⚠️ عنصر الطلب {order_item_id} لم يعد موجوداً")
                 return
 
-            current_order = order_item.order
-
-            # التحقق من وجود أوامر تقطيع للطلب
-            existing_cutting_orders = CuttingOrder.objects.filter(order=current_order)
-
-            if existing_cutting_orders.exists():
-                # التحقق من عدم وجود العنصر بالفعل في أوامر التقطيع
-                if CuttingOrderItem.objects.filter(order_item=order_item).exists():
-                    logger.info(
-                        f"⏭️ العنصر {order_item_id} موجود بالفعل في أمر تقطيع - تخطي"
-                    )
-                    return
-
-                # إضافة العنصر الجديد لأمر التقطيع المناسب
-                target_warehouse = determine_warehouse_for_item(
-                    order_item, Warehouse.objects.filter(is_active=True)
-                )
-
-                if target_warehouse:
-                    cutting_order = existing_cutting_orders.filter(
-                        warehouse=target_warehouse
-                    ).first()
-
-                    if cutting_order:
-                        CuttingOrderItem.objects.create(
-                            cutting_order=cutting_order,
-                            order_item=order_item,
-                            status="pending",
-                        )
-                        logger.info(
-                            f"✅ تم إضافة عنصر جديد لأمر التقطيع {cutting_order.cutting_code}"
-                        )
-                    else:
-                        # إنشاء أمر تقطيع جديد لهذا المستودع
-                        cutting_order = CuttingOrder.objects.create(
-                            order=current_order,
-                            warehouse=target_warehouse,
-                            status="pending",
-                            notes=f"أمر تقطيع تلقائي للطلب {current_order.order_number} - مستودع {target_warehouse.name}",
-                        )
-
-                        CuttingOrderItem.objects.create(
-                            cutting_order=cutting_order,
-                            order_item=order_item,
-                            status="pending",
-                        )
-                        logger.info(
-                            f"✅ تم إنشاء أمر تقطيع جديد {cutting_order.cutting_code} للمستودع {target_warehouse.name}"
-                        )
-                else:
-                    # المنتج غير موجود في أي مستودع - تخطي إنشاء أمر تقطيع
-                    product_info = (
-                        f"{order_item.product.name} (كود: {order_item.product.code})"
-                        if order_item.product
-                        else "غير محدد"
-                    )
-                    logger.warning(
-                        f"⏭️ تخطي العنصر {product_info} - المنتج غير موجود في أي مستودع نشط"
-                    )
-            else:
-                # لا يوجد أمر تقطيع - ننشئ واحد جديد (للطلبات القديمة أو حالات خاصة)
-                logger.info(
-                    f"📦 لا يوجد أمر تقطيع للطلب {current_order.order_number} - إنشاء أمر جديد"
-                )
-
-                # تحديد المستودع المناسب
-                target_warehouse = determine_warehouse_for_item(
-                    order_item, Warehouse.objects.filter(is_active=True)
-                )
-
-                if target_warehouse:
-                    cutting_order = CuttingOrder.objects.create(
-                        order=current_order,
-                        warehouse=target_warehouse,
-                        status="pending",
-                        notes=f"أمر تقطيع تلقائي للطلب {current_order.order_number} (تم إنشاؤه عند إضافة عنصر)",
-                    )
-
-                    CuttingOrderItem.objects.create(
-                        cutting_order=cutting_order, order_item=order_item, status="pending"
-                    )
-                    logger.info(
-                        f"✅ تم إنشاء أمر تقطيع {cutting_order.cutting_code} وإضافة العنصر"
-                    )
-                else:
-                    product_info = (
-                        f"{order_item.product.name} (كود: {order_item.product.code})"
-                        if order_item.product
-                        else "غير محدد"
-                    )
-                    logger.warning(f"⏭️ تخطي العنصر {product_info} - لا يوجد مستودع مناسب")
+            allocate_order_item(order_item)
         except Exception as e:
             logger.error(f"❌ خطأ في معالجة عنصر الطلب {order_item_id}: {str(e)}")
 
@@ -950,62 +959,11 @@ def auto_fix_on_stock_change(sender, instance, created, **kwargs):
     """
     إعادة تقييم أوامر التقطيع عند حدوث أي حركة مخزنية للمنتج
     هذا يضمن تحديث المستودعات عند الاستلام أو التحويل، واستعادة الأوامر التي حُذفت سابقاً لنقص المخزون
-    """
-    from .auto_fix import auto_fix_cutting_order_items
-
-    # 1. البحث عن أوامر التقطيع الموجودة حالياً والتي تحتوي على هذا المنتج
-    affected_items = CuttingOrderItem.objects.filter(
-        order_item__product=instance.product,
-        cutting_order__status__in=["pending", "in_progress", "partially_completed"],
-    )
-    affected_order_ids = set(affected_items.values_list("cutting_order_id", flat=True))
-
-    # 2. البحث عن الطلبات التي تحتوي على هذا المنتج ولكن ليس لها "أمر تقطيع" (بسبب حذفه سابقاً لنقص المخزون)
-    # نركز فقط على الطلبات النشطة (غير المكتملة أو الملغاة)
-    orders_needing_creation = (
-        Order.objects.filter(
-            items__product=instance.product,
-            status__in=["pending", "processing", "confirmed"],
-        )
-        .exclude(items__cutting_items__isnull=False, items__product=instance.product)
-        .distinct()
-    )
-
-    orders_to_process = set(orders_needing_creation.values_list("id", flat=True))
 
-    if not affected_order_ids and not orders_to_process:
-        return
-
-    def run_bulk_fix():
-        # معالجة الأوامر الموجودة
-        for order_id in affected_order_ids:
-            try:
-                co = CuttingOrder.objects.get(id=order_id)
-                results = auto_fix_cutting_order_items(
-                    co, trigger_source="stock_change"
-                )
-                if results.get("needs_fix"):
-                    create_operation_log(co, results, trigger_source="stock_change")
-            except Exception as e:
-                logger.error(
-                    f"❌ خطأ في معالجة تحديث المخزون للتقطيع {order_id}: {str(e)}"
-                )
-
-        # معالجة الطلبات التي تحتاج لإنشاء أوامر تقطيع جديدة
-        # نستخدم نفس الوظيفة التي تُستخدم عند تعديل الطلب (توزيع الأصناف)
-        for order_id in orders_to_process:
-            try:
-                order_obj = Order.objects.get(id=order_id)
-                # استدعاء دالة التوزيع للأصناف غير الموزعة
-                from .signals import handle_order_item_creation
-
-                for item in order_obj.items.filter(product=instance.product):
-                    if not CuttingOrderItem.objects.filter(order_item=item).exists():
-                        handle_order_item_creation(OrderItem, item, created=True)
-            except Exception as e:
-                logger.error(f"❌ خطأ في إنشاء قطع للطلب {order_id}: {str(e)}")
-
-    transaction.on_commit(run_bulk_fix)
+    ✅ المنتج يُسجَّل فقط، والمعالجة مرة واحدة لكل منتج بعد نجاح المعاملة
+    (cutting.allocation) — إذن استلام بمئات الحركات لا يكرر الإصلاح لكل حركة
+    """
+    mark_products_changed([instance.product_id])
 
 
 def process_external_fabrics(order):
@@ -19,6 +19,7 @@ from django.views.generic import (
 )
 
 from accounting.export_utils import export_to_excel
+from core.exports import batched_objects
 from core.utils.general import convert_arabic_numbers_to_english
 from customers.models import Customer
 
@@ -940,25 +941,25 @@ class ExportEngineersExcelView(DecoratorDeptRequiredMixin, View):
             "customer", "customer__branch", "assigned_staff"
         ).order_by("designer_code")
 
-        data = []
-        for p in profiles:
-            data.append(
-                {
-                    "كود المهندس": p.designer_code,
-                    "اسم المهندس": p.customer.name,
-                    "الهاتف": p.customer.phone,
-                    "الفرع": p.customer.branch.name if p.customer.branch else "",
-                    "المدينة": p.city,
-                    "الأولوية": p.get_priority_display(),
-                    "المكتب": p.company_office_name,
-                    "عدد العملاء": p.total_clients_count,
-                    "عدد الطلبات": p.total_orders_count,
-                    "آخر تواصل": str(p.last_contact_date or ""),
-                    "موظف المتابعة": (
-                        p.assigned_staff.get_full_name() if p.assigned_staff else ""
-                    ),
-                }
-            )
+        # الصفوف تُولّد على دفعات أثناء كتابة الملف (core.exports)
+        data = (
+            {
+                "كود المهندس": p.designer_code,
+                "اسم المهندس": p.customer.name,
+                "الهاتف": p.customer.phone,
+                "الفرع": p.customer.branch.name if p.customer.branch else "",
+                "المدينة": p.city,
+                "الأولوية": p.get_priority_display(),
+                "المكتب": p.company_office_name,
+                "عدد العملاء": p.total_clients_count,
+                "عدد الطلبات": p.total_orders_count,
+                "آخر تواصل": str(p.last_contact_date or ""),
+                "موظف المتابعة": (
+                    p.assigned_staff.get_full_name() if p.assigned_staff else ""
+                ),
+            }
+            for p in batched_objects(profiles)
+        )
 
         columns = [
             {"header": h, "key": h}
@@ -1015,21 +1016,20 @@ class ExportCommissionsExcelView(DecoratorDeptRequiredMixin, View):
             "engineer__customer", "order", "order__customer"
         ).order_by("-linked_at")
 
-        data = []
-        for c in commissions:
-            data.append(
-                {
-                    "كود المهندس": c.engineer.designer_code,
-                    "اسم المهندس": c.engineer.customer.name,
-                    "رقم الطلب": c.order.order_number,
-                    "العميل": c.order.customer.name if c.order.customer else "",
-                    "إجمالي الطلب": str(c.order.total_amount or 0),
-                    "نسبة العمولة": str(c.commission_rate),
-                    "قيمة العمولة": str(c.commission_value),
-                    "الحالة": c.get_commission_status_display(),
-                    "تاريخ الربط": str(c.linked_at)[:10],
-                }
-            )
+        data = (
+            {
+                "كود المهندس": c.engineer.designer_code,
+                "اسم المهندس": c.engineer.customer.name,
+                "رقم الطلب": c.order.order_number,
+                "العميل": c.order.customer.name if c.order.customer else "",
+                "إجمالي الطلب": str(c.order.total_amount or 0),
+                "نسبة العمولة": str(c.commission_rate),
+                "قيمة العمولة": str(c.commission_value),
+                "الحالة": c.get_commission_status_display(),
+                "تاريخ الربط": str(c.linked_at)[:10],
+            }
+            for c in batched_objects(commissions)
+        )
 
         columns = [
             {"header": h, "key": h}
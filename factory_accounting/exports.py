@@ -0,0 +1,289 @@
+"""
+تصدير تقرير الإنتاج (core.exports)
+"""
+
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from core.exports import batched_objects
+
+from .models import FactoryCard, ReadyCurtainEntry, Tailor
+
+
+def _default_date_from(today):
+    """الافتراضي: يوم 25 من الشهر السابق (مثل صفحة التقارير)"""
+    if today.day >= 25:
+        return today.replace(day=25).strftime("%Y-%m-%d")
+    if today.month == 1:
+        return today.replace(year=today.year - 1, month=12, day=25).strftime("%Y-%m-%d")
+    return today.replace(month=today.month - 1, day=25).strftime("%Y-%m-%d")
+
+
+def _tailor_lines(card, row_splits):
+    lines = [f"{s.tailor.name}: {float(s.share_amount):.2f}" for s in row_splits]
+
+    # تفاصيل التسعير
+    breakdown = card.tailoring_cost_breakdown or {}
+    if breakdown:
+        lines.append("---")
+        lines.append("تفاصيل التسعير:")
+        for entry in breakdown.values():
+            if entry.get("method") == "per_piece":
+                lines.append(
+                    f"  {entry['display']}: {int(entry.get('pieces', 0))} قطعة × {entry['rate']} = {entry['cost']}"
+                )
+            else:
+                lines.append(
+                    f"  {entry['display']}: {entry['meters']}م × {entry['rate']} = {entry['cost']}"
+                )
+    return "\n".join(lines) if lines else "-"
+
+
+def production_report_export(params, user):
+    """
+    تقرير الإنتاج بنفس فلاتر production_reports.
+    الحصص تُفلتر من prefetch لكل بطاقة، وإجماليات البطاقات الجانبية تُجمع
+    أثناء الكتابة بدلاً من مرور كامل إضافي على البطاقات والحصص.
+    """
+    today = timezone.now().date()
+    date_from = params.get("date_from", _default_date_from(today))
+    date_to = params.get("date_to")
+    payment_status = params.get("payment_status", "all")
+    card_status = params.get("card_status", "all")
+    tailor_id = params.get("tailor")
+    cutter_id = params.get("cutter")
+    tailor_filtered = bool(tailor_id and tailor_id.isdigit())
+
+    # ── البطاقات (مطابقة لـ production_reports) ──
+    cards = FactoryCard.objects.select_related(
+        "manufacturing_order",
+        "manufacturing_order__production_line",
+        "manufacturing_order__order",
+        "manufacturing_order__order__customer",
+        "manufacturing_order__modification_request__tailor",
+    ).prefetch_related("splits__tailor")
+
+    cards = cards.exclude(production_date__isnull=True)
+    cards = cards.exclude(manufacturing_order__production_line_id=4)
+
+    if date_from:
+        cards = cards.filter(production_date__gte=date_from)
+    if date_to:
+        cards = cards.filter(production_date__lte=date_to)
+    if card_status != "all":
+        cards = cards.filter(status=card_status)
+    if tailor_id:
+        if tailor_id == "without":
+            cards = cards.filter(
+                splits__isnull=True,
+            ).exclude(
+                manufacturing_order__order_type="modification",
+                manufacturing_order__modification_request__tailor__isnull=False,
+            )
+        else:
+            cards = cards.filter(
+                Q(splits__tailor_id=tailor_id)
+                | Q(
+                    manufacturing_order__order_type="modification",
+                    manufacturing_order__modification_request__tailor_id=tailor_id,
+                )
+            ).distinct()
+    if cutter_id:
+        cards = cards.filter(manufacturing_order__production_line_id=cutter_id)
+
+    if payment_status == "paid":
+        cards = cards.filter(status="paid")
+    elif payment_status == "unpaid":
+        cards = cards.exclude(status="paid")
+
+    def row_splits_for(card):
+        splits = list(card.splits.all())
+        if not tailor_id:
+            return splits
+        if tailor_id != "without":
+            splits = [s for s in splits if str(s.tailor_id) == tailor_id]
+        if payment_status == "paid":
+            splits = [s for s in splits if s.is_paid]
+        elif payment_status == "unpaid":
+            splits = [s for s in splits if not s.is_paid]
+        return splits
+
+    # ── الستائر الجاهزة ──
+    ready_curtains = ReadyCurtainEntry.objects.select_related(
+        "tailor", "created_by"
+    ).order_by("-production_date")
+
+    if date_from:
+        ready_curtains = ready_curtains.filter(production_date__gte=date_from)
+    if date_to:
+        ready_curtains = ready_curtains.filter(production_date__lte=date_to)
+    if tailor_filtered:
+        ready_curtains = ready_curtains.filter(tailor_id=tailor_id)
+    elif tailor_id == "without":
+        ready_curtains = ready_curtains.none()
+    if payment_status == "paid":
+        ready_curtains = ready_curtains.filter(is_paid=True)
+    elif payment_status == "unpaid":
+        ready_curtains = ready_curtains.filter(is_paid=False)
+
+    ready_curtain_total = ready_curtains.aggregate(total=Sum("total_cost"))["total"] or Decimal(
+        "0.00"
+    )
+
+    # ── وصف الفلترة ──
+    filter_parts = []
+    if date_from:
+        filter_parts.append(f"من {date_from}")
+    if date_to:
+        filter_parts.append(f"إلى {date_to}")
+    if tailor_id:
+        if tailor_id == "without":
+            filter_parts.append("بدون خياط")
+        elif tailor_filtered:
+            tailor = Tailor.objects.filter(pk=tailor_id).first()
+            if tailor:
+                filter_parts.append(f"خياط: {tailor.name}")
+    if cutter_id:
+        from manufacturing.models import ProductionLine
+
+        line = ProductionLine.objects.filter(pk=cutter_id).first()
+        if line:
+            filter_parts.append(f"قصاص: {line.name}")
+    if payment_status == "paid":
+        filter_parts.append("مدفوع فقط")
+    elif payment_status == "unpaid":
+        filter_parts.append("غير مدفوع فقط")
+    if card_status != "all":
+        filter_parts.append(f"حالة البطاقة: {card_status}")
+
+    filter_text = " | ".join(filter_parts) if filter_parts else "بدون فلترة"
+
+    def card_rows():
+        for card in batched_objects(cards.order_by("-production_date")):
+            row_splits = row_splits_for(card)
+
+            # تكلفة الخياطين للصف: مجموع الحصص عند فلترة خياط وإلا إجمالي البطاقة
+            if tailor_filtered:
+                card_tailor_cost = sum((s.share_amount or Decimal("0.00")) for s in row_splits)
+            else:
+                card_tailor_cost = card.total_tailoring_cost or Decimal("0.00")
+
+            cutter_name = "-"
+            if card.manufacturing_order.production_line:
+                cutter_name = card.manufacturing_order.production_line.name
+
+            if tailor_filtered and row_splits:
+                all_paid = all(s.is_paid for s in row_splits)
+                pay_display = "مدفوع" if all_paid else "غير مدفوع"
+                pay_date = "-"
+                if all_paid:
+                    last_paid = max((s.paid_date for s in row_splits if s.paid_date), default=None)
+                    pay_date = last_paid.strftime("%Y-%m-%d") if last_paid else "-"
+            else:
+                pay_display = "مدفوع" if card.status == "paid" else "غير مدفوع"
+                pay_date = card.payment_date.strftime("%Y-%m-%d") if card.payment_date else "-"
+
+            yield {
+                "order_number": card.order_number,
+                "customer": card.customer_name,
+                "production_date": (
+                    card.production_date.strftime("%Y-%m-%d") if card.production_date else "-"
+                ),
+                "meters": float(card.get_actual_meters()),
+                "cutter": cutter_name,
+                "cutter_cost": float(card.get_current_cutter_cost()),
+                "tailors": _tailor_lines(card, row_splits),
+                "tailor_cost": float(card_tailor_cost),
+                "order_status": card.manufacturing_order.get_status_display(),
+                "payment_status": pay_display,
+                "payment_date": pay_date,
+            }
+
+    def card_footer(totals):
+        footer = [
+            ("إجمالي الأمتار", f"{totals['meters']:,.2f} متر"),
+            ("تكلفة القصاص", totals["cutter_cost"]),
+            ("تكلفة الخياطين", totals["tailor_cost"] + float(ready_curtain_total)),
+        ]
+        if ready_curtain_total > 0:
+            footer.append(("ستائر جاهزة", float(ready_curtain_total)))
+            footer.append(
+                (
+                    "الإجمالي الكلي (بطاقات + ستائر جاهزة)",
+                    totals["tailor_cost"] + float(ready_curtain_total),
+                )
+            )
+        return footer
+
+    sheets = [
+        {
+            "title": "تقرير الإنتاج",
+            "heading": "تقرير الإنتاج",
+            "subheading": f"الفلترة: {filter_text}",
+            "columns": [
+                {"header": "رقم الأمر", "key": "order_number", "width": 20},
+                {"header": "العميل", "key": "customer", "width": 28},
+                {"header": "تاريخ الإنتاج", "key": "production_date", "width": 16},
+                {"header": "إجمالي الأمتار", "key": "meters", "width": 16},
+                {"header": "القصاص", "key": "cutter", "width": 22},
+                {"header": "تكلفة القصاص", "key": "cutter_cost", "width": 16},
+                {"header": "الخياطين", "key": "tailors", "width": 35},
+                {"header": "تكلفة الخياطين", "key": "tailor_cost", "width": 18},
+                {"header": "حالة الطلب", "key": "order_status", "width": 16},
+                {"header": "حالة الدفع", "key": "payment_status", "width": 16},
+                {"header": "تاريخ الدفع", "key": "payment_date", "width": 18},
+            ],
+            "rows": card_rows(),
+            "totals": {
+                "label": "المجموع الكلي (بطاقات)",
+                "keys": ["meters", "cutter_cost", "tailor_cost"],
+            },
+            "footer": card_footer,
+        }
+    ]
+
+    ready_count = ready_curtains.count()
+    if ready_count:
+        sheets.append(
+            {
+                "title": "ستائر جاهزة",
+                "heading": "ستائر جاهزة",
+                "subheading": f"الفلترة: {filter_text}",
+                "columns": [
+                    {"header": "الخياط", "key": "tailor", "width": 22},
+                    {"header": "الكمية", "key": "quantity", "width": 12},
+                    {"header": "سعر القطعة", "key": "price_per_piece", "width": 14},
+                    {"header": "الإجمالي", "key": "total_cost", "width": 16},
+                    {"header": "تاريخ الإنتاج", "key": "production_date", "width": 16},
+                    {"header": "الوصف", "key": "description", "width": 30},
+                    {"header": "حالة الدفع", "key": "payment_status", "width": 14},
+                    {"header": "بواسطة", "key": "created_by", "width": 18},
+                ],
+                "rows": (
+                    {
+                        "tailor": rc.tailor.name if rc.tailor else "-",
+                        "quantity": rc.quantity,
+                        "price_per_piece": float(rc.price_per_piece),
+                        "total_cost": float(rc.total_cost),
+                        "production_date": (
+                            rc.production_date.strftime("%Y-%m-%d")
+                            if rc.production_date
+                            else "-"
+                        ),
+                        "description": rc.description or "-",
+                        "payment_status": "مدفوع" if rc.is_paid else "غير مدفوع",
+                        "created_by": rc.created_by.get_full_name() if rc.created_by else "-",
+                    }
+                    for rc in batched_objects(ready_curtains)
+                ),
+                "totals": {"label": "المجموع", "keys": ["total_cost"]},
+            }
+        )
+
+    return {
+        "filename": f"production_report_{timezone.now().strftime('%Y%m%d')}.xlsx",
+        "count": cards.count() + ready_count,
+        "sheets": sheets,
+    }
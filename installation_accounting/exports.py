@@ -0,0 +1,131 @@
+"""
+تصدير تقرير التركيبات (core.exports)
+"""
+
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.exports import batched_objects
+
+from .models import InstallationCard
+
+
+def installation_report_export(params, user):
+    """
+    تقرير التركيبات بنفس فلاتر صفحة التقارير.
+    الحصص تُفلتر من prefetch في الذاكرة (بدون استعلام لكل صف) وبطاقات
+    الإجماليات تُجمع أثناء الكتابة مع aggregate واحد لتكلفة التركيبات.
+    """
+    from installations.models import InstallationSchedule
+
+    date_from = params.get("date_from")
+    date_to = params.get("date_to")
+    payment_status = params.get("payment_status", "all")
+    technician_id = params.get("technician")
+
+    schedules = (
+        InstallationSchedule.objects.select_related(
+            "order",
+            "order__customer",
+            "accounting_card",
+        )
+        .prefetch_related(
+            "technicians",
+            "accounting_card__shares",
+            "accounting_card__shares__technician",
+        )
+        .exclude(status="cancelled")
+        .filter(status__in=["completed", "modification_completed"])
+    )
+
+    if date_from:
+        schedules = schedules.filter(scheduled_date__gte=date_from)
+    if date_to:
+        schedules = schedules.filter(scheduled_date__lte=date_to)
+    if technician_id:
+        schedules = schedules.filter(technicians__id=technician_id).distinct()
+    if payment_status == "paid":
+        schedules = schedules.filter(accounting_card__status="paid")
+    elif payment_status == "unpaid":
+        schedules = schedules.exclude(accounting_card__status="paid")
+
+    total_cost = InstallationCard.objects.filter(
+        installation_schedule__in=schedules.values("pk")
+    ).aggregate(total=Sum("total_cost"))["total"] or Decimal("0.00")
+
+    def rows():
+        for schedule in batched_objects(schedules):
+            card = getattr(schedule, "accounting_card", None)
+            if card:
+                shares = list(card.shares.all())
+                if technician_id:
+                    shares = [s for s in shares if str(s.technician_id) == str(technician_id)]
+                    wins = sum(share.assigned_windows for share in shares) if shares else 0
+                else:
+                    wins = card.windows_count
+                if payment_status == "paid":
+                    shares = [s for s in shares if s.is_paid]
+                elif payment_status == "unpaid":
+                    shares = [s for s in shares if not s.is_paid]
+                techs_detail = "\n".join(
+                    [f"{s.technician.name}: {float(s.assigned_windows)} شباك" for s in shares]
+                ) or "-"
+                tech_total = sum(share.amount for share in shares)
+                pay_status_str = "مدفوع" if card.status == "paid" else "غير مدفوع"
+                pay_date_str = (
+                    card.payment_date.strftime("%Y-%m-%d") if card.payment_date else "-"
+                )
+                price_per_win = float(card.price_per_window)
+            else:
+                wins = schedule.windows_count or 0
+                techs_detail = ", ".join([t.name for t in schedule.technicians.all()]) or "-"
+                tech_total = Decimal("0.00")
+                pay_status_str = "غير جاهز"
+                pay_date_str = "-"
+                price_per_win = "-"
+
+            yield {
+                "scheduled_date": (
+                    schedule.scheduled_date.strftime("%Y-%m-%d")
+                    if schedule.scheduled_date
+                    else "-"
+                ),
+                "order_number": schedule.order.order_number,
+                "customer": schedule.order.customer.name,
+                "windows": float(wins),
+                "price_per_window": price_per_win,
+                "technicians": techs_detail,
+                "tech_total": float(tech_total),
+                "payment_status": pay_status_str,
+                "payment_date": pay_date_str,
+            }
+
+    return {
+        "filename": f"installation_report_{timezone.now().strftime('%Y%m%d')}.xlsx",
+        "count": schedules.count(),
+        "sheets": [
+            {
+                "title": "تقرير التركيبات",
+                "columns": [
+                    {"header": "التاريخ المجدول", "key": "scheduled_date", "width": 15},
+                    {"header": "رقم الطلب", "key": "order_number", "width": 18},
+                    {"header": "العميل", "key": "customer", "width": 25},
+                    {"header": "الشبابيك", "key": "windows", "width": 12},
+                    {"header": "سعر الشباك", "key": "price_per_window", "width": 15},
+                    {"header": "الفنيين (الحصص)", "key": "technicians", "width": 35},
+                    {"header": "المستحقات", "key": "tech_total", "width": 15},
+                    {"header": "حالة الدفع", "key": "payment_status", "width": 15},
+                    {"header": "تاريخ الدفع", "key": "payment_date", "width": 15},
+                ],
+                "rows": rows(),
+                "totals": {"label": "المجموع الكلي", "keys": ["windows", "tech_total"]},
+                "footer": lambda totals: [
+                    ("🪟 إجمالي الشبابيك", f"{totals['windows']} شباك"),
+                    ("💰 إجمالي تكلفة التركيبات", float(total_cost)),
+                    ("👷 إجمالي مستحقات الفنيين", totals["tech_total"]),
+                ],
+            }
+        ],
+    }
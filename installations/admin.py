@@ -10,6 +10,7 @@ from django.utils.translation import gettext_lazy as _
 
 from accounts.models import SystemSettings
 from core.admin_mixins import SoftDeleteAdminMixin
+from core.page_cache import invalidate_tags_on_commit
 from manufacturing.models import ManufacturingOrder
 
 from . import admin_filters
@@ -845,9 +846,11 @@ class InstallationScheduleAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     installation_code.short_description = "رقم طلب التركيب"
 
     # إجراءات التحديث المجمع لحالة التركيب
+    # update() لا يطلق post_save، لذا تُلغى وسوم كاش الصفحات (core.page_cache) يدوياً
     def mark_status_scheduled(self, request, queryset):
         """تغيير حالة التركيب إلى مجدول"""
         updated = queryset.update(status="scheduled")
+        invalidate_tags_on_commit("installations", "orders")
         self.message_user(request, f'✅ تم تغيير حالة {updated} تركيب إلى "مجدول"')
 
     mark_status_scheduled.short_description = "تغيير الحالة إلى مجدول"
@@ -855,6 +858,7 @@ class InstallationScheduleAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     def mark_status_in_installation(self, request, queryset):
         """تغيير حالة التركيب إلى قيد التركيب"""
         updated = queryset.update(status="in_installation")
+        invalidate_tags_on_commit("installations", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} تركيب إلى "قيد التركيب"'
         )
@@ -864,6 +868,7 @@ class InstallationScheduleAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     def mark_status_completed(self, request, queryset):
         """تغيير حالة التركيب إلى مكتمل"""
         updated = queryset.update(status="completed")
+        invalidate_tags_on_commit("installations", "orders")
         self.message_user(request, f'✅ تم تغيير حالة {updated} تركيب إلى "مكتمل"')
 
     mark_status_completed.short_description = "تغيير الحالة إلى مكتمل"
@@ -871,6 +876,7 @@ class InstallationScheduleAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     def mark_status_cancelled(self, request, queryset):
         """تغيير حالة التركيب إلى ملغي"""
         updated = queryset.update(status="cancelled")
+        invalidate_tags_on_commit("installations", "orders")
         self.message_user(request, f'✅ تم تغيير حالة {updated} تركيب إلى "ملغي"')
 
     mark_status_cancelled.short_description = "تغيير الحالة إلى ملغي"
@@ -878,6 +884,7 @@ class InstallationScheduleAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     def mark_status_modification_required(self, request, queryset):
         """تغيير حالة التركيب إلى يحتاج تعديل"""
         updated = queryset.update(status="modification_required")
+        invalidate_tags_on_commit("installations", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} تركيب إلى "يحتاج تعديل"'
         )
@@ -1244,6 +1251,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_as_pending(self, request, queryset):
         """تغيير الحالة إلى في الانتظار"""
         updated = queryset.update(status="pending")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'تم تغيير حالة {updated} أمر تصنيع إلى "في الانتظار"'
         )
@@ -1253,6 +1261,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_as_in_progress(self, request, queryset):
         """تغيير الحالة إلى قيد التصنيع"""
         updated = queryset.update(status="in_progress")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'تم تغيير حالة {updated} أمر تصنيع إلى "قيد التصنيع"'
         )
@@ -1262,6 +1271,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_as_ready_install(self, request, queryset):
         """تغيير الحالة إلى جاهز للتركيب"""
         updated = queryset.update(status="ready_install")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'تم تغيير حالة {updated} أمر تصنيع إلى "جاهز للتركيب"'
         )
@@ -1271,6 +1281,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_as_completed(self, request, queryset):
         """تغيير الحالة إلى مكتمل"""
         updated = queryset.update(status="completed")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(request, f'تم تغيير حالة {updated} أمر تصنيع إلى "مكتمل"')
 
     mark_as_completed.short_description = "تغيير الحالة إلى مكتمل"
@@ -1278,6 +1289,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_as_delivered(self, request, queryset):
         """تغيير الحالة إلى تم التسليم"""
         updated = queryset.update(status="delivered")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'تم تغيير حالة {updated} أمر تصنيع إلى "تم التسليم"'
         )
@@ -1405,6 +1417,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_pending_approval(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى قيد الموافقة"""
         updated = queryset.update(status="pending_approval")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "قيد الموافقة"'
         )
@@ -1416,6 +1429,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_pending(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى قيد الانتظار"""
         updated = queryset.update(status="pending")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "قيد الانتظار"'
         )
@@ -1425,6 +1439,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_in_progress(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى قيد التصنيع"""
         updated = queryset.update(status="in_progress")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "قيد التصنيع"'
         )
@@ -1436,6 +1451,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_ready_install(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى جاهز للتركيب"""
         updated = queryset.update(status="ready_install")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "جاهز للتركيب"'
         )
@@ -1447,6 +1463,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_completed(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى مكتمل"""
         updated = queryset.update(status="completed")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "مكتمل"')
 
     mark_manufacturing_completed.short_description = "تغيير حالة التصنيع إلى مكتمل"
@@ -1454,6 +1471,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_delivered(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى تم التسليم"""
         updated = queryset.update(status="delivered")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(
             request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "تم التسليم"'
         )
@@ -1463,6 +1481,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_rejected(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى مرفوض"""
         updated = queryset.update(status="rejected")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "مرفوض"')
 
     mark_manufacturing_rejected.short_description = "تغيير حالة التصنيع إلى مرفوض"
@@ -1470,6 +1489,7 @@ class InstallationManufacturingOrderAdmin(admin.ModelAdmin):
     def mark_manufacturing_cancelled(self, request, queryset):
         """تغيير حالة أمر التصنيع إلى ملغي"""
         updated = queryset.update(status="cancelled")
+        invalidate_tags_on_commit("manufacturing", "orders")
         self.message_user(request, f'✅ تم تغيير حالة {updated} أمر تصنيع إلى "ملغي"')
 
     mark_manufacturing_cancelled.short_description = "تغيير حالة التصنيع إلى ملغي"
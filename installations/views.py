@@ -16,6 +16,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
 from accounts.models import Branch, SystemSettings
+from core.search import order_search_q
 from orders.models import Order
 
 from .forms import (
@@ -516,8 +517,6 @@ def change_installation_status(request, installation_id):
 @login_required
 def installation_list(request):
     """قائمة التركيبات - محسّنة مع فلاتر ذكية والفلترة الشهرية"""
-    from django.db.models import Q
-
     from accounts.utils import apply_default_year_filter
     from core.monthly_filter_utils import apply_monthly_filter, get_available_years
     from manufacturing.models import ManufacturingOrder
@@ -595,20 +594,7 @@ def installation_list(request):
             except ValueError:
                 pass
         if search:
-            search_q = (
-                Q(order__order_number__icontains=search)
-                | Q(order__customer__name__icontains=search)
-                | Q(order__customer__phone__icontains=search)
-                | Q(order__customer__address__icontains=search)
-                | Q(order__customer__location_type__icontains=search)
-                | Q(order__salesperson__name__icontains=search)
-                | Q(order__contract_number__icontains=search)
-                | Q(order__contract_number_2__icontains=search)
-                | Q(order__contract_number_3__icontains=search)
-                | Q(order__invoice_number__icontains=search)
-                | Q(order__invoice_number_2__icontains=search)
-                | Q(order__invoice_number_3__icontains=search)
-            )
+            search_q = order_search_q(search, "order__")
             scheduled_query = scheduled_query.filter(search_q)
 
         # إضافة التركيبات المجدولة للقائمة
@@ -654,20 +640,7 @@ def installation_list(request):
 
         # تطبيق الفلاتر
         if search:
-            search_q = (
-                Q(order__order_number__icontains=search)
-                | Q(order__customer__name__icontains=search)
-                | Q(order__customer__phone__icontains=search)
-                | Q(order__customer__address__icontains=search)
-                | Q(order__customer__location_type__icontains=search)
-                | Q(order__salesperson__name__icontains=search)
-                | Q(order__contract_number__icontains=search)
-                | Q(order__contract_number_2__icontains=search)
-                | Q(order__contract_number_3__icontains=search)
-                | Q(order__invoice_number__icontains=search)
-                | Q(order__invoice_number_2__icontains=search)
-                | Q(order__invoice_number_3__icontains=search)
-            )
+            search_q = order_search_q(search, "order__")
             ready_manufacturing_query = ready_manufacturing_query.filter(search_q)
 
         if branch_filter:
@@ -727,11 +700,7 @@ def installation_list(request):
         )
 
         if search:
-            search_q = (
-                Q(order__order_number__icontains=search)
-                | Q(order__customer__name__icontains=search)
-                | Q(order__customer__phone__icontains=search)
-            )
+            search_q = order_search_q(search, "order__")
             mod_manufacturing_query = mod_manufacturing_query.filter(search_q)
 
         if branch_filter:
@@ -789,11 +758,7 @@ def installation_list(request):
 
         # تطبيق فلاتر البحث
         if search:
-            search_q = (
-                Q(order__order_number__icontains=search)
-                | Q(order__customer__name__icontains=search)
-                | Q(order__customer__phone__icontains=search)
-            )
+            search_q = order_search_q(search, "order__")
             under_manufacturing_query = under_manufacturing_query.filter(search_q)
 
         under_manufacturing_query = under_manufacturing_query.order_by("-created_at")[:MAX_RESULTS]
@@ -2326,20 +2291,8 @@ def daily_schedule(request):
         # بحث شامل متعدد الحقول (يشمل جميع أرقام الفواتير والعقود)
         if search:
             installations = installations.filter(
-                Q(order__order_number__icontains=search)
-                | Q(order__customer__name__icontains=search)
-                | Q(order__customer__phone__icontains=search)
-                | Q(order__contract_number__icontains=search)
-                | Q(order__contract_number_2__icontains=search)
-                | Q(order__contract_number_3__icontains=search)
-                | Q(order__invoice_number__icontains=search)
-                | Q(order__invoice_number_2__icontains=search)
-                | Q(order__invoice_number_3__icontains=search)
-                | Q(order__customer__phone2__icontains=search)
-                | Q(order__customer__email__icontains=search)
-                | Q(order__salesperson__name__icontains=search)
+                order_search_q(search, "order__")
                 | Q(team__name__icontains=search)
-                | Q(order__branch__name__icontains=search)
                 | Q(notes__icontains=search)
                 | Q(status__icontains=search)
                 | Q(scheduled_date__icontains=search)
@@ -2396,11 +2349,7 @@ def print_daily_schedule(request):
 
     # البحث
     if search:
-        installations = installations.filter(
-            models.Q(order__order_number__icontains=search)
-            | models.Q(order__customer__name__icontains=search)
-            | models.Q(order__customer__phone__icontains=search)
-        )
+        installations = installations.filter(order_search_q(search, "order__"))
 
     installations = installations.order_by("scheduled_time")
 
@@ -3681,7 +3630,7 @@ def delete_installation(request, installation_id):
 @login_required
 def debt_orders_list(request):
     """قائمة الطلبات التي عليها مديونية"""
-    from django.db.models import Exists, F, OuterRef, Q
+    from django.db.models import Exists, F, OuterRef
 
     from .models import CustomerDebt
 
@@ -3708,11 +3657,7 @@ def debt_orders_list(request):
         debt_orders_query = debt_orders_query.filter(order_status=order_status_filter)
 
     if search:
-        search_q = (
-            Q(order_number__icontains=search)
-            | Q(customer__name__icontains=search)
-            | Q(customer__phone__icontains=search)
-        )
+        search_q = order_search_q(search)
         debt_orders_query = debt_orders_query.filter(search_q)
 
     # فلتر السنة
@@ -3995,8 +3940,6 @@ def installation_detail_redirect(request, installation_id):
 @login_required
 def daily_schedule(request):
     """عرض الجدول اليومي للتركيبات مع فلاتر محسنة"""
-    from django.db.models import Q
-
     from manufacturing.models import ManufacturingOrder
 
     # نموذج الفلترة
@@ -4042,17 +3985,7 @@ def daily_schedule(request):
 
     # تطبيق فلاتر البحث (يشمل جميع أرقام الفواتير والعقود)
     if search:
-        search_q = (
-            Q(order__order_number__icontains=search)
-            | Q(order__customer__name__icontains=search)
-            | Q(order__customer__phone__icontains=search)
-            | Q(order__contract_number__icontains=search)
-            | Q(order__contract_number_2__icontains=search)
-            | Q(order__contract_number_3__icontains=search)
-            | Q(order__invoice_number__icontains=search)
-            | Q(order__invoice_number_2__icontains=search)
-            | Q(order__invoice_number_3__icontains=search)
-        )
+        search_q = order_search_q(search, "order__")
         installations_query = installations_query.filter(search_q)
 
     # ترتيب النتائج حسب الوقت المجدول
@@ -4276,8 +4209,6 @@ def api_upcoming_installations_filters(request):
 def print_daily_schedule(request):
     """طباعة الجدول اليومي للتركيبات"""
     # نفس منطق daily_schedule ولكن مع template مختلف للطباعة
-    from django.db.models import Q
-
     from manufacturing.models import ManufacturingOrder
 
     # نموذج الفلترة
@@ -4323,17 +4254,7 @@ def print_daily_schedule(request):
 
     # تطبيق فلاتر البحث (يشمل جميع أرقام الفواتير والعقود)
     if search:
-        search_q = (
-            Q(order__order_number__icontains=search)
-            | Q(order__customer__name__icontains=search)
-            | Q(order__customer__phone__icontains=search)
-            | Q(order__contract_number__icontains=search)
-            | Q(order__contract_number_2__icontains=search)
-            | Q(order__contract_number_3__icontains=search)
-            | Q(order__invoice_number__icontains=search)
-            | Q(order__invoice_number_2__icontains=search)
-            | Q(order__invoice_number_3__icontains=search)
-        )
+        search_q = order_search_q(search, "order__")
         installations_query = installations_query.filter(search_q)
 
     # ترتيب النتائج حسب الوقت المجدول
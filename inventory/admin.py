@@ -19,6 +19,7 @@ from .models import (  # Variant System Models
     PurchaseOrder,
     PurchaseOrderItem,
     StockAlert,
+    StockBalance,
     StockTransaction,
     StockTransfer,
     StockTransferItem,
@@ -175,6 +176,20 @@ class StockTransactionAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    list_display = ("product", "warehouse", "quantity", "updated_at")
+    list_filter = ("warehouse",)
+    search_fields = ("product__name", "product__code")
+    list_select_related = ("product", "warehouse")
+    readonly_fields = ("product", "warehouse", "quantity", "updated_at")
+
+    def has_add_permission(self, request):
+        # الأرصدة تُدار من حركات المخزون فقط
+        return False
+
+
 @admin.register(Supplier)
 class SupplierAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_per_page = 50
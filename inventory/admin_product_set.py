@@ -3,6 +3,7 @@ Admin configuration for ProductSet
 """
 
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 
 from .models import ProductSet, ProductSetItem
@@ -58,11 +59,20 @@ class ProductSetAdmin(admin.ModelAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        # عدد المنتجات لكل مجموعة في نفس استعلام القائمة بدلاً من COUNT لكل صف
+        return super().get_queryset(request).annotate(
+            products_count=Count("base_products", distinct=True)
+        )
+
     def get_products_count(self, obj):
-        count = obj.base_products.count()
+        count = getattr(obj, "products_count", None)
+        if count is None:
+            count = obj.base_products.count()
         return format_html('<span style="font-weight:bold">{}</span>', count)
 
     get_products_count.short_description = "عدد المنتجات"
+    get_products_count.admin_order_field = "products_count"
 
     def sync_status(self, obj):
         if obj.cloudflare_synced:
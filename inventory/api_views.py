@@ -24,6 +24,7 @@ from .models import (
     Category,
     Product,
     StockAlert,
+    StockBalance,
     StockTransaction,
     StockTransfer,
     Warehouse,
@@ -333,27 +334,14 @@ def warehouse_stock_summary_api(request, warehouse_id=None):
 
             available_stock = current_stock_sum - out_stock_sum
 
-            # حساب القيمة الإجمالية
-            stock_value = 0
-            last_transactions = (
-                StockTransaction.objects.filter(
-                    warehouse=warehouse, transaction_type="in"
-                )
-                .select_related("product")
-                .order_by("-transaction_date")[:50]
+            # حساب القيمة الإجمالية من أرصدة المستودع باستعلام مجمّع واحد
+            stock_value = float(
+                StockBalance.objects.filter(
+                    warehouse=warehouse, quantity__gt=0
+                ).aggregate(total=Sum(F("quantity") * F("product__price")))["total"]
+                or 0
             )
 
-            for trans in last_transactions:
-                if trans.product and trans.product.price:
-                    # حساب قيمة المنتج بناءً على رصيده الحالي
-                    try:
-                        current_balance = get_cached_stock_level(trans.product.id)
-                        stock_value += float(trans.product.price) * float(
-                            current_balance
-                        )
-                    except Exception:
-                        pass
-
             warehouse_data.append(
                 {
                     "id": warehouse.id,
@@ -403,10 +391,12 @@ def category_stock_analysis_api(request):
             low_stock_count = 0
             out_of_stock_count = 0
 
-            products = category.products.all()[:20]  # محدود للإداء
+            products = Product.objects.filter(category=category).with_stock(
+                per_warehouse=False
+            )[:20]  # محدود للإداء
 
             for product in products:
-                stock_level = get_cached_stock_level(product.id)
+                stock_level = float(product.current_stock)
                 category_stock += stock_level
 
                 if product.price:
@@ -509,13 +499,15 @@ def inventory_value_report_api(request):
             category_stock = 0
             products_in_category = 0
 
-            products = Product.objects.filter(category=category).select_related(
-                "category"
+            products = (
+                Product.objects.filter(category=category)
+                .select_related("category")
+                .with_stock(per_warehouse=False)
             )
 
             for product in products:
                 try:
-                    stock_level = get_cached_stock_level(product.id)
+                    stock_level = float(product.current_stock)
                     if stock_level > 0 and product.price:
                         product_value = Decimal(str(product.price)) * Decimal(
                             str(stock_level)
@@ -546,35 +538,23 @@ def inventory_value_report_api(request):
                     (Decimal(str(cat["total_value"])) / total_inventory_value) * 100, 2
                 )
 
-        # تحليل حسب المستودعات
-        warehouses = Warehouse.objects.filter(is_active=True)
-
-        for warehouse in warehouses:
-            warehouse_value = Decimal("0")
-            warehouse_stock = 0
-
-            # الحصول على المنتجات في المستودع
-            warehouse_transactions = (
-                StockTransaction.objects.filter(
-                    warehouse=warehouse, transaction_type="in"
-                )
-                .values("product_id")
-                .distinct()
+        # تحليل حسب المستودعات — تجميع واحد من جدول الأرصدة
+        warehouse_totals = {
+            row["warehouse_id"]: row
+            for row in StockBalance.objects.filter(quantity__gt=0)
+            .order_by()
+            .values("warehouse_id")
+            .annotate(
+                value=Sum(F("quantity") * F("product__price")),
+                stock=Sum("quantity"),
             )
+        }
+        warehouses = Warehouse.objects.filter(is_active=True).select_related("branch")
 
-            for trans in warehouse_transactions[:50]:  # محدود للأداء
-                try:
-                    product = Product.objects.get(id=trans["product_id"])
-                    stock_level = get_cached_stock_level(product.id)
-
-                    if stock_level > 0 and product.price:
-                        product_value = Decimal(str(product.price)) * Decimal(
-                            str(stock_level)
-                        )
-                        warehouse_value += product_value
-                        warehouse_stock += stock_level
-                except Exception:
-                    pass
+        for warehouse in warehouses:
+            totals = warehouse_totals.get(warehouse.id, {})
+            warehouse_value = Decimal(str(totals.get("value") or 0))
+            warehouse_stock = float(totals.get("stock") or 0)
 
             if warehouse_value > 0:
                 warehouse_breakdown.append(
@@ -596,19 +576,21 @@ def inventory_value_report_api(request):
 
         # إحصائيات إضافية
         total_products = Product.objects.count()
-        products_with_stock = sum(
-            1
-            for p in Product.objects.all()[:100]  # محدود للأداء
-            if get_cached_stock_level(p.id) > 0
+        products_with_stock = (
+            Product.objects.with_stock(per_warehouse=False)
+            .filter(stock_total__gt=0)
+            .count()
         )
 
         low_value_products = []
         high_value_products = []
 
         products_with_values = []
-        for product in Product.objects.select_related("category")[:100]:
+        for product in Product.objects.select_related("category").with_stock(
+            per_warehouse=False
+        )[:100]:
             try:
-                stock_level = get_cached_stock_level(product.id)
+                stock_level = float(product.current_stock)
                 if stock_level > 0 and product.price:
                     product_value = float(product.price) * stock_level
                     products_with_values.append(
@@ -673,32 +655,31 @@ def stock_turnover_analysis_api(request):
         # حساب معدل الدوران لكل منتج
         turnover_data = []
 
-        products = Product.objects.select_related("category")[:50]  # محدود للأداء
+        # المخزون الحالي وإجمالي الدخول/الخروج في الفترة لكل المنتجات باستعلام واحد
+        period = Q(transactions__transaction_date__range=[start_date, end_date])
+        products = (
+            Product.objects.select_related("category")
+            .with_stock(per_warehouse=False)
+            .annotate(
+                period_out=Sum(
+                    "transactions__quantity",
+                    filter=period & Q(transactions__transaction_type="out"),
+                ),
+                period_in=Sum(
+                    "transactions__quantity",
+                    filter=period & Q(transactions__transaction_type="in"),
+                ),
+            )[:50]  # محدود للأداء
+        )
 
         for product in products:
             try:
                 # حساب المخزون الحالي
-                current_stock = get_cached_stock_level(product.id)
-
-                # حساب إجمالي الخروج في الفترة
-                total_out = (
-                    StockTransaction.objects.filter(
-                        product=product,
-                        transaction_type="out",
-                        transaction_date__range=[start_date, end_date],
-                    ).aggregate(total=Sum("quantity"))["total"]
-                    or 0
-                )
+                current_stock = float(product.current_stock)
 
-                # حساب إجمالي الدخول في الفترة
-                total_in = (
-                    StockTransaction.objects.filter(
-                        product=product,
-                        transaction_type="in",
-                        transaction_date__range=[start_date, end_date],
-                    ).aggregate(total=Sum("quantity"))["total"]
-                    or 0
-                )
+                # إجمالي الخروج والدخول في الفترة
+                total_out = float(product.period_out or 0)
+                total_in = float(product.period_in or 0)
 
                 # حساب المخزون المتوسط
                 avg_stock = (
@@ -951,11 +932,13 @@ def reorder_recommendations_api(request):
     try:
         recommendations = []
 
-        products = Product.objects.select_related("category")
+        products = Product.objects.select_related("category").with_stock(
+            per_warehouse=False
+        )
 
         for product in products[:100]:  # محدود للأداء
             try:
-                current_stock = get_cached_stock_level(product.id)
+                current_stock = float(product.current_stock)
 
                 # فحص إذا كان المخزون أقل من الحد الأدنى
                 if current_stock <= product.minimum_stock:
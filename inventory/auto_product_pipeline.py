@@ -326,15 +326,14 @@ def _generate_qr_for_base(base_product):
 # ============================================================
 def _sync_to_cloudflare(base_product):
     """
-    مزامنة المنتج مع Cloudflare KV
+    إضافة المنتج لطابور مزامنة Cloudflare KV
 
-    تشمل:
-    - مزامنة بيانات المنتج
-    - تحديث خريطة الأسماء (Name Map) إذا لزم الأمر
+    ✅ الإرسال الفعلي (بيانات المنتج + خريطة الأسماء) يتم على دفعات من
+    طابور public.sync_outbox، والحفظ المتكرر لنفس الكود يُدمج في صف واحد
     """
     try:
-        from public.cloudflare_sync import get_cloudflare_sync
         from public.models import CloudflareSettings
+        from public.sync_outbox import enqueue_base_products
 
         # التحقق من تفعيل المزامنة
         try:
@@ -345,94 +344,13 @@ def _sync_to_cloudflare(base_product):
             if not getattr(settings, "CLOUDFLARE_SYNC_ENABLED", False):
                 return
 
-        sync = get_cloudflare_sync()
-        if not sync.is_configured():
-            return
-
-        # مزامنة المنتج
-        result = sync.sync_product(base_product)
-        if result:
-            logger.info(f"☁️ Cloudflare synced: {base_product.code}")
-
-            # تحديث خريطة الأسماء إذا كان للمنتج اسم مختلف عن الكود
-            _update_name_map_entry(base_product, sync)
-        else:
-            logger.warning(f"⚠️ Cloudflare sync failed for {base_product.code}")
+        if enqueue_base_products([base_product]):
+            logger.info(f"☁️ Cloudflare sync queued: {base_product.code}")
 
     except Exception as e:
         logger.error(f"❌ Cloudflare sync error for {base_product.code}: {e}")
 
 
-def _update_name_map_entry(base_product, sync=None):
-    """
-    تحديث إدخال واحد في خريطة الأسماء (Name Map) في Cloudflare KV
-
-    هذا يضمن أن QR codes القديمة (التي تحمل الاسم) تعمل مع الأكواد الجديدة
-    """
-    try:
-        if sync is None:
-            from public.cloudflare_sync import get_cloudflare_sync
-            sync = get_cloudflare_sync()
-
-        if not sync.is_configured():
-            return
-
-        # جلب الأسماء القديمة من المتغيرات المرتبطة
-        from inventory.models import ProductVariant
-        variants = ProductVariant.objects.filter(
-            base_product=base_product,
-            legacy_product__isnull=False
-        ).select_related("legacy_product")
-
-        names_to_add = {}
-
-        # اسم المنتج الأساسي كمفتاح → الكود كقيمة
-        if base_product.name and base_product.name != base_product.code:
-            names_to_add[base_product.name] = base_product.code
-            names_to_add[base_product.name.upper()] = base_product.code
-
-        # أسماء المنتجات القديمة المرتبطة
-        for variant in variants:
-            if variant.legacy_product and variant.legacy_product.name:
-                old_name = variant.legacy_product.name
-                if old_name != base_product.code:
-                    names_to_add[old_name] = base_product.code
-                    names_to_add[old_name.upper()] = base_product.code
-
-        if not names_to_add:
-            return
-
-        # إرسال تحديث خريطة الأسماء الجزئي
-        import requests
-        try:
-            response = requests.post(
-                f"{sync.worker_url}/sync",
-                json={
-                    "action": "update_name_map",
-                    "entries": names_to_add,
-                },
-                headers={
-                    "Content-Type": "application/json",
-                    "X-Sync-API-Key": sync.api_key,
-                },
-                timeout=15,
-            )
-            if response.status_code == 200:
-                logger.info(
-                    f"📝 Name map updated for {base_product.code}: "
-                    f"{len(names_to_add)} entries"
-                )
-            else:
-                logger.warning(
-                    f"⚠️ Name map update failed: {response.status_code}"
-                )
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"⚠️ Name map update request failed: {e}")
-
-    except Exception as e:
-        logger.error(f"❌ Name map update error: {e}")
-
-
 # ============================================================
 # نقاط الدخول للـ Signals
 # ============================================================
@@ -478,10 +396,10 @@ def on_product_deleted(product_code):
 
 
 def _handle_product_deletion(product_code):
-    """حذف المنتج من Cloudflare"""
+    """إضافة حذف المنتج لطابور Cloudflare"""
     try:
-        from public.cloudflare_sync import get_cloudflare_sync
         from public.models import CloudflareSettings
+        from public.sync_outbox import enqueue_delete
 
         try:
             cf_settings = CloudflareSettings.get_settings()
@@ -491,10 +409,8 @@ def _handle_product_deletion(product_code):
             if not getattr(settings, "CLOUDFLARE_SYNC_ENABLED", False):
                 return
 
-        sync = get_cloudflare_sync()
-        if sync.is_configured():
-            sync.delete_product(product_code)
-            logger.info(f"🗑️ Product {product_code} deleted from Cloudflare")
+        if enqueue_delete(product_code):
+            logger.info(f"🗑️ Product {product_code} queued for Cloudflare deletion")
 
     except Exception as e:
         logger.error(f"❌ Delete from Cloudflare error for {product_code}: {e}")
@@ -583,9 +499,9 @@ def _run_bulk_pipeline(product_ids):
     """
     import time
 
-    from inventory.models import BaseProduct, Product, ProductVariant
-    from public.cloudflare_sync import get_cloudflare_sync
+    from inventory.models import Product, ProductVariant
     from public.models import CloudflareSettings
+    from public.sync_outbox import enqueue_base_products
 
     logger.info(f"🚀 Bulk pipeline started for {len(product_ids)} products")
 
@@ -597,13 +513,10 @@ def _run_bulk_pipeline(product_ids):
     except Exception:
         cf_enabled = getattr(settings, "CLOUDFLARE_SYNC_ENABLED", False)
 
-    sync = get_cloudflare_sync() if cf_enabled else None
-
     migrated_count = 0
     qr_count = 0
     synced_count = 0
     batch_size = 20
-    name_map_entries = {}
 
     for i in range(0, len(product_ids), batch_size):
         batch_ids = product_ids[i:i + batch_size]
@@ -645,29 +558,13 @@ def _run_bulk_pipeline(product_ids):
                                 qr_count += 1
 
                         base_products_to_sync.append(base_product)
-
-                        # تجميع إدخالات خريطة الأسماء
-                        if base_product.name and base_product.name != base_product.code:
-                            name_map_entries[base_product.name] = base_product.code
-                            name_map_entries[base_product.name.upper()] = base_product.code
-
                 except Exception as e:
                     logger.error(f"❌ Bulk pipeline error for product {product.code}: {e}")
 
-            # مزامنة الدفعة مع Cloudflare
-            if sync and sync.is_configured() and base_products_to_sync:
+            # إضافة الدفعة لطابور Cloudflare (يُرسل بـ sync_all مع خريطة الأسماء)
+            if cf_enabled and base_products_to_sync:
                 try:
-                    formatted = [sync.format_base_product(bp) for bp in base_products_to_sync]
-                    data = {"action": "sync_all", "products": formatted}
-                    if sync._send_request(data):
-                        synced_count += len(formatted)
-                        # تحديث حالة المزامنة
-                        from django.utils import timezone
-                        bp_ids = [bp.pk for bp in base_products_to_sync]
-                        BaseProduct.objects.filter(pk__in=bp_ids).update(
-                            cloudflare_synced=True,
-                            last_synced_at=timezone.now()
-                        )
+                    synced_count += enqueue_base_products(base_products_to_sync)
                 except Exception as e:
                     logger.error(f"❌ Bulk Cloudflare sync error: {e}")
 
@@ -678,29 +575,8 @@ def _run_bulk_pipeline(product_ids):
         if i + batch_size < len(product_ids):
             time.sleep(0.5)
 
-    # إرسال خريطة الأسماء دفعة واحدة
-    if sync and sync.is_configured() and name_map_entries:
-        try:
-            import requests
-            response = requests.post(
-                f"{sync.worker_url}/sync",
-                json={
-                    "action": "update_name_map",
-                    "entries": name_map_entries,
-                },
-                headers={
-                    "Content-Type": "application/json",
-                    "X-Sync-API-Key": sync.api_key,
-                },
-                timeout=30,
-            )
-            if response.status_code == 200:
-                logger.info(f"📝 Bulk name map updated: {len(name_map_entries)} entries")
-        except Exception as e:
-            logger.warning(f"⚠️ Bulk name map update failed: {e}")
-
     logger.info(
         f"✅ Bulk pipeline complete: "
         f"{migrated_count} migrated, {qr_count} QR generated, "
-        f"{synced_count} synced to Cloudflare"
+        f"{synced_count} queued for Cloudflare"
     )
@@ -0,0 +1,955 @@
+"""
+محرك الرفع الجماعي للمنتجات (COPY + SQL جماعي)
+================================================
+مهام الرفع السابقة كانت تقرأ ملف Excel كاملاً بـ pandas وتمر عليه صفاً
+صفاً بـ iterrows()، وتحمّل كل المنتجات في dict، وتعطّل كل receivers الخاصة
+بـ post_save/pre_save على مستوى العملية — فتتعطل الإشارات لطلبات المستخدمين
+الآخرين على نفس الـ worker طوال مدة الرفع.
+
+المحرك الجديد:
+1. يقرأ الملف بوضع openpyxl read_only على دفعات (CHUNK_ROWS صف) دون تحميله كاملاً
+2. ينظف الأعمدة بعمليات pandas متجهة (vectorised) — بدون حلقة لكل صف
+3. ينسخ الدفعة إلى جدول مؤقت بـ COPY ثم يطبق كل شيء بأوامر SQL جماعية:
+   مطابقة الأكواد، إنشاء/تحديث المنتجات، حركات المخزون، الرصيد المتحرك
+   وجدول StockBalance
+4. لا يعطّل أي إشارة: الكتابة تتم بـ SQL مباشرة، وما كانت الإشارات تفعله
+   (التنبيهات، VariantStock، الكاش، أوامر التقطيع، خط الإنتاج التلقائي) يُنفَّذ صراحة
+   مرة واحدة بعد انتهاء الرفع في _run_post_upload_hooks
+5. يحدّث BulkUploadLog ويسجل BulkUploadError لكل صف بعد كل دفعة
+
+يدعم أوضاع الرفع: smart_update و merge_warehouses (تحديث الحقول الممتلئة
+وإضافة الكمية)، add_only (تخطي الموجود)، clean_start (مسح كامل ثم إنشاء).
+يتطلب PostgreSQL.
+"""
+
+import io
+import logging
+from io import BytesIO
+
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 5000
+ERROR_BATCH_SIZE = 1000
+
+# الحقول وأسماء أعمدتها المقبولة في ملف Excel
+COLUMN_ALIASES = {
+    "name": ["اسم المنتج", "الاسم", "product_name", "name"],
+    "code": ["الكود", "كود المنتج", "product_code", "code"],
+    "category": ["الفئة", "category"],
+    "price": ["السعر", "price"],
+    "wholesale_price": ["سعر الجملة", "wholesale_price"],
+    "quantity": ["الكمية", "quantity"],
+    "warehouse": ["المستودع", "warehouse"],
+    "description": ["الوصف", "description"],
+    "minimum_stock": ["الحد الأدنى", "minimum_stock"],
+    "material": ["الخامة", "Material", "material"],
+    "width": ["العرض", "Width", "width"],
+    "currency": ["العملة", "currency"],
+    "unit": ["الوحدة", "unit"],
+}
+
+# ترتيب الأعمدة في القالب المُولّد (download_excel_template) لملفات بدون عناوين معروفة
+TEMPLATE_POSITIONS = {
+    "name": 0,
+    "code": 1,
+    "category": 2,
+    "price": 3,
+    "wholesale_price": 4,
+    "quantity": 5,
+    "warehouse": 6,
+    "description": 7,
+    "minimum_stock": 8,
+    "material": 9,
+    "width": 10,
+    "currency": 11,
+    "unit": 12,
+}
+
+TEXT_LIMITS = {"name": 255, "code": 100, "material": 100, "width": 50}
+VALID_CURRENCIES = {"EGP", "USD", "EUR", "SAR"}
+VALID_UNITS = {"piece", "kg", "gram", "liter", "meter", "box", "pack", "dozen", "roll", "sheet"}
+UNIT_MAP = {
+    "قطعة": "piece",
+    "كيلوجرام": "kg",
+    "جرام": "gram",
+    "لتر": "liter",
+    "متر": "meter",
+    "علبة": "box",
+    "عبوة": "pack",
+    "دستة": "dozen",
+    "لفة": "roll",
+    "ورقة": "sheet",
+}
+EMPTY_MARKERS = {"", "nan", "none", "nat", "null"}
+ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩٫", "0123456789.")
+
+# أعمدة الجدول المؤقت بالترتيب الذي يُكتب به COPY
+STAGE_COLUMNS = [
+    "row_number",
+    "code",
+    "name",
+    "category_id",
+    "price",
+    "wholesale_price",
+    "quantity",
+    "warehouse_id",
+    "description",
+    "minimum_stock",
+    "material",
+    "width",
+    "currency",
+    "unit",
+]
+
+_STAGE_TABLE_SQL = """
+    CREATE TEMP TABLE bulk_product_stage (
+        row_number integer NOT NULL,
+        code varchar(100),
+        name varchar(255),
+        category_id bigint,
+        price numeric(18, 2),
+        wholesale_price numeric(18, 2),
+        quantity numeric(18, 2),
+        warehouse_id bigint,
+        description text,
+        minimum_stock integer,
+        material varchar(100),
+        width varchar(50),
+        currency varchar(3),
+        unit varchar(10),
+        product_id bigint,
+        is_new boolean NOT NULL DEFAULT false,
+        status varchar(10) NOT NULL DEFAULT '',
+        moved_quantity numeric(18, 2) NOT NULL DEFAULT 0
+    ) ON COMMIT DROP
+"""
+
+RESULT_MESSAGES = {
+    "created": "تم الإنشاء",
+    "updated": "تم التحديث",
+    "missing": "منتج جديد ولكن الاسم مفقود - يرجى إضافة الاسم ليتمكن النظام من إنشائه",
+}
+
+
+# ============================================
+# القراءة والتنظيف
+# ============================================
+
+
+def resolve_columns(header):
+    """
+    تحديد رقم العمود لكل حقل من صف العناوين.
+    إذا لم يُعرف أي عنوان يُعتمد ترتيب القالب المُولّد.
+    """
+    names = [str(value).strip() if value is not None else "" for value in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+
+    if not columns:
+        columns = {
+            field: position
+            for field, position in TEMPLATE_POSITIONS.items()
+            if position < len(names)
+        }
+    return columns
+
+
+def _text(series):
+    """نص منظف: مسافات مقصوصة والقيم الفارغة/nan تصبح <NA>"""
+    text = series.astype("string").str.strip()
+    return text.mask(text.str.lower().isin(EMPTY_MARKERS))
+
+
+def _number(series):
+    """رقم مع تحويل الأرقام العربية؛ القيم غير الصالحة تصبح NaN"""
+    text = series.astype("string").str.strip().str.translate(ARABIC_DIGITS)
+    return pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce")
+
+
+def _code(series):
+    """
+    الكود كنص: الأرقام الصحيحة المقروءة كـ float (123.0) تعود 123،
+    والأكواد الرقمية تُزال أصفارها البادئة (المطابقة مع الأكواد المبطّنة تتم في SQL)
+    """
+    numeric = pd.to_numeric(series, errors="coerce")
+    integral = numeric.notna() & (numeric % 1 == 0)
+    code = _text(series)
+    if integral.any():
+        code = code.mask(integral, numeric[integral].astype("int64").astype("string"))
+    code = code.str.translate(ARABIC_DIGITS)
+    digits = code.str.fullmatch(r"\d+").fillna(False)
+    stripped = code.str.lstrip("0")
+    stripped = stripped.mask((stripped == "").fillna(False), "0")
+    return code.mask(digits, stripped)
+
+
+def normalize_frame(frame, columns, first_row_number):
+    """
+    تحويل دفعة خام (أعمدة بأرقامها) إلى إطار موحد بأعمدة الحقول.
+    الصفوف بدون كود ولا اسم تُحذف. category و warehouse تبقى أسماءً هنا.
+    """
+
+    def column(field):
+        index = columns.get(field)
+        if index is None or index >= frame.shape[1]:
+            return pd.Series(pd.NA, index=frame.index, dtype="object")
+        return frame.iloc[:, index]
+
+    out = pd.DataFrame(index=frame.index)
+    out["row_number"] = pd.RangeIndex(first_row_number, first_row_number + len(frame))
+    out["code"] = _code(column("code"))
+    out["name"] = _text(column("name"))
+    out["category"] = _text(column("category"))
+    out["price"] = _number(column("price"))
+    out["wholesale_price"] = _number(column("wholesale_price"))
+    out["quantity"] = _number(column("quantity")).fillna(0).clip(lower=0)
+    out["warehouse"] = _text(column("warehouse"))
+    out["description"] = _text(column("description"))
+    out["minimum_stock"] = _number(column("minimum_stock")).clip(lower=0).floordiv(1)
+    out["minimum_stock"] = out["minimum_stock"].astype("Int64")
+    out["material"] = _text(column("material"))
+
+    width = _text(column("width"))
+    numeric_width = width.str.fullmatch(r"\d+(\.\d+)?").fillna(False)
+    out["width"] = width.mask(numeric_width, width + " cm")
+
+    currency = _text(column("currency")).str.upper()
+    out["currency"] = currency.where(currency.isin(VALID_CURRENCIES))
+
+    unit = _text(column("unit"))
+    unit = unit.mask(unit.isin(list(UNIT_MAP)), unit.map(UNIT_MAP))
+    out["unit"] = unit.where(unit.isin(VALID_UNITS))
+
+    for field, limit in TEXT_LIMITS.items():
+        out[field] = out[field].str.slice(0, limit)
+
+    # الأسعار غير الموجبة تعني "بدون تغيير"
+    for field in ("price", "wholesale_price"):
+        out[field] = out[field].where(out[field] > 0)
+
+    return out[out["code"].notna() | out["name"].notna()]
+
+
+def iter_sheet_chunks(file_content, chunk_rows=CHUNK_ROWS):
+    """
+    قراءة الورقة الأولى على دفعات: (columns, إطار خام، رقم أول صف في Excel).
+    openpyxl بوضع read_only لا يحمّل الملف كاملاً؛ ملفات xls القديمة تُقرأ بـ pandas.
+    """
+    try:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(BytesIO(file_content), read_only=True, data_only=True)
+    except Exception:
+        frame = pd.read_excel(BytesIO(file_content), header=None, dtype=object)
+        if frame.empty:
+            return
+        columns = resolve_columns(list(frame.iloc[0]))
+        for start in range(1, len(frame), chunk_rows):
+            yield columns, frame.iloc[start : start + chunk_rows].reset_index(drop=True), start + 1
+        return
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = resolve_columns(header)
+
+        chunk = []
+        first_row_number = 2
+        for values in rows:
+            chunk.append(values)
+            if len(chunk) >= chunk_rows:
+                yield columns, pd.DataFrame(chunk, dtype=object), first_row_number
+                first_row_number += len(chunk)
+                chunk = []
+        if chunk:
+            yield columns, pd.DataFrame(chunk, dtype=object), first_row_number
+    finally:
+        workbook.close()
+
+
+def estimate_total_rows(file_content):
+    """عدد الصفوف التقريبي من أبعاد الورقة (بدون قراءة البيانات)"""
+    try:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(BytesIO(file_content), read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max(int(max_row or 1) - 1, 0)
+    except Exception:
+        return 0
+
+
+# ============================================
+# المحرك
+# ============================================
+
+
+class ProductBulkUploadEngine:
+    """
+    رفع المنتجات على دفعات عبر جدول مؤقت و SQL جماعي.
+
+    engine = ProductBulkUploadEngine(upload_log, user, warehouse, upload_mode)
+    stats = engine.run(file_content, progress=callback)
+    """
+
+    def __init__(self, upload_log, user, warehouse=None, upload_mode="smart_update"):
+        self.upload_log = upload_log
+        self.user = user
+        self.warehouse = warehouse
+        self.upload_mode = upload_mode
+        self.stats = {
+            "processed": 0,
+            "created": 0,
+            "updated": 0,
+            "skipped": 0,
+            "errors": 0,
+            "stock_rows": 0,
+        }
+        self.affected_product_ids = set()
+        self.moved_pairs = set()
+        self._categories = None
+        self._warehouses = None
+        self._default_warehouse_id = None
+
+    # ---------- الواجهة ----------
+
+    def run(self, file_content, progress=None):
+        """تنفيذ الرفع كاملاً ثم خطوات ما بعد الرفع؛ يعيد الإحصائيات"""
+        if connection.vendor != "postgresql":
+            raise RuntimeError("محرك الرفع الجماعي يتطلب PostgreSQL (COPY)")
+
+        if self.upload_mode == "clean_start":
+            from .smart_upload_logic import clean_start_reset
+
+            logger.warning("⚠️ وضع المسح الكامل")
+            reset_stats = clean_start_reset()
+            self.upload_log.summary = (
+                f"مسح كامل: {reset_stats['deleted_products']} منتج، "
+                f"{reset_stats['deleted_transactions']} معاملة"
+            )
+            self.upload_log.save(update_fields=["summary"])
+
+        for columns, raw, first_row_number in iter_sheet_chunks(file_content):
+            frame = normalize_frame(raw, columns, first_row_number)
+            self.stats["processed"] += len(raw)
+            if not frame.empty:
+                self._process_chunk(frame)
+            logger.info(
+                f"⚡ {self.stats['processed']} صف: {self.stats['created']} جديد، "
+                f"{self.stats['updated']} محدث، {self.stats['errors']} خطأ"
+            )
+            if progress:
+                progress(self.stats)
+
+        self._run_post_upload_hooks()
+        return self.stats
+
+    # ---------- الحل المسبق للفئات والمستودعات ----------
+
+    def _category_ids(self, names):
+        from .models import Category
+
+        if self._categories is None:
+            self._categories = {}
+            for category_id, name in Category.objects.values_list("id", "name"):
+                self._categories.setdefault(name.strip(), category_id)
+
+        for name in names:
+            if name not in self._categories:
+                self._categories[name] = Category.objects.create(name=name[:100]).pk
+        return self._categories
+
+    def _warehouse_ids(self, names):
+        from .models import Warehouse
+        from .views_bulk import get_or_create_warehouse
+
+        if self._warehouses is None:
+            self._warehouses = {}
+            for warehouse_id, name in Warehouse.objects.filter(is_active=True).values_list(
+                "id", "name"
+            ):
+                self._warehouses.setdefault(name.strip(), warehouse_id)
+
+        for name in names:
+            if name not in self._warehouses:
+                warehouse = get_or_create_warehouse(name, self.user)
+                self._warehouses[name] = warehouse.pk if warehouse else None
+        return self._warehouses
+
+    def _fallback_warehouse_id(self):
+        """المستودع الافتراضي للمنتجات الموجودة بدون مستودع ولا حركات سابقة"""
+        from .models import Warehouse
+
+        if self._default_warehouse_id is None:
+            self._default_warehouse_id = (
+                Warehouse.objects.filter(is_active=True).values_list("id", flat=True).first()
+                or 0
+            )
+        return self._default_warehouse_id or None
+
+    def _stage_frame(self, frame):
+        """تحويل أسماء الفئات والمستودعات إلى معرفات (خريطة واحدة لكل دفعة)"""
+        categories = frame["category"].dropna().unique()
+        warehouses = frame["warehouse"].dropna().unique()
+
+        staged = frame.copy()
+        staged["category_id"] = (
+            frame["category"].map(self._category_ids(categories)).astype("Int64")
+            if len(categories)
+            else pd.Series(pd.NA, index=frame.index, dtype="Int64")
+        )
+        warehouse_ids = (
+            frame["warehouse"].map(self._warehouse_ids(warehouses)).astype("Int64")
+            if len(warehouses)
+            else pd.Series(pd.NA, index=frame.index, dtype="Int64")
+        )
+        if self.warehouse:
+            warehouse_ids = warehouse_ids.fillna(self.warehouse.pk)
+        staged["warehouse_id"] = warehouse_ids
+        return staged[STAGE_COLUMNS]
+
+    # ---------- معالجة الدفعة ----------
+
+    def _process_chunk(self, frame):
+        staged = self._stage_frame(frame)
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(_STAGE_TABLE_SQL)
+                    self._copy(cursor, staged)
+                    self._match_products(cursor)
+                    self._apply_products(cursor)
+                    self._apply_stock(cursor)
+                    results = self._collect_results(cursor)
+                self._save_results(results)
+        except Exception as e:
+            logger.error(f"❌ فشل دفعة الرفع (الصفوف {frame['row_number'].min()}+): {e}")
+            self._save_chunk_failure(frame, e)
+
+    def _copy(self, cursor, staged):
+        buffer = io.StringIO()
+        staged.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(
+            f"COPY bulk_product_stage ({', '.join(STAGE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+    def _match_products(self, cursor):
+        """مطابقة الأكواد مع المنتجات (تطابق تام ثم أكواد رقمية بأصفار بادئة)"""
+        product_table = self._table("Product")
+        cursor.execute(
+            f"""
+            UPDATE bulk_product_stage s SET product_id = p.id
+            FROM {product_table} p
+            WHERE p.code = s.code AND NOT p.is_deleted
+            """
+        )
+        cursor.execute(
+            f"""
+            UPDATE bulk_product_stage s SET product_id = p.id
+            FROM {product_table} p
+            WHERE s.product_id IS NULL
+              AND s.code ~ '^[0-9]+$'
+              AND p.code ~ '^0+[0-9]+$'
+              AND ltrim(p.code, '0') = s.code
+              AND NOT p.is_deleted
+            """
+        )
+
+        if self.upload_mode == "add_only":
+            cursor.execute(
+                "UPDATE bulk_product_stage SET status = 'skipped' WHERE product_id IS NOT NULL"
+            )
+
+        # منتج جديد لا يحمل أي صف من صفوفه اسماً
+        cursor.execute(
+            """
+            UPDATE bulk_product_stage s SET status = 'missing'
+            WHERE s.product_id IS NULL AND s.name IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM bulk_product_stage o
+                  WHERE o.code = s.code AND o.name IS NOT NULL
+              )
+            """
+        )
+
+        # حجز معرفات المنتجات الجديدة من تسلسل الجدول: معرف لكل كود، ولكل صف بدون كود
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [self._table("Product", False)])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            WITH new_codes AS (
+                SELECT code, nextval(%s) AS id
+                FROM (
+                    SELECT DISTINCT code FROM bulk_product_stage
+                    WHERE product_id IS NULL AND status = '' AND code IS NOT NULL
+                ) c
+            )
+            UPDATE bulk_product_stage s SET product_id = n.id, is_new = true
+            FROM new_codes n
+            WHERE s.code = n.code AND s.product_id IS NULL AND s.status = ''
+            """,
+            [sequence],
+        )
+        cursor.execute(
+            """
+            UPDATE bulk_product_stage SET product_id = nextval(%s), is_new = true
+            WHERE product_id IS NULL AND status = '' AND code IS NULL
+            """,
+            [sequence],
+        )
+
+    def _apply_products(self, cursor):
+        """إنشاء المنتجات الجديدة وتحديث الحقول الممتلئة فقط للمنتجات الموجودة"""
+        product_table = self._table("Product")
+        now = timezone.now()
+        user_id = self.user.pk if self.user else None
+
+        cursor.execute(
+            f"""
+            INSERT INTO {product_table} (
+                id, name, code, price, wholesale_price, currency, unit, category_id,
+                description, minimum_stock, material, width, created_at, updated_at,
+                created_by_id, updated_by_id, is_deleted
+            )
+            SELECT DISTINCT ON (product_id)
+                product_id, COALESCE(name, code, 'منتج جديد بدون اسم'), code,
+                COALESCE(price, 0), COALESCE(wholesale_price, 0),
+                COALESCE(currency, 'EGP'), COALESCE(unit, 'piece'), category_id,
+                COALESCE(description, ''), COALESCE(minimum_stock, 0),
+                COALESCE(material, ''), COALESCE(width, ''), %s, %s, %s, %s, false
+            FROM bulk_product_stage
+            WHERE is_new
+            ORDER BY product_id, (name IS NULL), row_number DESC
+            """,
+            [now, now, user_id, user_id],
+        )
+
+        if self.upload_mode != "add_only":
+            cursor.execute(
+                f"""
+                UPDATE {product_table} p SET
+                    name = COALESCE(s.name, p.name),
+                    price = COALESCE(s.price, p.price),
+                    wholesale_price = COALESCE(s.wholesale_price, p.wholesale_price),
+                    category_id = COALESCE(s.category_id, p.category_id),
+                    description = COALESCE(s.description, p.description),
+                    minimum_stock = COALESCE(s.minimum_stock, p.minimum_stock),
+                    currency = COALESCE(s.currency, p.currency),
+                    unit = COALESCE(s.unit, p.unit),
+                    material = COALESCE(s.material, p.material),
+                    width = COALESCE(s.width, p.width),
+                    updated_at = %s,
+                    updated_by_id = COALESCE(%s, p.updated_by_id)
+                FROM (
+                    SELECT DISTINCT ON (product_id) *
+                    FROM bulk_product_stage
+                    WHERE NOT is_new AND product_id IS NOT NULL AND status = ''
+                    ORDER BY product_id, row_number DESC
+                ) s
+                WHERE p.id = s.product_id
+                """,
+                [now, user_id],
+            )
+
+        # أول صف لكل منتج جديد "تم الإنشاء" والصفوف المكررة بعده "تم التحديث"
+        cursor.execute(
+            """
+            UPDATE bulk_product_stage s
+            SET status = CASE
+                WHEN s.is_new AND s.row_number = f.first_row THEN 'created'
+                ELSE 'updated'
+            END
+            FROM (
+                SELECT product_id, MIN(row_number) AS first_row
+                FROM bulk_product_stage WHERE status = '' GROUP BY product_id
+            ) f
+            WHERE s.product_id = f.product_id AND s.status = ''
+            """
+        )
+
+    def _apply_stock(self, cursor):
+        """
+        حركات الوارد للكميات: insert واحد برصيد متحرك محسوب بدالة نافذة فوق
+        رصيد StockBalance الحالي، ثم upsert واحد لجدول الأرصدة.
+        """
+        transaction_table = self._table("StockTransaction")
+        balance_table = self._table("StockBalance")
+        now = timezone.now()
+        user_id = self.user.pk if self.user else None
+
+        # المنتجات الموجودة بدون مستودع: آخر مستودع استُخدم ثم المستودع الافتراضي
+        cursor.execute(
+            f"""
+            UPDATE bulk_product_stage s SET warehouse_id = t.warehouse_id
+            FROM (
+                SELECT DISTINCT ON (product_id) product_id, warehouse_id
+                FROM {transaction_table}
+                WHERE warehouse_id IS NOT NULL AND product_id IN (
+                    SELECT product_id FROM bulk_product_stage
+                    WHERE warehouse_id IS NULL AND NOT is_new AND quantity > 0
+                )
+                ORDER BY product_id, transaction_date DESC, id DESC
+            ) t
+            WHERE s.product_id = t.product_id AND s.warehouse_id IS NULL AND NOT s.is_new
+            """
+        )
+        fallback_id = self._fallback_warehouse_id()
+        if fallback_id:
+            cursor.execute(
+                """
+                UPDATE bulk_product_stage SET warehouse_id = %s
+                WHERE warehouse_id IS NULL AND NOT is_new AND quantity > 0
+                """,
+                [fallback_id],
+            )
+
+        cursor.execute(
+            """
+            UPDATE bulk_product_stage SET moved_quantity = quantity
+            WHERE status IN ('created', 'updated') AND quantity > 0
+              AND warehouse_id IS NOT NULL
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {transaction_table} (
+                product_id, warehouse_id, transaction_type, reason, quantity, reference,
+                transaction_date, date, notes, running_balance, created_by_id
+            )
+            SELECT
+                s.product_id, s.warehouse_id, 'in', 'purchase', s.moved_quantity,
+                'رفع سريع', %s, %s,
+                CASE WHEN s.is_new THEN 'إنشاء من Excel' ELSE 'رفع سريع من Excel' END,
+                COALESCE(b.quantity, 0) + SUM(s.moved_quantity) OVER (
+                    PARTITION BY s.product_id, s.warehouse_id ORDER BY s.row_number
+                ),
+                %s
+            FROM bulk_product_stage s
+            LEFT JOIN {balance_table} b
+              ON b.product_id = s.product_id AND b.warehouse_id = s.warehouse_id
+            WHERE s.moved_quantity > 0
+            ORDER BY s.row_number
+            """,
+            [now, now, user_id],
+        )
+        self.stats["stock_rows"] += cursor.rowcount
+
+        cursor.execute(
+            f"""
+            INSERT INTO {balance_table} (product_id, warehouse_id, quantity, updated_at)
+            SELECT product_id, warehouse_id, SUM(moved_quantity), %s
+            FROM bulk_product_stage
+            WHERE moved_quantity > 0
+            GROUP BY product_id, warehouse_id
+            ON CONFLICT (product_id, warehouse_id) DO UPDATE
+            SET quantity = {balance_table}.quantity + EXCLUDED.quantity,
+                updated_at = EXCLUDED.updated_at
+            """,
+            [now],
+        )
+
+        # سلاسل فيها حركات بتاريخ لاحق: إعادة حساب رصيدها المتحرك كاملاً
+        cursor.execute(
+            f"""
+            SELECT DISTINCT t.product_id, t.warehouse_id
+            FROM {transaction_table} t
+            JOIN bulk_product_stage s
+              ON s.product_id = t.product_id AND s.warehouse_id = t.warehouse_id
+            WHERE s.moved_quantity > 0 AND t.transaction_date > %s
+            """,
+            [now],
+        )
+        later_pairs = cursor.fetchall()
+        if later_pairs:
+            from .running_balance import recalculate_running_balances
+
+            recalculate_running_balances(later_pairs)
+
+    def _collect_results(self, cursor):
+        cursor.execute(
+            """
+            SELECT row_number, code, name, status, product_id, warehouse_id, moved_quantity
+            FROM bulk_product_stage ORDER BY row_number
+            """
+        )
+        return cursor.fetchall()
+
+    # ---------- التقارير ----------
+
+    def _save_results(self, results):
+        from .models import BulkUploadError
+
+        records = []
+        for row_number, code, name, status, product_id, warehouse_id, moved in results:
+            if status == "missing":
+                self.stats["errors"] += 1
+                records.append(
+                    BulkUploadError(
+                        upload_log=self.upload_log,
+                        row_number=row_number,
+                        error_type="missing_data",
+                        result_status="failed",
+                        error_message=RESULT_MESSAGES["missing"],
+                        row_data={"code": code},
+                    )
+                )
+                continue
+
+            self.stats[status] += 1
+            if status in ("created", "updated"):
+                self.affected_product_ids.add(product_id)
+            if moved:
+                self.moved_pairs.add((product_id, warehouse_id))
+            records.append(
+                BulkUploadError(
+                    upload_log=self.upload_log,
+                    row_number=row_number,
+                    error_type="other",
+                    result_status=status,
+                    error_message=RESULT_MESSAGES.get(status, f"منتج موجود: {code}"),
+                    row_data={"name": name or code or "بدون اسم", "code": code},
+                )
+            )
+        BulkUploadError.objects.bulk_create(records, batch_size=ERROR_BATCH_SIZE)
+
+    def _save_chunk_failure(self, frame, error):
+        from .models import BulkUploadError
+
+        self.stats["errors"] += len(frame)
+        try:
+            BulkUploadError.objects.bulk_create(
+                [
+                    BulkUploadError(
+                        upload_log=self.upload_log,
+                        row_number=int(row_number),
+                        error_type="processing",
+                        result_status="failed",
+                        error_message=str(error)[:500],
+                        row_data={},
+                    )
+                    for row_number in frame["row_number"]
+                ],
+                batch_size=ERROR_BATCH_SIZE,
+            )
+        except Exception as save_error:
+            logger.error(f"⚠️ فشل حفظ الأخطاء: {save_error}")
+
+    # ---------- ما بعد الرفع ----------
+
+    def _run_post_upload_hooks(self):
+        """
+        ما كانت إشارات post_save تفعله لكل منتج/حركة، مرة واحدة للرفع كله:
+        حل تنبيهات النفاذ، مزامنة VariantStock، مسح الكاش، إعادة توزيع أوامر
+        التقطيع، وخط الإنتاج التلقائي
+        """
+        for hook in (
+            self._resolve_stock_alerts,
+            self._sync_variant_stock,
+            self._invalidate_caches,
+            self._refresh_cutting_orders,
+            self._start_product_pipeline,
+        ):
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"⚠️ فشل خطوة ما بعد الرفع {hook.__name__}: {e}")
+
+    def _resolve_stock_alerts(self):
+        from django.db.models import Sum
+
+        from .models import StockAlert, StockBalance
+
+        product_ids = {product_id for product_id, _ in self.moved_pairs}
+        if not product_ids:
+            return
+        available = (
+            StockBalance.objects.filter(
+                product_id__in=product_ids,
+                warehouse__is_active=True,
+                warehouse__is_deleted=False,
+            )
+            .values("product_id")
+            .annotate(total=Sum("quantity"))
+            .filter(total__gt=0)
+            .values("product_id")
+        )
+        resolved = StockAlert.objects.filter(
+            product_id__in=available, alert_type="out_of_stock", status="active"
+        ).update(status="resolved", resolved_at=timezone.now(), resolved_by=self.user)
+        if resolved:
+            logger.info(f"✅ تم حل {resolved} تنبيه نفاذ بعد الرفع الجماعي")
+
+    def _sync_variant_stock(self):
+        from .models import ProductVariant, StockBalance, VariantStock
+
+        if not self.moved_pairs:
+            return
+        product_ids = {product_id for product_id, _ in self.moved_pairs}
+        variants = dict(
+            ProductVariant.objects.filter(legacy_product_id__in=product_ids).values_list(
+                "legacy_product_id", "id"
+            )
+        )
+        if not variants:
+            return
+
+        balances = StockBalance.objects.filter(product_id__in=variants.keys()).values_list(
+            "product_id", "warehouse_id", "quantity"
+        )
+        VariantStock.objects.bulk_create(
+            [
+                VariantStock(
+                    variant_id=variants[product_id],
+                    warehouse_id=warehouse_id,
+                    current_quantity=max(quantity, 0),
+                )
+                for product_id, warehouse_id, quantity in balances
+                if (product_id, warehouse_id) in self.moved_pairs
+            ],
+            update_conflicts=True,
+            unique_fields=["variant", "warehouse"],
+            update_fields=["current_quantity", "last_updated"],
+            batch_size=ERROR_BATCH_SIZE,
+        )
+
+    def _invalidate_caches(self):
+        from django.core.cache import cache
+
+        from orders.cache import OrderCache
+
+        OrderCache.invalidate_product_search_cache()
+        keys = [
+            "product_list_all",
+            "inventory_dashboard_stats",
+            "product_list_None_False",
+            "product_list_None_True",
+        ]
+        for product_id in self.affected_product_ids:
+            keys.append(f"product_detail_{product_id}")
+            keys.append(f"product_stock_{product_id}")
+        cache.delete_many(keys)
+
+    def _refresh_cutting_orders(self):
+        """إعادة توزيع أوامر التقطيع للمنتجات التي تحركت أرصدتها — مرة واحدة للرفع"""
+        product_ids = {product_id for product_id, _ in self.moved_pairs}
+        if not product_ids:
+            return
+        from cutting.allocation import process_products
+
+        process_products(product_ids)
+
+    def _start_product_pipeline(self):
+        """ترحيل BaseProduct + QR + مزامنة Cloudflare للمنتجات المتأثرة (في الخلفية)"""
+        if not self.affected_product_ids:
+            return
+        from .auto_product_pipeline import bulk_post_upload_pipeline
+
+        bulk_post_upload_pipeline(sorted(self.affected_product_ids))
+
+    # ---------- مساعدات ----------
+
+    @staticmethod
+    def _table(model_name, quoted=True):
+        from django.apps import apps
+
+        table = apps.get_model("inventory", model_name)._meta.db_table
+        return connection.ops.quote_name(table) if quoted else table
+
+
+def run_product_upload(task, upload_log_id, file_content, warehouse_id, upload_mode, user_id):
+    """
+    تنفيذ رفع المنتجات لسجل BulkUploadLog مع تحديث التقدم بعد كل دفعة.
+    مشترك بين مهام Celery (turbo_upload_products و bulk_upload_products_fast).
+    """
+    from django.contrib.auth import get_user_model
+
+    from .models import BulkUploadLog, Warehouse
+
+    User = get_user_model()
+    started = timezone.now()
+    upload_log = BulkUploadLog.objects.get(id=upload_log_id)
+
+    try:
+        user = User.objects.get(id=user_id)
+        warehouse = Warehouse.objects.get(id=warehouse_id) if warehouse_id else None
+
+        upload_log.status = "processing"
+        upload_log.total_rows = estimate_total_rows(file_content)
+        upload_log.processed_count = 0
+        upload_log.save(update_fields=["status", "total_rows", "processed_count"])
+        logger.info(
+            f"🚀 بدء الرفع الجماعي - Log: {upload_log_id} - الوضع: {upload_mode} "
+            f"- ~{upload_log.total_rows} صف"
+        )
+
+        def progress(stats):
+            upload_log.processed_count = stats["processed"]
+            upload_log.total_rows = max(upload_log.total_rows, stats["processed"])
+            upload_log.created_count = stats["created"]
+            upload_log.updated_count = stats["updated"]
+            upload_log.skipped_count = stats["skipped"]
+            upload_log.error_count = stats["errors"]
+            upload_log.save(
+                update_fields=[
+                    "processed_count",
+                    "total_rows",
+                    "created_count",
+                    "updated_count",
+                    "skipped_count",
+                    "error_count",
+                ]
+            )
+            if task is not None:
+                total = upload_log.total_rows or 1
+                task.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "current": stats["processed"],
+                        "total": upload_log.total_rows,
+                        "percent": int(stats["processed"] / total * 100),
+                        "created": stats["created"],
+                        "updated": stats["updated"],
+                        "skipped": stats["skipped"],
+                        "errors": stats["errors"],
+                    },
+                )
+
+        engine = ProductBulkUploadEngine(upload_log, user, warehouse, upload_mode)
+        stats = engine.run(file_content, progress=progress)
+
+        duration = (timezone.now() - started).total_seconds()
+        summary_parts = []
+        if stats["created"]:
+            summary_parts.append(f"✅ {stats['created']} جديد")
+        if stats["updated"]:
+            summary_parts.append(f"🔄 {stats['updated']} محدث")
+        if stats["skipped"]:
+            summary_parts.append(f"⏭️ {stats['skipped']} متخطى")
+        if stats["errors"]:
+            summary_parts.append(f"❌ {stats['errors']} خطأ")
+        summary_parts.append(f"{duration:.1f}ث")
+
+        upload_log.total_rows = stats["processed"]
+        upload_log.complete(summary=" | ".join(summary_parts))
+        logger.info(f"🎉 اكتمل الرفع الجماعي - Log: {upload_log_id}: {upload_log.summary}")
+        return {"status": "success", "stats": stats, "duration": duration}
+
+    except Exception as e:
+        logger.error(f"❌ فشل الرفع الجماعي - Log: {upload_log_id}: {e}")
+        upload_log.fail(error_message=str(e))
+        raise
@@ -1,30 +1,26 @@
 """
 Context Processors للمخزون - لعرض إشعارات التحويلات في جميع الصفحات
-Cached per-user for 60 seconds.
+الكاش لكل مستخدم مع الإلغاء بالإصدارات يتم عبر core.layout_context.
 """
 
-from django.core.cache import cache
+from core.layout_context import render_section
 
 from .models import StockTransfer, Warehouse
 
-_TRANSFER_CACHE_TTL = 60  # 1 دقيقة
-
 
 def pending_transfers(request):
     """
-    إضافة عدد التحويلات المعلقة للمستخدم الحالي — Cached per user
+    إضافة عدد التحويلات المعلقة للمستخدم الحالي — عبر خدمة سياق القالب الموحدة
 
     مسؤول المخزون: يرى فقط التحويلات الواردة لمخزنه
     مدير النظام: يرى جميع التحويلات
     """
-    if not request.user.is_authenticated:
-        return {"pending_transfers_count": 0, "pending_transfers": [], "is_warehouse_manager": False}
+    return render_section(request, "pending_transfers")
+
 
+def build_pending_transfers(request):
+    """بناء التحويلات المعلقة للمستخدم الحالي (بدون كاش)"""
     user = request.user
-    cache_key = f"ctx_pending_transfers_{user.pk}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
 
     _STATUSES = ["pending", "approved", "in_transit"]
     _WAREHOUSE_GROUPS = ["مسؤول مخزون", "مسؤول مخازن", "Warehouse Manager", "مسؤول مستودع"]
@@ -62,11 +58,9 @@ def pending_transfers(request):
         pending_transfers = []
         pending_count = 0
 
-    result = {
+    return {
         "pending_transfers_count": pending_count,
         "pending_transfers": pending_transfers,
         "has_pending_transfers": pending_count > 0,
         "is_warehouse_manager": is_warehouse_manager,
     }
-    cache.set(cache_key, result, _TRANSFER_CACHE_TTL)
-    return result
@@ -3,7 +3,7 @@
 """
 
 from django.core.cache import cache
-from django.db.models import Case, F, IntegerField, Sum, When
+from django.db.models import F, Sum
 
 from .models import Product
 
@@ -11,38 +11,40 @@ from .models import Product
 def get_cached_stock_level(product_id):
     """
     الحصول على مستوى المخزون الحالي للمنتج من الذاكرة المؤقتة أو حسابه إذا لم يكن موجوداً
-    يستخدم running_balance من آخر حركة لكل مستودع (متوافق مع models.py)
+    يقرأ من جدول الأرصدة StockBalance (متوافق مع current_stock property في Product model)
     """
     cache_key = f"product_stock_{product_id}"
     stock_level = cache.get(cache_key)
 
     if stock_level is None:
-        # حساب المخزون باستخدام running_balance من جميع المستودعات
-        # هذه الطريقة متوافقة مع current_stock property في Product model
-        from .models import StockTransaction, Warehouse
-
-        total_stock = 0
-        warehouses = Warehouse.objects.filter(is_active=True)
-
-        for warehouse in warehouses:
-            last_trans = (
-                StockTransaction.objects.filter(
-                    product_id=product_id, warehouse=warehouse
-                )
-                .order_by("-transaction_date", "-id")
-                .first()
-            )
-
-            if last_trans and last_trans.running_balance:
-                total_stock += float(last_trans.running_balance)
-
-        stock_level = total_stock
+        stock_level = get_stock_levels([product_id]).get(product_id, 0.0)
         # تخزين في الذاكرة المؤقتة لمدة ساعة
         cache.set(cache_key, stock_level, 3600)
 
     return stock_level
 
 
+def get_stock_levels(product_ids):
+    """
+    مستويات المخزون لمجموعة منتجات باستعلام واحد مجمّع.
+    يعيد dict بالشكل {product_id: float} (المنتج بلا رصيد غير موجود في الناتج).
+    """
+    from .managers import active_stock_balances
+
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+
+    rows = (
+        active_stock_balances()
+        .filter(product_id__in=product_ids)
+        .order_by()
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+    )
+    return {row["product_id"]: float(row["total"] or 0) for row in rows}
+
+
 def invalidate_product_cache(product_id):
     """
     إلغاء صلاحية الذاكرة المؤقتة للمنتج
@@ -77,28 +79,8 @@ def get_cached_product_list(category_id=None, include_stock=True):
             queryset = queryset.filter(category_id=category_id)
 
         if include_stock:
-            queryset = queryset.annotate(
-                stock_in=Sum(
-                    Case(
-                        When(
-                            transactions__transaction_type="in",
-                            then="transactions__quantity",
-                        ),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                ),
-                stock_out=Sum(
-                    Case(
-                        When(
-                            transactions__transaction_type="out",
-                            then="transactions__quantity",
-                        ),
-                        default=0,
-                        output_field=IntegerField(),
-                    )
-                ),
-                current_stock_calc=F("stock_in") - F("stock_out"),
+            queryset = queryset.with_stock(per_warehouse=False).annotate(
+                current_stock_calc=F("stock_total")
             )
 
         products = list(queryset)
@@ -117,28 +99,8 @@ def get_cached_dashboard_stats():
 
     if stats is None:
         # حساب الإحصائيات إذا لم تكن في الذاكرة المؤقتة
-        products = Product.objects.all().annotate(
-            stock_in=Sum(
-                Case(
-                    When(
-                        transactions__transaction_type="in",
-                        then="transactions__quantity",
-                    ),
-                    default=0,
-                    output_field=IntegerField(),
-                )
-            ),
-            stock_out=Sum(
-                Case(
-                    When(
-                        transactions__transaction_type="out",
-                        then="transactions__quantity",
-                    ),
-                    default=0,
-                    output_field=IntegerField(),
-                )
-            ),
-            current_stock_calc=F("stock_in") - F("stock_out"),
+        products = Product.objects.with_stock(per_warehouse=False).annotate(
+            current_stock_calc=F("stock_total")
         )
 
         stats = {
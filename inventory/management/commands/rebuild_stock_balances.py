@@ -0,0 +1,104 @@
+"""
+أمر إدارة: إعادة بناء / فحص جدول أرصدة المخزون (StockBalance)
+================================================================
+يعيد تشغيل سجل الحركات (StockTransaction) ويحسب الرصيد الصحيح لكل
+(منتج، مستودع)، ثم يقارنه بالجدول المجمّع أو يعيد كتابته.
+
+الاستخدام:
+    python manage.py rebuild_stock_balances --verify          # فحص الفروقات فقط
+    python manage.py rebuild_stock_balances                   # إعادة البناء بالكامل
+    python manage.py rebuild_stock_balances --product-id 15   # منتج محدد
+    python manage.py rebuild_stock_balances --warehouse-id 5  # مستودع محدد
+"""
+
+import logging
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء أو فحص جدول أرصدة المخزون من سجل الحركات"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            default=False,
+            help="مقارنة الأرصدة بسجل الحركات بدون تعديل",
+        )
+        parser.add_argument(
+            "--product-id",
+            type=int,
+            default=None,
+            help="معرّف منتج محدد",
+        )
+        parser.add_argument(
+            "--warehouse-id",
+            type=int,
+            default=None,
+            help="معرّف مستودع محدد",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="الحد الأقصى للفروقات المعروضة عند الفحص",
+        )
+
+    def handle(self, *args, **options):
+        from inventory.models import StockBalance
+
+        product_ids = [options["product_id"]] if options["product_id"] else None
+        warehouse_ids = [options["warehouse_id"]] if options["warehouse_id"] else None
+
+        if options["verify"]:
+            self._verify(StockBalance, product_ids, warehouse_ids, options["limit"])
+            return
+
+        count = StockBalance.rebuild(product_ids=product_ids, warehouse_ids=warehouse_ids)
+        logger.info(f"✅ تمت إعادة بناء {count} رصيد مخزون")
+        self.stdout.write(self.style.SUCCESS(f"✅ تمت إعادة بناء {count} رصيد مخزون"))
+
+    def _verify(self, StockBalance, product_ids, warehouse_ids, limit):
+        expected = StockBalance.ledger_totals(
+            product_ids=product_ids, warehouse_ids=warehouse_ids
+        )
+
+        balances = StockBalance.objects.all()
+        if product_ids is not None:
+            balances = balances.filter(product_id__in=product_ids)
+        if warehouse_ids is not None:
+            balances = balances.filter(warehouse_id__in=warehouse_ids)
+        actual = {
+            (row["product_id"], row["warehouse_id"]): row["quantity"]
+            for row in balances.values("product_id", "warehouse_id", "quantity")
+        }
+
+        mismatches = []
+        for key in expected.keys() | actual.keys():
+            ledger_qty = expected.get(key) or Decimal("0")
+            table_qty = actual.get(key)
+            if table_qty is None or table_qty != ledger_qty:
+                mismatches.append((key, ledger_qty, table_qty))
+
+        self.stdout.write(f"📊 أزواج (منتج+مستودع) في السجل: {len(expected)}")
+        self.stdout.write(f"📊 أرصدة في الجدول: {len(actual)}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("✅ جميع الأرصدة مطابقة لسجل الحركات"))
+            return
+
+        self.stdout.write(self.style.WARNING(f"⚠️ عدد الفروقات: {len(mismatches)}"))
+        for (product_id, warehouse_id), ledger_qty, table_qty in sorted(
+            mismatches, key=lambda m: m[0]
+        )[:limit]:
+            self.stdout.write(
+                f"   منتج {product_id} / مستودع {warehouse_id}: "
+                f"السجل={ledger_qty} الجدول={table_qty if table_qty is not None else '—'}"
+            )
+        self.stdout.write(
+            self.style.WARNING("شغّل الأمر بدون --verify لإعادة بناء الأرصدة.")
+        )
@@ -1,9 +1,92 @@
 from django.core.cache import cache
 from django.db import models
-from django.db.models import Case, F, IntegerField, Sum, When
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+
+def active_stock_balances():
+    """أرصدة المستودعات النشطة فقط — مشتركة بين التجميع والـ prefetch"""
+    from .models import StockBalance
+
+    return StockBalance.objects.filter(
+        warehouse__is_active=True, warehouse__is_deleted=False
+    )
+
+
+def stock_total_expression():
+    """
+    تعبير SQL لإجمالي مخزون المنتج من جدول StockBalance (استعلام فرعي مجمّع).
+    يُستخدم في annotate لصفحة كاملة من المنتجات دون N+1.
+    """
+    total = (
+        active_stock_balances()
+        .filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(total, output_field=DecimalField(max_digits=18, decimal_places=2)),
+        Value(0),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+
+
+def stock_balances_prefetch():
+    """Prefetch لأرصدة كل مستودع نشط — يُخزَّن في product.active_stock_balances"""
+    return Prefetch(
+        "stock_balances",
+        queryset=active_stock_balances()
+        .select_related("warehouse")
+        .order_by("warehouse__name"),
+        to_attr="active_stock_balances",
+    )
+
+
+def attach_stock_info(products):
+    """
+    إرفاق معلومات المخزون بقائمة منتجات مُقيَّمة مسبقاً (من الكاش أو من علاقة أخرى).
+    استعلام واحد لكل الصفحة؛ بعده تقرأ current_stock و stock_status و
+    warehouses_with_stock من البيانات المرفقة دون أي استعلام إضافي.
+    """
+    from django.db.models import prefetch_related_objects
+
+    products = [p for p in products if p is not None]
+    if not products:
+        return products
+
+    prefetch_related_objects(products, stock_balances_prefetch())
+    for product in products:
+        product.stock_total = sum(
+            (balance.quantity for balance in product.active_stock_balances), 0
+        )
+    return products
 
 
 class ProductQuerySet(models.QuerySet):
+    def with_stock(self, per_warehouse=True):
+        """
+        إضافة المخزون الإجمالي (stock_total) وأرصدة المستودعات لصفحة كاملة
+        من المنتجات بعدد ثابت من الاستعلامات (استعلام + prefetch واحد).
+        خصائص current_stock و stock_status و warehouses_with_stock تقرأ منها.
+        """
+        qs = self.annotate(stock_total=stock_total_expression())
+        if per_warehouse:
+            qs = qs.prefetch_related(stock_balances_prefetch())
+        return qs
+
     def with_stock_level(self):
         """
         إضافة حساب مستوى المخزون الحالي للمنتجات
@@ -65,6 +148,9 @@ class ProductManager(models.Manager):
     def get_queryset(self):
         return ProductQuerySet(self.model, using=self._db)
 
+    def with_stock(self, per_warehouse=True):
+        return self.get_queryset().with_stock(per_warehouse=per_warehouse)
+
     def with_stock_level(self):
         return self.get_queryset().with_stock_level()
 
@@ -0,0 +1,103 @@
+# Generated by Django 5.1.15 on 2026-10-17 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, Sum, When
+
+
+def populate_stock_balances(apps, schema_editor):
+    """تعبئة الأرصدة الأولية بإعادة تشغيل سجل الحركات"""
+    StockTransaction = apps.get_model("inventory", "StockTransaction")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+
+    rows = (
+        StockTransaction.objects.filter(warehouse__isnull=False)
+        .order_by()
+        .values("product_id", "warehouse_id")
+        .annotate(
+            total=Sum(
+                Case(
+                    When(transaction_type__iexact="in", then=F("quantity")),
+                    default=-F("quantity"),
+                    output_field=DecimalField(max_digits=18, decimal_places=2),
+                )
+            )
+        )
+    )
+    StockBalance.objects.bulk_create(
+        [
+            StockBalance(
+                product_id=row["product_id"],
+                warehouse_id=row["warehouse_id"],
+                quantity=row["total"] or 0,
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0040_merge_20260315_0100"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=18,
+                        verbose_name="الرصيد الحالي",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="آخر تحديث"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_balances",
+                        to="inventory.product",
+                        verbose_name="المنتج",
+                    ),
+                ),
+                (
+                    "warehouse",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_balances",
+                        to="inventory.warehouse",
+                        verbose_name="المستودع",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "رصيد مخزون",
+                "verbose_name_plural": "أرصدة المخزون",
+                "indexes": [
+                    models.Index(
+                        fields=["warehouse", "quantity"], name="stock_bal_wh_qty_idx"
+                    )
+                ],
+                "unique_together": {("product", "warehouse")},
+            },
+        ),
+        migrations.RunPython(populate_stock_balances, migrations.RunPython.noop),
+    ]
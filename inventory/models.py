@@ -177,23 +177,15 @@ class Product(SoftDeleteMixin, models.Model):
 
     @cached_property
     def current_stock(self):
-        """الحصول على مستوى المخزون الحالي (مجموع جميع المستودعات)"""
-        from django.db.models import OuterRef, Subquery
+        """الحصول على مستوى المخزون الحالي (مجموع جميع المستودعات النشطة)"""
+        # مُرفق مسبقاً عبر Product.objects.with_stock() أو attach_stock_info()
+        if "stock_total" in self.__dict__:
+            return self.stock_total
 
-        warehouses = Warehouse.objects.filter(is_active=True)
-
-        total_stock = 0
-        latest_transactions = StockTransaction.objects.filter(
-            product=self, warehouse=OuterRef("pk")
-        ).order_by("-transaction_date", "-id")
-
-        for warehouse in warehouses.annotate(
-            latest_balance=Subquery(latest_transactions.values("running_balance")[:1])
-        ):
-            if warehouse.latest_balance is not None:
-                total_stock += warehouse.latest_balance
-
-        return total_stock
+        total = self.stock_balances.filter(
+            warehouse__is_active=True, warehouse__is_deleted=False
+        ).aggregate(total=Sum("quantity"))["total"]
+        return total if total is not None else 0
 
     @property
     def is_available(self):
@@ -210,28 +202,40 @@ class Product(SoftDeleteMixin, models.Model):
             return _("مخزون منخفض")
         return _("متوفر")
 
+    @property
+    def stock_by_warehouse(self):
+        """أرصدة المستودعات النشطة: قائمة (المستودع، الكمية) مرتبة بالاسم"""
+        balances = getattr(self, "active_stock_balances", None)
+        if balances is None:
+            balances = (
+                self.stock_balances.filter(
+                    warehouse__is_active=True, warehouse__is_deleted=False
+                )
+                .select_related("warehouse")
+                .order_by("warehouse__name")
+            )
+        return [(balance.warehouse, balance.quantity) for balance in balances]
+
     @property
     def warehouses_with_stock(self):
         """الحصول على أسماء المستودعات التي تحتوي على المنتج — استعلام واحد بدلاً من N"""
-        from django.db.models import OuterRef, Subquery
-
-        latest_balance_subq = (
-            StockTransaction.objects.filter(
-                product=self,
-                warehouse=OuterRef("pk"),
+        if hasattr(self, "active_stock_balances"):
+            names = [
+                balance.warehouse.name
+                for balance in self.active_stock_balances
+                if balance.quantity > 0
+            ][:4]
+        else:
+            names = list(
+                self.stock_balances.filter(
+                    warehouse__is_active=True,
+                    warehouse__is_deleted=False,
+                    quantity__gt=0,
+                )
+                .order_by("warehouse__name")
+                .values_list("warehouse__name", flat=True)[:4]
             )
-            .order_by("-transaction_date", "-id")
-            .values("running_balance")[:1]
-        )
-
-        warehouses = (
-            Warehouse.objects.filter(is_active=True)
-            .annotate(latest_balance=Subquery(latest_balance_subq))
-            .filter(latest_balance__gt=0)
-            .values_list("name", flat=True)
-        )
 
-        names = list(warehouses[:4])
         if not names:
             return ""
         if len(names) == 4:
@@ -647,7 +651,18 @@ class StockTransaction(models.Model):
 
         from django.db import transaction
 
+        from .running_balance import schedule_running_balance_recalculation
+
         with transaction.atomic():
+            # الحالة السابقة للحركة (عند التعديل) لحساب فرق الرصيد المجمّع
+            previous_state = None
+            if self.pk:
+                previous_state = (
+                    StockTransaction.objects.filter(pk=self.pk)
+                    .values("product_id", "warehouse_id", "transaction_type", "quantity")
+                    .first()
+                )
+
             # Get previous balance from the transaction immediately before this one
             # إضافة warehouse للفلتر لحساب الرصيد الصحيح لكل مستودع
             previous_balance = (
@@ -707,31 +722,165 @@ class StockTransaction(models.Model):
             # Save this transaction
             super().save(*args, **kwargs)
 
-            # Update all subsequent transactions' running balances
-            # إضافة warehouse للفلتر لتحديث أرصدة نفس المستودع فقط
-            next_transactions = (
-                StockTransaction.objects.filter(
-                    product=self.product,
-                    warehouse=self.warehouse,
-                    transaction_date__gt=self.transaction_date,
+            # ✅ تحديث جدول الأرصدة المجمّعة في نفس المعاملة الذرية
+            if previous_state:
+                StockBalance.apply_delta(
+                    previous_state["product_id"],
+                    previous_state["warehouse_id"],
+                    -StockBalance.signed_quantity(
+                        previous_state["transaction_type"], previous_state["quantity"]
+                    ),
+                )
+            StockBalance.apply_delta(
+                self.product_id,
+                self.warehouse_id,
+                StockBalance.signed_quantity(self.transaction_type, self.quantity),
+            )
+
+            # المعاملات اللاحقة (حركة بتاريخ سابق): إعادة حساب السلسلة جماعياً
+            # مرة واحدة عند نجاح المعاملة بدلاً من حفظ كل معاملة لاحقة على حدة
+            has_later = StockTransaction.objects.filter(
+                product=self.product,
+                warehouse=self.warehouse,
+                transaction_date__gt=self.transaction_date,
+            ).exists()
+            if has_later:
+                schedule_running_balance_recalculation(self.product_id, self.warehouse_id)
+            if previous_state and (
+                previous_state["product_id"] != self.product_id
+                or previous_state["warehouse_id"] != self.warehouse_id
+            ):
+                schedule_running_balance_recalculation(
+                    previous_state["product_id"], previous_state["warehouse_id"]
+                )
+
+
+class StockBalance(models.Model):
+    """
+    الرصيد الحالي لكل (منتج، مستودع).
+    يُحدَّث ذرياً مع كل حركة مخزون في StockTransaction.save() بحيث تصبح
+    قراءة المخزون استعلاماً واحداً بدلاً من البحث عن آخر running_balance.
+    يمكن إعادة بنائه من سجل الحركات بالأمر rebuild_stock_balances.
+    """
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="stock_balances",
+        verbose_name=_("المنتج"),
+    )
+    warehouse = models.ForeignKey(
+        "Warehouse",
+        on_delete=models.CASCADE,
+        related_name="stock_balances",
+        verbose_name=_("المستودع"),
+    )
+    quantity = models.DecimalField(
+        _("الرصيد الحالي"), max_digits=18, decimal_places=2, default=0
+    )
+    updated_at = models.DateTimeField(_("آخر تحديث"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("رصيد مخزون")
+        verbose_name_plural = _("أرصدة المخزون")
+        unique_together = ["product", "warehouse"]
+        indexes = [
+            models.Index(fields=["warehouse", "quantity"], name="stock_bal_wh_qty_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.warehouse_id}: {self.quantity}"
+
+    @staticmethod
+    def signed_quantity(transaction_type, quantity):
+        """أثر الحركة على الرصيد: موجب للوارد وسالب لما عداه"""
+        from decimal import Decimal
+
+        qty = Decimal(str(quantity or 0))
+        return qty if (transaction_type or "").lower() == "in" else -qty
+
+    @classmethod
+    def apply_delta(cls, product_id, warehouse_id, delta, create=True):
+        """
+        إضافة فرق إلى رصيد (منتج، مستودع) بتحديث ذري واحد (F expression).
+        create=False يُستخدم عند الحذف المتتالي حتى لا يُعاد إنشاء رصيد لمنتج محذوف.
+        """
+        if not product_id or not warehouse_id or not delta:
+            return
+
+        updated = cls.objects.filter(
+            product_id=product_id, warehouse_id=warehouse_id
+        ).update(quantity=models.F("quantity") + delta, updated_at=timezone.now())
+        if updated or not create:
+            return
+
+        balance, created = cls.objects.get_or_create(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            defaults={"quantity": delta},
+        )
+        if not created:
+            # أُنشئ الرصيد بالتوازي بين التحديث والإنشاء
+            cls.objects.filter(pk=balance.pk).update(
+                quantity=models.F("quantity") + delta, updated_at=timezone.now()
+            )
+
+    @classmethod
+    def ledger_totals(cls, product_ids=None, warehouse_ids=None):
+        """
+        إعادة تشغيل سجل الحركات: مجموع الكميات الموقّعة لكل (منتج، مستودع).
+        يعيد dict بالشكل {(product_id, warehouse_id): Decimal}.
+        """
+        from django.db.models import Case, DecimalField, F, When
+
+        txns = StockTransaction.objects.filter(warehouse__isnull=False)
+        if product_ids is not None:
+            txns = txns.filter(product_id__in=product_ids)
+        if warehouse_ids is not None:
+            txns = txns.filter(warehouse_id__in=warehouse_ids)
+
+        rows = (
+            txns.order_by()
+            .values("product_id", "warehouse_id")
+            .annotate(
+                total=Sum(
+                    Case(
+                        When(transaction_type__iexact="in", then=F("quantity")),
+                        default=-F("quantity"),
+                        output_field=DecimalField(max_digits=18, decimal_places=2),
+                    )
                 )
-                .order_by("transaction_date", "id")
-                .select_for_update()
             )
+        )
+        return {(r["product_id"], r["warehouse_id"]): r["total"] for r in rows}
 
-            # Recalculate running balances for all subsequent transactions
-            current_balance = Decimal(str(self.running_balance))
-            for trans in next_transactions:
-                trans_quantity = Decimal(str(trans.quantity))
-                if trans.transaction_type.lower() == "in":
-                    current_balance += trans_quantity
-                else:  # out, transfer, or adjustment
-                    current_balance -= trans_quantity
+    @classmethod
+    def rebuild(cls, product_ids=None, warehouse_ids=None, batch_size=1000):
+        """
+        إعادة بناء الأرصدة من سجل الحركات (بالكامل أو لمنتجات/مستودعات محددة).
+        يعيد عدد الأرصدة المكتوبة.
+        """
+        from django.db import transaction
 
-                # Only update if balance has changed
-                if trans.running_balance != current_balance:
-                    trans.running_balance = current_balance
-                    super(StockTransaction, trans).save()
+        totals = cls.ledger_totals(product_ids=product_ids, warehouse_ids=warehouse_ids)
+
+        with transaction.atomic():
+            existing = cls.objects.all()
+            if product_ids is not None:
+                existing = existing.filter(product_id__in=product_ids)
+            if warehouse_ids is not None:
+                existing = existing.filter(warehouse_id__in=warehouse_ids)
+            existing.delete()
+
+            cls.objects.bulk_create(
+                [
+                    cls(product_id=product_id, warehouse_id=warehouse_id, quantity=total)
+                    for (product_id, warehouse_id), total in totals.items()
+                ],
+                batch_size=batch_size,
+            )
+
+        return len(totals)
 
 
 class PurchaseOrder(SoftDeleteMixin, models.Model):
@@ -1083,22 +1232,16 @@ class StockTransfer(models.Model):
         if not self.transfer_number:
             from datetime import datetime
 
-            date_str = datetime.now().strftime("%Y%m%d")
-            last_transfer = (
-                StockTransfer.objects.filter(
-                    transfer_number__startswith=f"TRF-{date_str}"
-                )
-                .order_by("-transfer_number")
-                .first()
-            )
-
-            if last_transfer:
-                last_number = int(last_transfer.transfer_number.split("-")[-1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
+            from core.sequences import allocate, max_suffix
 
-            self.transfer_number = f"TRF-{date_str}-{new_number:04d}"
+            prefix = f"TRF-{datetime.now().strftime('%Y%m%d')}-"
+            self.transfer_number = allocate(
+                "inventory.transfer_number",
+                prefix,
+                render=lambda n: f"{prefix}{n:04d}",
+                seed=lambda: max_suffix(StockTransfer.objects, "transfer_number", prefix),
+                taken=lambda value: StockTransfer.objects.filter(transfer_number=value).exists(),
+            )
 
         super().save(*args, **kwargs)
 
@@ -1138,33 +1281,37 @@ class StockTransfer(models.Model):
         self.save()
 
         # إنشاء حركات مخزون للخروج من المستودع المصدر
-        for item in self.items.all():
-            # الحصول على آخر رصيد في المستودع المصدر
-            last_transaction = (
-                StockTransaction.objects.filter(
-                    product=item.product, warehouse=self.from_warehouse
+        # وضع جماعي: إعادة توزيع أوامر التقطيع مرة واحدة لكل البنود
+        from cutting.allocation import bulk_allocation
+
+        with bulk_allocation():
+            for item in self.items.all():
+                # الحصول على آخر رصيد في المستودع المصدر
+                last_transaction = (
+                    StockTransaction.objects.filter(
+                        product=item.product, warehouse=self.from_warehouse
+                    )
+                    .order_by("-transaction_date", "-id")
+                    .first()
                 )
-                .order_by("-transaction_date", "-id")
-                .first()
-            )
 
-            previous_balance = (
-                last_transaction.running_balance if last_transaction else 0
-            )
-            new_balance = previous_balance - item.quantity
+                previous_balance = (
+                    last_transaction.running_balance if last_transaction else 0
+                )
+                new_balance = previous_balance - item.quantity
 
-            StockTransaction.objects.create(
-                product=item.product,
-                warehouse=self.from_warehouse,
-                transaction_type="out",
-                reason="transfer",
-                quantity=item.quantity,
-                reference=self.transfer_number,
-                transaction_date=self.transfer_date,
-                notes=f"تحويل إلى {self.to_warehouse.name}",
-                running_balance=new_balance,
-                created_by=user,
-            )
+                StockTransaction.objects.create(
+                    product=item.product,
+                    warehouse=self.from_warehouse,
+                    transaction_type="out",
+                    reason="transfer",
+                    quantity=item.quantity,
+                    reference=self.transfer_number,
+                    transaction_date=self.transfer_date,
+                    notes=f"تحويل إلى {self.to_warehouse.name}",
+                    running_balance=new_balance,
+                    created_by=user,
+                )
 
     def complete(self, user):
         """إكمال التحويل — مع كشف النقل الكامل تلقائياً"""
@@ -1175,60 +1322,56 @@ class StockTransfer(models.Model):
         self.completed_by = user
         self.completed_at = timezone.now()
         self.actual_arrival_date = timezone.now()
-        self.save()
 
         from decimal import Decimal
 
+        from django.db import transaction as db_transaction
+
+        from cutting.allocation import mark_products_changed
+
         fully_migrated_products = []
 
-        for item in self.items.all():
-            qty = item.received_quantity or item.quantity
+        # معاملة واحدة لكل البنود: إعادة حساب الأرصدة المتحركة المؤجلة
+        # تُنفَّذ مرة واحدة لكل (منتج، مستودع) عند نجاح المعاملة
+        with db_transaction.atomic():
+            self.save()
 
-            # كشف النقل الكامل: هل رصيد المنتج في المصدر = 0 بعد الخصم؟
-            source_balance_txn = (
-                StockTransaction.objects.filter(
-                    product=item.product, warehouse=self.from_warehouse
-                )
-                .order_by("-transaction_date", "-id")
-                .first()
+            items = list(self.items.select_related("product"))
+            source_balances = dict(
+                StockBalance.objects.filter(
+                    warehouse=self.from_warehouse,
+                    product_id__in=[item.product_id for item in items],
+                ).values_list("product_id", "quantity")
             )
-            source_balance = Decimal(str(
-                source_balance_txn.running_balance if source_balance_txn else 0
-            ))
 
-            if source_balance == Decimal("0"):
-                # ===== نقل كامل: نقل جميع المعاملات للمستودع الجديد =====
-                self._migrate_product_history(
-                    item.product, self.from_warehouse, self.to_warehouse, user
-                )
-                fully_migrated_products.append(item.product.name)
-            else:
-                # ===== نقل جزئي: السلوك العادي =====
-                last_transaction = (
-                    StockTransaction.objects.filter(
-                        product=item.product, warehouse=self.to_warehouse
-                    )
-                    .order_by("-transaction_date", "-id")
-                    .first()
-                )
+            for item in items:
+                qty = item.received_quantity or item.quantity
 
-                previous_balance = (
-                    last_transaction.running_balance if last_transaction else 0
-                )
-                new_balance = previous_balance + qty
+                # كشف النقل الكامل: هل رصيد المنتج في المصدر = 0 بعد الخصم؟
+                source_balance = Decimal(str(source_balances.get(item.product_id, 0)))
 
-                StockTransaction.objects.create(
-                    product=item.product,
-                    warehouse=self.to_warehouse,
-                    transaction_type="in",
-                    reason="transfer",
-                    quantity=qty,
-                    reference=self.transfer_number,
-                    transaction_date=timezone.now(),
-                    notes=f"تحويل من {self.from_warehouse.name}",
-                    running_balance=new_balance,
-                    created_by=user,
-                )
+                if source_balance == Decimal("0"):
+                    # ===== نقل كامل: نقل جميع المعاملات للمستودع الجديد =====
+                    self._migrate_product_history(
+                        item.product, self.from_warehouse, self.to_warehouse, user
+                    )
+                    # النقل الكامل يتم بـ update() دون إشارات StockTransaction
+                    mark_products_changed([item.product_id])
+                    fully_migrated_products.append(item.product.name)
+                else:
+                    # ===== نقل جزئي: السلوك العادي =====
+                    # running_balance يُحسب في StockTransaction.save()
+                    StockTransaction.objects.create(
+                        product=item.product,
+                        warehouse=self.to_warehouse,
+                        transaction_type="in",
+                        reason="transfer",
+                        quantity=qty,
+                        reference=self.transfer_number,
+                        transaction_date=timezone.now(),
+                        notes=f"تحويل من {self.from_warehouse.name}",
+                        created_by=user,
+                    )
 
         # تسجيل النقل الكامل في ملاحظات التحويل
         if fully_migrated_products:
@@ -1328,6 +1471,9 @@ class StockTransfer(models.Model):
             # 4. إعادة حساب running_balance للمستودع المستهدف بالكامل
             self._recalculate_product_balance(product, to_warehouse)
 
+            # 5. update() يتجاوز save() — إعادة بناء أرصدة المنتج من السجل
+            StockBalance.rebuild(product_ids=[product.id])
+
             import logging
             logger = logging.getLogger(__name__)
             logger.info(
@@ -1340,75 +1486,51 @@ class StockTransfer(models.Model):
     def _recalculate_product_balance(product, warehouse):
         """
         إعادة حساب running_balance لجميع معاملات منتج في مستودع معين.
-        يُستخدم بعد دمج المعاملات من مستودعين.
+        يُستخدم بعد دمج المعاملات من مستودعين — بأمر UPDATE جماعي واحد.
         """
-        from decimal import Decimal
-
-        all_txns = (
-            StockTransaction.objects.filter(
-                product=product,
-                warehouse=warehouse,
-            )
-            .order_by("transaction_date", "id")
-            .select_for_update()
-        )
+        from .running_balance import recalculate_running_balances
 
-        balance = Decimal("0")
-        for txn in all_txns:
-            qty = Decimal(str(txn.quantity))
-            if txn.transaction_type.lower() == "in":
-                balance += qty
-            else:  # out, transfer, adjustment
-                balance -= qty
-
-            changed = False
-            if txn.transaction_type != txn.transaction_type.lower():
-                txn.transaction_type = txn.transaction_type.lower()
-                changed = True
-            if txn.running_balance != balance:
-                txn.running_balance = balance
-                changed = True
-            if changed:
-                super(StockTransaction, txn).save(
-                    update_fields=["running_balance", "transaction_type"]
-                )
+        return recalculate_running_balances([(product.id, warehouse.id)])
 
     def cancel(self, user, reason=""):
         """إلغاء التحويل - مع إرجاع المخزون إذا كان قد تم خصمه"""
         if not self.can_cancel:
             raise ValueError(_("لا يمكن إلغاء هذا التحويل"))
 
+        from cutting.allocation import bulk_allocation
+
         # إرجاع المخزون إذا كان التحويل في حالة approved أو in_transit
         # (أي تم خصم المخزون من المستودع المصدر)
         if self.status in ["approved", "in_transit"]:
-            for item in self.items.all():
-                # الحصول على آخر رصيد في المستودع المصدر
-                last_transaction = (
-                    StockTransaction.objects.filter(
-                        product=item.product, warehouse=self.from_warehouse
+            with bulk_allocation():
+                for item in self.items.all():
+                    # الحصول على آخر رصيد في المستودع المصدر
+                    last_transaction = (
+                        StockTransaction.objects.filter(
+                            product=item.product, warehouse=self.from_warehouse
+                        )
+                        .order_by("-transaction_date", "-id")
+                        .first()
                     )
-                    .order_by("-transaction_date", "-id")
-                    .first()
-                )
 
-                previous_balance = (
-                    last_transaction.running_balance if last_transaction else 0
-                )
-                new_balance = previous_balance + item.quantity
-
-                # إنشاء حركة مخزون لإرجاع الكمية
-                StockTransaction.objects.create(
-                    product=item.product,
-                    warehouse=self.from_warehouse,
-                    transaction_type="in",
-                    reason="return",
-                    quantity=item.quantity,
-                    reference=self.transfer_number,
-                    transaction_date=timezone.now(),
-                    notes=f"إرجاع بسبب إلغاء التحويل - {reason}" if reason else "إرجاع بسبب إلغاء التحويل",
-                    running_balance=new_balance,
-                    created_by=user,
-                )
+                    previous_balance = (
+                        last_transaction.running_balance if last_transaction else 0
+                    )
+                    new_balance = previous_balance + item.quantity
+
+                    # إنشاء حركة مخزون لإرجاع الكمية
+                    StockTransaction.objects.create(
+                        product=item.product,
+                        warehouse=self.from_warehouse,
+                        transaction_type="in",
+                        reason="return",
+                        quantity=item.quantity,
+                        reference=self.transfer_number,
+                        transaction_date=timezone.now(),
+                        notes=f"إرجاع بسبب إلغاء التحويل - {reason}" if reason else "إرجاع بسبب إلغاء التحويل",
+                        running_balance=new_balance,
+                        created_by=user,
+                    )
 
         self.status = "cancelled"
         if reason:
@@ -1447,36 +1569,39 @@ class StockTransfer(models.Model):
         if self.status not in ["pending", "approved", "in_transit"]:
             raise ValueError(_("لا يمكن رفض هذا التحويل"))
 
+        from cutting.allocation import bulk_allocation
+
         # إرجاع المخزون إذا كان التحويل في حالة approved أو in_transit
         if self.status in ["approved", "in_transit"]:
-            for item in self.items.all():
-                # الحصول على آخر رصيد في المستودع المصدر
-                last_transaction = (
-                    StockTransaction.objects.filter(
-                        product=item.product, warehouse=self.from_warehouse
+            with bulk_allocation():
+                for item in self.items.all():
+                    # الحصول على آخر رصيد في المستودع المصدر
+                    last_transaction = (
+                        StockTransaction.objects.filter(
+                            product=item.product, warehouse=self.from_warehouse
+                        )
+                        .order_by("-transaction_date", "-id")
+                        .first()
                     )
-                    .order_by("-transaction_date", "-id")
-                    .first()
-                )
 
-                previous_balance = (
-                    last_transaction.running_balance if last_transaction else 0
-                )
-                new_balance = previous_balance + item.quantity
-
-                # إنشاء حركة مخزون لإرجاع الكمية
-                StockTransaction.objects.create(
-                    product=item.product,
-                    warehouse=self.from_warehouse,
-                    transaction_type="in",
-                    reason="return",
-                    quantity=item.quantity,
-                    reference=self.transfer_number,
-                    transaction_date=timezone.now(),
-                    notes=f"إرجاع بسبب رفض التحويل - {reason}" if reason else "إرجاع بسبب رفض التحويل",
-                    running_balance=new_balance,
-                    created_by=user,
-                )
+                    previous_balance = (
+                        last_transaction.running_balance if last_transaction else 0
+                    )
+                    new_balance = previous_balance + item.quantity
+
+                    # إنشاء حركة مخزون لإرجاع الكمية
+                    StockTransaction.objects.create(
+                        product=item.product,
+                        warehouse=self.from_warehouse,
+                        transaction_type="in",
+                        reason="return",
+                        quantity=item.quantity,
+                        reference=self.transfer_number,
+                        transaction_date=timezone.now(),
+                        notes=f"إرجاع بسبب رفض التحويل - {reason}" if reason else "إرجاع بسبب رفض التحويل",
+                        running_balance=new_balance,
+                        created_by=user,
+                    )
 
         self.status = "rejected"
         if reason:
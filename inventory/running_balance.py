@@ -0,0 +1,242 @@
+"""
+إعادة حساب الرصيد المتحرك (running_balance) بشكل جماعي
+=========================================================
+بدلاً من حفظ كل معاملة لاحقة على حدة عند إدراج حركة بتاريخ سابق،
+تُعاد كتابة أرصدة سلسلة (منتج، مستودع) كاملة بأمر UPDATE واحد يعتمد
+على دالة نافذة (window function) تجمع الكميات الموقّعة بالترتيب.
+
+الاستخدام:
+    # فوري (داخل المعاملة الحالية)
+    recalculate_running_balances([(product_id, warehouse_id)])
+
+    # مؤجل حتى نجاح المعاملة — كل سلسلة تُحسب مرة واحدة مهما تكررت
+    schedule_running_balance_recalculation(product_id, warehouse_id)
+
+    # ليلاً: السلاسل التي فشل حسابها المؤجل (مسجلة في Redis)
+    rebuild_dirty_series()
+"""
+
+import functools
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Sum, When, Window
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+# مجموعة Redis للسلاسل التي فشل حسابها بعد التأكيد ("product_id:warehouse_id")
+DIRTY_SERIES_KEY = "crm:inventory:running_balance:dirty_series"
+
+_WINDOW_UPDATE_SQL = """
+    UPDATE {table} AS t
+    SET running_balance = s.balance
+    FROM (
+        SELECT id,
+               SUM(CASE WHEN LOWER(transaction_type) = 'in' THEN quantity ELSE -quantity END)
+                   OVER (
+                       PARTITION BY product_id, warehouse_id
+                       ORDER BY transaction_date, id
+                   ) AS balance
+        FROM {table}
+        WHERE product_id = %s AND warehouse_id = %s
+    ) AS s
+    WHERE t.id = s.id AND t.running_balance IS DISTINCT FROM s.balance
+"""
+
+
+def _normalize_pairs(pairs):
+    return {
+        (product_id, warehouse_id)
+        for product_id, warehouse_id in pairs
+        if product_id and warehouse_id
+    }
+
+
+def recalculate_running_balances(pairs, batch_size=500):
+    """
+    إعادة حساب running_balance لكل معاملات السلاسل المحددة.
+    pairs: مجموعة من (product_id, warehouse_id).
+    يعيد عدد المعاملات التي تغيّر رصيدها.
+    """
+    from .models import StockTransaction
+
+    pairs = _normalize_pairs(pairs)
+    if not pairs:
+        return 0
+
+    # توحيد نوع الحركة إلى أحرف صغيرة (بيانات قديمة مستوردة)
+    for product_id, warehouse_id in pairs:
+        StockTransaction.objects.filter(
+            product_id=product_id, warehouse_id=warehouse_id
+        ).exclude(transaction_type__in=["in", "out", "transfer", "adjustment"]).update(
+            transaction_type=Lower("transaction_type")
+        )
+
+    if connection.vendor == "postgresql":
+        sql = _WINDOW_UPDATE_SQL.format(
+            table=connection.ops.quote_name(StockTransaction._meta.db_table)
+        )
+        updated = 0
+        with connection.cursor() as cursor:
+            for product_id, warehouse_id in pairs:
+                cursor.execute(sql, [product_id, warehouse_id])
+                updated += cursor.rowcount
+        return updated
+
+    return _recalculate_with_bulk_update(pairs, batch_size)
+
+
+def _recalculate_with_bulk_update(pairs, batch_size):
+    """مسار احتياطي لقواعد البيانات الأخرى: قراءة واحدة بدالة نافذة ثم bulk_update"""
+    from .models import StockTransaction
+
+    signed_quantity = Case(
+        When(transaction_type="in", then=F("quantity")),
+        default=-F("quantity"),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+
+    changed = []
+    for product_id, warehouse_id in pairs:
+        rows = (
+            StockTransaction.objects.filter(product_id=product_id, warehouse_id=warehouse_id)
+            .annotate(
+                balance=Window(
+                    expression=Sum(signed_quantity),
+                    order_by=[F("transaction_date").asc(), F("id").asc()],
+                )
+            )
+            .values_list("id", "running_balance", "balance")
+        )
+        changed.extend(
+            StockTransaction(id=txn_id, running_balance=balance)
+            for txn_id, running_balance, balance in rows
+            if running_balance != balance
+        )
+
+    StockTransaction.objects.bulk_update(changed, ["running_balance"], batch_size=batch_size)
+    return len(changed)
+
+
+def _registered_pairs():
+    """
+    مجموعة سلاسل المعاملة الحالية ما دام callback تفريغها مسجلاً.
+    بعد تراجع المعاملة (أو نقطة الحفظ التي سُجّل فيها) يُحذف الـ callback
+    فتُهمل المجموعة ولا تنتقل تسجيلاتها إلى المعاملة التالية.
+    """
+    flush = getattr(_pending, "flush", None)
+    if flush is None or not connection.in_atomic_block:
+        return None
+    if any(entry[1] is flush for entry in connection.run_on_commit):
+        return flush.args[0]
+    return None
+
+
+def schedule_running_balance_recalculation(product_id, warehouse_id):
+    """
+    تسجيل سلسلة (منتج، مستودع) لإعادة الحساب بعد نجاح المعاملة الحالية.
+    التسجيلات المتكررة لنفس السلسلة تُدمج، فتحويل من 200 بند يعيد حساب
+    كل سلسلة مرة واحدة فقط.
+    """
+    if not product_id or not warehouse_id:
+        return
+
+    pairs = _registered_pairs()
+    if pairs is not None:
+        pairs.add((product_id, warehouse_id))
+        return
+
+    pairs = {(product_id, warehouse_id)}
+    _pending.flush = functools.partial(flush_pending_recalculations, pairs)
+    # خارج المعاملات يُنفَّذ فوراً
+    transaction.on_commit(_pending.flush)
+
+
+def flush_pending_recalculations(pairs):
+    """تنفيذ إعادة الحساب المؤجلة لسلاسل معاملة مؤكدة"""
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    try:
+        with transaction.atomic():
+            updated = recalculate_running_balances(pairs)
+        logger.debug(
+            f"✅ إعادة حساب الرصيد المتحرك: {len(pairs)} سلسلة، {updated} معاملة"
+        )
+        return updated
+    except Exception as e:
+        logger.error(f"❌ فشل إعادة حساب الرصيد المتحرك لـ {len(pairs)} سلسلة: {e}")
+        mark_series_dirty(pairs)
+        return 0
+
+
+# ─── السلاسل الفاشلة: إعادة بناء ليلية ───────────────────────────────
+
+
+def _redis():
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def mark_series_dirty(pairs):
+    """تسجيل سلاسل فشل حسابها في مجموعة Redis لإعادة بنائها ليلاً"""
+    members = [f"{product_id}:{warehouse_id}" for product_id, warehouse_id in _normalize_pairs(pairs)]
+    client = _redis()
+    if not members or client is None:
+        return
+    try:
+        client.sadd(DIRTY_SERIES_KEY, *members)
+    except Exception as e:
+        logger.warning(f"Failed to mark running balance series dirty: {e}")
+
+
+def _pop_dirty_series(limit):
+    client = _redis()
+    if client is None:
+        return set()
+    try:
+        members = client.spop(DIRTY_SERIES_KEY, limit) or []
+    except Exception as e:
+        logger.warning(f"Failed to read dirty running balance series: {e}")
+        return set()
+    pairs = set()
+    for member in members:
+        if isinstance(member, bytes):
+            member = member.decode()
+        product_id, _, warehouse_id = member.partition(":")
+        if product_id.isdigit() and warehouse_id.isdigit():
+            pairs.add((int(product_id), int(warehouse_id)))
+    return pairs
+
+
+def rebuild_dirty_series(batch_size=200):
+    """
+    إعادة حساب السلاسل المسجلة كفاشلة (مهمة ليلية).
+    السلسلة التي تفشل مجدداً تعود إلى المجموعة للدورة التالية.
+    Returns: (عدد السلاسل المعاد حسابها، عدد الفاشلة)
+    """
+    rebuilt = 0
+    failed = set()
+    while True:
+        pairs = _pop_dirty_series(batch_size)
+        if not pairs:
+            break
+        for pair in sorted(pairs):
+            try:
+                with transaction.atomic():
+                    recalculate_running_balances([pair])
+                rebuilt += 1
+            except Exception as e:
+                logger.error(f"❌ فشل إعادة بناء الرصيد المتحرك للسلسلة {pair}: {e}")
+                failed.add(pair)
+    # بعد انتهاء الدورة حتى لا تُسحب مجدداً في نفسها
+    mark_series_dirty(failed)
+    return rebuilt, len(failed)
@@ -19,6 +19,7 @@ from .models import (
     Product,
     ProductVariant,
     StockAlert,
+    StockBalance,
     StockTransaction,
     VariantStock,
 )
@@ -185,6 +186,20 @@ def stock_manager_handler(sender, instance, created, **kwargs):
     transaction.on_commit(sync_variant_stock)
 
 
+@receiver(post_delete, sender=StockTransaction)
+def reverse_stock_balance_on_delete(sender, instance, **kwargs):
+    """
+    عكس أثر الحركة المحذوفة على جدول الأرصدة المجمّعة.
+    لا يُنشأ رصيد جديد هنا لأن الحذف قد يكون متتالياً من حذف المنتج أو المستودع.
+    """
+    StockBalance.apply_delta(
+        instance.product_id,
+        instance.warehouse_id,
+        -StockBalance.signed_quantity(instance.transaction_type, instance.quantity),
+        create=False,
+    )
+
+
 # ========== إشارة تسوية المخزون ========== #
 
 
@@ -458,25 +473,14 @@ def sync_base_product_to_cloudflare(sender, instance, **kwargs):
     if not instance.code:
         return
 
-    def do_sync():
-        try:
-            # Import inside function to avoid circular imports
-            from public.cloudflare_sync import (
-                get_cloudflare_sync,
-                sync_product_to_cloudflare,
-            )
-
-            # Check if sync is enabled globally
-            if not get_cloudflare_sync().is_configured():
-                return
-
-            sync_product_to_cloudflare(instance)
-            logger.info(f"✅ Auto-synced BaseProduct {instance.code} to Cloudflare")
-        except Exception as e:
-            logger.error(f"❌ Failed to auto-sync BaseProduct {instance.code}: {e}")
+    try:
+        # ✅ صف في طابور Cloudflare داخل نفس المعاملة — الحفظ المتكرر لنفس
+        # الكود يُدمج ويُرسل في دفعة واحدة (public.sync_outbox)
+        from public.sync_outbox import enqueue_base_products
 
-    # Use on_commit to ensure DB transaction is finished
-    transaction.on_commit(do_sync)
+        enqueue_base_products([instance])
+    except Exception as e:
+        logger.error(f"❌ Failed to queue BaseProduct {instance.code} for Cloudflare: {e}")
 
 
 @receiver(post_save, sender=BaseProduct)
@@ -557,22 +561,10 @@ def sync_variant_parent_to_cloudflare(sender, instance, **kwargs):
     if not instance.base_product or not instance.base_product.code:
         return
 
-    def do_sync():
-        try:
-            from public.cloudflare_sync import (
-                get_cloudflare_sync,
-                sync_product_to_cloudflare,
-            )
-
-            if not get_cloudflare_sync().is_configured():
-                return
-
-            # Sync the PARENT BaseProduct because KV structure is based on BaseProduct
-            sync_product_to_cloudflare(instance.base_product)
-            logger.info(
-                f"✅ Auto-synced BaseProduct {instance.base_product.code} (triggered by Variant {instance.variant_code})"
-            )
-        except Exception as e:
-            logger.error(f"❌ Failed to auto-sync BaseProduct from Variant update: {e}")
+    try:
+        # KV مبني على المنتج الأساسي — نضيف الأب للطابور
+        from public.sync_outbox import enqueue_base_products
 
-    transaction.on_commit(do_sync)
+        enqueue_base_products([instance.base_product])
+    except Exception as e:
+        logger.error(f"❌ Failed to queue BaseProduct from Variant update: {e}")
@@ -378,6 +378,19 @@ def process_bulk_upload_async(
         raise self.retry(exc=e, countdown=60)
 
 
+@shared_task(name="inventory.tasks.rebuild_dirty_running_balances")
+def rebuild_dirty_running_balances():
+    """
+    إعادة حساب الرصيد المتحرك للسلاسل التي فشل حسابها المؤجل بعد التأكيد
+    """
+    from .running_balance import rebuild_dirty_series
+
+    rebuilt, failed = rebuild_dirty_series()
+    if rebuilt or failed:
+        logger.info(f"إعادة بناء الرصيد المتحرك: {rebuilt} سلسلة، {failed} فاشلة")
+    return {"status": "success", "rebuilt": rebuilt, "failed": failed}
+
+
 @shared_task(
     bind=True, max_retries=3, default_retry_delay=180, autoretry_for=(Exception,)
 )
@@ -333,31 +333,19 @@ class VariantService:
             logger.info(f"✅ تم توليد {qr_generated} QR")
             stats["qr_generated"] = qr_generated
 
-        # المرحلة 3: مزامنة Cloudflare
+        # المرحلة 3: مزامنة Cloudflare (عبر طابور الدفعات)
         if migrated_base_products:
-            from .models import BaseProduct
-
             logger.info(
-                f"☁️ بدء مزامنة Cloudflare لـ {len(migrated_base_products)} منتج..."
+                f"☁️ إضافة {len(migrated_base_products)} منتج لطابور Cloudflare..."
             )
             try:
-                from public.cloudflare_sync import (
-                    get_cloudflare_sync,
-                    sync_product_to_cloudflare,
-                )
+                from public.cloudflare_sync import get_cloudflare_sync
+                from public.sync_outbox import enqueue_base_product_ids
 
                 if get_cloudflare_sync().is_configured():
-                    synced = 0
-                    for base_id in migrated_base_products:
-                        try:
-                            base = BaseProduct.objects.get(id=base_id)
-                            sync_product_to_cloudflare(base)
-                            synced += 1
-                        except Exception as e:
-                            logger.error(f"خطأ في مزامنة المنتج {base_id}: {e}")
-
-                    logger.info(f"✅ تم مزامنة {synced} منتج مع Cloudflare")
-                    stats["cloudflare_synced"] = synced
+                    queued = enqueue_base_product_ids(migrated_base_products)
+                    logger.info(f"✅ تمت إضافة {queued} منتج لطابور Cloudflare")
+                    stats["cloudflare_synced"] = queued
                 else:
                     logger.warning("⚠️ Cloudflare غير مُعد - تم تخطي المزامنة")
                     stats["cloudflare_synced"] = 0
@@ -549,9 +537,8 @@ class VariantService:
     def phase3_sync_cloudflare(cls, base_product_ids):
         """
         المرحلة 3: مزامنة Cloudflare للمنتجات المرحلة
+        ✅ تُضاف للطابور وتُرسل على دفعات sync_all (public.sync_outbox)
         """
-        from .models import BaseProduct
-
         stats = {
             "total": len(base_product_ids),
             "synced": 0,
@@ -563,29 +550,18 @@ class VariantService:
         logger.info(f"☁️ المرحلة 3: بدء مزامنة Cloudflare لـ {stats['total']} منتج")
 
         try:
-            from public.cloudflare_sync import (
-                get_cloudflare_sync,
-                sync_product_to_cloudflare,
-            )
+            from public.cloudflare_sync import get_cloudflare_sync
+            from public.sync_outbox import enqueue_base_product_ids
 
             if not get_cloudflare_sync().is_configured():
                 logger.warning("⚠️ Cloudflare غير مُعد - تم تخطي المزامنة")
                 stats["skipped"] = stats["total"]
                 return stats
 
-            for base_id in base_product_ids:
-                try:
-                    base = BaseProduct.objects.get(id=base_id)
-                    sync_product_to_cloudflare(base)
-                    stats["synced"] += 1
-                except Exception as e:
-                    stats["failed"] += 1
-                    stats["errors"].append(
-                        {"base_product_id": base_id, "error": str(e)}
-                    )
-                    logger.error(f"خطأ في مزامنة المنتج {base_id}: {e}")
+            stats["synced"] = enqueue_base_product_ids(base_product_ids)
+            stats["skipped"] = stats["total"] - stats["synced"]
 
-            logger.info(f"✅ المرحلة 3 اكتملت: {stats['synced']} منتج")
+            logger.info(f"✅ المرحلة 3 اكتملت: {stats['synced']} منتج في الطابور")
         except Exception as e:
             logger.error(f"خطأ عام في مزامنة Cloudflare: {e}")
             stats["failed"] = stats["total"]
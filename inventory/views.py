@@ -8,7 +8,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
 from django.db import models, transaction
-from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models import Case, Count, F, Q, Sum, When
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
@@ -61,17 +61,9 @@ class InventoryDashboardView(LoginRequiredMixin, TemplateView):
 
         # الحصول على المنتجات منخفضة المخزون - محسن جداً
         # استخدام only() وتحديد 5 فقط بدلاً من 10
-        latest_balance = (
-            StockTransaction.objects.filter(product=OuterRef("pk"))
-            .order_by("-transaction_date")
-            .values("running_balance")[:1]
-        )
-
         low_stock_products = (
-            Product.objects.annotate(current_stock_level=Subquery(latest_balance))
-            .filter(
-                current_stock_level__gt=0, current_stock_level__lte=F("minimum_stock")
-            )
+            Product.objects.with_stock(per_warehouse=False)
+            .filter(stock_total__gt=0, stock_total__lte=F("minimum_stock"))
             .select_related("category")
             .only("id", "name", "code", "minimum_stock", "category__name")[:5]
         )  # من 10 إلى 5
@@ -79,9 +71,9 @@ class InventoryDashboardView(LoginRequiredMixin, TemplateView):
         context["low_stock_products"] = [
             {
                 "product": p,
-                "current_stock": p.current_stock_level or 0,
+                "current_stock": p.stock_total,
                 "status": "مخزون منخفض",
-                "is_available": (p.current_stock_level or 0) > 0,
+                "is_available": p.stock_total > 0,
             }
             for p in low_stock_products
         ]
@@ -196,26 +188,11 @@ def product_list(request):
     filter_type = request.GET.get("filter", "")
     sort_by = request.GET.get("sort", "-created_at")
 
-    # الحصول على المنتجات مع حساب المخزون الحالي
-    # ✅ FIX: حساب المخزون الكلي بجمع آخر رصيد من كل مستودع (DISTINCT ON)
-    from django.db.models import DecimalField, OuterRef
-    from django.db.models.expressions import RawSQL
-
+    # الحصول على المنتجات مع المخزون الإجمالي وأرصدة المستودعات للصفحة كاملة
+    # (annotate + prefetch واحد بدلاً من استعلامات لكل منتج)
     products = (
         Product.objects.select_related("category")
-        .annotate(
-            current_stock_calc=RawSQL("""
-                COALESCE((
-                    SELECT SUM(latest.running_balance)
-                    FROM (
-                        SELECT DISTINCT ON (st.warehouse_id) st.running_balance
-                        FROM inventory_stocktransaction st
-                        WHERE st.product_id = inventory_product.id
-                        ORDER BY st.warehouse_id, st.transaction_date DESC, st.id DESC
-                    ) latest
-                ), 0)
-            """, [], output_field=DecimalField())
-        )
+        .with_stock()
         .only("id", "name", "code", "price", "category", "created_at", "minimum_stock")
     )
 
@@ -236,13 +213,13 @@ def product_list(request):
     # تطبيق فلاتر خاصة
     if filter_type == "low_stock":
         # المنتجات التي المخزون الحالي أقل من الحد الأدنى
-        products = products.filter(current_stock_calc__lt=F('minimum_stock'))
+        products = products.filter(stock_total__lt=F('minimum_stock'))
     elif filter_type == "out_of_stock":
         # ✅ FIX: المنتجات التي المخزون = 0 أو أقل (سالب)
-        products = products.filter(current_stock_calc__lte=0)
+        products = products.filter(stock_total__lte=0)
     elif filter_type == "in_stock":
         # المنتجات المتوفرة في المخزون
-        products = products.filter(current_stock_calc__gt=0)
+        products = products.filter(stock_total__gt=0)
 
     # تطبيق الترتيب
     valid_sort_fields = ['name', 'code', 'price', 'created_at', 'minimum_stock']
@@ -252,7 +229,7 @@ def product_list(request):
         products = products.order_by(sort_by)
     elif sort_field == 'current_stock':
         # ترتيب حسب المخزون الحالي
-        products = products.order_by(sort_by.replace('current_stock', 'current_stock_calc'))
+        products = products.order_by(sort_by.replace('current_stock', 'stock_total'))
     else:
         products = products.order_by("-created_at")
 
@@ -805,9 +782,11 @@ def product_api_autocomplete(request):
 
             # العودة للطريقة التقليدية في حالة الخطأ
             results = []
-            products = Product.objects.filter(
-                Q(name__icontains=query) | Q(code__icontains=query)
-            ).select_related("category")[:10]
+            products = (
+                Product.objects.filter(Q(name__icontains=query) | Q(code__icontains=query))
+                .select_related("category")
+                .with_stock(per_warehouse=False)[:10]
+            )
 
             for p in products:
                 results.append(
@@ -824,7 +803,11 @@ def product_api_autocomplete(request):
     else:
         # للاستعلامات الفارغة أو القصيرة، عرض المنتجات الأكثر شيوعاً
         results = []
-        products = Product.objects.select_related("category").order_by("-id")[:10]
+        products = (
+            Product.objects.select_related("category")
+            .with_stock(per_warehouse=False)
+            .order_by("-id")[:10]
+        )
 
         for p in products:
             results.append(
@@ -905,7 +888,7 @@ def product_search_api(request):
     # تطبيق الصفحات
     start = (page - 1) * page_size
     end = start + page_size
-    products = products[start:end]
+    products = products.with_stock(per_warehouse=False)[start:end]
 
     # تحضير النتائج
     results = []
@@ -917,7 +900,7 @@ def product_search_api(request):
                 "name": product.name,
                 "price": float(product.price),
                 "code": product.code or "",
-                "current_stock": get_cached_stock_level(product.id),
+                "current_stock": float(product.current_stock),
             }
         )
 
@@ -960,31 +943,23 @@ def barcode_scan_api(request):
         # حساب المخزون الحالي من جميع المستودعات
         current_stock = product.current_stock
 
-        # الحصول على المخزون حسب المستودع
-        from .models import Warehouse
-
-        warehouses_stock = []
-        warehouses = Warehouse.objects.filter(is_active=True)
-
-        for warehouse in warehouses:
-            last_transaction = (
-                StockTransaction.objects.filter(product=product, warehouse=warehouse)
-                .order_by("-transaction_date", "-id")
-                .first()
-            )
-
-            if last_transaction and last_transaction.running_balance > 0:
-                warehouses_stock.append(
-                    {
-                        "warehouse_id": warehouse.id,
-                        "warehouse_name": warehouse.name,
-                        "warehouse_code": warehouse.code,
-                        "stock": float(last_transaction.running_balance),
-                        "last_update": last_transaction.transaction_date.strftime(
-                            "%Y-%m-%d %H:%M"
-                        ),
-                    }
-                )
+        # الحصول على المخزون حسب المستودع — من جدول الأرصدة باستعلام واحد
+        warehouses_stock = [
+            {
+                "warehouse_id": balance.warehouse.id,
+                "warehouse_name": balance.warehouse.name,
+                "warehouse_code": balance.warehouse.code,
+                "stock": float(balance.quantity),
+                "last_update": timezone.localtime(balance.updated_at).strftime(
+                    "%Y-%m-%d %H:%M"
+                ),
+            }
+            for balance in product.stock_balances.filter(
+                warehouse__is_active=True,
+                warehouse__is_deleted=False,
+                quantity__gt=0,
+            ).select_related("warehouse")
+        ]
 
         # جلب إعدادات النظام للعملة
         system_settings = SystemSettings.get_settings()
@@ -0,0 +1,251 @@
+"""
+تصدير أوامر التصنيع (core.exports)
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.exports import batched_values, export_request
+
+from .models import ManufacturingOrder, ManufacturingOrderItem, ManufacturingSettings
+
+OVERDUE_STATUSES = ["pending_approval", "pending", "in_progress"]
+OVERDUE_FILL = "FFEBEE"
+
+
+def annotate_fabric_counts(queryset):
+    """
+    عدد عناصر الطلب الكلي/المستلم/المقطوع (calc_total / calc_received / calc_cut)
+    حسب مستودعات العرض — نفس منطق بادجات حالة القماش في الموديل
+    """
+    # الحصول على المستودعات المحددة للعرض
+    try:
+        settings = ManufacturingSettings.get_settings()
+        display_warehouses = list(settings.warehouses_for_display.all())
+    except Exception:
+        display_warehouses = []
+
+    # إعداد فلاتر العد
+    # إعداد فلاتر العد باستخدام items (OrderItem) من الطلب الأصلي
+    # لأن ManufacturingOrderItem قد لا تكون موجودة للعناصر غير المقطوعة
+
+    if display_warehouses:
+        # في حالة تحديد مستودعات:
+
+        # 1. Total: جميع عناصر الطلب المرتبطة بطلب تقطيع في هذه المستودعات
+        total_filter = Q(
+            order__items__cutting_items__cutting_order__warehouse__in=display_warehouses
+        )
+
+        # تعريف حالة القطع الفعلي (مكتمل أو لديه بيانات استلام)
+        is_actually_cut = Q(order__items__cutting_items__status="completed") | (
+            Q(order__items__cutting_items__receiver_name__isnull=False)
+            & ~Q(order__items__cutting_items__receiver_name="")
+            & Q(order__items__cutting_items__permit_number__isnull=False)
+            & ~Q(order__items__cutting_items__permit_number="")
+        )
+
+        # 2. Cut: عناصر من الـ Total ولكن تم قطعها فعلياً في المستودع المحدد
+        cut_filter = total_filter & is_actually_cut
+
+        # 3. Received: عناصر من الـ Total ولكن تم استلامها (يوجد ManufacturingOrderItem مرتبط ومستلم)
+        # يجب تصفية ManufacturingOrderItem للتأكد من أنه مرتبط بنفس الطلب والمستودع؟
+        # البادج في الموديل يفحص: items.filter(order_item=order_item, fabric_received=True)
+        # وبما أننا داخل نفس الطلب، يكفي التحقق من manufacturing_items المرتبطة بـ OrderItem
+        received_filter = total_filter & Q(
+            order__items__manufacturing_items__fabric_received=True
+        )
+
+    else:
+        # بدون تحديد مستودعات:
+
+        # 1. Total: جميع عناصر الطلب
+        total_filter = Q()
+
+        # تعريف حالة القطع الفعلي
+        is_actually_cut = Q(order__items__cutting_items__status="completed") | (
+            Q(order__items__cutting_items__receiver_name__isnull=False)
+            & ~Q(order__items__cutting_items__receiver_name="")
+            & Q(order__items__cutting_items__permit_number__isnull=False)
+            & ~Q(order__items__cutting_items__permit_number="")
+        )
+
+        # 2. Cut: عناصر لديها cutting_item وحالته مكتملة
+        cut_filter = (
+            Q(order__items__cutting_items__isnull=False) & is_actually_cut
+        )
+
+        # 3. Received: عناصر لديها manufacturing_item مستلم
+        received_filter = Q(
+            order__items__manufacturing_items__fabric_received=True
+        )
+
+    # تطبيق Annotations للحساب
+    return queryset.annotate(
+        # عدد العناصر الكلي (من OrderItem)
+        calc_total=Count("order__items", filter=total_filter, distinct=True),
+        # عدد العناصر المستلمة
+        calc_received=Count(
+            "order__items", filter=received_filter, distinct=True
+        ),
+        # عدد العناصر المقطوعة
+        calc_cut=Count("order__items", filter=cut_filter, distinct=True),
+    )
+
+
+def fabric_status_label(total, received, cut):
+    if total > 0 and received == 0 and cut == total:
+        return "بحاجة استلام"
+    if total > 0 and (received < total or cut < total):
+        return "ناقص"
+    if total > 0 and received == total and cut == total:
+        return "كامل"
+    if cut == 0:
+        return "غير مقطوع"
+    return "غير محدد"
+
+
+def _meters_items(warehouses):
+    items = ManufacturingOrderItem.objects.all()
+    if warehouses:
+        items = items.filter(cutting_item__cutting_order__warehouse__in=warehouses)
+    return items
+
+
+def manufacturing_orders_export(params, user):
+    """
+    أوامر التصنيع المفلترة بنفس منطق ManufacturingOrderListView.
+    الأمتار تُحسب بـ Subquery لكل أمر وإجماليها بـ aggregate واحد
+    بدلاً من items.all() لكل أمر.
+    """
+    from .views import ManufacturingOrderListView
+
+    view = ManufacturingOrderListView()
+    view.request = export_request(params, user)
+    view.kwargs = {}
+    queryset = view.get_queryset()
+    if "calc_total" not in queryset.query.annotations:
+        queryset = annotate_fabric_counts(queryset)
+
+    # إعدادات حساب الأمتار
+    try:
+        settings = ManufacturingSettings.get_settings()
+        warehouses = list(settings.warehouses_for_meters_calculation.all())
+    except Exception:
+        warehouses = []
+
+    order_meters = (
+        _meters_items(warehouses)
+        .filter(manufacturing_order=OuterRef("pk"))
+        .values("manufacturing_order")
+        .annotate(total=Sum("quantity"))
+        .values("total")[:1]
+    )
+    queryset = queryset.annotate(
+        export_meters=Coalesce(
+            Subquery(order_meters),
+            Value(Decimal("0")),
+            output_field=DecimalField(max_digits=14, decimal_places=3),
+        )
+    )
+
+    today = timezone.now().date()
+    order_ids = queryset.values("pk")
+    total_count = queryset.count()
+    overdue_count = (
+        ManufacturingOrder.objects.filter(pk__in=order_ids)
+        .filter(
+            expected_delivery_date__lt=today,
+            status__in=["pending_approval", "pending", "in_progress", "under_execution"],
+        )
+        .count()
+    )
+    grand_total_meters = _meters_items(warehouses).filter(
+        manufacturing_order__in=order_ids
+    ).aggregate(total=Sum("quantity"))["total"] or Decimal("0")
+
+    # تحديد اسم الفلتر النشط
+    active_filter_name = "الكل"
+    status_map = dict(ManufacturingOrder.STATUS_CHOICES)
+    status_filter = params.getlist("status")
+    if status_filter:
+        filter_names = [str(status_map.get(s, s)) for s in status_filter if s]
+        if filter_names:
+            active_filter_name = ", ".join(filter_names)
+
+    type_map = dict(ManufacturingOrder.ORDER_TYPE_CHOICES)
+
+    def rows():
+        fields = [
+            "order__order_number",
+            "order__customer__name",
+            "production_line__name",
+            "order_date",
+            "expected_delivery_date",
+            "order_type",
+            "order__branch__name",
+            "status",
+            "order__salesperson__name",
+            "calc_total",
+            "calc_received",
+            "calc_cut",
+            "export_meters",
+        ]
+        for order in batched_values(queryset, fields):
+            delivery = order["expected_delivery_date"]
+            overdue = bool(delivery and delivery < today and order["status"] in OVERDUE_STATUSES)
+            yield {
+                "order_number": order["order__order_number"] or "-",
+                "customer": order["order__customer__name"] or "-",
+                "line": order["production_line__name"] or "-",
+                "order_date": (
+                    order["order_date"].strftime("%Y-%m-%d") if order["order_date"] else "-"
+                ),
+                "delivery_date": delivery.strftime("%Y-%m-%d") if delivery else "-",
+                "order_type": str(type_map.get(order["order_type"], order["order_type"])),
+                "branch": order["order__branch__name"] or "-",
+                "status": str(status_map.get(order["status"], order["status"])),
+                "salesperson": order["order__salesperson__name"] or "-",
+                "fabric_status": fabric_status_label(
+                    order["calc_total"], order["calc_received"], order["calc_cut"]
+                ),
+                "meters": order["export_meters"],
+                "_fill": OVERDUE_FILL if overdue else None,
+            }
+
+    formatted_meters = "{:,.1f}".format(grand_total_meters)
+    if formatted_meters.endswith(".0"):
+        formatted_meters = formatted_meters[:-2]
+
+    return {
+        "filename": f"manufacturing_orders_{timezone.now().strftime('%Y%m%d_%H%M')}.xlsx",
+        "count": total_count,
+        "sheets": [
+            {
+                "title": "أوامر التصنيع",
+                "cards": [
+                    ("إجمالي الأوامر", total_count),
+                    ("المتأخرات", overdue_count),
+                    ("الفلتر الحالي", active_filter_name),
+                    ("إجمالي الأمتار", f"{formatted_meters} م"),
+                ],
+                "columns": [
+                    {"header": "رقم الطلب", "key": "order_number", "width": 15},
+                    {"header": "العميل", "key": "customer", "width": 25},
+                    {"header": "خط الإنتاج", "key": "line", "width": 20},
+                    {"header": "التاريخ", "key": "order_date", "width": 15},
+                    {"header": "تاريخ التسليم", "key": "delivery_date", "width": 15},
+                    {"header": "النوع", "key": "order_type", "width": 15},
+                    {"header": "الفرع", "key": "branch", "width": 15},
+                    {"header": "الحالة", "key": "status", "width": 15},
+                    {"header": "البائع", "key": "salesperson", "width": 20},
+                    {"header": "حالة القماش", "key": "fabric_status", "width": 15},
+                    {"header": "الأمتار", "key": "meters", "width": 10},
+                ],
+                "rows": rows(),
+            }
+        ],
+    }
@@ -9,6 +9,7 @@ from django.urls import reverse
 from django.utils import timezone
 from model_utils import FieldTracker
 
+from core.page_cache import invalidate_tags_on_commit
 from core.soft_delete import SoftDeleteManager, SoftDeleteMixin
 
 User = get_user_model()
@@ -508,6 +509,7 @@ class ManufacturingOrder(SoftDeleteMixin, models.Model):
             ManufacturingOrder.objects.filter(pk=self.pk).update(
                 completion_date=self.completion_date
             )
+            invalidate_tags_on_commit("manufacturing", "orders")
 
         # تحديث حالة الطلب لتتطابق مع حالة التصنيع
         # تطابق مباشر بين الحالات
@@ -548,6 +550,7 @@ class ManufacturingOrder(SoftDeleteMixin, models.Model):
 
         # تحديث بدون إطلاق الإشارات لتجنب الrecursion
         updated_count = Order.objects.filter(pk=self.order.pk).update(**update_fields)
+        invalidate_tags_on_commit("orders")
 
         # إجبار تحديث الطلب في الذاكرة
         if updated_count > 0:
@@ -1605,6 +1608,7 @@ def update_related_models(sender, instance, created, **kwargs):
             ManufacturingOrder.objects.filter(pk=instance.pk).update(
                 production_line=instance.production_line
             )
+            invalidate_tags_on_commit("manufacturing", "orders")
 
     instance.update_order_status()
 
@@ -1713,9 +1717,15 @@ class FabricReceipt(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.receipt_code:
-            import uuid
-
-            self.receipt_code = f"FR-{uuid.uuid4().hex[:8].upper()}"
+            from core.sequences import allocate, max_suffix
+
+            prefix = f"FR-{timezone.now().strftime('%Y%m')}-"
+            self.receipt_code = allocate(
+                "manufacturing.receipt_code",
+                prefix,
+                render=lambda n: f"{prefix}{n:05d}",
+                seed=lambda: max_suffix(FabricReceipt.objects, "receipt_code", prefix),
+            )
         super().save(*args, **kwargs)
 
     @property
@@ -16,7 +16,7 @@ from django.contrib.auth.mixins import (
 )
 from django.core.paginator import Paginator
 from django.db import models, transaction
-from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, Value, When
 from django.db.models.functions import ExtractMonth, ExtractYear, TruncDay, TruncMonth
 from django.http import (
     Http404,
@@ -44,6 +44,7 @@ from django.views.generic import (
 from accounts.models import Department
 from accounts.utils import apply_default_year_filter
 from core.mixins import PaginationFixMixin
+from core.search import order_search_q
 from notifications.models import Notification, NotificationVisibility
 from orders.models import Order
 
@@ -54,6 +55,7 @@ from .models import (
     ManufacturingOrderItem,
     ProductionLine,
 )
+from .exports import annotate_fabric_counts
 from .utils import get_material_summary_context  # تم إضافة هذا السطر
 
 # ...existing code...
@@ -61,6 +63,9 @@ from .utils import get_material_summary_context  # تم إضافة هذا الس
 
 logger = logging.getLogger(__name__)
 
+# تقارير PDF بعدد طلبات أكبر من هذا تُجهز في الخلفية (core.pdf_service)
+PDF_BACKGROUND_THRESHOLD = 150
+
 
 class ManufacturingOrderListView(
     PaginationFixMixin, LoginRequiredMixin, PermissionRequiredMixin, ListView
@@ -269,83 +274,7 @@ class ManufacturingOrderListView(
         # فلتر حالة الأقمشة - تحسين الأداء باستخدام SQL Annotations
         fabric_status_filter = self.request.GET.get("fabric_status")
         if fabric_status_filter:
-            # from django.db.models import Case, Count, F, IntegerField, Q, When (Removed to fix UnboundLocalError)
-
-            from manufacturing.models import ManufacturingSettings
-
-            # الحصول على المستودعات المحددة للعرض
-            try:
-                settings = ManufacturingSettings.get_settings()
-                display_warehouses = list(settings.warehouses_for_display.all())
-            except Exception:
-                display_warehouses = []
-
-            # إعداد فلاتر العد
-            # إعداد فلاتر العد باستخدام items (OrderItem) من الطلب الأصلي
-            # لأن ManufacturingOrderItem قد لا تكون موجودة للعناصر غير المقطوعة
-
-            if display_warehouses:
-                # في حالة تحديد مستودعات:
-
-                # 1. Total: جميع عناصر الطلب المرتبطة بطلب تقطيع في هذه المستودعات
-                total_filter = Q(
-                    order__items__cutting_items__cutting_order__warehouse__in=display_warehouses
-                )
-
-                # تعريف حالة القطع الفعلي (مكتمل أو لديه بيانات استلام)
-                is_actually_cut = Q(order__items__cutting_items__status="completed") | (
-                    Q(order__items__cutting_items__receiver_name__isnull=False)
-                    & ~Q(order__items__cutting_items__receiver_name="")
-                    & Q(order__items__cutting_items__permit_number__isnull=False)
-                    & ~Q(order__items__cutting_items__permit_number="")
-                )
-
-                # 2. Cut: عناصر من الـ Total ولكن تم قطعها فعلياً في المستودع المحدد
-                cut_filter = total_filter & is_actually_cut
-
-                # 3. Received: عناصر من الـ Total ولكن تم استلامها (يوجد ManufacturingOrderItem مرتبط ومستلم)
-                # يجب تصفية ManufacturingOrderItem للتأكد من أنه مرتبط بنفس الطلب والمستودع؟
-                # البادج في الموديل يفحص: items.filter(order_item=order_item, fabric_received=True)
-                # وبما أننا داخل نفس الطلب، يكفي التحقق من manufacturing_items المرتبطة بـ OrderItem
-                received_filter = total_filter & Q(
-                    order__items__manufacturing_items__fabric_received=True
-                )
-
-            else:
-                # بدون تحديد مستودعات:
-
-                # 1. Total: جميع عناصر الطلب
-                total_filter = Q()
-
-                # تعريف حالة القطع الفعلي
-                is_actually_cut = Q(order__items__cutting_items__status="completed") | (
-                    Q(order__items__cutting_items__receiver_name__isnull=False)
-                    & ~Q(order__items__cutting_items__receiver_name="")
-                    & Q(order__items__cutting_items__permit_number__isnull=False)
-                    & ~Q(order__items__cutting_items__permit_number="")
-                )
-
-                # 2. Cut: عناصر لديها cutting_item وحالته مكتملة
-                cut_filter = (
-                    Q(order__items__cutting_items__isnull=False) & is_actually_cut
-                )
-
-                # 3. Received: عناصر لديها manufacturing_item مستلم
-                received_filter = Q(
-                    order__items__manufacturing_items__fabric_received=True
-                )
-
-            # تطبيق Annotations للحساب
-            queryset = queryset.annotate(
-                # عدد العناصر الكلي (من OrderItem)
-                calc_total=Count("order__items", filter=total_filter, distinct=True),
-                # عدد العناصر المستلمة
-                calc_received=Count(
-                    "order__items", filter=received_filter, distinct=True
-                ),
-                # عدد العناصر المقطوعة
-                calc_cut=Count("order__items", filter=cut_filter, distinct=True),
-            )
+            queryset = annotate_fabric_counts(queryset)
 
             # تطبيق الفلاتر
             if fabric_status_filter == "needs_receipt":
@@ -404,18 +333,11 @@ class ManufacturingOrderListView(
             # إذا لم يحدد المستخدم أعمدة أو اختار 'all'، نفذ البحث الشامل كما كان (يشمل جميع أرقام الفواتير والعقود)
             if not search_columns or "all" in search_columns:
                 queryset = queryset.filter(
-                    Q(order__id__icontains=search)
-                    | Q(order__order_number__icontains=search)
+                    order_search_q(search, "order__")
+                    | Q(order_id__icontains=search)
                     | Q(contract_number__icontains=search)
-                    | Q(order__contract_number_2__icontains=search)
-                    | Q(order__contract_number_3__icontains=search)
                     | Q(invoice_number__icontains=search)
-                    | Q(order__invoice_number_2__icontains=search)
-                    | Q(order__invoice_number_3__icontains=search)
                     | Q(exit_permit_number__icontains=search)
-                    | Q(order__customer__name__icontains=search)
-                    | Q(order__salesperson__name__icontains=search)
-                    | Q(order__branch__name__icontains=search)
                     | Q(notes__icontains=search)
                     | Q(order_type__icontains=search)
                     | Q(status__icontains=search)
@@ -1754,6 +1676,33 @@ class ProductionLinePrintTemplateView(ProductionLinePrintView):
 
         return context
 
+    def pdf_document_key(self, template_name, queryset, *extra):
+        """
+        مفتاح PDF من القالب والفلاتر وحالة البيانات — HTML يحتوي وقت الطباعة
+        (print_date / now) فبصمته تتغير كل دقيقة لنفس المستند
+        """
+        from core.pdf_service import document_key
+
+        params = sorted(
+            (key, sorted(self.request.GET.getlist(key)))
+            for key in self.request.GET
+            if key != "format"
+        )
+        data_version = queryset.order_by().aggregate(
+            count=Count("pk"),
+            changed=Max("updated_at"),
+            order_changed=Max("order__updated_at"),
+        )
+        # {% now "Y-m-d" %} في القالب يحدد المتأخر — المستند يتغير يومياً
+        return document_key(
+            template_name,
+            self.production_line.pk,
+            params,
+            data_version,
+            timezone.localdate(),
+            *extra,
+        )
+
 
 class ProductionLinePDFView(ProductionLinePrintTemplateView):
     """تحميل تقرير خط الإنتاج كملف PDF"""
@@ -1766,11 +1715,19 @@ class ProductionLinePDFView(ProductionLinePrintTemplateView):
 
     def get(self, request, *args, **kwargs):
         try:
-            import io
-
-            from django.http import HttpResponse
             from django.template.loader import render_to_string
-            from core.utils.pdf import build_pdf
+            from core.pdf_service import cached_pdf_exists, file_response, pdf_response_or_prepare
+
+            extra_css = "-webkit-print-color-adjust: exact; print-color-adjust: exact;"
+            base_url = request.build_absolute_uri()
+            filename = f"production_line_{self.production_line.name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
+
+            # ✅ PDF مخزن حسب القالب والبيانات؛ المخزن يُنزَّل دون رندر
+            token = self.pdf_document_key(
+                self.template_name, self.get_queryset(), extra_css, base_url
+            )
+            if cached_pdf_exists(token):
+                return file_response(token, filename)
 
             # الحصول على البيانات
             context = self.get_context_data()
@@ -1778,20 +1735,17 @@ class ProductionLinePDFView(ProductionLinePrintTemplateView):
             # رندر HTML
             html_string = render_to_string(self.template_name, context, request=request)
 
-            # إنشاء PDF مع دعم الخطوط العربية
-            pdf_file = build_pdf(
+            # التقارير الكبيرة تُجهز في الخلفية
+            return pdf_response_or_prepare(
+                request,
                 html_string,
-                extra_css="-webkit-print-color-adjust: exact; print-color-adjust: exact;",
-                base_url=request.build_absolute_uri(),
+                filename,
+                extra_css=extra_css,
+                base_url=base_url,
+                large=context["total_orders"] > PDF_BACKGROUND_THRESHOLD,
+                token=token,
             )
 
-            # إنشاء الاستجابة
-            response = HttpResponse(pdf_file, content_type="application/pdf")
-            filename = f"production_line_{self.production_line.name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
-            response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-            return response
-
         except ImportError:
             # إذا لم تكن weasyprint مثبتة، استخدم طريقة بديلة
             from django.http import JsonResponse
@@ -1833,9 +1787,21 @@ class ProductionLinePDFView(ProductionLinePrintTemplateView):
         try:
             from django.template.loader import render_to_string
 
+            from core.pdf_service import cached_pdf_exists, file_response, pdf_response_or_prepare
+
             # الحصول على جميع الطلبات المفلترة (بدون صفحات للـ PDF)
             all_filtered_orders = self.get_queryset()
 
+            template_name = "manufacturing/production_line_print_pdf.html"
+            filename = f"production_line_{self.production_line.name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
+            # ✅ PDF مخزن حسب القالب والبيانات؛ المخزن يُنزَّل دون رندر
+            # القالب يطبع اسم المستخدم
+            token = self.pdf_document_key(
+                template_name, all_filtered_orders, self.request.user.pk
+            )
+            if cached_pdf_exists(token):
+                return file_response(token, filename)
+
             context = self.get_context_data()
             context.update(
                 {
@@ -1845,17 +1811,15 @@ class ProductionLinePDFView(ProductionLinePrintTemplateView):
                 }
             )
 
-            html_string = render_to_string(
-                "manufacturing/production_line_print_pdf.html", context
-            )
-            from core.utils.pdf import build_pdf
-            pdf = build_pdf(html_string)
-
-            response = HttpResponse(pdf, content_type="application/pdf")
-            filename = f"production_line_{self.production_line.name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
-            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            html_string = render_to_string(template_name, context)
 
-            return response
+            return pdf_response_or_prepare(
+                self.request,
+                html_string,
+                filename,
+                large=all_filtered_orders.count() > PDF_BACKGROUND_THRESHOLD,
+                token=token,
+            )
 
         except Exception as e:
             messages.error(self.request, f"خطأ في إنتاج PDF: {str(e)}")
@@ -2571,8 +2535,8 @@ def print_manufacturing_order(request, pk):
     )
 
     # Create PDF with Arabic font support
-    from core.utils.pdf import build_pdf
-    pdf = build_pdf(html_string, base_url=request.build_absolute_uri("/"))
+    from core.pdf_service import render_cached
+    pdf = render_cached(html_string, base_url=request.build_absolute_uri("/"))
 
     # Create HTTP response with PDF
     response = HttpResponse(pdf, content_type="application/pdf")
@@ -5174,6 +5138,7 @@ class ManufacturingItemStatusReportView(
 def export_manufacturing_orders(request):
     """
     تصدير أوامر التصنيع إلى ملف Excel مع بطاقات ملخص وتنسيق احترافي
+    (core.exports — التصديرات الكبيرة تُجهز في الخلفية)
     """
     # 1. التحقق من الصلاحية
     if not hasattr(request.user, "can_export") or not request.user.can_export:
@@ -5181,279 +5146,9 @@ def export_manufacturing_orders(request):
 
         return HttpResponseForbidden("ليس لديك صلاحية لتصدير البيانات")
 
-    from django.http import HttpResponse
-    from openpyxl import Workbook
-    from openpyxl.styles import Alignment, Border, Color, Font, PatternFill, Side
-    from openpyxl.utils import get_column_letter
-
-    # 2. الحصول على البيانات المفلترة باستخدام View Class الموجود
-    # نستخدم نفس منطق ManufacturingOrderListView لضمان تطابق النتائج
-    view = ManufacturingOrderListView()
-    view.request = request
-    view.kwargs = {}
-
-    # الحصول على QuerySet المفلتر
-    queryset = view.get_queryset()
-
-    # تحسين الأداء لحساب الأمتار
-    from django.db.models import Prefetch
-
-    queryset = queryset.prefetch_related(
-        "items__cutting_item__cutting_order__warehouse"
-    )
-
-    # إعدادات حساب الأمتار
-    from manufacturing.models import ManufacturingSettings
-
-    try:
-        settings = ManufacturingSettings.get_settings()
-        warehouses_for_meters = list(settings.warehouses_for_meters_calculation.all())
-    except Exception:
-        warehouses_for_meters = []
-
-    # 3. حساب الإحصائيات للبطاقات
-    total_count = queryset.count()
-
-    # عدد المتأخرات داخل النتائج المفلترة
-    from django.utils import timezone
-
-    today = timezone.now().date()
-    overdue_count = queryset.filter(
-        expected_delivery_date__lt=today,
-        status__in=["pending_approval", "pending", "in_progress", "under_execution"],
-    ).count()
-
-    # حساب إجمالي الأمتار
-    grand_total_meters = 0
-    # سنقوم بحساب الأمتار لكل طلب وتخزينها لاستخدامها لاحقاً
-    # هذا لتجنب إعادة الحساب مرتين
-    orders_with_meters = []
-
-    for order in queryset:
-        order_meters = 0
-        # حساب أمتار كل طلب
-        for item in order.items.all():
-            quantity = item.quantity or 0
-            if not warehouses_for_meters:
-                # إذا لم تكن هناك مستودعات محددة، نجمع الكل
-                order_meters += quantity
-            else:
-                # التحقق من المستودع
-                # نتأكد من وجود سلسلة العلاقات كاملة
-                if (
-                    item.cutting_item
-                    and item.cutting_item.cutting_order
-                    and item.cutting_item.cutting_order.warehouse
-                    in warehouses_for_meters
-                ):
-                    order_meters += quantity
-
-        grand_total_meters += order_meters
-        # تخزين الطلب مع أمتاره
-        order.calculated_meters = order_meters
-        orders_with_meters.append(order)
-
-    # تحديد اسم الفلتر النشط
-    active_filter_name = "الكل"
-    status_filter = request.GET.getlist("status")
-    if status_filter:
-        status_map = dict(ManufacturingOrder.STATUS_CHOICES)
-        filter_names = [str(status_map.get(s, s)) for s in status_filter if s]
-        if filter_names:
-            active_filter_name = ", ".join(filter_names)
-
-    # 4. إعداد ملف Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "أوامر التصنيع"
-    ws.sheet_view.rightToLeft = True  # اتجاه الورقة من اليمين لليسار
-
-    # --- تنسيقات ---
-    # حدود الخلايا
-    thin_border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
+    from core.exports import export_response
 
-    # أنماط البطاقات
-    card_title_font = Font(name="Arial", size=12, bold=True, color="FFFFFF")
-    card_value_font = Font(name="Arial", size=14, bold=True, color="FFFFFF")
-    card_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    # ألوان البطاقات
-    # الأزرق (Total)
-    blue_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    # الأحمر (Overdue)
-    red_fill = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")
-    # الأخضر (Active Filter)
-    green_fill = PatternFill(
-        start_color="548235", end_color="548235", fill_type="solid"
-    )
-    # البنفسجي (Total Meters)
-    purple_fill = PatternFill(
-        start_color="7030A0", end_color="7030A0", fill_type="solid"
-    )
-
-    # --- رسم البطاقات (الصف 2-4) ---
-
-    # بطاقة الإجمالي (A2:B4)
-    ws.merge_cells("A2:B4")
-    cell = ws["A2"]
-    cell.value = f"إجمالي الأوامر\n{total_count}"
-    cell.fill = blue_fill
-    cell.font = card_value_font
-    cell.alignment = card_alignment
-
-    # بطاقة المتأخرات (C2:E4)
-    ws.merge_cells("C2:E4")
-    cell = ws["C2"]
-    cell.value = f"المتأخرات\n{overdue_count}"
-    cell.fill = red_fill
-    cell.font = card_value_font
-    cell.alignment = card_alignment
-
-    # بطاقة الفلتر النشط (F2:H4)
-    ws.merge_cells("F2:H4")
-    cell = ws["F2"]
-    cell.value = f"الفلتر الحالي\n{active_filter_name}"
-    cell.fill = green_fill
-    cell.font = card_value_font
-    cell.alignment = card_alignment
-
-    # بطاقة إجمالي الأمتار (I2:K4)
-    ws.merge_cells("I2:K4")
-    cell = ws["I2"]
-    # تنسيق الرقم بفاصلة عشرية واحدة
-    formatted_meters = "{:,.1f}".format(grand_total_meters)
-    # إزالة .0 اذا كان رقماً صحيحاً
-    if formatted_meters.endswith(".0"):
-        formatted_meters = formatted_meters[:-2]
-
-    cell.value = f"إجمالي الأمتار\n{formatted_meters} م"
-    cell.fill = purple_fill
-    cell.font = card_value_font
-    cell.alignment = card_alignment
-
-    # --- جدول البيانات (يبدأ من الصف 6) ---
-    headers = [
-        "رقم الطلب",
-        "العميل",
-        "خط الإنتاج",
-        "التاريخ",
-        "تاريخ التسليم",
-        "النوع",
-        "الفرع",
-        "الحالة",
-        "البائع",
-        "حالة القماش",
-        "الأمتار",
-    ]
-
-    header_row = 6
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=header_row, column=col_num)
-        cell.value = header
-        cell.font = Font(bold=True, size=11, color="FFFFFF")
-        cell.fill = PatternFill(
-            start_color="808080", end_color="808080", fill_type="solid"
-        )
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = thin_border
-
-    # تعبئة البيانات
-    data_row = 7
-    # نستخدم القائمة المحسوبة مسبقاً بدلاً من queryset
-    for order in orders_with_meters:
-        # ترجمة الحالة
-        status_display = order.get_status_display()
-        type_display = order.get_order_type_display()
-
-        # حالة القماش (من Bages) - استخدام الخصائص الموجودة في الموديل أو القيم المحسوبة
-        # نستخدم القيم المحسوبة إذا كانت متوفرة لضمان تطابق الفلتر، وإلا نستخدم الخصائص
-
-        fabric_status = "غير محدد"
-        if hasattr(order, "calc_total"):
-            # استخدام القيم المحسوبة من الـ annotation
-            total = order.calc_total
-            received = order.calc_received
-            cut = order.calc_cut
-
-            if total > 0 and received == 0 and cut == total:
-                fabric_status = "بحاجة استلام"
-            elif total > 0 and (received < total or cut < total):
-                fabric_status = "ناقص"
-            elif total > 0 and received == total and cut == total:
-                fabric_status = "كامل"
-            elif cut == 0:
-                fabric_status = "غير مقطوع"
-        else:
-            # استخدام خصائص الموديل
-            total = order.total_items_count
-            received = order.received_items_count
-            cut = order.cut_items_count
-
-            if total > 0 and received == 0 and cut == total:
-                fabric_status = "بحاجة استلام"
-            elif total > 0 and (received < total or cut < total):
-                fabric_status = "ناقص"
-            elif total > 0 and received == total and cut == total:
-                fabric_status = "كامل"
-            elif cut == 0:
-                fabric_status = "غير مقطوع"
-
-        row_data = [
-            order.order.order_number if order.order else "-",
-            order.order.customer.name if order.order.customer else "-",
-            order.production_line.name if order.production_line else "-",
-            order.order_date.strftime("%Y-%m-%d") if order.order_date else "-",
-            (
-                order.expected_delivery_date.strftime("%Y-%m-%d")
-                if order.expected_delivery_date
-                else "-"
-            ),
-            type_display,
-            order.order.branch.name if order.order.branch else "-",
-            status_display,
-            order.order.salesperson.name if order.order.salesperson else "-",
-            fabric_status,
-            order.calculated_meters,  # استخدام القيمة المحسوبة مسبقاً
-        ]
-
-        for col_num, value in enumerate(row_data, 1):
-            cell = ws.cell(row=data_row, column=col_num)
-            cell.value = value
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = thin_border
-
-            # تلوين صف المتأخرات
-            is_overdue = False
-            if order.expected_delivery_date and order.expected_delivery_date < today:
-                if order.status in ["pending_approval", "pending", "in_progress"]:
-                    is_overdue = True
-
-            if is_overdue:
-                cell.fill = PatternFill(
-                    start_color="FFEBEE", end_color="FFEBEE", fill_type="solid"
-                )
-
-        data_row += 1
-
-    # ضبط عرض الأعمدة تلقائياً
-    column_widths = [15, 25, 20, 15, 15, 15, 15, 15, 20, 15, 10]
-    for i, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(i)].width = width
-
-    # إعداد الاستجابة
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    filename = f"manufacturing_orders_{timezone.now().strftime('%Y%m%d_%H%M')}.xlsx"
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-
-    wb.save(response)
-    return response
+    return export_response(request, "manufacturing_orders")
 
 
 @login_required
@@ -10,6 +10,8 @@ from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
+from core.page_cache import invalidate_tags_on_commit
+
 from manufacturing.models import ManufacturingOrder, ManufacturingOrderItem
 from orders.models import Order
 
@@ -186,6 +188,8 @@ def bulk_update_status_api(request: HttpRequest) -> JsonResponse:
             updated_count = ManufacturingOrder.objects.filter(
                 id__in=order_ids
             ).update(status=new_status)
+            # update() لا يطلق post_save — إلغاء كاش الصفحات يدوياً
+            invalidate_tags_on_commit("manufacturing", "orders")
         
         return JsonResponse({
             'success': True,
@@ -1,24 +1,19 @@
-from django.core.cache import cache
+from core.layout_context import render_section
 
 from .models import Notification
 from .utils import get_user_notification_count
 
-_NOTIF_CACHE_TTL = 30  # 30 ثانية
-
 
 def notifications_context(request):
     """
-    إضافة معلومات الإشعارات إلى السياق العام — Cached 30s per user
+    إضافة معلومات الإشعارات إلى السياق العام — عبر خدمة سياق القالب الموحدة
     """
-    if not request.user.is_authenticated:
-        return {}
+    return render_section(request, "notifications")
 
-    user = request.user
-    cache_key = f"ctx_notif_{user.pk}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
 
+def build_notifications_context(request):
+    """بناء عدادات وآخر إشعارات المستخدم (بدون كاش)"""
+    user = request.user
     unread_count = get_user_notification_count(user)
 
     recent_notifications = list(
@@ -27,9 +22,7 @@ def notifications_context(request):
         )
     )
 
-    result = {
+    return {
         "notifications_unread_count": unread_count,
         "recent_notifications": recent_notifications,
     }
-    cache.set(cache_key, result, _NOTIF_CACHE_TTL)
-    return result
@@ -0,0 +1,137 @@
+"""
+عدادات الإشعارات غير المقروءة في Redis
+======================================
+بدلاً من COUNT(*) على NotificationVisibility لكل صفحة ولكل استعلام دوري
+من كل تبويب مفتوح، يُحفظ لكل مستخدم عداد في الكاش:
+
+- يزيد عند توزيع الإشعار (create_notification / إنشاء سجل رؤية منفرد)
+- ينقص عند القراءة (والقراءة الجماعية عبر mark_visibilities_read) وعند حذف
+  سجل غير مقروء، ويُصفّر عند "تحديد الكل كمقروء"
+- إذا لم يكن العداد موجوداً يُحسب من الجدول عند أول قراءة
+- مهمة دورية (reconcile_unread_counters) تصحح أي انحراف عن الجدول
+- كل تغيير يُبث لتبويبات المستخدم عبر WebSocket (الموضوع user:<id>)
+
+التعديلات تُطبق بعد تأكيد المعاملة فقط حتى لا يُحسب ما أُلغي.
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY_PREFIX = "notifications:unread:"
+COUNTER_TIMEOUT = 24 * 60 * 60
+
+
+def _key(user_id):
+    return f"{COUNTER_KEY_PREFIX}{user_id}"
+
+
+def count_unread_from_db(user_id):
+    from .models import NotificationVisibility
+
+    return NotificationVisibility.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def get_unread_count(user_id):
+    """عدد الإشعارات غير المقروءة من العداد (يُحسب من الجدول إن لم يوجد)"""
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = count_unread_from_db(user_id)
+        cache.set(_key(user_id), count, COUNTER_TIMEOUT)
+    return max(int(count), 0)
+
+
+def _adjust(user_ids, delta):
+    for user_id in user_ids:
+        try:
+            count = cache.incr(_key(user_id), delta)
+        except ValueError:
+            # لا يوجد عداد — يُحسب من الجدول (المعاملة تأكدت بالفعل)
+            count = get_unread_count(user_id)
+        _push(user_id, count)
+
+
+def _push(user_id, count):
+    """بث العدد الجديد لتبويبات المستخدم المفتوحة (core.realtime)"""
+    if count is None:
+        return
+    from core.realtime import send_now
+
+    send_now(f"user:{user_id}", "notifications.unread", {"count": max(int(count), 0)})
+
+
+def increment_unread(user_ids, amount=1):
+    user_ids = [user_id for user_id in user_ids if user_id]
+    if user_ids:
+        transaction.on_commit(lambda: _adjust(user_ids, amount))
+
+
+def decrement_unread(user_id, amount=1):
+    if user_id and amount:
+        transaction.on_commit(lambda: _adjust([user_id], -amount))
+
+
+def mark_visibilities_read(queryset):
+    """
+    تحديد سجلات رؤية كمقروءة بـ update واحد مع إنقاص عداد كل مستخدم بما قُرئ له
+    Returns: عدد السجلات المحدّثة
+    """
+    from django.db.models import Count
+    from django.utils import timezone
+
+    unread = queryset.filter(is_read=False)
+    per_user = list(
+        unread.order_by()
+        .values("user_id")
+        .annotate(unread=Count("id"))
+        .values_list("user_id", "unread")
+    )
+    updated = unread.update(is_read=True, read_at=timezone.now())
+    for user_id, amount in per_user:
+        decrement_unread(user_id, amount)
+    return updated
+
+
+def reset_unread(user_id):
+    def _reset():
+        cache.set(_key(user_id), 0, COUNTER_TIMEOUT)
+        _push(user_id, 0)
+
+    transaction.on_commit(_reset)
+
+
+def reconcile_unread_counters():
+    """
+    مطابقة العدادات مع الجدول لكل المستخدمين النشطين (استعلامان فقط)
+    Returns: عدد العدادات التي كانت منحرفة
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+
+    from .models import NotificationVisibility
+
+    user_ids = list(get_user_model().objects.filter(is_active=True).values_list("id", flat=True))
+    actual = dict(
+        NotificationVisibility.objects.filter(is_read=False, user_id__in=user_ids)
+        .values("user_id")
+        .annotate(unread=Count("id"))
+        .values_list("user_id", "unread")
+    )
+
+    keys = {_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(list(keys))
+    drifted = sum(
+        1
+        for key, value in cached.items()
+        if value is not None and int(value) != actual.get(keys[key], 0)
+    )
+
+    cache.set_many(
+        {key: actual.get(user_id, 0) for key, user_id in keys.items()}, COUNTER_TIMEOUT
+    )
+    if drifted:
+        logger.info(f"🔔 تم تصحيح {drifted} عداد إشعارات غير مقروءة")
+    return drifted
@@ -66,6 +66,8 @@ class Notification(models.Model):
         ("order_rejected", _("رفض طلب")),
         # إشعارات المبيعات الخارجية
         ("decorator_engineer_added", _("مهندس ديكور جديد")),
+        # التقارير المجدولة
+        ("report_ready", _("تقرير مجدول جاهز")),
     ]
 
     PRIORITY_LEVELS = [
@@ -542,6 +544,10 @@ class NotificationVisibility(models.Model):
             self.read_at = timezone.now()
             self.save(update_fields=["is_read", "read_at"])
 
+            from .counters import decrement_unread
+
+            decrement_unread(self.user_id)
+
 
 class NotificationSettings(models.Model):
     """إعدادات الإشعارات للمستخدمين"""
@@ -2,17 +2,42 @@ import logging
 
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import post_save, pre_save
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from core.realtime import publish
+
+from .counters import decrement_unread, increment_unread
 from .models import Notification, NotificationVisibility
-from .utils import get_notification_recipients
+from .utils import invalidate_role_index, resolve_recipient_ids
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+DEDUP_WINDOW = 5 * 60
+STATUS_CHANGE_TYPES = (
+    "order_status_changed",
+    "manufacturing_status_changed",
+    "inspection_status_changed",
+    "installation_completed",
+)
+ROLE_FIELDS = {
+    "is_active",
+    "is_superuser",
+    "branch",
+    "is_salesperson",
+    "is_branch_manager",
+    "is_region_manager",
+    "is_sales_manager",
+    "is_factory_manager",
+    "is_inspection_manager",
+    "is_installation_manager",
+}
+
 
 def clean_extra_data(data):
     """تنظيف البيانات الإضافية من النصوص المترجمة لتجنب مشاكل JSON"""
@@ -55,45 +80,62 @@ def create_notification(
     Returns:
         Notification: الإشعار المنشأ
     """
-    from datetime import timedelta
+    # فحص الإشعارات المكررة (نفس النوع والكائن المرتبط في آخر 5 دقائق)
+    # ✅ بمفتاح Redis يُحجز ذرياً بدلاً من البحث في جدول الإشعارات
+    dedup_key = _dedup_key(notification_type, related_object, extra_data)
+    if dedup_key:
+        claimed = cache.add(dedup_key, 0, DEDUP_WINDOW)
+        # False = المفتاح موجود؛ None = Redis غير متاح (لا نمنع الإشعار)
+        if claimed is False:
+            logger.info(f"⚠️ تم تجاهل إشعار مكرر: {title}")
+            existing_id = cache.get(dedup_key)
+            return Notification.objects.filter(pk=existing_id).first() if existing_id else None
 
-    from django.utils import timezone
+    try:
+        notification = _create_notification_records(
+            title,
+            message,
+            notification_type,
+            related_object,
+            created_by,
+            priority,
+            extra_data,
+            recipients,
+        )
+    except Exception:
+        if dedup_key:
+            cache.delete(dedup_key)
+        raise
+
+    if dedup_key:
+        cache.set(dedup_key, notification.pk, DEDUP_WINDOW)
+    return notification
+
+
+def _dedup_key(notification_type, related_object, extra_data):
+    """
+    مفتاح منع التكرار: للإشعارات الحساسة (تغيير حالة) يدخل التغيير نفسه في
+    المفتاح فيُسمح بإشعار جديد فقط إذا كان تغييراً مختلفاً
+    """
+    if not related_object or related_object.pk is None:
+        return None
+    content_type = ContentType.objects.get_for_model(related_object)
+    key = f"notifications:dedup:{notification_type}:{content_type.pk}:{related_object.pk}"
+    if notification_type in STATUS_CHANGE_TYPES and extra_data:
+        key += f":{extra_data.get('old_status')}:{extra_data.get('new_status')}"
+    return key
 
-    # فحص الإشعارات المكررة (نفس النوع والكائن المرتبط في آخر 5 دقائق)
-    if related_object:
-        recent_time = timezone.now() - timedelta(minutes=5)
-        existing_notification = Notification.objects.filter(
-            notification_type=notification_type,
-            content_type=ContentType.objects.get_for_model(related_object),
-            object_id=related_object.pk,
-            created_at__gte=recent_time,
-        ).first()
-
-        if existing_notification:
-            # للإشعارات الحساسة (تغيير حالة)، السماح بإشعار جديد فقط إذا كان تغييراً مختلفاً
-            if notification_type in [
-                "order_status_changed",
-                "manufacturing_status_changed",
-                "inspection_status_changed",
-                "installation_completed",
-            ]:
-                is_different_change = (
-                    extra_data
-                    and existing_notification.extra_data
-                    and (
-                        extra_data.get("old_status") != existing_notification.extra_data.get("old_status")
-                        or extra_data.get("new_status") != existing_notification.extra_data.get("new_status")
-                    )
-                )
-                if is_different_change:
-                    pass  # تغيير مختلف — السماح بإنشاء إشعار جديد
-                else:
-                    logger.info(f"⚠️ تم تجاهل إشعار مكرر (نفس التغيير): {title}")
-                    return existing_notification
-            else:
-                logger.info(f"⚠️ تم تجاهل إشعار مكرر: {title}")
-                return existing_notification
 
+def _create_notification_records(
+    title,
+    message,
+    notification_type,
+    related_object,
+    created_by,
+    priority,
+    extra_data,
+    recipients,
+):
     # إنشاء الإشعار
     notification = Notification.objects.create(
         title=title,
@@ -112,28 +154,147 @@ def create_notification(
 
     # تحديد المستخدمين المصرح لهم برؤية الإشعار
     if recipients is None:
-        recipients = get_notification_recipients(
-            notification_type, related_object, created_by
-        )
+        recipient_ids = resolve_recipient_ids(notification_type, related_object, created_by)
+    else:
+        recipient_ids = {getattr(user, "pk", user) for user in recipients if user}
 
-    # إنشاء سجلات الرؤية مع منع التكرار
-    seen_ids = set()
-    visibility_records = []
-    for user in recipients:
-        if user.pk not in seen_ids:
-            seen_ids.add(user.pk)
-            visibility_records.append(
-                NotificationVisibility(notification=notification, user=user, is_read=False)
-            )
+    # إنشاء سجلات الرؤية (المجموعة تمنع التكرار)
+    visibility_records = [
+        NotificationVisibility(notification=notification, user_id=user_id, is_read=False)
+        for user_id in recipient_ids
+    ]
 
     if visibility_records:
         NotificationVisibility.objects.bulk_create(
             visibility_records, ignore_conflicts=True
         )
+        increment_unread(recipient_ids)
+        publish(
+            [f"user:{user_id}" for user_id in recipient_ids],
+            "notifications.new",
+            {
+                "id": notification.pk,
+                "title": notification.title,
+                "priority": notification.priority,
+                "notification_type": notification.notification_type,
+            },
+        )
 
     return notification
 
 
+# ===== التوزيع غير المتزامن =====
+
+
+def queue_notification(
+    title,
+    message,
+    notification_type,
+    related_object=None,
+    created_by=None,
+    priority="normal",
+    extra_data=None,
+    recipients=None,
+):
+    """
+    نفس معاملات create_notification لكن الإشعار يُنشأ خارج طلب الحفظ:
+    يُحفظ حدث خفيف ويُرسل لـ Celery بعد تأكيد المعاملة، ويحدد العامل
+    المستلمين وينشئ سجلات الرؤية. لا يُرسل شيء إذا أُلغيت المعاملة.
+    """
+    event = {
+        "title": str(title),
+        "message": str(message),
+        "notification_type": notification_type,
+        "priority": priority,
+        "extra_data": clean_extra_data(extra_data or {}),
+        "content_type_id": (
+            ContentType.objects.get_for_model(related_object).pk if related_object else None
+        ),
+        "object_id": related_object.pk if related_object else None,
+        "created_by_id": created_by.pk if created_by else None,
+        "recipient_ids": (
+            [getattr(user, "pk", user) for user in recipients if user]
+            if recipients is not None
+            else None
+        ),
+    }
+    transaction.on_commit(lambda: _dispatch_event(event))
+
+
+def _dispatch_event(event):
+    try:
+        from .tasks import fan_out_notification
+
+        fan_out_notification.delay(event)
+    except Exception as e:
+        # الوسيط غير متاح — ننشئ الإشعار مباشرة حتى لا يضيع
+        logger.warning(f"⚠️ تعذر جدولة الإشعار ({e}) — إنشاء مباشر")
+        deliver_notification_event(event)
+
+
+def deliver_notification_event(event):
+    """إنشاء الإشعار من حدث queue_notification (يُستدعى من العامل)"""
+    related_object = None
+    if event["content_type_id"] and event["object_id"] is not None:
+        content_type = ContentType.objects.get_for_id(event["content_type_id"])
+        related_object = (
+            content_type.model_class()._base_manager.filter(pk=event["object_id"]).first()
+        )
+        if related_object is None:
+            logger.info(f"⚠️ تم تجاهل إشعار لكائن محذوف: {event['title']}")
+            return None
+
+    created_by = None
+    if event["created_by_id"]:
+        created_by = User.objects.filter(pk=event["created_by_id"]).first()
+
+    return create_notification(
+        title=event["title"],
+        message=event["message"],
+        notification_type=event["notification_type"],
+        related_object=related_object,
+        created_by=created_by,
+        priority=event["priority"],
+        extra_data=event["extra_data"],
+        recipients=event["recipient_ids"],
+    )
+
+
+# ===== عدادات غير المقروء =====
+
+
+@receiver(post_save, sender=NotificationVisibility)
+def count_new_visibility(sender, instance, created, **kwargs):
+    """سجلات الرؤية المنشأة منفردة (get_or_create) — bulk_create يُحسب في create_notification"""
+    if created and not instance.is_read:
+        increment_unread([instance.user_id])
+
+
+@receiver(post_delete, sender=NotificationVisibility)
+def count_deleted_visibility(sender, instance, **kwargs):
+    """الحذف المباشر أو المتتالي (حذف الإشعار) لسجل غير مقروء ينقص العداد"""
+    if not instance.is_read:
+        decrement_unread(instance.user_id)
+
+
+# ===== فهرس الأدوار =====
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender="accounts.Role")
+@receiver(post_delete, sender="accounts.Role")
+@receiver(post_save, sender="accounts.UserRole")
+@receiver(post_delete, sender="accounts.UserRole")
+def invalidate_notification_role_index(sender, **kwargs):
+    """مسح فهرس الأدوار عند تعديل المستخدمين أو الأدوار"""
+    if sender is User and kwargs.get("update_fields"):
+        # تحديثات last_login وما شابه لا تغير الأدوار
+        if not set(kwargs["update_fields"]) & ROLE_FIELDS:
+            return
+    transaction.on_commit(invalidate_role_index)
+
+
 # ===== إشعارات العملاء =====
 
 
@@ -147,7 +308,7 @@ def customer_created_notification(sender, instance, created, **kwargs):
         if instance.created_by:
             message += f" بواسطة {instance.created_by.get_full_name() or instance.created_by.username}"
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="customer_created",
@@ -191,7 +352,7 @@ def order_created_notification(sender, instance, created, **kwargs):
         if instance.created_by:
             message += f" بواسطة {instance.created_by.get_full_name() or instance.created_by.username}"
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="order_created",
@@ -243,7 +404,7 @@ def order_rejected_notification(sender, instance, **kwargs):
                     customer_name = instance.customer.name
                 rejection_reason = getattr(instance, "rejection_reason", "") or ""
 
-                create_notification(
+                queue_notification(
                     title=f"تم رفض الطلب {order_number}",
                     message=(
                         f'تم رفض طلبك رقم {order_number}'
@@ -291,7 +452,7 @@ def manufacturing_order_rejected_notification(sender, instance, **kwargs):
                     pass
                 rejection_reason = getattr(instance, "rejection_reason", "") or ""
 
-                create_notification(
+                queue_notification(
                     title=f"تم رفض أمر التصنيع للطلب {order_number}",
                     message=(
                         f'تم رفض أمر التصنيع للطلب رقم {order_number}'
@@ -351,7 +512,7 @@ def inspection_created_notification(sender, instance, created, **kwargs):
         # محاولة الحصول على المستخدم المنشئ
         created_by_user = getattr(instance, "_changed_by", None) or getattr(instance, "created_by", None)
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="inspection_created",
@@ -433,7 +594,7 @@ def inspection_status_changed_notification(sender, instance, **kwargs):
 
                 logger.info(f"✅ إنشاء إشعار تغيير المعاينة: {title}")
 
-                create_notification(
+                queue_notification(
                     title=title,
                     message=message,
                     notification_type="inspection_status_changed",
@@ -493,7 +654,7 @@ def installation_scheduled_notification(sender, instance, created, **kwargs):
         if created_by_user:
             message += f" بواسطة {created_by_user.get_full_name() or created_by_user.username}"
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="installation_scheduled",
@@ -549,7 +710,7 @@ def installation_completed_notification(sender, instance, **kwargs):
                         f" بواسطة {changed_by.get_full_name() or changed_by.username}"
                     )
 
-                create_notification(
+                queue_notification(
                     title=title,
                     message=message,
                     notification_type="installation_completed",
@@ -625,7 +786,7 @@ def manufacturing_order_status_changed_notification(sender, instance, **kwargs):
                     f" بواسطة {changed_by.get_full_name() or changed_by.username}"
                 )
 
-                create_notification(
+                queue_notification(
                     title=title,
                     message=message,
                     notification_type="manufacturing_status_changed",
@@ -672,7 +833,7 @@ def complaint_created_notification(sender, instance, created, **kwargs):
 
         created_by_user = getattr(instance, "_changed_by", None) or getattr(instance, "created_by", None)
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="complaint_created",
@@ -739,7 +900,7 @@ def complaint_status_and_assignment_notification(sender, instance, created, **kw
         title = f"تغيير حالة الشكوى {instance.complaint_number}"
         message = f'تم تغيير حالة الشكوى من "{status_map.get(old_status, old_status)}" إلى "{status_map.get(new_status, new_status)}"'
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type=notif_type,
@@ -793,7 +954,7 @@ def complaint_status_and_assignment_notification(sender, instance, created, **kw
         if old_assignee:
             message += f" (كانت مسندة إلى {old_assignee.get_full_name()})"
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="complaint_assigned",
@@ -834,7 +995,7 @@ def complaint_escalation_notification(sender, instance, created, **kwargs):
         if instance.escalated_from:
             message += f" من {instance.escalated_from.get_full_name()}"
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="complaint_escalated",
@@ -871,7 +1032,7 @@ def complaint_update_notification(sender, instance, created, **kwargs):
         desc = instance.description or ""
         message = desc[:100] + "..." if len(desc) > 100 else desc
 
-        create_notification(
+        queue_notification(
             title=title,
             message=message,
             notification_type="complaint_comment",
@@ -0,0 +1,33 @@
+"""
+مهام خلفية لنظام الإشعارات
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def fan_out_notification(self, event):
+    """
+    إنشاء إشعار وتوزيعه على المستلمين خارج طلب الحفظ
+    (الحدث من notifications.signals.queue_notification)
+    """
+    from .signals import deliver_notification_event
+
+    try:
+        notification = deliver_notification_event(event)
+        return {"success": True, "notification_id": notification.pk if notification else None}
+    except Exception as exc:
+        logger.error(f"❌ فشل توزيع الإشعار '{event.get('title')}': {exc}")
+        raise self.retry(exc=exc)
+
+
+@shared_task(name="notifications.tasks.reconcile_unread_counters")
+def reconcile_unread_counters():
+    """مطابقة عدادات غير المقروء في Redis مع جدول NotificationVisibility"""
+    from .counters import reconcile_unread_counters as reconcile
+
+    return {"drifted": reconcile()}
@@ -1,38 +1,103 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
 
 User = get_user_model()
 
 
-def get_notification_recipients(
-    notification_type, related_object=None, created_by=None
-):
-    """
-    تحديد المستخدمين المصرح لهم برؤية الإشعار حسب نوع الإشعار والصلاحيات
+ROLE_INDEX_CACHE_KEY = "notifications:role_index"
+ROLE_INDEX_TIMEOUT = 60 * 60
 
-    Args:
-        notification_type: نوع الإشعار
-        related_object: الكائن المرتبط
-        created_by: المستخدم المنشئ
 
-    Returns:
-        QuerySet: المستخدمون المصرح لهم برؤية الإشعار
+def build_role_index():
     """
-    # جمع جميع IDs المستخدمين
-    recipient_ids = set()
+    فهرس الأدوار → المستخدمين النشطين باستعلام واحد
+    يُخزن في الكاش ويُمسح عند تعديل المستخدمين أو الأدوار (notifications.signals)
+    """
+    index = {
+        "admins": set(),
+        "sales_or_region_managers": set(),
+        "factory_managers": set(),
+        "inspection_managers": set(),
+        "installation_managers": set(),
+        "branch_managers": {},
+        "salespeople": {},
+    }
+    users = User.objects.filter(is_active=True).values_list(
+        "id",
+        "branch_id",
+        "is_superuser",
+        "is_sales_manager",
+        "is_region_manager",
+        "is_branch_manager",
+        "is_salesperson",
+        "is_factory_manager",
+        "is_inspection_manager",
+        "is_installation_manager",
+    )
+    for (
+        user_id,
+        branch_id,
+        is_superuser,
+        is_sales_manager,
+        is_region_manager,
+        is_branch_manager,
+        is_salesperson,
+        is_factory_manager,
+        is_inspection_manager,
+        is_installation_manager,
+    ) in users:
+        if is_superuser or is_sales_manager:
+            index["admins"].add(user_id)
+        if is_sales_manager or is_region_manager:
+            index["sales_or_region_managers"].add(user_id)
+        if is_factory_manager:
+            index["factory_managers"].add(user_id)
+        if is_inspection_manager:
+            index["inspection_managers"].add(user_id)
+        if is_installation_manager:
+            index["installation_managers"].add(user_id)
+        if branch_id:
+            if is_branch_manager or is_region_manager:
+                index["branch_managers"].setdefault(branch_id, set()).add(user_id)
+            if is_salesperson:
+                index["salespeople"].setdefault(branch_id, set()).add(user_id)
+    return index
+
+
+def get_role_index():
+    """فهرس الأدوار من الكاش (يُبنى عند أول طلب بعد المسح)"""
+    index = cache.get(ROLE_INDEX_CACHE_KEY)
+    if index is None:
+        index = build_role_index()
+        cache.set(ROLE_INDEX_CACHE_KEY, index, ROLE_INDEX_TIMEOUT)
+    return index
+
+
+def invalidate_role_index():
+    cache.delete(ROLE_INDEX_CACHE_KEY)
+
+
+def _branch_managers(index, branch_id):
+    return index["branch_managers"].get(branch_id, set()) if branch_id else set()
+
+
+def _user_id(user):
+    return user.pk if user else None
+
+
+def resolve_recipient_ids(notification_type, related_object=None, created_by=None):
+    """
+    معرفات المستخدمين المصرح لهم برؤية الإشعار حسب نوعه والصلاحيات
+    ✅ من فهرس الأدوار المخزن بدلاً من عدة استعلامات union لكل إشعار
+    """
+    index = get_role_index()
 
     # مديرو النظام يرون جميع الإشعارات
-    super_admins = User.objects.filter(
-        Q(is_superuser=True) | Q(is_sales_manager=True), is_active=True
-    ).values_list("id", flat=True)
-    recipient_ids.update(super_admins)
+    recipient_ids = set(index["admins"])
 
     # تحديد المستخدمين حسب نوع الإشعار
     if notification_type in ["customer_created"]:
-        customer_recipients = get_customer_notification_recipients(
-            related_object, created_by
-        ).values_list("id", flat=True)
-        recipient_ids.update(customer_recipients)
+        recipient_ids |= get_customer_recipient_ids(index, related_object, created_by)
 
     elif notification_type in [
         "order_created",
@@ -41,279 +106,179 @@ def get_notification_recipients(
         "order_delivered",
         "manufacturing_status_changed",
     ]:
-        order_recipients = get_order_notification_recipients(
-            related_object, created_by, notification_type
-        ).values_list("id", flat=True)
-        recipient_ids.update(order_recipients)
+        recipient_ids |= get_order_recipient_ids(index, related_object, notification_type)
 
     elif notification_type in ["inspection_created", "inspection_status_changed"]:
-        inspection_recipients = get_inspection_notification_recipients(
-            related_object, created_by, notification_type
-        ).values_list("id", flat=True)
-        recipient_ids.update(inspection_recipients)
+        recipient_ids |= get_inspection_recipient_ids(
+            index, related_object, notification_type
+        )
 
     elif notification_type in [
         "installation_scheduled",
         "installation_completed",
         "installation_status_changed",
     ]:
-        installation_recipients = get_installation_notification_recipients(
-            related_object, created_by, notification_type
-        ).values_list("id", flat=True)
-        recipient_ids.update(installation_recipients)
+        recipient_ids |= get_installation_recipient_ids(index, related_object)
 
     elif notification_type in ["complaint_created"]:
-        complaint_recipients = get_complaint_notification_recipients(
-            related_object, created_by
-        ).values_list("id", flat=True)
-        recipient_ids.update(complaint_recipients)
+        recipient_ids |= get_complaint_recipient_ids(index, related_object, created_by)
+
+    recipient_ids.discard(None)
+    return recipient_ids
+
+
+def get_notification_recipients(
+    notification_type, related_object=None, created_by=None
+):
+    """
+    تحديد المستخدمين المصرح لهم برؤية الإشعار حسب نوع الإشعار والصلاحيات
+
+    Args:
+        notification_type: نوع الإشعار
+        related_object: الكائن المرتبط
+        created_by: المستخدم المنشئ
 
-    # إرجاع QuerySet للمستخدمين
-    return User.objects.filter(id__in=recipient_ids)
+    Returns:
+        QuerySet: المستخدمون المصرح لهم برؤية الإشعار
+    """
+    return User.objects.filter(
+        id__in=resolve_recipient_ids(notification_type, related_object, created_by)
+    )
 
 
-def get_customer_notification_recipients(customer, created_by):
+def get_customer_recipient_ids(index, customer, created_by):
     """تحديد مستقبلي إشعارات العملاء"""
-    recipients = User.objects.none()
-
-    if customer and hasattr(customer, "branch") and customer.branch:
-        # مديرو الفرع والمنطقة
-        branch_managers = User.objects.filter(
-            Q(is_branch_manager=True) | Q(is_region_manager=True),
-            branch=customer.branch,
-            is_active=True,
-        )
-        recipients = recipients.union(branch_managers)
+    recipient_ids = set()
 
-        # البائعون في نفس الفرع
-        salespeople = User.objects.filter(
-            is_salesperson=True, branch=customer.branch, is_active=True
-        )
-        recipients = recipients.union(salespeople)
+    branch_id = getattr(customer, "branch_id", None) if customer else None
+    if branch_id:
+        # مديرو الفرع والمنطقة والبائعون في نفس الفرع
+        recipient_ids |= _branch_managers(index, branch_id)
+        recipient_ids |= index["salespeople"].get(branch_id, set())
 
     # المستخدم المنشئ
-    if created_by:
-        recipients = recipients.union(User.objects.filter(pk=created_by.pk))
-
-    return recipients
+    recipient_ids.add(_user_id(created_by))
+    return recipient_ids
 
 
-def get_order_notification_recipients(order, created_by, notification_type):
+def get_order_recipient_ids(index, order, notification_type):
     """تحديد مستقبلي إشعارات الطلبات"""
-    recipients = User.objects.none()
+    recipient_ids = set()
+    if not order:
+        return recipient_ids
 
-    if order:
-        # المستخدم المنشئ للطلب
-        if hasattr(order, "created_by") and order.created_by:
-            recipients = recipients.union(User.objects.filter(pk=order.created_by.pk))
-
-        # مديرو الفرع والمنطقة للطلب
-        if hasattr(order, "branch") and order.branch:
-            managers = User.objects.filter(
-                Q(is_branch_manager=True) | Q(is_region_manager=True),
-                branch=order.branch,
-                is_active=True,
-            )
-            recipients = recipients.union(managers)
-
-        # الأقسام المسؤولة حسب نوع الطلب
-        if hasattr(order, "get_selected_types_list"):
-            order_types = order.get_selected_types_list()
-
-            # قسم التصنيع للطلبات التي تحتاج تصنيع
-            if any(t in order_types for t in ["installation", "tailoring"]):
-                factory_users = User.objects.filter(
-                    is_factory_manager=True, is_active=True
-                )
-                recipients = recipients.union(factory_users)
-
-            # قسم المعاينات للطلبات التي تحتاج معاينة
-            if "inspection" in order_types:
-                inspection_users = User.objects.filter(
-                    is_inspection_manager=True, is_active=True
-                )
-                recipients = recipients.union(inspection_users)
-
-            # قسم التركيبات للطلبات التي تحتاج تركيب
-            if "installation" in order_types:
-                installation_users = User.objects.filter(
-                    is_installation_manager=True, is_active=True
-                )
-                recipients = recipients.union(installation_users)
-
-        # للإشعارات الخاصة بتغيير الحالة، إضافة المديرين المباشرين
-        if notification_type == "order_status_changed":
-            if hasattr(order, "created_by") and order.created_by:
-                # مدير الفرع للمستخدم المنشئ
-                if order.created_by.branch:
-                    direct_managers = User.objects.filter(
-                        Q(is_branch_manager=True) | Q(is_region_manager=True),
-                        branch=order.created_by.branch,
-                        is_active=True,
-                    )
-                    recipients = recipients.union(direct_managers)
-
-            # إضافة مديري المصنع لإشعارات أوامر التصنيع
-            factory_managers = User.objects.filter(
-                is_factory_manager=True, is_active=True
-            )
-            recipients = recipients.union(factory_managers)
+    # المستخدم المنشئ للطلب ومديرو فرع الطلب
+    recipient_ids.add(getattr(order, "created_by_id", None))
+    recipient_ids |= _branch_managers(index, getattr(order, "branch_id", None))
 
-    return recipients
+    # الأقسام المسؤولة حسب نوع الطلب
+    if hasattr(order, "get_selected_types_list"):
+        order_types = order.get_selected_types_list()
 
+        # قسم التصنيع للطلبات التي تحتاج تصنيع
+        if any(t in order_types for t in ["installation", "tailoring"]):
+            recipient_ids |= index["factory_managers"]
 
-def get_inspection_notification_recipients(inspection, created_by, notification_type):
-    """تحديد مستقبلي إشعارات المعاينات"""
-    recipients = User.objects.none()
+        # قسم المعاينات للطلبات التي تحتاج معاينة
+        if "inspection" in order_types:
+            recipient_ids |= index["inspection_managers"]
 
-    if inspection:
-        # المستخدم المنشئ للمعاينة
-        if hasattr(inspection, "created_by") and inspection.created_by:
-            recipients = recipients.union(
-                User.objects.filter(pk=inspection.created_by.pk)
-            )
+        # قسم التركيبات للطلبات التي تحتاج تركيب
+        if "installation" in order_types:
+            recipient_ids |= index["installation_managers"]
 
-        # البائع المسؤول
-        if (
-            hasattr(inspection, "responsible_employee")
-            and inspection.responsible_employee
-        ):
-            if (
-                hasattr(inspection.responsible_employee, "user")
-                and inspection.responsible_employee.user
-            ):
-                recipients = recipients.union(
-                    User.objects.filter(pk=inspection.responsible_employee.user.pk)
-                )
-
-        # المعاين المكلف
-        if hasattr(inspection, "inspector") and inspection.inspector:
-            recipients = recipients.union(
-                User.objects.filter(pk=inspection.inspector.pk)
-            )
+    # للإشعارات الخاصة بتغيير الحالة، إضافة المديرين المباشرين ومديري المصنع
+    if notification_type == "order_status_changed":
+        creator = getattr(order, "created_by", None)
+        if creator:
+            recipient_ids |= _branch_managers(index, creator.branch_id)
+        recipient_ids |= index["factory_managers"]
+
+    return recipient_ids
 
-        # مديرو قسم المعاينات
-        inspection_managers = User.objects.filter(
-            is_inspection_manager=True, is_active=True
+
+def get_inspection_recipient_ids(index, inspection, notification_type):
+    """تحديد مستقبلي إشعارات المعاينات"""
+    recipient_ids = set()
+    if not inspection:
+        return recipient_ids
+
+    # المستخدم المنشئ للمعاينة والمعاين المكلف
+    recipient_ids.add(getattr(inspection, "created_by_id", None))
+    recipient_ids.add(getattr(inspection, "inspector_id", None))
+
+    # البائع المسؤول
+    responsible = getattr(inspection, "responsible_employee", None)
+    responsible_user = getattr(responsible, "user", None) if responsible else None
+    recipient_ids.add(_user_id(responsible_user))
+
+    # مديرو قسم المعاينات ومديرو الفرع والمنطقة
+    recipient_ids |= index["inspection_managers"]
+    recipient_ids |= _branch_managers(index, getattr(inspection, "branch_id", None))
+
+    # للإشعارات الخاصة بتغيير الحالة، إضافة المديرين المباشرين
+    if notification_type == "inspection_status_changed" and responsible_user:
+        recipient_ids |= _branch_managers(
+            index, getattr(responsible_user, "branch_id", None)
         )
-        recipients = recipients.union(inspection_managers)
-
-        # مديرو الفرع والمنطقة
-        if hasattr(inspection, "branch") and inspection.branch:
-            managers = User.objects.filter(
-                Q(is_branch_manager=True) | Q(is_region_manager=True),
-                branch=inspection.branch,
-                is_active=True,
-            )
-            recipients = recipients.union(managers)
-
-        # للإشعارات الخاصة بتغيير الحالة، إضافة المديرين المباشرين
-        if notification_type == "inspection_status_changed":
-            if (
-                hasattr(inspection, "responsible_employee")
-                and inspection.responsible_employee
-                and hasattr(inspection.responsible_employee, "user")
-                and inspection.responsible_employee.user
-                and hasattr(inspection.responsible_employee.user, "branch")
-                and inspection.responsible_employee.user.branch
-            ):
-
-                direct_managers = User.objects.filter(
-                    Q(is_branch_manager=True) | Q(is_region_manager=True),
-                    branch=inspection.responsible_employee.user.branch,
-                    is_active=True,
-                )
-                recipients = recipients.union(direct_managers)
-
-    return recipients
-
-
-def get_installation_notification_recipients(
-    installation, created_by, notification_type
-):
+
+    return recipient_ids
+
+
+def get_installation_recipient_ids(index, installation):
     """تحديد مستقبلي إشعارات التركيبات"""
-    recipients = User.objects.none()
+    recipient_ids = set()
+    if not installation:
+        return recipient_ids
 
-    if installation:
-        # مديرو قسم التركيبات
-        installation_managers = User.objects.filter(
-            is_installation_manager=True, is_active=True
-        )
-        recipients = recipients.union(installation_managers)
-
-        # المستخدم المنشئ للطلب المرتبط
-        if hasattr(installation, "order") and installation.order:
-            if (
-                hasattr(installation.order, "created_by")
-                and installation.order.created_by
-            ):
-                recipients = recipients.union(
-                    User.objects.filter(pk=installation.order.created_by.pk)
-                )
-
-            # مديرو فرع الطلب
-            if hasattr(installation.order, "branch") and installation.order.branch:
-                managers = User.objects.filter(
-                    Q(is_branch_manager=True) | Q(is_region_manager=True),
-                    branch=installation.order.branch,
-                    is_active=True,
-                )
-                recipients = recipients.union(managers)
-
-        # المستخدم المنشئ للتركيب
-        if hasattr(installation, "created_by") and installation.created_by:
-            recipients = recipients.union(
-                User.objects.filter(pk=installation.created_by.pk)
-            )
+    # مديرو قسم التركيبات
+    recipient_ids |= index["installation_managers"]
 
-    return recipients
+    # المستخدم المنشئ للطلب المرتبط ومديرو فرع الطلب
+    order = getattr(installation, "order", None)
+    if order:
+        recipient_ids.add(getattr(order, "created_by_id", None))
+        recipient_ids |= _branch_managers(index, getattr(order, "branch_id", None))
 
+    # المستخدم المنشئ للتركيب
+    recipient_ids.add(getattr(installation, "created_by_id", None))
+    return recipient_ids
 
-def get_complaint_notification_recipients(complaint, created_by):
-    """تحديد مستقبلي إشعارات الشكاوى"""
-    recipients = User.objects.none()
 
-    if complaint:
-        # المستخدم المستهدف بالشكوى (إذا كان محدداً)
-        if hasattr(complaint, "target_user") and complaint.target_user:
-            recipients = recipients.union(
-                User.objects.filter(pk=complaint.target_user.pk)
-            )
+def get_complaint_recipient_ids(index, complaint, created_by):
+    """تحديد مستقبلي إشعارات الشكاوى"""
+    recipient_ids = set()
+    if not complaint:
+        return recipient_ids
 
-        # مديرو خدمة العملاء أو الشكاوى
-        complaint_managers = User.objects.filter(
-            Q(is_sales_manager=True) | Q(is_region_manager=True), is_active=True
-        )
-        recipients = recipients.union(complaint_managers)
+    # المستخدم المستهدف بالشكوى (إذا كان محدداً)
+    recipient_ids.add(getattr(complaint, "target_user_id", None))
 
-        # مدير فرع العميل
-        if hasattr(complaint, "customer") and complaint.customer:
-            if hasattr(complaint.customer, "branch") and complaint.customer.branch:
-                branch_managers = User.objects.filter(
-                    Q(is_branch_manager=True) | Q(is_region_manager=True),
-                    branch=complaint.customer.branch,
-                    is_active=True,
-                )
-                recipients = recipients.union(branch_managers)
+    # مديرو خدمة العملاء أو الشكاوى
+    recipient_ids |= index["sales_or_region_managers"]
 
-        # المستخدم المنشئ للشكوى
-        if created_by:
-            recipients = recipients.union(User.objects.filter(pk=created_by.pk))
+    # مدير فرع العميل
+    customer = getattr(complaint, "customer", None)
+    if customer:
+        recipient_ids |= _branch_managers(index, getattr(customer, "branch_id", None))
 
-    return recipients
+    # المستخدم المنشئ للشكوى
+    recipient_ids.add(_user_id(created_by))
+    return recipient_ids
 
 
 def get_user_notification_count(user):
-    """الحصول على عدد الإشعارات غير المقروءة للمستخدم"""
-    from .models import NotificationVisibility
+    """الحصول على عدد الإشعارات غير المقروءة للمستخدم (من عداد Redis)"""
+    from .counters import get_unread_count
 
-    return NotificationVisibility.objects.filter(user=user, is_read=False).count()
+    return get_unread_count(user.pk)
 
 
 def mark_notification_as_read(notification, user):
     """تحديد إشعار كمقروء لمستخدم معين"""
     from django.utils import timezone
 
+    from .counters import decrement_unread
     from .models import NotificationVisibility
 
     try:
@@ -326,6 +291,7 @@ def mark_notification_as_read(notification, user):
             visibility.is_read = True
             visibility.read_at = timezone.now()
             visibility.save()
+            decrement_unread(user.pk)
 
             # تسجيل في الـ logs للمراجعة
             import logging
@@ -344,6 +310,7 @@ def mark_all_notifications_as_read(user):
     """تحديد جميع الإشعارات كمقروءة لمستخدم معين"""
     from django.utils import timezone
 
+    from .counters import reset_unread
     from .models import NotificationVisibility
 
     unread_notifications = NotificationVisibility.objects.filter(
@@ -351,5 +318,6 @@ def mark_all_notifications_as_read(user):
     )
 
     count = unread_notifications.update(is_read=True, read_at=timezone.now())
+    reset_unread(user.pk)
 
     return count
@@ -274,7 +274,7 @@ def mark_all_notifications_read(request):
 
 @login_required
 def notification_count_ajax(request):
-    """الحصول على عدد الإشعارات غير المقروءة عبر AJAX"""
+    """الحصول على عدد الإشعارات غير المقروءة عبر AJAX (من العداد فقط بدون استعلام)"""
     count = get_user_notification_count(request.user)
 
     return JsonResponse({"success": True, "count": count})
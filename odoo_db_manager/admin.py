@@ -6,7 +6,7 @@ from django.contrib import admin
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .google_sync import GoogleSyncConfig, GoogleSyncLog
+from .google_sync import GoogleSheetExportState, GoogleSyncConfig, GoogleSyncLog
 from .google_sync_advanced import (
     GoogleSheetMapping,
     GoogleSyncConflict,
@@ -373,3 +373,31 @@ class GoogleSyncLogAdmin(admin.ModelAdmin):
         (_("التفاصيل"), {"fields": ("details",), "classes": ("collapse",)}),
         (_("معلومات النظام"), {"fields": ("created_at",), "classes": ("collapse",)}),
     )
+
+
+@admin.register(GoogleSheetExportState)
+class GoogleSheetExportStateAdmin(admin.ModelAdmin):
+    """حالة التصدير التزايدي لكل ورقة — إعادة الضبط تفرض تصديراً كاملاً في المزامنة التالية"""
+
+    list_display = ("sheet_name", "spreadsheet_id", "next_row", "watermark", "last_full_sync")
+    search_fields = ("sheet_name", "spreadsheet_id")
+    readonly_fields = (
+        "spreadsheet_id",
+        "sheet_name",
+        "sheet_id",
+        "header_hash",
+        "watermark",
+        "last_id",
+        "next_row",
+        "last_full_sync",
+        "updated_at",
+    )
+    exclude = ("row_map",)
+    actions = ["reset_export_state"]
+
+    @admin.action(description=_("إعادة ضبط (تصدير كامل في المزامنة التالية)"))
+    def reset_export_state(self, request, queryset):
+        for state in queryset:
+            state.reset()
+            state.save()
+        self.message_user(request, _("تمت إعادة ضبط حالة التصدير"))
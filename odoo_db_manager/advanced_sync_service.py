@@ -181,12 +181,21 @@ class AdvancedSyncService:
         }
 
     def sync_from_sheets(
-        self, task: GoogleSyncTask = None, use_fast_mode: bool = True
+        self,
+        task: GoogleSyncTask = None,
+        use_fast_mode: bool = True,
+        use_bulk_mode: bool = True,
     ) -> Dict[str, Any]:
-        """مزامنة البيانات من Google Sheets - مع خيار المزامنة السريعة"""
+        """
+        مزامنة البيانات من Google Sheets
+
+        use_bulk_mode (الافتراضي): الاستيراد الجماعي (bulk_sync_service) — حل مسبق
+        باستعلامات IN ثم bulk_create، مع تقرير تفصيلي لكل صف
+        use_fast_mode: المزامنة السريعة القديمة (صف بصف) عند تعطيل الوضع الجماعي
+        """
 
-        # استخدام المزامنة السريعة افتراضياً
-        if use_fast_mode:
+        # استخدام المزامنة السريعة عند تعطيل الاستيراد الجماعي
+        if use_fast_mode and not use_bulk_mode:
             from .fast_sync_service import FastSyncService
 
             fast_service = FastSyncService(self.mapping)
@@ -215,7 +224,12 @@ class AdvancedSyncService:
             task.save()
 
             # معالجة البيانات
-            self._process_sheet_data(sheet_data, task)
+            if use_bulk_mode:
+                from .bulk_sync_service import BulkSheetImporter
+
+                BulkSheetImporter(self).process(sheet_data, task)
+            else:
+                self._process_sheet_data(sheet_data, task)
 
             # إكمال المهمة
             task.status = "completed"
@@ -0,0 +1,849 @@
+"""
+الاستيراد الجماعي من Google Sheets (Set-based)
+==============================================
+المسار التفصيلي في AdvancedSyncService يعالج كل صف على حدة: بحث عن العميل
+بالهاتف، بحث عن طلب مماثل، بحث عن معاينة، ثم save() لكل كائن داخل معاملات
+من 50 صفاً — جدول من 8,000 صف يستغرق عشرات الدقائق ويُبقي المعاملات مفتوحة.
+
+هنا تُقرأ كل الصفوف أولاً ثم:
+1. حل كل الهواتف/الأسماء/أرقام العقود والفواتير باستعلامات IN قليلة (قبل أي كتابة)
+2. بناء العملاء والطلبات وأوامر التصنيع والمعاينات في الذاكرة بنفس قواعد
+   save() (الحقول القديمة، تاريخ التسليم)؛ أكواد العملاء وأرقام الطلبات والعقود
+   من نفس عدادات core.sequences التي يستخدمها save() حتى لا تتكرر بعد الاستيراد
+3. الكتابة بـ bulk_create بترتيب الاعتماديات في معاملات قصيرة (دفعة لكل CHUNK_SIZE صف)
+4. تقرير نتيجة كل صف في stats["detailed_errors"] كما في المسار التفصيلي
+
+⚠️ bulk_create لا يُطلق post_save؛ ما يلزم من آثارها يُنفَّذ صراحة بعد كل دفعة:
+حسابات العملاء والقيود المحاسبية والملخص المالي، حالة الطلب (تصنيع/معاينة)،
+أيام التجميع اليومي، مستندات البحث (core.search)، وكاش الصفحات وإحصائيات القالب. إشعارات الطلبات
+ورسائل واتساب لا تُرسل للصفوف المستوردة عمداً.
+
+الاستخدام:
+    BulkSheetImporter(service).process(sheet_data, task)
+"""
+
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from accounts.models import Salesperson
+from core.sequences import allocate, max_suffix
+from core.utils import convert_arabic_numbers_to_english, convert_model_arabic_numbers
+from customers.models import Customer
+from inspections.models import Inspection
+from manufacturing.models import ManufacturingOrder, ProductionLine
+from orders.models import DeliveryTimeSettings, Order
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+MAIN_ORDER_TYPES = ("installation", "accessory", "tailoring")
+NO_INVOICE_NUMBER = "لا يوجد رقم فاتورة"
+
+# نفس قواعد Order.save
+PRODUCT_TYPES = ("fabric", "accessory")
+SERVICE_TYPES = ("installation", "inspection", "transport", "tailoring")
+CONTRACT_TYPES = ("tailoring", "installation")
+
+# نفس خرائط AdvancedSyncService._create_order
+TRACKING_STATUS_MAPPING = {
+    "قيد الانتظار": "pending",
+    "قيد المعالجة": "processing",
+    "في المستودع": "warehouse",
+    "في المصنع": "factory",
+    "قيد القص": "cutting",
+    "جاهز للتسليم": "ready",
+    "تم التسليم": "delivered",
+}
+DELIVERY_TYPE_MAPPING = {
+    "توصيل للمنزل": "home",
+    "استلام من الفرع": "branch",
+}
+
+ORDER_ARABIC_NUMBER_FIELDS = ["invoice_number", "contract_number"]
+CUSTOMER_ARABIC_NUMBER_FIELDS = ["phone", "phone2"]
+
+
+def _normalize_number(value: str) -> str:
+    return convert_arabic_numbers_to_english(value or "").strip()
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    if not value:
+        return None
+    try:
+        return Decimal(str(value).replace(",", "").strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _sequence(value: str, prefix: str) -> int:
+    """الرقم التسلسلي في نهاية كود/رقم يبدأ بـ prefix (0 إذا لم يكن رقمياً)"""
+    if not value or not value.lower().startswith(prefix.lower()):
+        return 0
+    tail = value[len(prefix) :]
+    return int(tail) if tail.isdigit() else 0
+
+
+class BulkSheetImporter:
+    """استيراد جماعي يعيد استخدام أدوات AdvancedSyncService (التعيين، التواريخ، الإحصائيات)"""
+
+    def __init__(self, service, chunk_size: int = CHUNK_SIZE):
+        self.service = service
+        self.mapping = service.mapping
+        self.stats = service.stats
+        self.chunk_size = chunk_size
+
+        # فهارس الحل المسبق
+        self.customers_by_id: Dict[int, Customer] = {}
+        self.customers_by_phone: Dict[str, Customer] = {}
+        self.customers_by_name: Dict[str, Customer] = {}
+        self.orders_by_customer: Dict[object, List[Order]] = {}
+        # عقود العملاء الجدد فقط — لا يوجد pk لعداد core.sequences قبل الحفظ
+        self.contract_sequences: Dict[object, int] = {}
+        self.manufactured_order_ids = set()
+        self.inspected_order_ids = set()
+        self.taken_order_numbers = set()
+        self.salespersons: List[Salesperson] = []
+        self.customer_updates: Dict[int, Customer] = {}
+
+        self._delivery_days = {}
+        self._production_lines = {}
+        self._customer_codes = {}
+
+    # ------------------------------------------------------------------
+    # نقطة الدخول
+    # ------------------------------------------------------------------
+
+    def process(self, sheet_data: List[List[str]], task=None):
+        if not sheet_data or len(sheet_data) < 2:
+            logger.warning("لا توجد بيانات كافية في Google Sheets.")
+            print("[BULK_SYNC] لا توجد بيانات كافية في Google Sheets.")
+            return
+
+        started = time.monotonic()
+        headers = sheet_data[0]
+        self.stats["total_rows"] = len(sheet_data) - 1
+        print(f"[BULK_SYNC] بدء الاستيراد الجماعي لـ {self.stats['total_rows']} صف...")
+
+        plans = [
+            self._parse_row(headers, row, index)
+            for index, row in enumerate(sheet_data[1:], start=2)
+        ]
+        self._preload(plans)
+
+        for plan in plans:
+            if plan["error"]:
+                continue
+            try:
+                self._plan_row(plan)
+            except Exception as e:
+                self._fail(plan, e)
+
+        for chunk_start in range(0, len(plans), self.chunk_size):
+            chunk = plans[chunk_start : chunk_start + self.chunk_size]
+            self._write_chunk(chunk)
+            done = min(chunk_start + self.chunk_size, len(plans))
+            print(f"[BULK_SYNC] التقدم: {done * 100 / len(plans):.1f}% - {done} من {len(plans)} صف")
+
+        self._invalidate_caches()
+
+        for plan in plans:
+            self.stats["detailed_errors"].append(plan["details"])
+
+        logger.info(
+            f"[BULK_SYNC] اكتمل استيراد {len(plans)} صف خلال {time.monotonic() - started:.1f} ثانية"
+        )
+        self.service._print_detailed_report()
+
+    # ------------------------------------------------------------------
+    # 1. قراءة الصفوف
+    # ------------------------------------------------------------------
+
+    def _parse_row(self, headers, row, row_index) -> dict:
+        plan = {
+            "row": row_index,
+            "error": None,
+            "objects": [],
+            "details": {"row": row_index, "customer_name": "", "order_type": "", "actions": []},
+        }
+        try:
+            mapped_data = self.service._map_row_data(headers, row)
+            inspection_date = mapped_data.get("inspection_date", "").strip()
+            raw_order_type = mapped_data.get("order_type", "").strip()
+            plan.update(
+                {
+                    "mapped_data": mapped_data,
+                    "name": mapped_data.get("customer_name", "").strip(),
+                    "phone": _normalize_number(mapped_data.get("customer_phone", "")),
+                    "raw_order_type": raw_order_type,
+                    "order_type": self.service._map_order_type(raw_order_type),
+                    "inspection_date": inspection_date,
+                    "inspection_dt": (
+                        self.service._parse_date(inspection_date)
+                        if self.service._is_valid_inspection_date(inspection_date)
+                        else None
+                    ),
+                    "contract_number": _normalize_number(mapped_data.get("contract_number", "")),
+                    "invoice_number": _normalize_number(mapped_data.get("invoice_number", "")),
+                }
+            )
+            plan["details"].update(
+                {
+                    "customer_name": plan["name"],
+                    "order_type": raw_order_type,
+                    "inspection_date": inspection_date,
+                }
+            )
+        except Exception as e:
+            self._fail(plan, e)
+        return plan
+
+    # ------------------------------------------------------------------
+    # 2. الحل المسبق باستعلامات IN
+    # ------------------------------------------------------------------
+
+    def _preload(self, plans):
+        plans = [plan for plan in plans if not plan["error"]]
+
+        phones = {plan["phone"] for plan in plans if plan["phone"]}
+        names = {plan["name"].lower() for plan in plans if plan["name"] and not plan["phone"]}
+
+        # نفس ترتيب .first() في المسار التفصيلي (الأحدث أولاً)
+        if phones:
+            for customer in Customer.objects.filter(phone__in=phones).select_related(
+                "branch"
+            ):
+                self.customers_by_phone.setdefault(customer.phone, customer)
+        if names:
+            for customer in (
+                Customer.objects.annotate(name_lower=Lower("name"))
+                .filter(name_lower__in=names)
+                .select_related("branch")
+            ):
+                self.customers_by_name.setdefault(customer.name_lower, customer)
+
+        for customer in (*self.customers_by_phone.values(), *self.customers_by_name.values()):
+            self.customers_by_id[customer.pk] = customer
+        customer_ids = set(self.customers_by_id)
+        if customer_ids:
+            for order in Order.objects.filter(customer_id__in=customer_ids).only(
+                "id",
+                "customer_id",
+                "order_number",
+                "selected_types",
+                "contract_number",
+                "invoice_number",
+                "order_date",
+                "order_status",
+                "status",
+                "notes",
+                "total_amount",
+                "paid_amount",
+                "final_price",
+                "financial_addition",
+                "administrative_discount_amount",
+                "branch_id",
+                "created_at",
+            ):
+                self.orders_by_customer.setdefault(order.customer_id, []).append(order)
+
+            # أرقام الطلبات تشمل المحذوفة منطقياً (القيد الفريد على كل الجدول) —
+            # تحقق taken للعداد من الذاكرة بدلاً من exists() لكل طلب
+            self.taken_order_numbers.update(
+                Order.all_objects.filter(customer_id__in=customer_ids).values_list(
+                    "order_number", flat=True
+                )
+            )
+
+            order_ids = [
+                order.pk for orders in self.orders_by_customer.values() for order in orders
+            ]
+            self.manufactured_order_ids = set(
+                ManufacturingOrder.objects.filter(order_id__in=order_ids).values_list(
+                    "order_id", flat=True
+                )
+            )
+            self.inspected_order_ids = set(
+                Inspection.objects.filter(order_id__in=order_ids).values_list(
+                    "order_id", flat=True
+                )
+            )
+
+        requested_numbers = {
+            plan["mapped_data"].get("order_number", "").strip()
+            for plan in plans
+            if plan["mapped_data"].get("order_number", "").strip()
+        }
+        if requested_numbers:
+            self.taken_order_numbers.update(
+                Order.all_objects.filter(order_number__in=requested_numbers).values_list(
+                    "order_number", flat=True
+                )
+            )
+
+        if any(plan["mapped_data"].get("salesperson") for plan in plans):
+            self.salespersons = list(Salesperson.objects.all())
+
+        print(
+            f"[BULK_SYNC] تم حل {len(customer_ids)} عميل موجود و"
+            f"{sum(len(orders) for orders in self.orders_by_customer.values())} طلب مسبقاً"
+        )
+
+    # ------------------------------------------------------------------
+    # 3. بناء الكائنات في الذاكرة
+    # ------------------------------------------------------------------
+
+    def _plan_row(self, plan):
+        details = plan["details"]
+        customer = self._resolve_customer(plan)
+        if customer is None:
+            self.stats["customers_skipped"] += 1
+            details["actions"].append("❌ تخطي: لا يوجد اسم عميل صالح")
+            plan["skipped"] = True
+            return
+        plan["customer"] = customer
+        details["actions"].append(f"✅ عميل: {customer.name}")
+
+        order_type = plan["order_type"]
+        if order_type in MAIN_ORDER_TYPES:
+            main_order = self._find_main_order(plan, customer)
+            if main_order is not None:
+                details["actions"].append(f"🔄 طلب موجود {order_type}: {main_order.order_number}")
+            else:
+                main_order = self._build_order(plan["mapped_data"], customer, order_type)
+                plan["objects"].append(main_order)
+                details["actions"].append(f"✅ طلب جديد {order_type}: {main_order.order_number}")
+            self._plan_manufacturing_order(plan, main_order, customer)
+        else:
+            self.stats["orders_skipped"] += 1
+            if not order_type:
+                details["actions"].append(f"❌ نوع طلب غير معروف: '{plan['raw_order_type']}'")
+            else:
+                details["actions"].append(f"❌ نوع طلب غير مدعوم: '{order_type}'")
+
+        if plan["inspection_dt"]:
+            self._plan_inspection(plan, customer)
+        elif plan["inspection_date"]:
+            details["actions"].append(f"❌ تاريخ معاينة غير صالح: '{plan['inspection_date']}'")
+
+    def _resolve_customer(self, plan) -> Optional[Customer]:
+        """الهاتف أولاً، ثم الاسم إذا لم يوجد هاتف — مثل _process_customer"""
+        if not plan["name"]:
+            return None
+
+        customer = None
+        if plan["phone"]:
+            customer = self.customers_by_phone.get(plan["phone"])
+        else:
+            customer = self.customers_by_name.get(plan["name"].lower())
+
+        if customer is not None:
+            if self.mapping.update_existing and customer.pk:
+                self._plan_customer_update(customer, plan["mapped_data"])
+                self.stats["customers_updated"] += 1
+            return customer
+
+        if not self.mapping.auto_create_customers:
+            return None
+
+        customer = self._build_customer(plan["mapped_data"])
+        plan["objects"].append(customer)
+        if customer.phone:
+            self.customers_by_phone[customer.phone] = customer
+        self.customers_by_name[customer.name.lower()] = customer
+        return customer
+
+    def _plan_customer_update(self, customer, mapped_data):
+        """نفس حقول _update_customer — تُكتب لاحقاً بـ bulk_update"""
+        for field, key in (
+            ("phone2", "customer_phone2"),
+            ("email", "customer_email"),
+            ("address", "customer_address"),
+        ):
+            value = mapped_data.get(key, "").strip()
+            if value and getattr(customer, field) != value:
+                setattr(customer, field, value)
+                self.customer_updates[customer.pk] = customer
+
+    def _build_customer(self, mapped_data) -> Customer:
+        customer = Customer(
+            name=mapped_data.get("customer_name", "").strip(),
+            phone=mapped_data.get("customer_phone", "").strip(),
+            phone2=mapped_data.get("customer_phone2", ""),
+            email=mapped_data.get("customer_email", ""),
+            address=mapped_data.get("customer_address", ""),
+        )
+        if getattr(self.mapping, "default_customer_category", None):
+            customer.category = self.mapping.default_customer_category
+        if getattr(self.mapping, "default_customer_type", None):
+            customer.customer_type = self.mapping.default_customer_type
+        if getattr(self.mapping, "default_branch", None):
+            customer.branch = self.mapping.default_branch
+
+        if not getattr(self.mapping, "use_current_date_as_created", False):
+            created_at = self.service._parse_date(mapped_data.get("order_date", "").strip())
+            if created_at:
+                customer.created_at = created_at
+
+        convert_model_arabic_numbers(customer, CUSTOMER_ARABIC_NUMBER_FIELDS)
+        customer.code = self._allocate_customer_code(
+            customer, mapped_data.get("customer_code", "").strip()
+        )
+        self.contract_sequences[id(customer)] = 0
+        return customer
+
+    def _allocate_customer_code(self, customer, requested_code) -> str:
+        """نفس عداد Customer.generate_unique_code — الأكواد المستخدمة تُحمَّل مرة لكل فرع"""
+        branch_code = customer.branch.code if customer.branch else "00"
+        prefix = f"{branch_code}-"
+        taken = self._customer_codes.get(branch_code)
+        if taken is None:
+            taken = self._customer_codes[branch_code] = set(
+                Customer.all_objects.filter(code__startswith=prefix).values_list(
+                    "code", flat=True
+                )
+            )
+
+        if requested_code:
+            if requested_code not in taken and not Customer.all_objects.filter(
+                code=requested_code
+            ).exists():
+                taken.add(requested_code)
+                return requested_code
+            logger.warning(f"[BULK_SYNC] كود العميل {requested_code} مستخدم — سيتم توليد كود جديد")
+
+        code = allocate(
+            "customers.code",
+            prefix,
+            render=lambda n: f"{prefix}{n:04d}",
+            seed=lambda: max((_sequence(value, prefix) for value in taken), default=0),
+            taken=lambda value: value in taken,
+        )
+        taken.add(code)
+        return code
+
+    def _customer_key(self, customer):
+        return customer.pk if customer.pk else id(customer)
+
+    def _customer_orders(self, customer):
+        return self.orders_by_customer.setdefault(self._customer_key(customer), [])
+
+    def _find_main_order(self, plan, customer) -> Optional[Order]:
+        """نفس شروط _find_existing_order — من الفهرس بدلاً من استعلام لكل صف"""
+        contract_number = plan["contract_number"]
+        invoice_number = plan["invoice_number"]
+        for order in self._customer_orders(customer):
+            if plan["order_type"] not in (order.selected_types or []):
+                continue
+            if contract_number:
+                if order.contract_number != contract_number:
+                    continue
+            elif invoice_number and invoice_number != NO_INVOICE_NUMBER:
+                if order.invoice_number != invoice_number:
+                    continue
+            return order
+        return None
+
+    def _find_inspection_order(self, customer, inspection_day) -> Optional[Order]:
+        for order in self._customer_orders(customer):
+            if "inspection" in (order.selected_types or []) and (
+                timezone.localtime(order.order_date).date() == inspection_day
+            ):
+                return order
+        return None
+
+    def _build_order(self, mapped_data, customer, order_type) -> Order:
+        """نفس بيانات _create_order + ما يحسبه Order.save قبل الحفظ"""
+        order = Order(
+            customer=customer,
+            status=mapped_data.get("order_status", "normal") or "normal",
+            notes=mapped_data.get("order_notes", "").strip(),
+            contract_number=mapped_data.get("contract_number", "").strip(),
+            invoice_number=mapped_data.get("invoice_number", "").strip() or NO_INVOICE_NUMBER,
+            selected_types=[order_type],
+        )
+
+        order_date = self.service._parse_date(mapped_data.get("order_date", ""))
+        if order_date:
+            order.order_date = order_date
+
+        tracking_status = mapped_data.get("tracking_status", "")
+        if tracking_status:
+            order.tracking_status = TRACKING_STATUS_MAPPING.get(tracking_status, "pending")
+
+        total_amount = _to_decimal(mapped_data.get("total_amount"))
+        if total_amount is not None:
+            order.total_amount = total_amount
+        paid_amount = _to_decimal(mapped_data.get("paid_amount"))
+        if paid_amount is not None:
+            order.paid_amount = paid_amount
+
+        delivery_type = mapped_data.get("delivery_type", "")
+        if delivery_type:
+            order.delivery_type = DELIVERY_TYPE_MAPPING.get(delivery_type, "branch")
+        delivery_address = mapped_data.get("delivery_address", "")
+        if delivery_address:
+            order.delivery_address = delivery_address
+        if order.delivery_type == "home" and not order.delivery_address:
+            raise ValueError("عنوان التسليم مطلوب لخدمة التوصيل للمنزل")
+
+        salesperson_name = mapped_data.get("salesperson", "")
+        if salesperson_name:
+            salesperson = self._match_salesperson(salesperson_name)
+            if salesperson:
+                order.salesperson = salesperson
+            else:
+                order.salesperson_name_raw = salesperson_name
+
+        branch = getattr(self.mapping, "default_branch", None) or customer.branch
+        if branch:
+            order.branch = branch
+
+        convert_model_arabic_numbers(order, ORDER_ARABIC_NUMBER_FIELDS)
+
+        # الحقول القديمة (order_type/service_types) كما في Order.save
+        if order_type in PRODUCT_TYPES:
+            order.order_type = "product"
+        if order_type in SERVICE_TYPES:
+            order.order_type = "service"
+            order.service_types = [order_type]
+
+        order.expected_delivery_date = timezone.localtime(order.order_date).date() + timedelta(
+            days=self._delivery_days_for(order.status, order_type)
+        )
+
+        if order_type in CONTRACT_TYPES and not order.contract_number:
+            order.contract_number = self._allocate_contract_number(customer)
+
+        requested_number = mapped_data.get("order_number", "").strip()
+        if requested_number and requested_number not in self.taken_order_numbers:
+            order.order_number = requested_number
+        else:
+            prefix = f"{customer.code}-"
+            order.order_number = allocate(
+                "orders.order_number",
+                prefix,
+                render=lambda n: f"{prefix}{n:04d}",
+                seed=lambda: max_suffix(Order.all_objects, "order_number", prefix),
+                taken=lambda value: value in self.taken_order_numbers,
+            )
+        self.taken_order_numbers.add(order.order_number)
+
+        self._customer_orders(customer).append(order)
+        return order
+
+    def _allocate_contract_number(self, customer) -> str:
+        """نفس عداد Order.generate_unique_contract_number للعملاء الموجودين"""
+        if customer.pk is None:
+            # عميل جديد: أول استخدام للعداد بعد الحفظ يبدأ من أكبر رقم عقد (seed)
+            self.contract_sequences[id(customer)] += 1
+            return f"c{self.contract_sequences[id(customer)]}"
+
+        contracts = {
+            order.contract_number
+            for order in self._customer_orders(customer)
+            if order.contract_number
+        }
+        customer_orders = Order.all_objects.filter(customer=customer)
+        return allocate(
+            "orders.contract_number",
+            str(customer.pk),
+            render=lambda n: f"c{n}",
+            seed=lambda: max_suffix(customer_orders, "contract_number", "c"),
+            taken=lambda value: value in contracts
+            or customer_orders.filter(contract_number=value).exists(),
+        )
+
+    def _match_salesperson(self, name):
+        """نفس name__icontains().first() — جدول البائعين يُحمَّل مرة واحدة"""
+        name = name.lower()
+        for salesperson in self.salespersons:
+            if name in (salesperson.name or "").lower():
+                return salesperson
+        return None
+
+    def _delivery_days_for(self, status, service_type):
+        key = ("vip" if status == "vip" else "normal", service_type)
+        if key not in self._delivery_days:
+            self._delivery_days[key] = DeliveryTimeSettings.get_delivery_days(
+                order_type=key[0], service_type=service_type
+            )
+        return self._delivery_days[key]
+
+    def _plan_manufacturing_order(self, plan, order, customer):
+        """نفس _create_manufacturing_order — أمر واحد لكل طلب أساسي"""
+        if order.pk in self.manufactured_order_ids or getattr(order, "_bulk_manufacturing", None):
+            plan["details"]["actions"].append(f"🔄 أمر تصنيع موجود للطلب: {order.order_number}")
+            return
+
+        order_types = order.selected_types or []
+        manufacturing_type = "custom"
+        if "installation" in order_types:
+            manufacturing_type = "installation"
+        elif "accessory" in order_types:
+            manufacturing_type = "accessory"
+
+        order_date = timezone.localtime(order.order_date or timezone.now()).date()
+        manufacturing_order = ManufacturingOrder(
+            order=order,
+            order_type=manufacturing_type,
+            status="pending_approval",
+            order_date=order_date,
+            expected_delivery_date=order_date + timedelta(days=14),
+            contract_number=order.contract_number or "",
+            invoice_number=order.invoice_number or "",
+            notes=plan["mapped_data"].get("order_notes", "") or order.notes or "",
+            # بدل update_related_models (post_save)
+            production_line=self._production_line_for(customer, manufacturing_type),
+        )
+        convert_model_arabic_numbers(manufacturing_order, ORDER_ARABIC_NUMBER_FIELDS)
+        order._bulk_manufacturing = manufacturing_order
+        # بدل ManufacturingOrder.update_order_status: pending_approval → pending_approval
+        order.order_status = "pending_approval"
+        plan["objects"].append(manufacturing_order)
+        plan["details"]["actions"].append(f"✅ أمر تصنيع للطلب: {order.order_number}")
+
+    def _production_line_for(self, customer, manufacturing_type):
+        branch = customer.branch
+        key = (branch.pk if branch else None, manufacturing_type)
+        if key not in self._production_lines:
+            self._production_lines[key] = ProductionLine.get_default_line_for_branch(
+                branch, order_type=manufacturing_type
+            )
+        return self._production_lines[key]
+
+    def _plan_inspection(self, plan, customer):
+        details = plan["details"]
+        inspection_dt = plan["inspection_dt"]
+
+        inspection_order = self._find_inspection_order(customer, inspection_dt.date())
+        if inspection_order is None:
+            mapped_data = dict(plan["mapped_data"], order_date=plan["inspection_date"])
+            inspection_order = self._build_order(mapped_data, customer, "inspection")
+            plan["objects"].append(inspection_order)
+
+        if inspection_order.pk in self.inspected_order_ids or getattr(
+            inspection_order, "_bulk_inspection", None
+        ):
+            self.stats["inspections_skipped"] += 1
+            details["actions"].append(f"🔄 طلب معاينة موجود: {inspection_order.order_number}")
+            details["actions"].append("⚠️ معاينة موجودة مسبقاً للطلب")
+            return
+
+        details["actions"].append(f"✅ طلب معاينة: {inspection_order.order_number}")
+        scheduled_date = inspection_dt.date()
+        request_date = scheduled_date - timedelta(days=1)
+        inspection = Inspection(
+            order=inspection_order,
+            customer=customer,
+            branch_id=inspection_order.branch_id,
+            scheduled_date=scheduled_date,
+            request_date=request_date,
+            notes=plan["mapped_data"].get("inspection_notes", ""),
+            order_notes=inspection_order.notes or "",
+            payment_status="paid" if self._is_fully_paid(inspection_order) else "collect_on_visit",
+            expected_delivery_date=request_date
+            + timedelta(days=self._delivery_days_for(inspection_order.status, "inspection")),
+        )
+        inspection_order._bulk_inspection = inspection
+        # بدل update_order_status_on_inspection_change: pending → pending
+        inspection_order.order_status = "pending"
+        plan["objects"].append(inspection)
+        details["actions"].append(f"✅ معاينة جديدة: {scheduled_date}")
+
+    def _is_fully_paid(self, order):
+        if order.pk:
+            return order.is_fully_paid
+        # طلب جديد بلا بنود: المتبقي = الإجمالي - المدفوع
+        return (order.total_amount or 0) - (order.paid_amount or 0) < Decimal("0.01")
+
+    # ------------------------------------------------------------------
+    # 4. الكتابة بترتيب الاعتماديات
+    # ------------------------------------------------------------------
+
+    def _write_chunk(self, chunk):
+        pending = [plan for plan in chunk if not plan["error"]]
+        if not pending:
+            return
+        try:
+            written = self._write_plans(pending)
+        except Exception as e:
+            # صف واحد معطوب لا يُسقط الدفعة كلها: إعادة المحاولة صفاً صفاً
+            logger.warning(
+                f"[BULK_SYNC] فشل حفظ الصفوف {chunk[0]['row']}-{chunk[-1]['row']}: {e} "
+                "— إعادة المحاولة لكل صف"
+            )
+            for plan in pending:
+                try:
+                    written = self._write_plans([plan])
+                except Exception as row_error:
+                    logger.error(f"[BULK_SYNC] فشل حفظ الصف {plan['row']}: {row_error}")
+                    self._fail(plan, row_error)
+                    continue
+                self._after_write([plan], *written)
+            return
+        self._after_write(pending, *written)
+
+    def _write_plans(self, plans):
+        """حفظ كائنات الصفوف في معاملة واحدة — عند الفشل تعود غير محفوظة ويُعاد رفع الخطأ"""
+        new_objects = {}
+        for plan in plans:
+            for obj in plan["objects"]:
+                self._collect_unsaved(obj, new_objects)
+
+        by_model = {Customer: [], Order: [], ManufacturingOrder: [], Inspection: []}
+        for obj in new_objects.values():
+            by_model[type(obj)].append(obj)
+
+        existing_updates = self._existing_order_status_updates(plans)
+        customer_updates = [
+            customer
+            for customer in self.customer_updates.values()
+            if any(plan.get("customer") is customer for plan in plans)
+        ]
+
+        try:
+            with transaction.atomic():
+                for model, objects in by_model.items():
+                    if objects:
+                        model.objects.bulk_create(objects, batch_size=self.chunk_size)
+                for status, order_ids in existing_updates.items():
+                    Order.objects.filter(pk__in=order_ids).exclude(order_status=status).update(
+                        order_status=status
+                    )
+                if customer_updates:
+                    Customer.objects.bulk_update(
+                        customer_updates, ["phone2", "email", "address"], batch_size=self.chunk_size
+                    )
+        except Exception:
+            self._reset_unsaved(new_objects.values())
+            raise
+        return by_model, existing_updates, customer_updates
+
+    def _after_write(self, plans, by_model, existing_updates, customer_updates):
+        # الإحصاءات تُحتسب بعد نجاح الحفظ لا عند التخطيط
+        self.stats["customers_created"] += len(by_model[Customer])
+        self.stats["orders_created"] += len(by_model[Order])
+        self.stats["manufacturing_orders_created"] += len(by_model[ManufacturingOrder])
+        self.stats["inspections_created"] += len(by_model[Inspection])
+
+        for customer in customer_updates:
+            self.customer_updates.pop(customer.pk, None)
+        for obj in by_model[ManufacturingOrder]:
+            self.manufactured_order_ids.add(obj.order_id)
+        for obj in by_model[Inspection]:
+            self.inspected_order_ids.add(obj.order_id)
+
+        for plan in plans:
+            if plan.get("skipped"):
+                continue
+            self.stats["processed_rows"] += 1
+            self.stats["successful_rows"] += 1
+            if plan.get("customer") is not None:
+                plan["details"]["customer_id"] = plan["customer"].pk
+
+        self._run_follow_ups(
+            by_model[Customer],
+            by_model[Order],
+            updated_customer_ids=[customer.pk for customer in customer_updates],
+            updated_order_ids=[pk for order_ids in existing_updates.values() for pk in order_ids],
+        )
+
+    def _collect_unsaved(self, obj, collected):
+        """الكائن وما يعتمد عليه (عميل الطلب، طلب المعاينة/التصنيع) إن لم يُحفظ بعد"""
+        if obj is None or obj.pk is not None or id(obj) in collected:
+            return
+        collected[id(obj)] = obj
+        for field in ("customer", "order"):
+            if field in obj._meta._forward_fields_map:
+                self._collect_unsaved(getattr(obj, field), collected)
+
+    def _existing_order_status_updates(self, plans):
+        """حالة الطلبات الموجودة التي أُضيف لها أمر تصنيع أو معاينة الآن"""
+        updates = {}
+        for plan in plans:
+            for obj in plan["objects"]:
+                if isinstance(obj, (ManufacturingOrder, Inspection)) and obj.order.pk:
+                    status = "pending_approval" if isinstance(obj, ManufacturingOrder) else "pending"
+                    updates.setdefault(status, set()).add(obj.order.pk)
+        return updates
+
+    def _reset_unsaved(self, objects):
+        """المعاملة تراجعت: الكائنات تعود غير محفوظة لتُعاد محاولتها في دفعة لاحقة"""
+        objects = list(objects)
+        for obj in objects:
+            obj.pk = None
+            obj._state.adding = True
+        for obj in objects:
+            for field in ("customer", "order"):
+                related = obj._meta._forward_fields_map.get(field)
+                if related is not None and getattr(obj, field) is not None:
+                    if getattr(obj, field).pk is None:
+                        # عبر __dict__ لا الواصف: الواصف يمسح الكائن المرتبط المخزَّن
+                        # فتفقد إعادة المحاولة عميل الطلب أو طلب المعاينة
+                        obj.__dict__[related.attname] = None
+
+    # ------------------------------------------------------------------
+    # 5. ما كانت تفعله post_save
+    # ------------------------------------------------------------------
+
+    def _run_follow_ups(self, customers, orders, updated_customer_ids=(), updated_order_ids=()):
+        try:
+            from accounting.signals import (
+                create_customer_accounts,
+                create_order_transaction,
+                update_customer_financial_summary,
+            )
+
+            create_customer_accounts(customers)
+            for order in orders:
+                if (order.total_amount or 0) > 0:
+                    create_order_transaction(order)
+            for customer in {order.customer_id: order.customer for order in orders}.values():
+                update_customer_financial_summary(customer)
+        except Exception as e:
+            logger.error(f"[BULK_SYNC] فشل إنشاء القيود المحاسبية للدفعة: {e}")
+
+        try:
+            from core.order_rollups import mark_order_day_dirty
+
+            for day in {timezone.localtime(order.created_at).date() for order in orders}:
+                mark_order_day_dirty(day)
+        except Exception:
+            pass
+
+        try:
+            from core.search import refresh_documents
+
+            refresh_documents("customer", [customer.pk for customer in customers])
+            refresh_documents("order", [order.pk for order in orders])
+            # عملاء وطلبات قائمة تغيّرت بياناتها أو حالتها في هذه الدفعة
+            refresh_documents("customer", updated_customer_ids)
+            refresh_documents("order_customer", updated_customer_ids)
+            refresh_documents("order", updated_order_ids)
+        except Exception as e:
+            # المستندات الناقصة تُصحَّح في إعادة البناء الدورية — لا نُفشل الاستيراد
+            logger.error(f"[BULK_SYNC] فشل تحديث مستندات البحث للدفعة: {e}")
+
+    def _invalidate_caches(self):
+        try:
+            from core.layout_context import bump_layout_version
+            from core.page_cache import invalidate_tags
+
+            invalidate_tags("orders", "manufacturing")
+            bump_layout_version("admin_stats")
+        except Exception as e:
+            logger.warning(f"[BULK_SYNC] فشل إلغاء الكاش بعد الاستيراد: {e}")
+
+    def _fail(self, plan, error):
+        self.stats["failed_rows"] += 1
+        self.stats["errors"].append(f"خطأ في الصف {plan['row']}: {error}")
+        plan["error"] = error
+        plan["details"]["actions"] = [f"❌ خطأ فادح: {error}"]
@@ -14,6 +14,8 @@ from django.db import connection, models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .sheet_delta_export import describe_result, export_sheet_delta
+
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
 
@@ -181,6 +183,40 @@ class GoogleSyncLog(models.Model):
         return f"{self.get_status_display()} - {self.created_at}"
 
 
+class GoogleSheetExportState(models.Model):
+    """حالة التصدير التزايدي لورقة عمل (sheet_delta_export)"""
+
+    spreadsheet_id = models.CharField(_("معرف جدول البيانات"), max_length=255)
+    sheet_name = models.CharField(_("اسم ورقة العمل"), max_length=100)
+    sheet_id = models.BigIntegerField(_("معرف الورقة"), null=True, blank=True)
+    header_hash = models.CharField(_("بصمة العناوين"), max_length=32, blank=True)
+    watermark = models.DateTimeField(_("آخر تحديث مُصدَّر"), null=True, blank=True)
+    last_id = models.BigIntegerField(_("أعلى معرف مُصدَّر"), default=0)
+    row_map = models.JSONField(_("خريطة الصفوف"), default=dict, blank=True)
+    next_row = models.PositiveIntegerField(_("الصف التالي"), default=2)
+    last_full_sync = models.DateTimeField(_("آخر تصدير كامل"), null=True, blank=True)
+    updated_at = models.DateTimeField(_("تاريخ التحديث"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("حالة تصدير ورقة")
+        verbose_name_plural = _("حالات تصدير الأوراق")
+        unique_together = ("spreadsheet_id", "sheet_name")
+
+    def __str__(self):
+        return f"{self.sheet_name} ({len(self.row_map)} صف)"
+
+    def reset(self):
+        """
+        إجبار التصدير التالي على إعادة كتابة الورقة كاملة
+        (next_row يبقى ليمسح التصدير الكامل الصفوف الزائدة القديمة)
+        """
+        self.sheet_id = None
+        self.header_hash = ""
+        self.watermark = None
+        self.last_id = 0
+        self.row_map = {}
+
+
 def sync_with_google_sheets(
     config_id=None, manual=False, full_backup=False, selected_tables=None
 ):
@@ -257,10 +293,14 @@ def sync_with_google_sheets(
                 users_result = sync_users(sheets_service, config.spreadsheet_id)
                 sync_results["users"] = users_result
             if "customers" in selected_tables:
-                customers_result = sync_customers(sheets_service, config.spreadsheet_id)
+                customers_result = sync_customers(
+                    sheets_service, config.spreadsheet_id, full=full_backup
+                )
                 sync_results["customers"] = customers_result
             if "orders" in selected_tables:
-                orders_result = sync_orders(sheets_service, config.spreadsheet_id)
+                orders_result = sync_orders(
+                    sheets_service, config.spreadsheet_id, full=full_backup
+                )
                 sync_results["orders"] = orders_result
             if "products" in selected_tables:
                 products_result = sync_products(sheets_service, config.spreadsheet_id)
@@ -313,7 +353,7 @@ def sync_with_google_sheets(
                 sync_results["comprehensive_users"] = comp_users_result
             if "comprehensive_inventory" in selected_tables:
                 comp_inventory_result = sync_comprehensive_inventory(
-                    sheets_service, config.spreadsheet_id
+                    sheets_service, config.spreadsheet_id, full=full_backup
                 )
                 sync_results["comprehensive_inventory"] = comp_inventory_result
             if "comprehensive_system" in selected_tables:
@@ -323,7 +363,7 @@ def sync_with_google_sheets(
                 sync_results["comprehensive_system"] = comp_system_result
             if "complete_orders_lifecycle" in selected_tables:
                 complete_lifecycle_result = sync_complete_orders_lifecycle(
-                    sheets_service, config.spreadsheet_id
+                    sheets_service, config.spreadsheet_id, full=full_backup
                 )
                 sync_results["complete_orders_lifecycle"] = complete_lifecycle_result
 
@@ -334,9 +374,13 @@ def sync_with_google_sheets(
             sync_results["databases"] = db_result
             users_result = sync_users(sheets_service, config.spreadsheet_id)
             sync_results["users"] = users_result
-            customers_result = sync_customers(sheets_service, config.spreadsheet_id)
+            customers_result = sync_customers(
+                sheets_service, config.spreadsheet_id, full=full_backup
+            )
             sync_results["customers"] = customers_result
-            orders_result = sync_orders(sheets_service, config.spreadsheet_id)
+            orders_result = sync_orders(
+                sheets_service, config.spreadsheet_id, full=full_backup
+            )
             sync_results["orders"] = orders_result
             products_result = sync_products(sheets_service, config.spreadsheet_id)
             sync_results["products"] = products_result
@@ -378,7 +422,7 @@ def sync_with_google_sheets(
                 sync_results["comprehensive_users"] = comp_users_result
             if config.sync_comprehensive_inventory:
                 comp_inventory_result = sync_comprehensive_inventory(
-                    sheets_service, config.spreadsheet_id
+                    sheets_service, config.spreadsheet_id, full=full_backup
                 )
                 sync_results["comprehensive_inventory"] = comp_inventory_result
             if config.sync_comprehensive_system:
@@ -389,7 +433,7 @@ def sync_with_google_sheets(
 
             # دورة حياة الطلبات الكاملة (دائماً مفعلة في المزامنة الشاملة)
             complete_lifecycle_result = sync_complete_orders_lifecycle(
-                sheets_service, config.spreadsheet_id
+                sheets_service, config.spreadsheet_id, full=full_backup
             )
             sync_results["complete_orders_lifecycle"] = complete_lifecycle_result
 
@@ -663,13 +707,13 @@ def sync_users(service, spreadsheet_id):
         return {"status": "error", "message": message}
 
 
-def sync_customers(service, spreadsheet_id):
+def sync_customers(service, spreadsheet_id, full=False):
     """
     مزامنة العملاء مع Google Sheets مع جميع الحقول (حتى غير المعروضة في لوحة الإدارة)
+    ✅ تصدير تزايدي: العملاء المتغيرون فقط، مع جلب العلاقات بنفس الاستعلام
     """
     try:
         Customer = apps.get_model("customers", "Customer")
-        customers = Customer.objects.all()
         # استخراج جميع الحقول من الموديل ديناميكياً
         fields = [
             f.name
@@ -678,6 +722,7 @@ def sync_customers(service, spreadsheet_id):
         ]
         # إضافة الحقول المرتبطة (عرض الاسم بدلاً من الـID)
         header = []
+        relations = []
         for f in fields:
             field_obj = Customer._meta.get_field(f)
             if (
@@ -689,10 +734,12 @@ def sync_customers(service, spreadsheet_id):
                 continue  # تجاهل العلاقات many-to-many
             if field_obj.is_relation and hasattr(field_obj, "related_model"):
                 header.append(f"{f}_display")
+                if field_obj.concrete or field_obj.one_to_one:
+                    relations.append(f)
             else:
                 header.append(f)
-        data = [header]
-        for customer in customers:
+
+        def customer_row(customer):
             row = []
             for f in fields:
                 field_obj = Customer._meta.get_field(f)
@@ -710,10 +757,22 @@ def sync_customers(service, spreadsheet_id):
                         row.append("")
                 else:
                     row.append(str(value) if value is not None else "")
-            data.append(row)
-        sheet_name = "العملاء"
-        result = update_sheet(service, spreadsheet_id, sheet_name, data)
-        return {"status": "success", "message": f"تمت مزامنة {len(customers)} عميل"}
+            return row
+
+        def build_rows(ids):
+            for customer in Customer.objects.select_related(*relations).filter(pk__in=ids):
+                yield customer.pk, customer_row(customer)
+
+        result = export_sheet_delta(
+            service,
+            spreadsheet_id,
+            "العملاء",
+            header,
+            Customer.objects.all(),
+            build_rows,
+            full=full,
+        )
+        return {"status": "success", "message": describe_result(result, "عميل")}
     except Exception as e:
         message = f"حدث خطأ أثناء مزامنة العملاء: {str(e)}"
         logger.error(message)
@@ -829,13 +888,124 @@ def sync_inspections(service, spreadsheet_id):
         return {"status": "error", "message": str(e)}
 
 
-def sync_orders(service, spreadsheet_id):
+def _order_row(order):
+    """صف ورقة الطلبات"""
+    # التأكد من وجود العميل وعدم فقدان أي بيانات
+    customer_name = order.customer.name if order.customer else "عميل غير محدد"
+    customer_phone = order.customer.phone if order.customer else ""
+    customer_phone2 = (
+        order.customer.phone2
+        if order.customer and hasattr(order.customer, "phone2")
+        else ""
+    )
+    customer_address = order.customer.address if order.customer else ""
+
+    # حساب المبلغ المتبقي
+    remaining_amount = (order.total_amount or 0) - (order.paid_amount or 0)
+
+    # تحضير أنواع الخدمات
+    service_types_str = (
+        ", ".join(order.service_types) if order.service_types else ""
+    )
+
+    # تحضير أنواع الطلب المختارة مع الترجمة الصحيحة
+    selected_types_display = []
+    if order.selected_types:
+        type_mapping = {
+            "accessory": "إكسسوار",
+            "installation": "تركيب",
+            "inspection": "معاينة",
+            "tailoring": "تسليم",
+        }
+        # التعامل مع البيانات سواء كانت list أو string
+        if isinstance(order.selected_types, list):
+            types_list = order.selected_types
+        elif isinstance(order.selected_types, str):
+            # إذا كانت string، نحاول تحويلها إلى list
+            try:
+                import json
+
+                types_list = json.loads(order.selected_types)
+            except Exception:
+                # إذا فشل، نعتبرها نوع واحد
+                types_list = (
+                    [order.selected_types] if order.selected_types else []
+                )
+        else:
+            types_list = []
+
+        for type_code in types_list:
+            if type_code and type_code.strip():  # تجاهل القيم الفارغة
+                selected_types_display.append(
+                    type_mapping.get(type_code.strip(), type_code.strip())
+                )
+    selected_types_str = ", ".join(selected_types_display)
+
+    # تحضير ملف العقد
+    contract_file_name = order.contract_file.name if order.contract_file else ""
+
+    row = [
+        str(order.id),
+        order.order_number or "",
+        customer_name,
+        customer_phone,
+        customer_phone2,
+        customer_address,
+        order.invoice_number or "",
+        order.invoice_number_2 or "",
+        order.invoice_number_3 or "",
+        order.contract_number or "",
+        order.contract_number_2 or "",
+        order.contract_number_3 or "",
+        contract_file_name,
+        order.contract_google_drive_file_url or "",
+        selected_types_str,
+        service_types_str,
+        order.get_status_display(),  # وضع الطلب (عادي/VIP)
+        order.get_order_status_display(),  # حالة الطلب (من التصنيع)
+        order.get_tracking_status_display(),  # حالة التتبع
+        order.get_installation_status_display(),  # حالة التركيب
+        order.get_inspection_status_display(),  # حالة المعاينة
+        "نعم" if order.is_fully_completed else "لا",  # مكتمل بالكامل
+        order.branch.name if order.branch else "",
+        order.salesperson.name if order.salesperson else "",
+        str(order.total_amount) if order.total_amount else "0",
+        str(order.final_price) if order.final_price else "0",
+        str(order.paid_amount) if order.paid_amount else "0",
+        str(remaining_amount),
+        "نعم" if order.payment_verified else "لا",
+        order.order_date.strftime("%Y-%m-%d") if order.order_date else "",
+        (
+            order.expected_delivery_date.strftime("%Y-%m-%d")
+            if order.expected_delivery_date
+            else ""
+        ),
+        order.get_delivery_type_display() if order.delivery_type else "",
+        order.delivery_address or "",
+        order.get_location_type_display() if order.location_type else "",
+        order.location_address or "",
+        order.delivery_recipient_name or "",
+        order.related_inspection or "",
+        order.related_inspection_type or "",
+        (
+            order.last_notification_date.strftime("%Y-%m-%d %H:%M")
+            if order.last_notification_date
+            else ""
+        ),
+        order.notes or "",
+        order.created_at.strftime("%Y-%m-%d %H:%M") if order.created_at else "",
+        order.updated_at.strftime("%Y-%m-%d %H:%M") if order.updated_at else "",
+    ]
+    return row
+
+
+def sync_orders(service, spreadsheet_id, full=False):
     """
     مزامنة الطلبات مع Google Sheets مع ربطها بالعملاء وضمان عدم فقدان أي سجل
+    ✅ تصدير تزايدي: الطلبات المتغيرة (أو التي تغيّر عميلها) فقط
     """
     try:
         Order = apps.get_model("orders", "Order")
-        orders = Order.objects.select_related("customer", "branch", "salesperson").all()
 
         # تحديد العناوين المخصصة للطلبات مع ربط العملاء وجميع البيانات
         header = [
@@ -883,122 +1053,24 @@ def sync_orders(service, spreadsheet_id):
             "تاريخ التحديث",
         ]
 
-        data = [header]
-        for order in orders:
-            # التأكد من وجود العميل وعدم فقدان أي بيانات
-            customer_name = order.customer.name if order.customer else "عميل غير محدد"
-            customer_phone = order.customer.phone if order.customer else ""
-            customer_phone2 = (
-                order.customer.phone2
-                if order.customer and hasattr(order.customer, "phone2")
-                else ""
-            )
-            customer_address = order.customer.address if order.customer else ""
-
-            # حساب المبلغ المتبقي
-            remaining_amount = (order.total_amount or 0) - (order.paid_amount or 0)
-
-            # تحضير أنواع الخدمات
-            service_types_str = (
-                ", ".join(order.service_types) if order.service_types else ""
+        def build_rows(ids):
+            orders = Order.objects.select_related("customer", "branch", "salesperson").filter(
+                pk__in=ids
             )
-
-            # تحضير أنواع الطلب المختارة مع الترجمة الصحيحة
-            selected_types_display = []
-            if order.selected_types:
-                type_mapping = {
-                    "accessory": "إكسسوار",
-                    "installation": "تركيب",
-                    "inspection": "معاينة",
-                    "tailoring": "تسليم",
-                }
-                # التعامل مع البيانات سواء كانت list أو string
-                if isinstance(order.selected_types, list):
-                    types_list = order.selected_types
-                elif isinstance(order.selected_types, str):
-                    # إذا كانت string، نحاول تحويلها إلى list
-                    try:
-                        import json
-
-                        types_list = json.loads(order.selected_types)
-                    except Exception:
-                        # إذا فشل، نعتبرها نوع واحد
-                        types_list = (
-                            [order.selected_types] if order.selected_types else []
-                        )
-                else:
-                    types_list = []
-
-                for type_code in types_list:
-                    if type_code and type_code.strip():  # تجاهل القيم الفارغة
-                        selected_types_display.append(
-                            type_mapping.get(type_code.strip(), type_code.strip())
-                        )
-            selected_types_str = ", ".join(selected_types_display)
-
-            # تحضير ملف العقد
-            contract_file_name = order.contract_file.name if order.contract_file else ""
-
-            row = [
-                str(order.id),
-                order.order_number or "",
-                customer_name,
-                customer_phone,
-                customer_phone2,
-                customer_address,
-                order.invoice_number or "",
-                order.invoice_number_2 or "",
-                order.invoice_number_3 or "",
-                order.contract_number or "",
-                order.contract_number_2 or "",
-                order.contract_number_3 or "",
-                contract_file_name,
-                order.contract_google_drive_file_url or "",
-                selected_types_str,
-                service_types_str,
-                order.get_status_display(),  # وضع الطلب (عادي/VIP)
-                order.get_order_status_display(),  # حالة الطلب (من التصنيع)
-                order.get_tracking_status_display(),  # حالة التتبع
-                order.get_installation_status_display(),  # حالة التركيب
-                order.get_inspection_status_display(),  # حالة المعاينة
-                "نعم" if order.is_fully_completed else "لا",  # مكتمل بالكامل
-                order.branch.name if order.branch else "",
-                order.salesperson.name if order.salesperson else "",
-                str(order.total_amount) if order.total_amount else "0",
-                str(order.final_price) if order.final_price else "0",
-                str(order.paid_amount) if order.paid_amount else "0",
-                str(remaining_amount),
-                "نعم" if order.payment_verified else "لا",
-                order.order_date.strftime("%Y-%m-%d") if order.order_date else "",
-                (
-                    order.expected_delivery_date.strftime("%Y-%m-%d")
-                    if order.expected_delivery_date
-                    else ""
-                ),
-                order.get_delivery_type_display() if order.delivery_type else "",
-                order.delivery_address or "",
-                order.get_location_type_display() if order.location_type else "",
-                order.location_address or "",
-                order.delivery_recipient_name or "",
-                order.related_inspection or "",
-                order.related_inspection_type or "",
-                (
-                    order.last_notification_date.strftime("%Y-%m-%d %H:%M")
-                    if order.last_notification_date
-                    else ""
-                ),
-                order.notes or "",
-                order.created_at.strftime("%Y-%m-%d %H:%M") if order.created_at else "",
-                order.updated_at.strftime("%Y-%m-%d %H:%M") if order.updated_at else "",
-            ]
-            data.append(row)
-
-        sheet_name = "الطلبات"
-        result = update_sheet(service, spreadsheet_id, sheet_name, data)
-        return {
-            "status": "success",
-            "message": f"تمت مزامنة {len(orders)} طلب مع ربطها بالعملاء",
-        }
+            for order in orders:
+                yield order.pk, _order_row(order)
+
+        result = export_sheet_delta(
+            service,
+            spreadsheet_id,
+            "الطلبات",
+            header,
+            Order.objects.all(),
+            build_rows,
+            related=[(Order.objects.all(), "pk", "customer__updated_at")],
+            full=full,
+        )
+        return {"status": "success", "message": describe_result(result, "طلب")}
     except Exception as e:
         logger.error(f"حدث خطأ أثناء مزامنة الطلبات: {str(e)}")
         return {"status": "error", "message": str(e)}
@@ -1617,73 +1689,8 @@ def update_sheet(service, spreadsheet_id, sheet_name, data):
 
         # تنسيق الورقة
         if sheet_id:
-            try:
-                requests = [
-                    # تنسيق الصف الأول (العناوين)
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sheet_id,
-                                "startRowIndex": 0,
-                                "endRowIndex": 1,
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "backgroundColor": {
-                                        "red": 0.0,
-                                        "green": 0.4,
-                                        "blue": 0.7,
-                                    },
-                                    "textFormat": {
-                                        "foregroundColor": {
-                                            "red": 1.0,
-                                            "green": 1.0,
-                                            "blue": 1.0,
-                                        },
-                                        "bold": True,
-                                    },
-                                    "horizontalAlignment": "CENTER",
-                                    "verticalAlignment": "MIDDLE",
-                                }
-                            },
-                            "fields": "userEnteredFormat(backgroundColor,textFormat,horizontalAlignment,verticalAlignment)",
-                        }
-                    },
-                    # تنسيق الخلايا
-                    {
-                        "updateSheetProperties": {
-                            "properties": {
-                                "sheetId": sheet_id,
-                                "gridProperties": {"frozenRowCount": 1},
-                            },
-                            "fields": "gridProperties.frozenRowCount",
-                        }
-                    },
-                ]
-
-                # إضافة طلب تعديل حجم الأعمدة فقط إذا كانت البيانات تحتوي على صفوف
-                if data and len(data) > 0 and len(data[0]) > 0:
-                    requests.append(
-                        {
-                            "autoResizeDimensions": {
-                                "dimensions": {
-                                    "sheetId": sheet_id,
-                                    "dimension": "COLUMNS",
-                                    "startIndex": 0,
-                                    "endIndex": len(data[0]),
-                                }
-                            }
-                        }
-                    )
-
-                service.spreadsheets().batchUpdate(
-                    spreadsheetId=spreadsheet_id, body={"requests": requests}
-                ).execute()
-                logger.info(f"تم تنسيق ورقة: {sheet_name} بنجاح")
-            except Exception as format_error:
-                logger.warning(
-                    f"حدث خطأ أثناء تنسيق ورقة: {sheet_name} - {str(format_error)}"
-                )
+            column_count = len(data[0]) if data and len(data) > 0 else 0
+            format_sheet_header(service, spreadsheet_id, sheet_id, sheet_name, column_count)
 
         updated_rows = result.get("updatedRows", 0)
         if updated_rows == 0:
@@ -1696,6 +1703,79 @@ def update_sheet(service, spreadsheet_id, sheet_name, data):
         return 0
 
 
+def format_sheet_header(service, spreadsheet_id, sheet_id, sheet_name, column_count):
+    """
+    تنسيق صف العناوين وتثبيته وضبط عرض الأعمدة
+    """
+    try:
+        requests = [
+            # تنسيق الصف الأول (العناوين)
+            {
+                "repeatCell": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": 0,
+                        "endRowIndex": 1,
+                    },
+                    "cell": {
+                        "userEnteredFormat": {
+                            "backgroundColor": {
+                                "red": 0.0,
+                                "green": 0.4,
+                                "blue": 0.7,
+                            },
+                            "textFormat": {
+                                "foregroundColor": {
+                                    "red": 1.0,
+                                    "green": 1.0,
+                                    "blue": 1.0,
+                                },
+                                "bold": True,
+                            },
+                            "horizontalAlignment": "CENTER",
+                            "verticalAlignment": "MIDDLE",
+                        }
+                    },
+                    "fields": "userEnteredFormat(backgroundColor,textFormat,horizontalAlignment,verticalAlignment)",
+                }
+            },
+            # تنسيق الخلايا
+            {
+                "updateSheetProperties": {
+                    "properties": {
+                        "sheetId": sheet_id,
+                        "gridProperties": {"frozenRowCount": 1},
+                    },
+                    "fields": "gridProperties.frozenRowCount",
+                }
+            },
+        ]
+
+        # إضافة طلب تعديل حجم الأعمدة فقط إذا كانت البيانات تحتوي على صفوف
+        if column_count > 0:
+            requests.append(
+                {
+                    "autoResizeDimensions": {
+                        "dimensions": {
+                            "sheetId": sheet_id,
+                            "dimension": "COLUMNS",
+                            "startIndex": 0,
+                            "endIndex": column_count,
+                        }
+                    }
+                }
+            )
+
+        service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={"requests": requests}
+        ).execute()
+        logger.info(f"تم تنسيق ورقة: {sheet_name} بنجاح")
+    except Exception as format_error:
+        logger.warning(
+            f"حدث خطأ أثناء تنسيق ورقة: {sheet_name} - {str(format_error)}"
+        )
+
+
 # ========== دوال المزامنة المجمعة للصفحات الشاملة ==========
 
 
@@ -1889,17 +1969,15 @@ def sync_comprehensive_users(service, spreadsheet_id):
         return {"status": "error", "message": message}
 
 
-def sync_comprehensive_inventory(service, spreadsheet_id):
+def sync_comprehensive_inventory(service, spreadsheet_id, full=False):
     """
     مزامنة شاملة للمنتجات والمخزون والمستودعات
+    ✅ تصدير تزايدي: المخزون من أرصدة StockBalance (with_stock) بدلاً من جمع
+    كل حركات المنتج، وتغيّر الرصيد يعيد تصدير صف المنتج
     """
     try:
         Product = apps.get_model("inventory", "Product")
-        Category = apps.get_model("inventory", "Category")
-        Warehouse = apps.get_model("inventory", "Warehouse")
-        StockTransaction = apps.get_model("inventory", "StockTransaction")
-
-        products = Product.objects.select_related("category").all()
+        StockBalance = apps.get_model("inventory", "StockBalance")
 
         header = [
             "معرف المنتج",
@@ -1917,50 +1995,44 @@ def sync_comprehensive_inventory(service, spreadsheet_id):
             "تاريخ التحديث",
         ]
 
-        data = [header]
-        for product in products:
-            # حساب الكمية المتوفرة من المعاملات المخزنية
-            try:
-                stock_transactions = StockTransaction.objects.filter(product=product)
-                available_quantity = sum(
-                    [
-                        (
-                            trans.quantity
-                            if trans.transaction_type == "in"
-                            else -trans.quantity
-                        )
-                        for trans in stock_transactions
-                    ]
-                )
-            except Exception:
-                available_quantity = 0
-
-            # حساب قيمة المخزون
-            stock_value = available_quantity * (product.price or 0)
-
-            row = [
-                str(product.id),
-                product.code or "",
-                product.name,
-                product.category.name if product.category else "",
-                str(product.price) if product.price else "0",
-                product.currency or "EGP",
-                product.get_unit_display() if product.unit else "",
-                product.description or "",
-                str(product.minimum_stock),
-                str(available_quantity),
-                str(stock_value),
-                product.created_at.strftime("%Y-%m-%d") if product.created_at else "",
-                product.updated_at.strftime("%Y-%m-%d") if product.updated_at else "",
-            ]
-            data.append(row)
+        def build_rows(ids):
+            products = (
+                Product.objects.with_stock(per_warehouse=False)
+                .select_related("category")
+                .filter(pk__in=ids)
+            )
+            for product in products:
+                available_quantity = product.stock_total or 0
+                # حساب قيمة المخزون
+                stock_value = available_quantity * (product.price or 0)
+
+                yield product.pk, [
+                    str(product.id),
+                    product.code or "",
+                    product.name,
+                    product.category.name if product.category else "",
+                    str(product.price) if product.price else "0",
+                    product.currency or "EGP",
+                    product.get_unit_display() if product.unit else "",
+                    product.description or "",
+                    str(product.minimum_stock),
+                    str(available_quantity),
+                    str(stock_value),
+                    product.created_at.strftime("%Y-%m-%d") if product.created_at else "",
+                    product.updated_at.strftime("%Y-%m-%d") if product.updated_at else "",
+                ]
 
-        sheet_name = "المنتجات والمخزون الشامل"
-        result = update_sheet(service, spreadsheet_id, sheet_name, data)
-        return {
-            "status": "success",
-            "message": f"تمت مزامنة {len(products)} منتج مع بيانات المخزون الشاملة",
-        }
+        result = export_sheet_delta(
+            service,
+            spreadsheet_id,
+            "المنتجات والمخزون الشامل",
+            header,
+            Product.objects.all(),
+            build_rows,
+            related=[(StockBalance.objects.all(), "product_id", "updated_at")],
+            full=full,
+        )
+        return {"status": "success", "message": describe_result(result, "منتج")}
     except Exception as e:
         message = f"حدث خطأ أثناء المزامنة الشاملة للمنتجات والمخزون: {str(e)}"
         logger.error(message)
@@ -2057,9 +2129,255 @@ def sync_comprehensive_system_settings(service, spreadsheet_id):
         return {"status": "error", "message": message}
 
 
-def sync_complete_orders_lifecycle(service, spreadsheet_id):
+def _lifecycle_row(order):
+    """صف ورقة دورة حياة الطلب (الطلب + التصنيع + التركيب + المعاينة + التسليم)"""
+    # بيانات العميل
+    customer_name = order.customer.name if order.customer else "عميل غير محدد"
+    customer_phone = order.customer.phone if order.customer else ""
+    customer_address = order.customer.address if order.customer else ""
+
+    # حساب المبلغ المتبقي
+    remaining_amount = (order.total_amount or 0) - (order.paid_amount or 0)
+
+    # أنواع الطلب
+    selected_types_display = []
+    if order.selected_types:
+        type_mapping = {
+            "accessory": "إكسسوار",
+            "installation": "تركيب",
+            "inspection": "معاينة",
+            "tailoring": "تسليم",
+        }
+        if isinstance(order.selected_types, list):
+            types_list = order.selected_types
+        elif isinstance(order.selected_types, str):
+            try:
+                import json
+
+                types_list = json.loads(order.selected_types)
+            except Exception:
+                types_list = (
+                    [order.selected_types] if order.selected_types else []
+                )
+        else:
+            types_list = []
+
+        for type_code in types_list:
+            if type_code and type_code.strip():
+                selected_types_display.append(
+                    type_mapping.get(type_code.strip(), type_code.strip())
+                )
+    selected_types_str = ", ".join(selected_types_display)
+
+    # بيانات أمر التصنيع
+    manufacturing_order = getattr(order, "manufacturing_order", None)
+    mfg_code = (
+        manufacturing_order.manufacturing_code if manufacturing_order else ""
+    )
+    mfg_status = (
+        manufacturing_order.get_status_display() if manufacturing_order else ""
+    )
+    mfg_type = (
+        manufacturing_order.get_order_type_display()
+        if manufacturing_order
+        else ""
+    )
+    mfg_start_date = (
+        manufacturing_order.order_date.strftime("%Y-%m-%d")
+        if manufacturing_order and manufacturing_order.order_date
+        else ""
+    )
+    mfg_expected_end = (
+        manufacturing_order.expected_delivery_date.strftime("%Y-%m-%d")
+        if manufacturing_order and manufacturing_order.expected_delivery_date
+        else ""
+    )
+    mfg_actual_completion = (
+        manufacturing_order.completion_date.strftime("%Y-%m-%d")
+        if manufacturing_order and manufacturing_order.completion_date
+        else ""
+    )
+    mfg_exit_permit = (
+        manufacturing_order.exit_permit_number if manufacturing_order else ""
+    )
+    mfg_notes = manufacturing_order.notes if manufacturing_order else ""
+
+    # بيانات التركيب
+    installation = (
+        order.installation_schedules.first()
+        if hasattr(order, "installation_schedules")
+        else None
+    )
+    inst_status = installation.get_status_display() if installation else ""
+    inst_team = (
+        installation.team.name if installation and installation.team else ""
+    )
+    inst_scheduled_date = (
+        installation.scheduled_date.strftime("%Y-%m-%d")
+        if installation and installation.scheduled_date
+        else ""
+    )
+    inst_scheduled_time = (
+        installation.scheduled_time.strftime("%H:%M")
+        if installation and installation.scheduled_time
+        else ""
+    )
+    inst_location_type = (
+        installation.get_location_type_display()
+        if installation and installation.location_type
+        else ""
+    )
+    inst_location_address = (
+        installation.location_address if installation else ""
+    )
+    inst_completion_date = (
+        installation.completion_date.strftime("%Y-%m-%d %H:%M")
+        if installation and installation.completion_date
+        else ""
+    )
+    inst_notes = installation.notes if installation else ""
+
+    # بيانات المعاينة
+    inspection = (
+        order.inspections.first() if hasattr(order, "inspections") else None
+    )
+    insp_contract = inspection.contract_number if inspection else ""
+    insp_status = inspection.get_status_display() if inspection else ""
+    insp_result = (
+        inspection.get_result_display()
+        if inspection and inspection.result
+        else ""
+    )
+    insp_inspector = (
+        f"{inspection.inspector.first_name} {inspection.inspector.last_name}"
+        if inspection and inspection.inspector
+        else ""
+    )
+    insp_windows_count = (
+        str(inspection.windows_count)
+        if inspection and inspection.windows_count
+        else ""
+    )
+    insp_request_date = (
+        inspection.request_date.strftime("%Y-%m-%d")
+        if inspection and inspection.request_date
+        else ""
+    )
+    insp_scheduled_date = (
+        inspection.scheduled_date.strftime("%Y-%m-%d")
+        if inspection and inspection.scheduled_date
+        else ""
+    )
+    insp_scheduled_time = (
+        inspection.scheduled_time.strftime("%H:%M")
+        if inspection and inspection.scheduled_time
+        else ""
+    )
+    insp_payment_status = (
+        inspection.get_payment_status_display() if inspection else ""
+    )
+    insp_notes = inspection.notes if inspection else ""
+
+    # بيانات التسليم
+    is_delivered = (
+        "نعم"
+        if manufacturing_order and manufacturing_order.status == "delivered"
+        else "لا"
+    )
+    delivery_permit = (
+        manufacturing_order.delivery_permit_number
+        if manufacturing_order
+        else ""
+    )
+    delivery_recipient = (
+        manufacturing_order.delivery_recipient_name
+        if manufacturing_order
+        else ""
+    )
+    delivery_date = (
+        manufacturing_order.delivery_date.strftime("%Y-%m-%d %H:%M")
+        if manufacturing_order and manufacturing_order.delivery_date
+        else ""
+    )
+
+    # إنشاء الصف الشامل
+    row = [
+        # بيانات الطلب الأساسية
+        str(order.id),
+        order.order_number or "",
+        customer_name,
+        customer_phone,
+        customer_address,
+        selected_types_str,
+        order.get_status_display(),
+        order.get_order_status_display(),
+        order.get_tracking_status_display(),
+        order.branch.name if order.branch else "",
+        order.salesperson.name if order.salesperson else "",
+        str(order.total_amount) if order.total_amount else "0",
+        str(order.paid_amount) if order.paid_amount else "0",
+        str(remaining_amount),
+        "نعم" if order.payment_verified else "لا",
+        order.order_date.strftime("%Y-%m-%d") if order.order_date else "",
+        (
+            order.expected_delivery_date.strftime("%Y-%m-%d")
+            if order.expected_delivery_date
+            else ""
+        ),
+        # بيانات الفواتير والعقود
+        order.invoice_number or "",
+        order.invoice_number_2 or "",
+        order.invoice_number_3 or "",
+        order.contract_number or "",
+        order.contract_number_2 or "",
+        order.contract_number_3 or "",
+        # بيانات أمر التصنيع
+        mfg_code,
+        mfg_status,
+        mfg_type,
+        mfg_start_date,
+        mfg_expected_end,
+        mfg_actual_completion,
+        mfg_exit_permit,
+        mfg_notes,
+        # بيانات التركيب
+        inst_status,
+        inst_team,
+        inst_scheduled_date,
+        inst_scheduled_time,
+        inst_location_type,
+        inst_location_address,
+        inst_completion_date,
+        inst_notes,
+        # بيانات المعاينة
+        insp_contract,
+        insp_status,
+        insp_result,
+        insp_inspector,
+        insp_windows_count,
+        insp_request_date,
+        insp_scheduled_date,
+        insp_scheduled_time,
+        insp_payment_status,
+        insp_notes,
+        # بيانات التسليم
+        is_delivered,
+        delivery_permit,
+        delivery_recipient,
+        delivery_date,
+        # بيانات عامة
+        "نعم" if order.is_fully_completed else "لا",
+        order.notes or "",
+        order.created_at.strftime("%Y-%m-%d %H:%M") if order.created_at else "",
+        order.updated_at.strftime("%Y-%m-%d %H:%M") if order.updated_at else "",
+    ]
+    return row
+
+
+def sync_complete_orders_lifecycle(service, spreadsheet_id, full=False):
     """
     مزامنة دورة حياة الطلبات الكاملة - الطلب + التصنيع + التركيب + المعاينة + التسليم
+    ✅ تصدير تزايدي (sheet_delta_export): الصفوف المتغيرة فقط في batchUpdate واحد
     """
     try:
         Order = apps.get_model("orders", "Order")
@@ -2067,15 +2385,6 @@ def sync_complete_orders_lifecycle(service, spreadsheet_id):
         InstallationSchedule = apps.get_model("installations", "InstallationSchedule")
         Inspection = apps.get_model("inspections", "Inspection")
 
-        # جلب جميع الطلبات مع البيانات المترابطة
-        orders = (
-            Order.objects.select_related(
-                "customer", "branch", "salesperson", "manufacturing_order"
-            )
-            .prefetch_related("installation_schedules", "inspections")
-            .all()
-        )
-
         # تحديد العناوين الشاملة لدورة حياة الطلب
         header = [
             # بيانات الطلب الأساسية
@@ -2144,256 +2453,34 @@ def sync_complete_orders_lifecycle(service, spreadsheet_id):
             "تاريخ آخر تحديث",
         ]
 
-        data = [header]
-        for order in orders:
-            # بيانات العميل
-            customer_name = order.customer.name if order.customer else "عميل غير محدد"
-            customer_phone = order.customer.phone if order.customer else ""
-            customer_address = order.customer.address if order.customer else ""
-
-            # حساب المبلغ المتبقي
-            remaining_amount = (order.total_amount or 0) - (order.paid_amount or 0)
-
-            # أنواع الطلب
-            selected_types_display = []
-            if order.selected_types:
-                type_mapping = {
-                    "accessory": "إكسسوار",
-                    "installation": "تركيب",
-                    "inspection": "معاينة",
-                    "tailoring": "تسليم",
-                }
-                if isinstance(order.selected_types, list):
-                    types_list = order.selected_types
-                elif isinstance(order.selected_types, str):
-                    try:
-                        import json
-
-                        types_list = json.loads(order.selected_types)
-                    except Exception:
-                        types_list = (
-                            [order.selected_types] if order.selected_types else []
-                        )
-                else:
-                    types_list = []
-
-                for type_code in types_list:
-                    if type_code and type_code.strip():
-                        selected_types_display.append(
-                            type_mapping.get(type_code.strip(), type_code.strip())
-                        )
-            selected_types_str = ", ".join(selected_types_display)
-
-            # بيانات أمر التصنيع
-            manufacturing_order = getattr(order, "manufacturing_order", None)
-            mfg_code = (
-                manufacturing_order.manufacturing_code if manufacturing_order else ""
-            )
-            mfg_status = (
-                manufacturing_order.get_status_display() if manufacturing_order else ""
-            )
-            mfg_type = (
-                manufacturing_order.get_order_type_display()
-                if manufacturing_order
-                else ""
-            )
-            mfg_start_date = (
-                manufacturing_order.order_date.strftime("%Y-%m-%d")
-                if manufacturing_order and manufacturing_order.order_date
-                else ""
-            )
-            mfg_expected_end = (
-                manufacturing_order.expected_delivery_date.strftime("%Y-%m-%d")
-                if manufacturing_order and manufacturing_order.expected_delivery_date
-                else ""
-            )
-            mfg_actual_completion = (
-                manufacturing_order.completion_date.strftime("%Y-%m-%d")
-                if manufacturing_order and manufacturing_order.completion_date
-                else ""
-            )
-            mfg_exit_permit = (
-                manufacturing_order.exit_permit_number if manufacturing_order else ""
-            )
-            mfg_notes = manufacturing_order.notes if manufacturing_order else ""
-
-            # بيانات التركيب
-            installation = (
-                order.installation_schedules.first()
-                if hasattr(order, "installation_schedules")
-                else None
-            )
-            inst_status = installation.get_status_display() if installation else ""
-            inst_team = (
-                installation.team.name if installation and installation.team else ""
-            )
-            inst_scheduled_date = (
-                installation.scheduled_date.strftime("%Y-%m-%d")
-                if installation and installation.scheduled_date
-                else ""
-            )
-            inst_scheduled_time = (
-                installation.scheduled_time.strftime("%H:%M")
-                if installation and installation.scheduled_time
-                else ""
-            )
-            inst_location_type = (
-                installation.get_location_type_display()
-                if installation and installation.location_type
-                else ""
-            )
-            inst_location_address = (
-                installation.location_address if installation else ""
-            )
-            inst_completion_date = (
-                installation.completion_date.strftime("%Y-%m-%d %H:%M")
-                if installation and installation.completion_date
-                else ""
-            )
-            inst_notes = installation.notes if installation else ""
-
-            # بيانات المعاينة
-            inspection = (
-                order.inspections.first() if hasattr(order, "inspections") else None
-            )
-            insp_contract = inspection.contract_number if inspection else ""
-            insp_status = inspection.get_status_display() if inspection else ""
-            insp_result = (
-                inspection.get_result_display()
-                if inspection and inspection.result
-                else ""
-            )
-            insp_inspector = (
-                f"{inspection.inspector.first_name} {inspection.inspector.last_name}"
-                if inspection and inspection.inspector
-                else ""
-            )
-            insp_windows_count = (
-                str(inspection.windows_count)
-                if inspection and inspection.windows_count
-                else ""
-            )
-            insp_request_date = (
-                inspection.request_date.strftime("%Y-%m-%d")
-                if inspection and inspection.request_date
-                else ""
-            )
-            insp_scheduled_date = (
-                inspection.scheduled_date.strftime("%Y-%m-%d")
-                if inspection and inspection.scheduled_date
-                else ""
-            )
-            insp_scheduled_time = (
-                inspection.scheduled_time.strftime("%H:%M")
-                if inspection and inspection.scheduled_time
-                else ""
-            )
-            insp_payment_status = (
-                inspection.get_payment_status_display() if inspection else ""
-            )
-            insp_notes = inspection.notes if inspection else ""
-
-            # بيانات التسليم
-            is_delivered = (
-                "نعم"
-                if manufacturing_order and manufacturing_order.status == "delivered"
-                else "لا"
-            )
-            delivery_permit = (
-                manufacturing_order.delivery_permit_number
-                if manufacturing_order
-                else ""
-            )
-            delivery_recipient = (
-                manufacturing_order.delivery_recipient_name
-                if manufacturing_order
-                else ""
-            )
-            delivery_date = (
-                manufacturing_order.delivery_date.strftime("%Y-%m-%d %H:%M")
-                if manufacturing_order and manufacturing_order.delivery_date
-                else ""
+        def build_rows(ids):
+            orders = (
+                Order.objects.select_related(
+                    "customer", "branch", "salesperson", "manufacturing_order"
+                )
+                .prefetch_related("installation_schedules__team", "inspections__inspector")
+                .filter(pk__in=ids)
             )
-
-            # إنشاء الصف الشامل
-            row = [
-                # بيانات الطلب الأساسية
-                str(order.id),
-                order.order_number or "",
-                customer_name,
-                customer_phone,
-                customer_address,
-                selected_types_str,
-                order.get_status_display(),
-                order.get_order_status_display(),
-                order.get_tracking_status_display(),
-                order.branch.name if order.branch else "",
-                order.salesperson.name if order.salesperson else "",
-                str(order.total_amount) if order.total_amount else "0",
-                str(order.paid_amount) if order.paid_amount else "0",
-                str(remaining_amount),
-                "نعم" if order.payment_verified else "لا",
-                order.order_date.strftime("%Y-%m-%d") if order.order_date else "",
-                (
-                    order.expected_delivery_date.strftime("%Y-%m-%d")
-                    if order.expected_delivery_date
-                    else ""
-                ),
-                # بيانات الفواتير والعقود
-                order.invoice_number or "",
-                order.invoice_number_2 or "",
-                order.invoice_number_3 or "",
-                order.contract_number or "",
-                order.contract_number_2 or "",
-                order.contract_number_3 or "",
-                # بيانات أمر التصنيع
-                mfg_code,
-                mfg_status,
-                mfg_type,
-                mfg_start_date,
-                mfg_expected_end,
-                mfg_actual_completion,
-                mfg_exit_permit,
-                mfg_notes,
-                # بيانات التركيب
-                inst_status,
-                inst_team,
-                inst_scheduled_date,
-                inst_scheduled_time,
-                inst_location_type,
-                inst_location_address,
-                inst_completion_date,
-                inst_notes,
-                # بيانات المعاينة
-                insp_contract,
-                insp_status,
-                insp_result,
-                insp_inspector,
-                insp_windows_count,
-                insp_request_date,
-                insp_scheduled_date,
-                insp_scheduled_time,
-                insp_payment_status,
-                insp_notes,
-                # بيانات التسليم
-                is_delivered,
-                delivery_permit,
-                delivery_recipient,
-                delivery_date,
-                # بيانات عامة
-                "نعم" if order.is_fully_completed else "لا",
-                order.notes or "",
-                order.created_at.strftime("%Y-%m-%d %H:%M") if order.created_at else "",
-                order.updated_at.strftime("%Y-%m-%d %H:%M") if order.updated_at else "",
-            ]
-            data.append(row)
-
-        sheet_name = "Complete Orders Lifecycle"
-        result = update_sheet(service, spreadsheet_id, sheet_name, data)
-        return {
-            "status": "success",
-            "message": f"تمت مزامنة دورة حياة {len(orders)} طلب كاملة",
-        }
+            for order in orders:
+                yield order.pk, _lifecycle_row(order)
+
+        # الصف يتغيّر أيضاً بتغيّر العميل أو أمر التصنيع أو التركيب أو المعاينة
+        result = export_sheet_delta(
+            service,
+            spreadsheet_id,
+            "Complete Orders Lifecycle",
+            header,
+            Order.objects.all(),
+            build_rows,
+            related=[
+                (Order.objects.all(), "pk", "customer__updated_at"),
+                (ManufacturingOrder.objects.all(), "order_id", "updated_at"),
+                (InstallationSchedule.objects.all(), "order_id", "updated_at"),
+                (Inspection.objects.all(), "order_id", "updated_at"),
+            ],
+            full=full,
+        )
+        return {"status": "success", "message": describe_result(result, "دورة حياة طلب")}
     except Exception as e:
         message = f"حدث خطأ أثناء مزامنة دورة حياة الطلبات الكاملة: {str(e)}"
         logger.error(message)
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.5 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("odoo_db_manager", "0003_delete_backup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GoogleSheetExportState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "spreadsheet_id",
+                    models.CharField(max_length=255, verbose_name="معرف جدول البيانات"),
+                ),
+                ("sheet_name", models.CharField(max_length=100, verbose_name="اسم ورقة العمل")),
+                (
+                    "sheet_id",
+                    models.BigIntegerField(blank=True, null=True, verbose_name="معرف الورقة"),
+                ),
+                (
+                    "header_hash",
+                    models.CharField(blank=True, max_length=32, verbose_name="بصمة العناوين"),
+                ),
+                (
+                    "watermark",
+                    models.DateTimeField(blank=True, null=True, verbose_name="آخر تحديث مُصدَّر"),
+                ),
+                ("last_id", models.BigIntegerField(default=0, verbose_name="أعلى معرف مُصدَّر")),
+                (
+                    "row_map",
+                    models.JSONField(blank=True, default=dict, verbose_name="خريطة الصفوف"),
+                ),
+                ("next_row", models.PositiveIntegerField(default=2, verbose_name="الصف التالي")),
+                (
+                    "last_full_sync",
+                    models.DateTimeField(blank=True, null=True, verbose_name="آخر تصدير كامل"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="تاريخ التحديث")),
+            ],
+            options={
+                "verbose_name": "حالة تصدير ورقة",
+                "verbose_name_plural": "حالات تصدير الأوراق",
+                "unique_together": {("spreadsheet_id", "sheet_name")},
+            },
+        ),
+    ]
@@ -0,0 +1,284 @@
+"""
+التصدير التزايدي إلى Google Sheets (Delta Export)
+================================================
+دوال المزامنة كانت تحمّل كل السجلات بـ .all() وتبني المصفوفة كاملة في
+الذاكرة، ثم update_sheet() يعيد كتابة الورقة كلها من A1 ويجلب بيانات
+جدول البيانات (metadata) في كل مرة — ورقة دورة حياة الطلبات تستغرق دقائق
+وتستهلك حصة Sheets API.
+
+الآن لكل ورقة حالة محفوظة (GoogleSheetExportState):
+- watermark (updated_at) + last_id: ما الذي تغيّر منذ آخر تصدير
+- row_map: مفتاح السجل → رقم الصف في الورقة
+- sheet_id: لا حاجة لجلب metadata إلا عند أول تصدير
+
+التصدير التزايدي يرسل الصفوف المتغيرة فقط في values.batchUpdate واحد
+(الصفوف الجديدة تُلحق في نهاية الورقة). المعرفات تُقرأ بـ values_list().iterator()
+والصفوف تُبنى على دفعات، فلا تُحمَّل الجداول كاملة في الذاكرة.
+
+التصدير الكامل يحدث عند أول مرة، أو تغيّر العناوين، أو full=True (النسخة
+الشاملة) — وهو أيضاً ما يزيل صفوف السجلات المحذوفة من الورقة.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# هامش أمان: معاملة بدأت قبل التصدير السابق وانتهت بعده تحمل updated_at أقدم
+WATERMARK_OVERLAP = timedelta(minutes=2)
+ID_STREAM_CHUNK = 2000
+ROW_BUILD_CHUNK = 500
+FULL_WRITE_ROWS = 5000
+
+
+def _header_hash(header):
+    return hashlib.md5(json.dumps(header, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _a1(sheet_name, row):
+    return f"'{sheet_name}'!A{row}"
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ensure_sheet(service, spreadsheet_id, sheet_name, state):
+    """معرف الورقة من الحالة المحفوظة، وإلا metadata مرة واحدة (وإنشاء الورقة إن لم توجد)"""
+    if state.sheet_id is not None:
+        return False
+
+    metadata = (
+        service.spreadsheets()
+        .get(spreadsheetId=spreadsheet_id, fields="sheets.properties(sheetId,title)")
+        .execute()
+    )
+    for sheet in metadata.get("sheets", []):
+        properties = sheet.get("properties", {})
+        if properties.get("title") == sheet_name:
+            state.sheet_id = properties.get("sheetId")
+            return False
+
+    logger.info(f"إنشاء ورقة جديدة: {sheet_name}")
+    response = (
+        service.spreadsheets()
+        .batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]},
+        )
+        .execute()
+    )
+    state.sheet_id = (
+        response.get("replies", [{}])[0].get("addSheet", {}).get("properties", {}).get("sheetId")
+    )
+    return True
+
+
+def _changed_ids(queryset, state, related):
+    """معرفات السجلات المتغيرة منذ آخر تصدير (السجل نفسه أو أحد مصادره المرتبطة)"""
+    since = state.watermark - WATERMARK_OVERLAP
+    ids = set(
+        queryset.filter(Q(updated_at__gte=since) | Q(pk__gt=state.last_id))
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=ID_STREAM_CHUNK)
+    )
+    for related_queryset, id_field, updated_field in related:
+        ids.update(
+            related_queryset.filter(**{f"{updated_field}__gte": since})
+            .exclude(**{f"{id_field}__isnull": True})
+            .values_list(id_field, flat=True)
+            .iterator(chunk_size=ID_STREAM_CHUNK)
+        )
+    return sorted(ids)
+
+
+def _build_rows(ids, build_rows):
+    for chunk in _chunks(ids, ROW_BUILD_CHUNK):
+        yield from build_rows(chunk)
+
+
+def _write_full(service, spreadsheet_id, sheet_name, header, queryset, build_rows, state):
+    ids = queryset.order_by("pk").values_list("pk", flat=True).iterator(
+        chunk_size=ID_STREAM_CHUNK
+    )
+    row_map = {}
+    row_number = 2
+    last_id = 0
+    pending = [header]
+    pending_start = 1
+
+    def flush(values, start):
+        service.spreadsheets().values().update(
+            spreadsheetId=spreadsheet_id,
+            range=_a1(sheet_name, start),
+            valueInputOption="RAW",
+            body={"values": values},
+        ).execute()
+
+    for key, row in _build_rows(ids, build_rows):
+        row_map[str(key)] = row_number
+        last_id = max(last_id, key)
+        pending.append(row)
+        row_number += 1
+        if len(pending) >= FULL_WRITE_ROWS:
+            flush(pending, pending_start)
+            pending_start += len(pending)
+            pending = []
+    if pending:
+        flush(pending, pending_start)
+
+    # إزالة الصفوف الزائدة من تصدير سابق أطول (سجلات محذوفة)
+    if state.next_row > row_number:
+        service.spreadsheets().values().clear(
+            spreadsheetId=spreadsheet_id,
+            range=f"'{sheet_name}'!{row_number}:{state.next_row - 1}",
+            body={},
+        ).execute()
+
+    from .google_sync import format_sheet_header
+
+    format_sheet_header(service, spreadsheet_id, state.sheet_id, sheet_name, len(header))
+
+    state.row_map = row_map
+    state.next_row = row_number
+    state.last_id = last_id
+    state.last_full_sync = timezone.now()
+    return {"mode": "full", "rows": len(row_map), "updated": 0, "appended": len(row_map)}
+
+
+def _write_delta(service, spreadsheet_id, sheet_name, queryset, build_rows, related, state):
+    ids = _changed_ids(queryset, state, related)
+    if not ids:
+        return {"mode": "delta", "rows": len(state.row_map), "updated": 0, "appended": 0}
+
+    row_map = dict(state.row_map)
+    next_row = state.next_row
+    positioned = []
+    updated = appended = 0
+    for key, row in _build_rows(ids, build_rows):
+        row_number = row_map.get(str(key))
+        if row_number is None:
+            row_number = row_map[str(key)] = next_row
+            next_row += 1
+            appended += 1
+        else:
+            updated += 1
+        positioned.append((row_number, row))
+
+    # دمج الصفوف المتتالية في نطاق واحد (الصفوف الجديدة كلها نطاق واحد)
+    positioned.sort(key=lambda item: item[0])
+    data = []
+    for row_number, row in positioned:
+        if data and data[-1]["end"] == row_number - 1:
+            data[-1]["values"].append(row)
+            data[-1]["end"] = row_number
+        else:
+            data.append({"start": row_number, "end": row_number, "values": [row]})
+
+    if data:
+        service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={
+                "valueInputOption": "RAW",
+                "data": [
+                    {"range": _a1(sheet_name, item["start"]), "values": item["values"]}
+                    for item in data
+                ],
+            },
+        ).execute()
+
+    state.row_map = row_map
+    state.next_row = next_row
+    state.last_id = max([state.last_id, *ids])
+    return {"mode": "delta", "rows": len(row_map), "updated": updated, "appended": appended}
+
+
+def export_sheet_delta(
+    service,
+    spreadsheet_id,
+    sheet_name,
+    header,
+    queryset,
+    build_rows,
+    related=(),
+    full=False,
+):
+    """
+    تصدير ورقة بشكل تزايدي.
+
+    queryset: مصدر السجلات (يحتوي updated_at)
+    build_rows(ids): يعيد (المفتاح، الصف) لدفعة معرفات — يُستدعى لكل ROW_BUILD_CHUNK معرف
+    related: [(queryset, "حقل معرف السجل", "حقل التحديث")] تغيّرها يعيد تصدير السجل
+    full: إعادة كتابة الورقة كاملة
+
+    Returns:
+        dict: mode, rows, updated, appended
+    """
+    from .google_sync import GoogleSheetExportState
+
+    state, _ = GoogleSheetExportState.objects.get_or_create(
+        spreadsheet_id=spreadsheet_id, sheet_name=sheet_name
+    )
+    header_hash = _header_hash(header)
+    started = timezone.now()
+
+    created = _ensure_sheet(service, spreadsheet_id, sheet_name, state)
+    full = (
+        full
+        or created
+        or state.watermark is None
+        or not state.row_map
+        or state.header_hash != header_hash
+    )
+
+    try:
+        if full:
+            result = _write_full(
+                service, spreadsheet_id, sheet_name, header, queryset, build_rows, state
+            )
+        else:
+            result = _write_delta(
+                service, spreadsheet_id, sheet_name, queryset, build_rows, related, state
+            )
+    except Exception as e:
+        if full:
+            raise
+        # الورقة حُذفت أو أُعيدت تسميتها يدوياً: إعادة بنائها بالكامل مرة واحدة
+        logger.warning(f"فشل التصدير التزايدي لورقة {sheet_name}، إعادة كتابتها كاملة: {e}")
+        state.reset()
+        _ensure_sheet(service, spreadsheet_id, sheet_name, state)
+        result = _write_full(
+            service, spreadsheet_id, sheet_name, header, queryset, build_rows, state
+        )
+
+    state.header_hash = header_hash
+    state.watermark = started
+    state.save()
+
+    logger.info(
+        f"تصدير {sheet_name} ({result['mode']}): {result['updated']} محدث، "
+        f"{result['appended']} جديد من أصل {result['rows']}"
+    )
+    return result
+
+
+def describe_result(result, noun):
+    """رسالة موحدة لنتيجة التصدير"""
+    if result["mode"] == "full":
+        return f"تمت مزامنة {result['rows']} {noun} (تصدير كامل)"
+    return (
+        f"تمت مزامنة {noun} تزايدياً: {result['updated']} محدث، "
+        f"{result['appended']} جديد (الإجمالي {result['rows']})"
+    )
@@ -248,15 +248,15 @@ class OrderInventoryService:
     @staticmethod
     def _get_current_stock(product, warehouse):
         """الحصول على المخزون الحالي"""
-        from inventory.models import StockTransaction
+        from inventory.models import StockBalance
 
-        last_trans = (
-            StockTransaction.objects.filter(product=product, warehouse=warehouse)
-            .order_by("-transaction_date", "-id")
+        # الرصيد المجمّع صحيح دائماً حتى قبل إعادة حساب running_balance المؤجلة
+        balance = (
+            StockBalance.objects.filter(product=product, warehouse=warehouse)
+            .values_list("quantity", flat=True)
             .first()
         )
-
-        return last_trans.running_balance if last_trans else Decimal("0")
+        return balance if balance is not None else Decimal("0")
 
     @staticmethod
     def _create_low_stock_alert(product, current_stock, user=None):
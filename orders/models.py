@@ -839,123 +839,41 @@ class Order(SoftDeleteMixin, models.Model):
         return expected_date
 
     def generate_unique_order_number(self):
-        """توليد رقم طلب فريد للعميل"""
-        if not self.customer:
-            import uuid
-
-            return f"ORD-{str(uuid.uuid4())[:8]}"
-
-        try:
-            customer_code = (
-                self.customer.code
-                if hasattr(self.customer, "code") and self.customer.code
-                else "UNKNOWN"
-            )
-
-            # البحث عن آخر رقم طلب لهذا العميل
-            last_order = (
-                Order.objects.filter(
-                    customer=self.customer, order_number__startswith=customer_code
-                )
-                .exclude(pk=self.pk)
-                .order_by("-order_number")
-                .first()
-            )
-
-            if last_order:
-                # Extract the number part and increment it
-                try:
-                    last_num = int(last_order.order_number.split("-")[-1])
-                    next_num = last_num + 1
-                except ValueError:
-                    next_num = 1
-            else:
-                next_num = 1
-
-            # التأكد من عدم تكرار رقم الطلب
-            max_attempts = 100
-            for attempt in range(max_attempts):
-                potential_order_number = f"{customer_code}-{next_num:04d}"
-
-                # التحقق من عدم وجود رقم مكرر (باستثناء الطلب الحالي)
-                if (
-                    not Order.objects.filter(order_number=potential_order_number)
-                    .exclude(pk=self.pk)
-                    .exists()
-                ):
-                    return potential_order_number
-
-                next_num += 1
-
-            # إذا فشل في العثور على رقم فريد، استخدم UUID
-            import uuid
+        """توليد رقم طلب فريد للعميل (عداد core.sequences لكل كود عميل)"""
+        from core.sequences import allocate, max_suffix
 
-            return f"{customer_code}-{str(uuid.uuid4())[:8]}"
-
-        except Exception as e:
-            logger.debug(f"Error generating order number: {e}")
-            # Use a fallback order number if we can't generate one
-            import uuid
-
-            return f"ORD-{str(uuid.uuid4())[:8]}"
+        if self.customer:
+            customer_code = self.customer.code or "UNKNOWN"
+        else:
+            customer_code = "ORD"
+        prefix = f"{customer_code}-"
+        return allocate(
+            "orders.order_number",
+            prefix,
+            render=lambda n: f"{prefix}{n:04d}",
+            seed=lambda: max_suffix(Order.all_objects, "order_number", prefix),
+            taken=lambda value: Order.all_objects.filter(order_number=value)
+            .exclude(pk=self.pk)
+            .exists(),
+        )
 
     def generate_unique_contract_number(self):
-        """توليد رقم عقد فريد بصيغة c1, c2, c3, إلخ"""
+        """توليد رقم عقد فريد للعميل بصيغة c1, c2, c3, إلخ"""
         if not self.customer:
             return "c1"
 
-        try:
-            # البحث عن آخر رقم عقد لهذا العميل يبدأ بـ "c"
-            last_orders = (
-                Order.objects.filter(
-                    customer=self.customer,
-                    contract_number__isnull=False,
-                    contract_number__startswith="c",
-                )
-                .exclude(pk=self.pk)
-                .order_by("-contract_number")
-            )
-
-            next_num = 1
-            if last_orders.exists():
-                # Extract the highest contract number
-                for order in last_orders:
-                    try:
-                        # Extract number from format like "c1", "c2", etc.
-                        contract_num_str = order.contract_number.lower()
-                        if contract_num_str.startswith("c"):
-                            num = int(contract_num_str[1:])
-                            if num >= next_num:
-                                next_num = num + 1
-                    except (ValueError, IndexError):
-                        continue
-
-            # التأكد من عدم تكرار رقم العقد
-            max_attempts = 100
-            for attempt in range(max_attempts):
-                potential_contract_number = f"c{next_num}"
-
-                # التحقق من عدم وجود رقم مكرر (باستثناء الطلب الحالي)
-                if (
-                    not Order.objects.filter(
-                        customer=self.customer,
-                        contract_number=potential_contract_number,
-                    )
-                    .exclude(pk=self.pk)
-                    .exists()
-                ):
-                    return potential_contract_number
-
-                next_num += 1
-
-            # إذا فشل في العثور على رقم فريد، استخدم رقم عشوائي كبير
-            import random
-
-            return f"c{random.randint(100, 999)}"
-
-        except Exception as e:
-            logger.error(f"Error generating contract number: {e}")
-            return "c1"
+        from core.sequences import allocate, max_suffix
+
+        customer_orders = Order.all_objects.filter(customer=self.customer)
+        return allocate(
+            "orders.contract_number",
+            str(self.customer.pk),
+            render=lambda n: f"c{n}",
+            seed=lambda: max_suffix(customer_orders, "contract_number", "c"),
+            taken=lambda value: customer_orders.filter(contract_number=value)
+            .exclude(pk=self.pk)
+            .exists(),
+        )
 
     def upload_contract_to_google_drive(self):
         """رفع ملف العقد إلى Google Drive"""
@@ -1898,67 +1816,30 @@ from django.db.models.signals import post_delete as oi_post_delete
 from django.db.models.signals import post_save as oi_post_save
 
 
-def _recompute_order_totals(order_id):
-    try:
-        from django.db import transaction
-        from .tasks import calculate_order_totals_async
-
-        # تأخير المهمة حتى بعد commit المعاملة لتجنب race condition
-        transaction.on_commit(
-            lambda: calculate_order_totals_async.apply_async(
-                (order_id,), countdown=2
-            )
-        )
-    except Exception:
-        try:
-            order = Order.objects.get(pk=order_id)
-            # Force recalculation locally when Celery is not available
-            order.calculate_final_price(force_update=True)
-            order.total_amount = order.final_price
-            order.save(update_fields=["final_price", "total_amount"])
-        except Exception:
-            pass
-
-
-def _update_order_cutting_flag(order):
-    try:
-        # إذا وُجدت عناصر في حالة تقطيع غير مكتملة، ضع حالة الطلب إلى 'in_progress' للتقطيع
-        if order.items.filter(cutting_status__in=["pending", "in_progress"]).exists():
-            # نضع علامة تتبع أو نحدّث order_status إلى 'in_progress' إن كان مناسباً
-            # لكن من الأفضل استخدام عرض مخصص - هنا نحافظ على order_status إذا لم يكن 'in_progress'
-            if order.order_status != "in_progress":
-                order.order_status = "in_progress"
-                order.save(update_fields=["order_status"])
-        else:
-            # إذا لم توجد عناصر قيد التقطيع، لا نغيّر الحالة هنا (قد يتولّى المصنع/التوصيل إدارة الحالة)
-            pass
-    except Exception:
-        pass
+# الحقول التي يؤثر تغييرها على إجماليات الطلب
+ORDER_ITEM_PRICE_FIELDS = ("quantity", "unit_price", "product", "discount_percentage")
 
 
 def order_item_saved(sender, instance, created, **kwargs):
-    # إعادة حساب إجماليات الطلب
-    if instance and instance.order:
-        try:
-            # التحقق من أن الطلب لا يزال موجوداً
-            if Order.objects.filter(pk=instance.order.pk).exists():
-                _recompute_order_totals(instance.order.pk)
-                _update_order_cutting_flag(instance.order)
-        except Exception:
-            # تجاهل الأخطاء إذا كان الطلب قيد الحذف
-            pass
+    # ✅ تسجيل الطلب لإعادة حساب إجمالياته وحالة التقطيع مرة واحدة بعد نجاح المعاملة
+    # (بدلاً من استعلام تجميعي + Order.save() لكل بند — orders.recompute)
+    if instance and instance.order_id:
+        from .recompute import mark_order_dirty
+
+        force_price = (
+            created
+            or getattr(instance, "_force_price_update", False)
+            or any(instance.tracker.has_changed(field) for field in ORDER_ITEM_PRICE_FIELDS)
+        )
+        mark_order_dirty(instance.order, force_price=force_price)
 
 
 def order_item_deleted(sender, instance, **kwargs):
-    if instance and instance.order:
-        try:
-            # التحقق من أن الطلب لا يزال موجوداً
-            if Order.objects.filter(pk=instance.order.pk).exists():
-                _recompute_order_totals(instance.order.pk)
-                _update_order_cutting_flag(instance.order)
-        except Exception:
-            # تجاهل الأخطاء إذا كان الطلب قيد الحذف
-            pass
+    if instance and instance.order_id:
+        from .recompute import mark_order_dirty
+
+        # الطلب قد يكون قيد الحذف — flush_dirty_orders يتجاهل الطلبات غير الموجودة
+        mark_order_dirty(instance.order)
 
 
 class OrderItem(SoftDeleteMixin, models.Model):
@@ -2306,25 +2187,9 @@ class OrderItem(SoftDeleteMixin, models.Model):
             else:
                 self.discount_amount = Decimal("0.00")
 
+            # إجماليات الطلب تُعاد حسابها مرة واحدة بعد نجاح المعاملة (order_item_saved)
             super().save(*args, **kwargs)
 
-            # تحديث السعر النهائي للطلب فوراً لضمان الدقة
-            if is_new or force_update:
-                try:
-                    self.order.calculate_final_price(force_update=force_update)
-                    # تحديث مباشر باستخدام update لتجنب حلقات التكرار
-                    Order.objects.filter(pk=self.order.pk).update(
-                        final_price=self.order.final_price,
-                        total_amount=self.order.total_amount,
-                    )
-                except Exception as calc_error:
-                    import logging
-
-                    logger = logging.getLogger(__name__)
-                    logger.error(
-                        f"خطأ في تحديث السعر النهائي للطلب {self.order.pk}: {str(calc_error)}"
-                    )
-
         except Exception as e:
             import logging
 
@@ -0,0 +1,140 @@
+"""
+إعادة حساب الطلبات المؤجَّلة (Dirty Orders Collector)
+=====================================================
+كل حفظ/حذف لعنصر طلب كان يعيد حساب إجماليات الطلب وحالة التقطيع فوراً
+(استعلام تجميعي + Order.save() يطلق track_order_changes)، فطلب ستائر
+من 40 بنداً يكرر ذلك عشرات المرات.
+
+الآن تُسجَّل الطلبات المتأثرة في مجموعة خاصة بالخيط، وتُعاد حسابها
+مرة واحدة لكل طلب بعد نجاح المعاملة:
+- calculate_final_price ثم bulk_update لـ final_price/total_amount (بدون signals)
+  مع updated_at — التصدير التزايدي إلى Google Sheets يعتمد عليه
+- علامة التقطيع (in_progress) باستعلام واحد لكل الطلبات المتأثرة
+
+الاستخدام:
+    mark_order_dirty(order, force_price=True)
+    flush_dirty_orders()  # فوري — عند الحاجة للأرقام داخل المعاملة نفسها
+"""
+
+import logging
+import threading
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_pending = threading.local()
+
+CUTTING_ACTIVE_STATUSES = ("pending", "in_progress")
+
+
+def _pending_orders():
+    pending = getattr(_pending, "orders", None)
+    if pending is None:
+        pending = _pending.orders = {}
+    return pending
+
+
+def mark_order_dirty(order, force_price=False):
+    """
+    تسجيل طلب لإعادة حساب إجمالياته وحالة التقطيع بعد نجاح المعاملة.
+
+    force_price: تجاوز حماية الطلبات المدفوعة في calculate_final_price
+    (عند إضافة أو تعديل بنود)، ويُدمج بـ OR مع التسجيلات السابقة للطلب.
+    كائن الطلب في الذاكرة يُحدَّث أيضاً حتى لا يكتب save() لاحق أرقاماً قديمة.
+    """
+    if order is None or not order.pk:
+        return
+
+    pending = _pending_orders()
+    entry = pending.get(order.pk)
+    if entry is None:
+        pending[order.pk] = {"force": force_price, "instances": [order]}
+    else:
+        entry["force"] = entry["force"] or force_price
+        if not any(instance is order for instance in entry["instances"]):
+            entry["instances"].append(order)
+
+    # كل تسجيل يضيف callback خفيفاً؛ أول callback ينفَّذ يفرّغ المجموعة كاملة
+    # والباقي لا يجد شيئاً (نفس نمط inventory.running_balance)
+    transaction.on_commit(flush_dirty_orders)
+
+
+def _recompute_totals(orders, entries):
+    from .models import Order
+
+    changed = []
+    now = timezone.now()
+    for order in orders:
+        old_values = (order.final_price, order.total_amount)
+        order.calculate_final_price(force_update=entries[order.pk]["force"])
+        if (order.final_price, order.total_amount) != old_values:
+            # bulk_update لا يطبّق auto_now
+            order.updated_at = now
+            changed.append(order)
+        for instance in entries[order.pk]["instances"]:
+            instance.final_price = order.final_price
+            instance.total_amount = order.total_amount
+
+    if changed:
+        Order.objects.bulk_update(
+            changed, ["final_price", "total_amount", "updated_at"], batch_size=200
+        )
+    return changed
+
+
+def _update_cutting_flags(orders):
+    """نفس منطق _update_order_cutting_flag السابق — استعلام واحد لكل الطلبات"""
+    from .models import OrderItem
+
+    active_ids = set(
+        OrderItem.objects.filter(
+            order_id__in=[order.pk for order in orders],
+            cutting_status__in=CUTTING_ACTIVE_STATUSES,
+        )
+        .values_list("order_id", flat=True)
+        .distinct()
+    )
+    updated = 0
+    for order in orders:
+        if order.pk in active_ids and order.order_status != "in_progress":
+            order.order_status = "in_progress"
+            # save عادي هنا: تغيير الحالة يجب أن يمر عبر signals (سجل الحالة، الإشعارات)
+            order.save(update_fields=["order_status", "updated_at"])
+            updated += 1
+    return updated
+
+
+def flush_dirty_orders():
+    """إعادة حساب كل الطلبات المسجّلة — مرة واحدة لكل طلب"""
+    pending = getattr(_pending, "orders", None)
+    if not pending:
+        return 0
+
+    entries = dict(pending)
+    pending.clear()
+
+    from .models import Order
+
+    try:
+        with transaction.atomic():
+            # الطلبات المحذوفة (أو قيد الحذف) لا تظهر هنا فتُتجاهل تلقائياً
+            orders = list(Order.objects.filter(pk__in=list(entries)))
+            changed = _recompute_totals(orders, entries)
+            _update_cutting_flags(orders)
+    except Exception as e:
+        logger.error(f"❌ فشل إعادة حساب {len(entries)} طلب: {e}")
+        return 0
+
+    if changed:
+        try:
+            from core.order_rollups import mark_order_day_dirty
+
+            for order in changed:
+                mark_order_day_dirty(order.created_at)
+        except Exception:
+            pass
+
+    logger.debug(f"✅ إعادة حساب الطلبات: {len(orders)} طلب، {len(changed)} تغيّرت إجمالياته")
+    return len(orders)
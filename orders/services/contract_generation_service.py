@@ -8,8 +8,9 @@ from io import BytesIO
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.template.loader import render_to_string
-from weasyprint import CSS, HTML
-from weasyprint.text.fonts import FontConfiguration
+from weasyprint import HTML
+
+from core.utils.pdf import get_font_config, get_stylesheet
 
 from ..contract_models import ContractCurtain, ContractPrintLog, ContractTemplate
 from ..models import Order
@@ -312,8 +313,8 @@ class ContractGenerationService:
             # توليد HTML
             html_content = self.generate_html()
 
-            # إعداد الخطوط - محسّن
-            font_config = FontConfiguration()
+            # ✅ إعداد الخطوط مشترك بين كل العقود في العملية (core.utils.pdf)
+            font_config = get_font_config()
 
             # CSS إضافي من القالب
             css_content = self.template.css_styles if self.template.css_styles else ""
@@ -365,7 +366,7 @@ class ContractGenerationService:
 
             HTML(string=html_content, base_url=base_url).write_pdf(
                 pdf_file,
-                stylesheets=[CSS(string=full_css, font_config=font_config)],
+                stylesheets=[get_stylesheet(full_css)],
                 font_config=font_config,
                 # تحسينات الأداء
                 optimize_images=True,  # تحسين الصور
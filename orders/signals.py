@@ -1143,21 +1143,9 @@ def reverse_inventory_on_order_cancel(sender, instance, created, **kwargs):
 @receiver(post_save, sender=OrderItem, dispatch_uid='order_item_post_save')
 def order_item_post_save(sender, instance, created, **kwargs):
     """معالج حفظ عنصر الطلب"""
+    # ✅ إجماليات الطلب تُعاد حسابها مرة واحدة بعد نجاح المعاملة (orders.recompute)
+    # عبر order_item_saved — هنا تسجيل التعديلات فقط
     if created:
-        # تحديث المبلغ الإجمالي للطلب (للطلبات الجديدة فقط)
-        try:
-            # Force recalculation to ensure stored final_price matches items
-            instance.order.calculate_final_price(force_update=True)
-            # تحديث مباشر في قاعدة البيانات لضمان دقة الأرقام فوراً
-            instance.order._is_auto_update = True
-            Order.objects.filter(pk=instance.order.pk).update(
-                final_price=instance.order.final_price,
-                total_amount=instance.order.total_amount,
-            )
-        except Exception as e:
-            logger.error(
-                f"Error in synchronous recalculation for order {instance.order.id}: {e}"
-            )
         # لا نسجل تعديلات عند الإنشاء الأولي
         return
     else:
@@ -1324,18 +1312,6 @@ def order_item_post_save(sender, instance, created, **kwargs):
                         ]
                     },
                 )
-            # بعد تسجيل التعديل، نعيد حساب إجماليات الطلب ونحدث الحقول المخزنة فوراً بشكل متزامن
-            try:
-                instance.order.calculate_final_price(force_update=True)
-                instance.order._is_auto_update = True
-                Order.objects.filter(pk=instance.order.pk).update(
-                    final_price=instance.order.final_price,
-                    total_amount=instance.order.total_amount,
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error in synchronous update recalculation for order {instance.order.id}: {e}"
-                )
 
 
 @receiver(post_save, sender=Payment)
@@ -1347,8 +1323,9 @@ def payment_post_save(sender, instance, created, **kwargs):
             # تحديث المبلغ المدفوع للطلب
             paid_amount = order.payments.aggregate(total=models.Sum("amount"))["total"] or 0
             # تحديث مباشر في قاعدة البيانات لتجنب التكرار الذاتي
+            # (update() لا يطبّق auto_now — updated_at صراحةً للتصدير التزايدي)
             Order.objects.filter(pk=order.pk).update(
-                paid_amount=paid_amount, payment_verified=True
+                paid_amount=paid_amount, payment_verified=True, updated_at=timezone.now()
             )
 
 
@@ -1383,7 +1360,9 @@ def update_order_manufacturing_status(sender, instance, created, **kwargs):
         if getattr(instance, 'is_deleted', False):
             # إذا لم يتم ضبط حالة الطلب إلى manufacturing_deleted بعد، نضبطها الآن
             if order.order_status != 'manufacturing_deleted':
-                Order.objects.filter(pk=order.pk).update(order_status='manufacturing_deleted')
+                Order.objects.filter(pk=order.pk).update(
+                    order_status='manufacturing_deleted', updated_at=timezone.now()
+                )
             return
 
         # مطابقة مباشرة بين حالات التصنيع والطلب
@@ -1402,7 +1381,9 @@ def update_order_manufacturing_status(sender, instance, created, **kwargs):
 
         # تحديث الحالة فقط إذا تغيرت لتجنب التكرار الذاتي
         if new_status and new_status != order.order_status:
-            Order.objects.filter(pk=order.pk).update(order_status=new_status)
+            Order.objects.filter(pk=order.pk).update(
+                order_status=new_status, updated_at=timezone.now()
+            )
             order.refresh_from_db()
             order.update_completion_status()
     except Exception as e:
@@ -1434,7 +1415,7 @@ def log_manufacturing_order_deletion(sender, instance, **kwargs):
 
         # تحديث حالة الطلب
         Order.objects.filter(pk=instance.order.pk).update(
-            order_status="manufacturing_deleted"
+            order_status="manufacturing_deleted", updated_at=timezone.now()
         )
 
     except Exception as e:
@@ -1720,6 +1701,40 @@ def invalidate_product_cache_on_delete(sender, instance, **kwargs):
         logger.error(f"خطأ في إلغاء التخزين المؤقت للمنتجات بعد الحذف: {str(e)}")
 
 
+# ✅ إلغاء كاش الصفحات (core.page_cache) بالوسوم بعد نجاح المعاملة
+_PAGE_CACHE_TAGS = {
+    "orders.Order": ("orders",),
+    "orders.OrderItem": ("orders",),
+    "orders.Payment": ("orders",),
+    "manufacturing.ManufacturingOrder": ("manufacturing", "orders"),
+    "manufacturing.ManufacturingOrderItem": ("manufacturing",),
+    "manufacturing.FabricReceipt": ("manufacturing",),
+    "manufacturing.FabricReceiptItem": ("manufacturing",),
+    "cutting.CuttingOrder": ("manufacturing",),
+    "cutting.CuttingOrderItem": ("manufacturing",),
+    "installations.InstallationSchedule": ("installations", "orders"),
+}
+
+
+def _invalidate_page_cache(sender, **kwargs):
+    """رفع إصدار وسوم الصفحات المرتبطة بالنموذج المتغيّر"""
+    try:
+        from core.page_cache import invalidate_tags_on_commit
+
+        invalidate_tags_on_commit(*_PAGE_CACHE_TAGS[sender._meta.label])
+    except Exception as e:
+        logger.error(f"خطأ في إلغاء كاش الصفحات لـ {sender._meta.label}: {e}")
+
+
+for _label in _PAGE_CACHE_TAGS:
+    post_save.connect(
+        _invalidate_page_cache, sender=_label, dispatch_uid=f"page_cache_save_{_label}"
+    )
+    post_delete.connect(
+        _invalidate_page_cache, sender=_label, dispatch_uid=f"page_cache_delete_{_label}"
+    )
+
+
 # إضافة signals لتتبع تغييرات حالات أنواع الطلبات المختلفة
 try:
 
@@ -39,6 +39,7 @@ logger = logging.getLogger(__name__)
 from django.utils.translation import gettext_lazy as _
 
 from core.monthly_filter_utils import apply_monthly_filter
+from core.search import order_search_q
 from core.utils.secure_files import serve_protected_file
 
 from .permissions import can_user_view_order
@@ -171,25 +172,7 @@ def order_list(request):
     year_filter = request.GET.get("year", "")
 
     if search_query:
-        orders = orders.filter(
-            Q(order_number__icontains=search_query)
-            | Q(customer__name__icontains=search_query)
-            | Q(customer__phone__icontains=search_query)
-            | Q(customer__code__icontains=search_query)
-            | Q(contract_number__icontains=search_query)
-            | Q(contract_number_2__icontains=search_query)
-            | Q(contract_number_3__icontains=search_query)
-            | Q(invoice_number__icontains=search_query)
-            | Q(invoice_number_2__icontains=search_query)
-            | Q(invoice_number_3__icontains=search_query)
-            | Q(salesperson__name__icontains=search_query)
-            | Q(branch__name__icontains=search_query)
-            | Q(notes__icontains=search_query)
-            | Q(selected_types__icontains=search_query)
-            | Q(order_status__icontains=search_query)
-            | Q(order_date__icontains=search_query)
-            | Q(expected_delivery_date__icontains=search_query)
-        )
+        orders = orders.filter(order_search_q(search_query))
 
     if status_filter:
         if status_filter == "under_cutting":
@@ -13,6 +13,11 @@ from django.core.cache import cache
 
 logger = logging.getLogger(__name__)
 
+# نتائج send_batch (بدون انتظار داخلي — إعادة المحاولة مسؤولية طابور المزامنة)
+SEND_OK = "ok"
+SEND_RATE_LIMITED = "rate_limited"
+SEND_FAILED = "failed"
+
 
 class CloudflareSync:
     """
@@ -25,6 +30,61 @@ class CloudflareSync:
         )
         self.api_key = getattr(settings, "CLOUDFLARE_SYNC_API_KEY", None)
         self.enabled = getattr(settings, "CLOUDFLARE_SYNC_ENABLED", False)
+        self._session = None
+
+    @property
+    def session(self):
+        """جلسة HTTP مشتركة (keep-alive) بدلاً من اتصال جديد لكل طلب"""
+        if self._session is None:
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+            session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+            session.headers.update(
+                {"Content-Type": "application/json", "X-Sync-API-Key": self.api_key or ""}
+            )
+            self._session = session
+        return self._session
+
+    @staticmethod
+    def _timeout_for(data):
+        # حساب timeout: 60 ثانية أساسي + 1 ثانية لكل 10 منتجات
+        # مثال: 50 منتج = 60 + (50/10) = 65 ثانية
+        num_products = 1
+        if isinstance(data.get("products"), list):
+            num_products = len(data["products"])
+        return 60 + (num_products // 10)
+
+    @staticmethod
+    def _is_rate_limited(response):
+        # ✅ BUG-019: Rate limit سواء كان HTTP 429 مباشرة أو مُغلفاً في HTTP 500
+        # Cloudflare Worker يُعيد 500 إذا كان KV API أعاد 429 داخلياً
+        return response.status_code == 429 or (
+            response.status_code == 500 and "429" in response.text
+        )
+
+    def send_batch(self, data):
+        """
+        إرسال طلب واحد دون إعادة محاولة أو انتظار.
+        يعيد SEND_OK أو SEND_RATE_LIMITED أو SEND_FAILED.
+        """
+        if not self.is_configured():
+            return SEND_FAILED
+        try:
+            response = self.session.post(
+                f"{self.worker_url}/sync", json=data, timeout=self._timeout_for(data)
+            )
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Cloudflare sync request failed: {e}")
+            return SEND_FAILED
+
+        if response.status_code == 200:
+            return SEND_OK
+        if self._is_rate_limited(response):
+            return SEND_RATE_LIMITED
+        logger.error(f"Cloudflare sync failed: {response.status_code} - {response.text}")
+        return SEND_FAILED
 
     def is_configured(self):
         """Check if Cloudflare sync is properly configured"""
@@ -37,37 +97,19 @@ class CloudflareSync:
             return False
 
         try:
-            # تحديد timeout ديناميكي بناءً على حجم البيانات
-            # للدفعات الكبيرة، نحتاج وقت أطول
-            num_products = 1
-            if isinstance(data.get("products"), list):
-                num_products = len(data["products"])
-            
-            # حساب timeout: 60 ثانية أساسي + 1 ثانية لكل 10 منتجات
-            # مثال: 50 منتج = 60 + (50/10) = 65 ثانية
-            calculated_timeout = 60 + (num_products // 10)
-            
-            # logger.info(f"Sending sync request to {self.worker_url}/sync")
+            calculated_timeout = self._timeout_for(data)
+
             max_retries = 4
             for attempt in range(max_retries):
-                response = requests.post(
+                response = self.session.post(
                     f"{self.worker_url}/sync",
                     json=data,
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-Sync-API-Key": self.api_key,
-                    },
                     timeout=calculated_timeout,  # Timeout ديناميكي للدفعات الكبيرة
                 )
 
                 if response.status_code == 200:
-                    # logger.info(f"Cloudflare sync successful")
                     return True
-                elif response.status_code == 429 or (
-                    response.status_code == 500 and "429" in response.text
-                ):
-                    # ✅ BUG-019: Rate limit سواء كان HTTP 429 مباشرة أو مُغلفاً في HTTP 500
-                    # Cloudflare Worker يُعيد 500 إذا كان KV API أعاد 429 داخلياً
+                elif self._is_rate_limited(response):
                     wait_time = 2 ** (attempt + 1)  # 2, 4, 8, 16 ثانية
                     logger.warning(
                         f"Cloudflare KV rate limit (429) — محاولة {attempt + 1}/{max_retries}, "
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.5 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("public", "0009_qrdesignsettings_color_label_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CloudflareSyncOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.CharField(max_length=255, unique=True, verbose_name="الكود")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("sync", "مزامنة"), ("delete", "حذف")],
+                        max_length=10,
+                        verbose_name="العملية",
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(
+                        blank=True,
+                        choices=[("base_product", "منتج أساسي"), ("product", "منتج")],
+                        max_length=20,
+                        verbose_name="النوع",
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.BigIntegerField(blank=True, null=True, verbose_name="معرف السجل"),
+                ),
+                ("pending", models.BooleanField(default=True, verbose_name="بانتظار الإرسال")),
+                ("enqueued_at", models.DateTimeField(verbose_name="تاريخ الإضافة")),
+                ("attempts", models.PositiveIntegerField(default=0, verbose_name="المحاولات")),
+                ("last_error", models.TextField(blank=True, verbose_name="آخر خطأ")),
+                (
+                    "content_hash",
+                    models.CharField(blank=True, max_length=64, verbose_name="بصمة آخر مزامنة"),
+                ),
+                (
+                    "synced_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="آخر مزامنة"),
+                ),
+            ],
+            options={
+                "verbose_name": "طابور مزامنة Cloudflare",
+                "verbose_name_plural": "طابور مزامنة Cloudflare",
+                "indexes": [
+                    models.Index(
+                        fields=["pending", "enqueued_at"], name="cf_outbox_pending_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("public", "0010_cloudflaresyncoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cloudflaresyncoutbox",
+            name="next_attempt_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="المحاولة التالية"),
+        ),
+    ]
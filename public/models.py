@@ -248,6 +248,90 @@ class CloudflareSettingsAdmin(admin.ModelAdmin):
         return super().changeform_view(request, object_id, form_url, extra_context)
 
 
+# ============================================
+# Cloudflare Sync Outbox
+# ============================================
+
+
+class CloudflareSyncOutbox(models.Model):
+    """
+    طابور مزامنة Cloudflare KV (صف واحد لكل كود)
+    كل حفظ يحدّث صف الكود نفسه (coalescing) بدلاً من طلب HTTP مستقل،
+    ويقوم عامل public.tasks.drain_cloudflare_outbox بإرسالها على دفعات.
+    content_hash بصمة آخر بيانات أكّدها Worker لتخطي الإرسال إن لم تتغير.
+    next_attempt_at يؤجل الصف بعد فشل إرساله حتى لا يحجز رأس الطابور.
+    """
+
+    ACTION_CHOICES = [
+        ("sync", _("مزامنة")),
+        ("delete", _("حذف")),
+    ]
+    MODEL_CHOICES = [
+        ("base_product", _("منتج أساسي")),
+        ("product", _("منتج")),
+    ]
+
+    code = models.CharField(_("الكود"), max_length=255, unique=True)
+    action = models.CharField(_("العملية"), max_length=10, choices=ACTION_CHOICES)
+    model = models.CharField(_("النوع"), max_length=20, choices=MODEL_CHOICES, blank=True)
+    object_id = models.BigIntegerField(_("معرف السجل"), null=True, blank=True)
+    pending = models.BooleanField(_("بانتظار الإرسال"), default=True)
+    enqueued_at = models.DateTimeField(_("تاريخ الإضافة"))
+    attempts = models.PositiveIntegerField(_("المحاولات"), default=0)
+    last_error = models.TextField(_("آخر خطأ"), blank=True)
+    next_attempt_at = models.DateTimeField(_("المحاولة التالية"), null=True, blank=True)
+    content_hash = models.CharField(_("بصمة آخر مزامنة"), max_length=64, blank=True)
+    synced_at = models.DateTimeField(_("آخر مزامنة"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("طابور مزامنة Cloudflare")
+        verbose_name_plural = _("طابور مزامنة Cloudflare")
+        indexes = [
+            models.Index(fields=["pending", "enqueued_at"], name="cf_outbox_pending_idx"),
+        ]
+
+    def __str__(self):
+        state = "⏳" if self.pending else "✅"
+        return f"{state} {self.get_action_display()} {self.code}"
+
+
+@admin.register(CloudflareSyncOutbox)
+class CloudflareSyncOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "code",
+        "action",
+        "model",
+        "pending",
+        "attempts",
+        "next_attempt_at",
+        "enqueued_at",
+        "synced_at",
+    )
+    list_filter = ("pending", "action", "model")
+    search_fields = ("code",)
+    readonly_fields = [field.name for field in CloudflareSyncOutbox._meta.fields]
+    actions = ["requeue"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue(self, request, queryset):
+        """إعادة إرسال السجلات المحددة حتى لو لم تتغير بياناتها"""
+        from django.utils import timezone
+
+        count = queryset.update(
+            pending=True,
+            attempts=0,
+            last_error="",
+            next_attempt_at=None,
+            content_hash="",
+            enqueued_at=timezone.now(),
+        )
+        self.message_user(request, f"تمت إعادة {count} سجل إلى الطابور ✅", messages.SUCCESS)
+
+    requeue.short_description = "🔁 إعادة الإرسال"
+
+
 # ============================================
 # QR Design Settings Model
 # ============================================
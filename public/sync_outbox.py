@@ -0,0 +1,455 @@
+"""
+طابور مزامنة Cloudflare KV (Outbox)
+===================================
+كان كل حفظ لـ Product / BaseProduct / ProductVariant يفتح thread خاصاً يرسل
+طلب requests.post مستقلاً وينتظر داخله عند 429 — تحديث أسعار جماعي واحد
+يتحول إلى مئات الـ threads والطلبات.
+
+الآن:
+- enqueue_* تكتب صفاً واحداً لكل كود في CloudflareSyncOutbox داخل نفس
+  معاملة الحفظ (لا يضيع التغيير إذا توقف الخادم)، والحفظ المتكرر لنفس
+  الكود يحدّث الصف نفسه
+- drain_outbox يرسل الصفوف المنتظرة على دفعات بـ action: sync_all عبر جلسة
+  HTTP مشتركة، ويتخطى ما لم تتغير بصمة بياناته منذ آخر إرسال ناجح
+- عند rate limit يتوقف التفريغ كله لفترة متزايدة (cache) بدلاً من sleep
+- الدفعة الفاشلة تؤجَّل صفوفها (next_attempt_at بمهلة متزايدة) فلا تحجز
+  رأس الطابور عن الصفوف التي خلفها
+- cloudflare_synced لا يُعلَّم إلا بعد تأكيد Worker للدفعة (أو تطابق بصمة
+  آخر إرسال ناجح)
+
+الاستخدام:
+    enqueue_base_products([base_product])
+    enqueue_products([product])
+    enqueue_delete(code)
+    drain_outbox()  # من مهمة Celery الدورية
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "CLOUDFLARE_OUTBOX_BATCH_SIZE", 50)
+MAX_BATCHES_PER_RUN = 20
+MAX_ATTEMPTS = 10
+
+LOCK_KEY = "cf_outbox:drain_lock"
+KICK_KEY = "cf_outbox:kick"
+BACKOFF_KEY = "cf_outbox:backoff_until"
+BACKOFF_LEVEL_KEY = "cf_outbox:backoff_level"
+KICK_DELAY = 10  # ثوانٍ: تجميع الحفظ المتتالي في دفعة واحدة
+BACKOFF_BASE = 15
+BACKOFF_MAX = 600
+RETRY_BASE = 60  # ثوانٍ: تأجيل صفوف الدفعة الفاشلة (يتضاعف مع كل محاولة)
+RETRY_MAX = 3600
+
+
+def _sync_enabled():
+    from .cloudflare_sync import get_cloudflare_sync
+
+    return get_cloudflare_sync().is_configured()
+
+
+# ============================================
+# الإضافة إلى الطابور
+# ============================================
+
+
+def _enqueue(rows):
+    """
+    rows: [(code, action, model, object_id)]
+    upsert واحد: الكود الموجود يُعاد إلى الانتظار بأحدث عملية وسجل
+    """
+    from .models import CloudflareSyncOutbox
+
+    now = timezone.now()
+    latest = {}
+    for code, action, model, object_id in rows:
+        if code:
+            latest[code] = (action, model, object_id)
+    if not latest:
+        return 0
+
+    CloudflareSyncOutbox.objects.bulk_create(
+        [
+            CloudflareSyncOutbox(
+                code=code,
+                action=action,
+                model=model,
+                object_id=object_id,
+                pending=True,
+                enqueued_at=now,
+                attempts=0,
+                last_error="",
+                next_attempt_at=None,
+            )
+            for code, (action, model, object_id) in latest.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["code"],
+        update_fields=[
+            "action",
+            "model",
+            "object_id",
+            "pending",
+            "enqueued_at",
+            "attempts",
+            "last_error",
+            "next_attempt_at",
+        ],
+    )
+    transaction.on_commit(kick_worker)
+    return len(latest)
+
+
+def enqueue_base_products(base_products):
+    """إضافة منتجات أساسية للطابور وتعليمها غير متزامنة حتى يؤكد Worker"""
+    from inventory.models import BaseProduct
+
+    if not _sync_enabled():
+        return 0
+    base_products = [bp for bp in base_products if bp and bp.code]
+    if not base_products:
+        return 0
+
+    BaseProduct.objects.filter(
+        pk__in=[bp.pk for bp in base_products], cloudflare_synced=True
+    ).update(cloudflare_synced=False)
+    return _enqueue((bp.code, "sync", "base_product", bp.pk) for bp in base_products)
+
+
+def enqueue_base_product_ids(base_product_ids):
+    from inventory.models import BaseProduct
+
+    if not _sync_enabled():
+        return 0
+    return enqueue_base_products(
+        BaseProduct.objects.filter(pk__in=list(base_product_ids)).only("id", "code")
+    )
+
+
+def enqueue_products(products):
+    """
+    إضافة منتجات النظام القديم. المنتج المرتبط بمتغير يُرسل كمنتجه الأساسي
+    عند التفريغ، فتغييرات متغيرات نفس المنتج الأساسي تُرسل مرة واحدة.
+    """
+    if not _sync_enabled():
+        return 0
+    return _enqueue((p.code, "sync", "product", p.pk) for p in products if p and p.code)
+
+
+def enqueue_product_ids(product_ids):
+    from inventory.models import Product
+
+    if not _sync_enabled():
+        return 0
+    return enqueue_products(Product.objects.filter(pk__in=list(product_ids)).only("id", "code"))
+
+
+def enqueue_delete(code):
+    if not code or not _sync_enabled():
+        return 0
+    return _enqueue([(code, "delete", "", None)])
+
+
+def kick_worker():
+    """جدولة تفريغ قريب (مرة واحدة لكل KICK_DELAY مهما تكرر الحفظ)"""
+    if not cache.add(KICK_KEY, 1, KICK_DELAY):
+        return
+    try:
+        from .tasks import drain_cloudflare_outbox
+
+        drain_cloudflare_outbox.apply_async(countdown=KICK_DELAY)
+    except Exception as e:
+        # المهمة الدورية ستلتقط الطابور لاحقاً
+        logger.warning(f"⚠️ تعذر جدولة تفريغ طابور Cloudflare: {e}")
+
+
+# ============================================
+# التفريغ
+# ============================================
+
+
+def _payload_hash(payload):
+    """بصمة البيانات بدون updated_at (يتغير مع كل تنسيق)"""
+    stable = {key: value for key, value in payload.items() if key != "updated_at"}
+    encoded = json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _in_backoff():
+    return bool(cache.get(BACKOFF_KEY))
+
+
+def _start_backoff():
+    level = (cache.get(BACKOFF_LEVEL_KEY) or 0) + 1
+    delay = min(BACKOFF_BASE * 2 ** (level - 1), BACKOFF_MAX)
+    cache.set(BACKOFF_LEVEL_KEY, level, BACKOFF_MAX * 2)
+    cache.set(BACKOFF_KEY, 1, delay)
+    logger.warning(f"⏸️ Cloudflare rate limit — إيقاف طابور المزامنة {delay} ثانية")
+
+
+def _resolve_payloads(sync, rows):
+    """
+    تنسيق بيانات الصفوف. يعيد (entries, done):
+    entries: {مفتاح KV: {"payload", "hash", "rows", "base_product"}}
+    done: صفوف لا تحتاج إرسالاً (السجل محذوف أو بدون كود)
+    """
+    from inventory.models import BaseProduct, Product
+
+    base_ids = [row.object_id for row in rows if row.model == "base_product"]
+    product_ids = [row.object_id for row in rows if row.model == "product"]
+
+    products = {
+        p.pk: p
+        for p in Product.objects.filter(pk__in=product_ids).select_related(
+            "category", "variant_link__base_product__category"
+        )
+    }
+    base_products = {
+        bp.pk: bp
+        for bp in BaseProduct.objects.filter(pk__in=base_ids).select_related("category")
+    }
+
+    entries = {}
+    done = []
+    for row in rows:
+        base_product = None
+        product = None
+        if row.model == "base_product":
+            base_product = base_products.get(row.object_id)
+        else:
+            product = products.get(row.object_id)
+            variant = getattr(product, "variant_link", None) if product else None
+            if variant is not None and variant.base_product_id:
+                base_product = variant.base_product
+
+        if base_product is not None:
+            if not base_product.code or not base_product.is_active:
+                done.append(row)
+                continue
+            key = base_product.code
+            if key not in entries:
+                payload = sync.format_base_product(base_product)
+                entries[key] = {"payload": payload, "base_product": base_product, "rows": []}
+        elif product is not None and product.code:
+            key = product.code
+            if key not in entries:
+                entries[key] = {
+                    "payload": sync.format_product(product),
+                    "base_product": None,
+                    "rows": [],
+                }
+        else:
+            done.append(row)
+            continue
+        entries[key]["rows"].append(row)
+
+    for entry in entries.values():
+        entry["hash"] = _payload_hash(entry["payload"])
+    return entries, done
+
+
+def _name_map_entries(base_products):
+    """اسم المنتج الأساسي وأسماء منتجاته القديمة → الكود (لروابط QR القديمة)"""
+    from inventory.models import ProductVariant
+
+    entries = {}
+    by_id = {bp.pk: bp for bp in base_products}
+    for bp in base_products:
+        if bp.name and bp.name != bp.code:
+            entries[bp.name] = bp.code
+            entries[bp.name.upper()] = bp.code
+
+    legacy_names = ProductVariant.objects.filter(
+        base_product_id__in=by_id, legacy_product__isnull=False
+    ).values_list("base_product_id", "legacy_product__name")
+    for base_id, old_name in legacy_names:
+        code = by_id[base_id].code
+        if old_name and old_name != code:
+            entries[old_name] = code
+            entries[old_name.upper()] = code
+    return entries
+
+
+def _mark_done(rows, content_hashes=None, now=None):
+    """
+    إنهاء الصفوف — فقط إن لم يُعِد حفظٌ جديد إضافتها أثناء الإرسال
+    (enqueued_at تغيّر ⇒ يبقى الصف بانتظار دفعة لاحقة)
+    """
+    from .models import CloudflareSyncOutbox
+
+    now = now or timezone.now()
+    content_hashes = content_hashes or {}
+    for row in rows:
+        fields = {
+            "pending": False,
+            "attempts": 0,
+            "last_error": "",
+            "next_attempt_at": None,
+            "synced_at": now,
+        }
+        if row.pk in content_hashes:
+            fields["content_hash"] = content_hashes[row.pk]
+        CloudflareSyncOutbox.objects.filter(pk=row.pk, enqueued_at=row.enqueued_at).update(
+            **fields
+        )
+
+
+def _retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+def _mark_failed(rows, error):
+    """زيادة المحاولات وتأجيل الصفوف — الدفعات التالية تُرسل ما خلفها"""
+    from .models import CloudflareSyncOutbox
+
+    now = timezone.now()
+    by_attempts = {}
+    for row in rows:
+        by_attempts.setdefault(row.attempts + 1, []).append(row.pk)
+    for attempts, pks in by_attempts.items():
+        CloudflareSyncOutbox.objects.filter(pk__in=pks).update(
+            attempts=attempts,
+            last_error=str(error)[:1000],
+            next_attempt_at=now + timedelta(seconds=_retry_delay(attempts)),
+        )
+
+
+def _drain_deletes(sync, rows):
+    from .cloudflare_sync import SEND_OK, SEND_RATE_LIMITED
+
+    for row in rows:
+        result = sync.send_batch({"action": "delete_product", "code": row.code})
+        if result == SEND_OK:
+            _mark_done([row], {row.pk: ""})
+        elif result == SEND_RATE_LIMITED:
+            return result
+        else:
+            _mark_failed([row], "delete_product failed")
+            return result
+    return SEND_OK
+
+
+def _drain_syncs(sync, rows, stats):
+    from inventory.models import BaseProduct
+
+    from .cloudflare_sync import SEND_OK
+
+    entries, done = _resolve_payloads(sync, rows)
+    _mark_done(done)
+    stats["dropped"] += len(done)
+
+    # تخطي ما لم يتغير منذ آخر إرسال ناجح
+    to_send = {}
+    unchanged = []
+    unchanged_bases = []
+    for key, entry in entries.items():
+        if all(row.content_hash == entry["hash"] for row in entry["rows"]):
+            unchanged.extend(entry["rows"])
+            if entry["base_product"]:
+                unchanged_bases.append(entry["base_product"].pk)
+        else:
+            to_send[key] = entry
+    if unchanged:
+        _mark_done(unchanged)
+        stats["unchanged"] += len(unchanged)
+    if unchanged_bases:
+        # enqueue_base_products أزال العلامة، و Worker يحمل هذه البيانات بالفعل
+        BaseProduct.objects.filter(pk__in=unchanged_bases, cloudflare_synced=False).update(
+            cloudflare_synced=True
+        )
+
+    if not to_send:
+        return SEND_OK
+
+    result = sync.send_batch(
+        {"action": "sync_all", "products": [entry["payload"] for entry in to_send.values()]}
+    )
+    if result != SEND_OK:
+        _mark_failed([row for entry in to_send.values() for row in entry["rows"]], result)
+        return result
+
+    now = timezone.now()
+    hashes = {row.pk: entry["hash"] for entry in to_send.values() for row in entry["rows"]}
+    _mark_done([row for entry in to_send.values() for row in entry["rows"]], hashes, now)
+
+    synced_bases = [entry["base_product"] for entry in to_send.values() if entry["base_product"]]
+    if synced_bases:
+        BaseProduct.objects.filter(pk__in=[bp.pk for bp in synced_bases]).update(
+            cloudflare_synced=True, last_synced_at=now
+        )
+        name_map = _name_map_entries(synced_bases)
+        if name_map:
+            sync.send_batch({"action": "update_name_map", "entries": name_map})
+    stats["sent"] += len(to_send)
+    return SEND_OK
+
+
+def drain_outbox(batch_size=BATCH_SIZE, max_batches=MAX_BATCHES_PER_RUN):
+    """
+    تفريغ الطابور على دفعات. عامل واحد فقط في كل مرة (قفل cache).
+    يعيد إحصائيات: sent, unchanged, dropped, batches, status
+    """
+    from .cloudflare_sync import SEND_OK, SEND_RATE_LIMITED, get_cloudflare_sync
+    from .models import CloudflareSettings, CloudflareSyncOutbox
+
+    stats = {"sent": 0, "unchanged": 0, "dropped": 0, "batches": 0, "status": "idle"}
+
+    sync = get_cloudflare_sync()
+    try:
+        if not CloudflareSettings.get_settings().is_enabled:
+            stats["status"] = "disabled"
+            return stats
+    except Exception:
+        pass
+    if not sync.is_configured():
+        stats["status"] = "disabled"
+        return stats
+    if _in_backoff():
+        stats["status"] = "backoff"
+        return stats
+    if not cache.add(LOCK_KEY, 1, 600):
+        stats["status"] = "locked"
+        return stats
+
+    try:
+        for _ in range(max_batches):
+            now = timezone.now()
+            rows = list(
+                CloudflareSyncOutbox.objects.filter(pending=True, attempts__lt=MAX_ATTEMPTS)
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+                .order_by("enqueued_at")[:batch_size]
+            )
+            if not rows:
+                break
+            stats["batches"] += 1
+
+            deletes = [row for row in rows if row.action == "delete"]
+            syncs = [row for row in rows if row.action == "sync"]
+
+            result = _drain_deletes(sync, deletes) if deletes else SEND_OK
+            if result == SEND_OK and syncs:
+                result = _drain_syncs(sync, syncs, stats)
+
+            if result == SEND_RATE_LIMITED:
+                _start_backoff()
+                stats["status"] = "backoff"
+                break
+            if result != SEND_OK:
+                stats["status"] = "failed"
+                break
+            cache.delete(BACKOFF_LEVEL_KEY)
+            stats["status"] = "success"
+    finally:
+        cache.delete(LOCK_KEY)
+
+    return stats
@@ -0,0 +1,27 @@
+"""
+مهام Celery لتطبيق public
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    queue="maintenance",
+    name="public.tasks.drain_cloudflare_outbox",
+    soft_time_limit=540,
+)
+def drain_cloudflare_outbox():
+    """
+    تفريغ طابور مزامنة Cloudflare على دفعات (public.sync_outbox)
+    تُجدول بعد كل حفظ (مع تجميع) وكل دقيقة لالتقاط ما تبقى بعد rate limit
+    """
+    from .sync_outbox import drain_outbox
+
+    stats = drain_outbox()
+    if stats["sent"] or stats["status"] in ("failed", "backoff"):
+        logger.info(f"☁️ Cloudflare outbox: {stats}")
+    return stats
@@ -21,10 +21,17 @@ class ReportAdmin(admin.ModelAdmin):
 @admin.register(SavedReport)
 class SavedReportAdmin(admin.ModelAdmin):
     list_per_page = 50  # عرض 50 صف كافتراضي
-    list_display = ("name", "report", "created_by", "created_at")
-    list_filter = ("report", "created_by", "created_at")
+    list_display = ("name", "report", "is_snapshot", "duration_ms", "created_by", "created_at")
+    list_filter = ("is_snapshot", "report", "created_by", "created_at")
     search_fields = ("name", "report__title")
-    readonly_fields = ("created_by", "created_at")
+    readonly_fields = (
+        "created_by",
+        "created_at",
+        "parameters_hash",
+        "generated_at",
+        "duration_ms",
+        "schedule",
+    )
 
     def save_model(self, request, obj, form, change):
         if not change:  # Only set created_by on creation
@@ -40,13 +47,15 @@ class ReportScheduleAdmin(admin.ModelAdmin):
         "report",
         "frequency",
         "is_active",
+        "last_run_at",
+        "next_run_at",
         "created_by",
         "created_at",
     )
     list_filter = ("frequency", "is_active", "created_by", "created_at")
     search_fields = ("name", "report__title")
     filter_horizontal = ("recipients",)
-    readonly_fields = ("created_by", "created_at", "updated_at")
+    readonly_fields = ("created_by", "created_at", "updated_at", "last_run_at", "last_error")
 
     def save_model(self, request, obj, form, change):
         if not change:  # Only set created_by on creation
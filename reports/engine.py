@@ -0,0 +1,534 @@
+"""
+محرك تنفيذ التقارير — لقطات محسوبة مسبقاً
+==========================================
+تقرير الإنتاج كان يُعاد حسابه بالكامل مع كل فتح للصفحة، ومعه دالة
+calculate_meters() تستعلم عن بنود الطلب لكل سجل تصنيع (ربع سنة = 30+ ثانية
+وانتهاء مهلة الـ proxy).
+
+الآن:
+- المعلمات تُحسم (resolve_production_parameters) وتُحسب لها بصمة (parameters_hash)
+- النتيجة تُحفظ كلقطة SavedReport(is_snapshot=True) مع وقت ومدة التوليد
+- الصفحة تعرض آخر لقطة لنفس البصمة، ولا تعيد الحساب إلا بطلب صريح (?refresh=1)
+- الأمتار تُحسب باستعلام واحد مجمّع لكل الطلبات (meters_by_order)
+- الجدولات (ReportSchedule) تُنفذ من Celery beat عبر run_due_schedules
+
+التقارير المدعومة باللقطات مسجلة في REPORT_ENGINES؛ بقية الأنواع تُحسب مباشرة.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# عدد اللقطات التلقائية المحتفظ بها لكل تقرير (الأقدم تُحذف)
+SNAPSHOTS_PER_REPORT = 30
+
+FREQUENCY_STEPS = {
+    "daily": relativedelta(days=1),
+    "weekly": relativedelta(weeks=1),
+    "monthly": relativedelta(months=1),
+    "quarterly": relativedelta(months=3),
+}
+
+# مدة التقرير المجدول الافتراضية (إذا لم تحدد الجدولة تواريخ)
+FREQUENCY_PERIODS = {
+    "daily": 1,
+    "weekly": 7,
+    "monthly": 30,
+    "quarterly": 91,
+}
+
+
+# ============================================
+# تقرير الإنتاج
+# ============================================
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def resolve_production_parameters(saved, query=None, default_days=30):
+    """
+    معلمات تقرير الإنتاج النهائية: من الطلب (GET) إن وُجدت وإلا من المعلمات المحفوظة.
+    التواريخ تُحسم هنا حتى تختلف البصمة عند تغيّر "اليوم".
+    """
+    saved = saved or {}
+    if query:
+        date_from = query.get("date_from") or saved.get("date_from")
+        date_to = query.get("date_to") or saved.get("date_to")
+        order_types = query.getlist("order_types") or saved.get("order_types", [])
+        view_mode = query.get("view_mode", "all")
+        production_line = query.get("production_line") or saved.get("production_line")
+        warehouses = query.getlist("warehouses") or saved.get("warehouses", [])
+    else:
+        date_from = saved.get("date_from")
+        date_to = saved.get("date_to")
+        order_types = saved.get("order_types", [])
+        view_mode = "all"
+        production_line = saved.get("production_line")
+        warehouses = saved.get("warehouses", [])
+
+    date_to = _as_date(date_to) or timezone.now().date()
+    date_from = _as_date(date_from) or date_to - timedelta(days=default_days)
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "order_types": sorted(order_types),
+        "view_mode": view_mode if view_mode in ("all", "incoming", "produced") else "all",
+        "production_line": str(production_line) if production_line else None,
+        "warehouses": sorted({int(wid) for wid in warehouses if wid}),
+    }
+
+
+def meters_by_order(order_ids, warehouse_ids):
+    """
+    أمتار كل طلب (كميات بنوده من منتجات المستودعات المحددة) باستعلام واحد مجمّع
+    بدلاً من order.items لكل سجل
+    """
+    from inventory.models import StockTransaction
+    from orders.models import OrderItem
+
+    order_ids = {order_id for order_id in order_ids if order_id}
+    if not order_ids or not warehouse_ids:
+        return {}
+    warehouse_products = (
+        StockTransaction.objects.filter(warehouse_id__in=warehouse_ids)
+        .values("product_id")
+        .distinct()
+    )
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids, product_id__in=warehouse_products)
+        .values("order_id")
+        .annotate(meters=Sum("quantity"))
+    )
+    return {row["order_id"]: float(row["meters"] or 0) for row in rows}
+
+
+def _distribution_list(distribution, key):
+    return [
+        {key: name, "count": values["count"], "meters": round(values["meters"], 2)}
+        for name, values in sorted(
+            distribution.items(), key=lambda item: item[1]["count"], reverse=True
+        )
+    ]
+
+
+def _add_to_distribution(distribution, name, meters):
+    entry = distribution.setdefault(name, {"count": 0, "meters": 0})
+    entry["count"] += 1
+    entry["meters"] += meters
+
+
+def compute_production_report(params):
+    """
+    تقرير الإنتاج الشامل: الطلبات الواردة للمصنع + الطلبات المنتجة
+    params: ناتج resolve_production_parameters
+    """
+    from inventory.models import Warehouse
+    from manufacturing.models import (
+        ManufacturingOrder,
+        ManufacturingSettings,
+        ManufacturingStatusLog,
+        ProductionLine,
+    )
+
+    date_from = _as_date(params["date_from"])
+    date_to = _as_date(params["date_to"])
+    order_types = params["order_types"]
+    view_mode = params["view_mode"]
+    production_line_id = params["production_line"]
+
+    # المستودعات المختارة أو الافتراضية من إعدادات التصنيع
+    settings = ManufacturingSettings.get_settings()
+    default_warehouse_ids = list(
+        settings.warehouses_for_meters_calculation.values_list("id", flat=True)
+    )
+    warehouse_ids = params["warehouses"] or default_warehouse_ids
+
+    all_warehouses = Warehouse.objects.filter(is_active=True).order_by("name")
+    production_lines = ProductionLine.objects.filter(is_active=True)
+
+    completed_statuses = ["completed", "delivered"]
+    ready_install_statuses = ["ready_install"]
+    log_related = (
+        "manufacturing_order",
+        "manufacturing_order__order",
+        "manufacturing_order__order__customer",
+        "manufacturing_order__production_line",
+        "changed_by",
+    )
+
+    def apply_filters(logs):
+        if order_types:
+            logs = logs.filter(manufacturing_order__order_type__in=order_types)
+        if production_line_id:
+            logs = logs.filter(manufacturing_order__production_line_id=production_line_id)
+        return logs
+
+    # =====================================================
+    # 1. الطلبات الواردة للمصنع (pending_approval -> pending)
+    # =====================================================
+    incoming_logs = []
+    if view_mode in ["all", "incoming"]:
+        # استبعاد طلبات المعاينة (delivery)
+        incoming_logs = list(
+            apply_filters(
+                ManufacturingStatusLog.objects.filter(
+                    previous_status="pending_approval",
+                    new_status="pending",
+                    changed_at__date__gte=date_from,
+                    changed_at__date__lte=date_to,
+                ).exclude(manufacturing_order__order_type="delivery")
+            )
+            .select_related(*log_related)
+            .order_by("-changed_at")
+        )
+
+    # =====================================================
+    # 2. الطلبات المنتجة (completed/ready_install) — آخر تحول لكل أمر
+    # =====================================================
+    produced_logs = []
+    if view_mode in ["all", "produced"]:
+        latest_log_subquery = (
+            ManufacturingStatusLog.objects.filter(
+                manufacturing_order=OuterRef("manufacturing_order"),
+                changed_at__date__gte=date_from,
+                changed_at__date__lte=date_to,
+            )
+            .order_by("-changed_at")
+            .values("id")[:1]
+        )
+        status_filter = (
+            Q(manufacturing_order__order_type="custom", new_status__in=completed_statuses)
+            | Q(
+                manufacturing_order__order_type__in=["accessory", "installation"],
+                new_status__in=ready_install_statuses,
+            )
+            | Q(
+                manufacturing_order__order_type="modification",
+                new_status__in=completed_statuses + ready_install_statuses,
+            )
+        )
+        produced_logs = list(
+            apply_filters(
+                ManufacturingStatusLog.objects.filter(
+                    id__in=Subquery(latest_log_subquery)
+                ).filter(status_filter)
+            )
+            .select_related(*log_related)
+            .order_by("-changed_at")
+        )
+
+    # قيد التصنيع حالياً (بنفس الفلاتر، بدون طلبات المعاينة)
+    pending_query = ManufacturingOrder.objects.filter(
+        status__in=["pending_approval", "pending", "in_progress"]
+    ).exclude(order_type="delivery")
+    if order_types:
+        pending_query = pending_query.filter(order_type__in=order_types)
+    if production_line_id:
+        pending_query = pending_query.filter(production_line_id=production_line_id)
+    pending_order_ids = list(pending_query.values_list("order_id", flat=True))
+
+    # ✅ أمتار كل الطلبات المعنية في استعلام واحد
+    meters = meters_by_order(
+        [log.manufacturing_order.order_id for log in incoming_logs + produced_logs]
+        + pending_order_ids,
+        warehouse_ids,
+    )
+
+    incoming_orders_data = []
+    incoming_meters = 0
+    incoming_type_dist = {}
+    for log in incoming_logs:
+        mo = log.manufacturing_order
+        order = mo.order
+        order_meters = meters.get(mo.order_id, 0)
+        incoming_orders_data.append(
+            {
+                "manufacturing_code": mo.manufacturing_code,
+                "order_number": order.order_number if order else "-",
+                "customer_name": order.customer.name if order and order.customer else "-",
+                "order_type": mo.order_type,
+                "order_type_display": mo.get_order_type_display(),
+                "current_status": mo.status,
+                "current_status_display": mo.get_status_display(),
+                "meters": round(order_meters, 2),
+                "received_date": log.changed_at,
+                "received_by": log.changed_by.get_full_name() if log.changed_by else "-",
+                "production_line": mo.production_line.name if mo.production_line else "-",
+            }
+        )
+        incoming_meters += order_meters
+        _add_to_distribution(incoming_type_dist, mo.get_order_type_display(), order_meters)
+
+    produced_orders_data = []
+    produced_meters = 0
+    produced_type_dist = {}
+    user_distribution = {}
+    for log in produced_logs:
+        mo = log.manufacturing_order
+        order = mo.order
+        order_meters = meters.get(mo.order_id, 0)
+        produced_orders_data.append(
+            {
+                "manufacturing_code": mo.manufacturing_code,
+                "order_number": order.order_number if order else "-",
+                "customer_name": order.customer.name if order and order.customer else "-",
+                "order_type": mo.order_type,
+                "order_type_display": mo.get_order_type_display(),
+                "status": log.new_status,
+                "status_display": log.get_new_status_display(),
+                "meters": round(order_meters, 2),
+                "production_date": log.changed_at,
+                "changed_by": log.changed_by.get_full_name() if log.changed_by else "-",
+                "production_line": mo.production_line.name if mo.production_line else "-",
+            }
+        )
+        produced_meters += order_meters
+        _add_to_distribution(produced_type_dist, mo.get_order_type_display(), order_meters)
+        if log.changed_by:
+            user_name = log.changed_by.get_full_name() or log.changed_by.username
+            _add_to_distribution(user_distribution, user_name, order_meters)
+
+    incoming_total = len(incoming_orders_data)
+    produced_total = len(produced_orders_data)
+    pending_meters = sum(meters.get(order_id, 0) for order_id in pending_order_ids if order_id)
+
+    return {
+        "view_mode": view_mode,
+        "date_from": date_from,
+        "date_to": date_to,
+        # الطلبات الواردة
+        "incoming_total": incoming_total,
+        "incoming_meters": round(incoming_meters, 2),
+        "incoming_orders_data": incoming_orders_data,
+        "incoming_type_distribution": _distribution_list(incoming_type_dist, "type"),
+        "avg_meters_incoming": (
+            round(incoming_meters / incoming_total, 2) if incoming_total > 0 else 0
+        ),
+        # الطلبات المنتجة
+        "produced_total": produced_total,
+        "produced_meters": round(produced_meters, 2),
+        "produced_orders_data": produced_orders_data,
+        "produced_type_distribution": _distribution_list(produced_type_dist, "type"),
+        "avg_meters_produced": (
+            round(produced_meters / produced_total, 2) if produced_total > 0 else 0
+        ),
+        "user_distribution": _distribution_list(user_distribution, "user"),
+        # الإحصائيات العامة
+        "completion_rate": (
+            round((produced_total / incoming_total) * 100, 1) if incoming_total > 0 else 0
+        ),
+        "pending_count": len(pending_order_ids),
+        "pending_meters": round(pending_meters, 2),
+        # خيارات الفلترة
+        "production_lines": [{"id": pl.id, "name": pl.name} for pl in production_lines],
+        "selected_production_line": production_line_id,
+        "selected_order_types": order_types,
+        # المستودعات
+        "all_warehouses": [{"id": w.id, "name": w.name} for w in all_warehouses],
+        "selected_warehouses": warehouse_ids,
+        "default_warehouses": default_warehouse_ids,
+    }
+
+
+# نوع التقرير → (حل المعلمات، الحساب، حقول التاريخ التي تُستعاد من اللقطة)
+REPORT_ENGINES = {
+    "production": (
+        resolve_production_parameters,
+        compute_production_report,
+        {
+            "dates": ("date_from", "date_to"),
+            "row_datetimes": {
+                "incoming_orders_data": "received_date",
+                "produced_orders_data": "production_date",
+            },
+        },
+    ),
+}
+
+
+def supports_snapshots(report):
+    return report.report_type in REPORT_ENGINES
+
+
+# ============================================
+# اللقطات
+# ============================================
+
+
+def parameters_hash(report, params):
+    payload = json.dumps(
+        {"report": report.pk, "type": report.report_type, "params": params},
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def restore_snapshot_data(report, data):
+    """إعادة التواريخ من نص ISO (JSONField) حتى تعمل فلاتر القالب كما في الحساب المباشر"""
+    _, _, fields = REPORT_ENGINES[report.report_type]
+    data = dict(data)
+    for key in fields.get("dates", ()):
+        if isinstance(data.get(key), str):
+            data[key] = parse_date(data[key])
+    for list_key, row_key in fields.get("row_datetimes", {}).items():
+        for row in data.get(list_key) or []:
+            if isinstance(row.get(row_key), str):
+                row[row_key] = parse_datetime(row[row_key])
+    return data
+
+
+def latest_snapshot(report, params_hash):
+    return (
+        report.saved_results.filter(is_snapshot=True, parameters_hash=params_hash)
+        .order_by("-generated_at")
+        .first()
+    )
+
+
+def generate_snapshot(report, params, user=None, schedule=None):
+    """حساب التقرير وحفظه كلقطة"""
+    from .models import SavedReport
+
+    _, compute, _ = REPORT_ENGINES[report.report_type]
+    started = time.monotonic()
+    data = compute(params)
+    duration_ms = int((time.monotonic() - started) * 1000)
+    now = timezone.now()
+
+    snapshot = SavedReport.objects.create(
+        report=report,
+        name=f"{report.title} — {timezone.localtime(now):%Y-%m-%d %H:%M}",
+        data=data,
+        parameters_used=params,
+        parameters_hash=parameters_hash(report, params),
+        is_snapshot=True,
+        generated_at=now,
+        duration_ms=duration_ms,
+        schedule=schedule,
+        created_by=user,
+    )
+    prune_snapshots(report)
+    logger.info(f"📊 لقطة تقرير #{report.pk} ({report.report_type}) في {duration_ms}ms")
+    return snapshot
+
+
+def prune_snapshots(report, keep=SNAPSHOTS_PER_REPORT):
+    stale_ids = list(
+        report.saved_results.filter(is_snapshot=True)
+        .order_by("-generated_at")
+        .values_list("id", flat=True)[keep:]
+    )
+    if stale_ids:
+        report.saved_results.filter(id__in=stale_ids).delete()
+
+
+def get_report_data(report, query=None, refresh=False, user=None):
+    """
+    بيانات التقرير من آخر لقطة لنفس المعلمات، أو بحساب جديد إذا لم توجد
+    أو طلب المستخدم التحديث.
+    Returns: (data, snapshot)
+    """
+    resolve, _, _ = REPORT_ENGINES[report.report_type]
+    params = resolve(report.parameters, query)
+
+    snapshot = None if refresh else latest_snapshot(report, parameters_hash(report, params))
+    if snapshot is None:
+        snapshot = generate_snapshot(report, params, user=user)
+    return restore_snapshot_data(report, snapshot.data), snapshot
+
+
+# ============================================
+# الجدولات
+# ============================================
+
+
+def next_run_after(schedule, moment):
+    return moment + FREQUENCY_STEPS.get(schedule.frequency, relativedelta(days=1))
+
+
+def schedule_parameters(schedule):
+    """معلمات التشغيل المجدول: معلمات الجدولة فوق معلمات التقرير، بفترة تناسب التكرار"""
+    report = schedule.report
+    resolve, _, _ = REPORT_ENGINES[report.report_type]
+    return resolve(
+        {**(report.parameters or {}), **(schedule.parameters or {})},
+        default_days=FREQUENCY_PERIODS.get(schedule.frequency, 30),
+    )
+
+
+def run_schedule(schedule):
+    """تشغيل جدولة واحدة وإشعار المستلمين"""
+    report = schedule.report
+    snapshot = generate_snapshot(report, schedule_parameters(schedule), schedule=schedule)
+    _notify_recipients(schedule, snapshot)
+    return snapshot
+
+
+def _notify_recipients(schedule, snapshot):
+    recipients = list(schedule.recipients.filter(is_active=True))
+    if not recipients:
+        return
+    from django.urls import reverse
+
+    from notifications.signals import create_notification
+
+    create_notification(
+        title=f"تقرير مجدول جاهز: {schedule.report.title}",
+        message=f"{schedule.name} — {snapshot.name}",
+        notification_type="report_ready",
+        related_object=snapshot,
+        extra_data={"url": reverse("reports:report_detail", kwargs={"pk": schedule.report_id})},
+        recipients=recipients,
+    )
+
+
+def run_due_schedules(now=None):
+    """
+    تشغيل الجدولات المستحقة (next_run_at فارغ أو فات موعده)
+    Returns: {"ran": عدد, "failed": عدد, "skipped": عدد}
+    """
+    from .models import ReportSchedule
+
+    now = now or timezone.now()
+    results = {"ran": 0, "failed": 0, "skipped": 0}
+    due = (
+        ReportSchedule.objects.filter(is_active=True)
+        .filter(Q(next_run_at__isnull=True) | Q(next_run_at__lte=now))
+        .select_related("report")
+    )
+    for schedule in due:
+        if not supports_snapshots(schedule.report):
+            # يُسجل السبب ويُؤجل حتى لا تُفحص الجدولة في كل دورة
+            schedule.last_error = "نوع التقرير لا يدعم التشغيل المجدول"
+            results["skipped"] += 1
+        else:
+            try:
+                run_schedule(schedule)
+                schedule.last_error = ""
+                results["ran"] += 1
+            except Exception as e:
+                logger.error(f"❌ فشل تشغيل جدولة التقرير #{schedule.pk}: {e}")
+                schedule.last_error = str(e)[:2000]
+                results["failed"] += 1
+        schedule.last_run_at = now
+        schedule.next_run_at = next_run_after(schedule, now)
+        schedule.save(update_fields=["last_run_at", "next_run_at", "last_error", "updated_at"])
+    return results
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.5 on 2026-10-17 14:00
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0003_add_production_report_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportschedule",
+            name="last_run_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="آخر تشغيل"),
+        ),
+        migrations.AddField(
+            model_name="reportschedule",
+            name="next_run_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="التشغيل القادم"),
+        ),
+        migrations.AddField(
+            model_name="reportschedule",
+            name="last_error",
+            field=models.TextField(blank=True, verbose_name="آخر خطأ"),
+        ),
+        migrations.AlterField(
+            model_name="savedreport",
+            name="data",
+            field=models.JSONField(
+                default=dict,
+                encoder=django.core.serializers.json.DjangoJSONEncoder,
+                verbose_name="بيانات التقرير",
+            ),
+        ),
+        migrations.AddField(
+            model_name="savedreport",
+            name="is_snapshot",
+            field=models.BooleanField(default=False, verbose_name="لقطة تلقائية"),
+        ),
+        migrations.AddField(
+            model_name="savedreport",
+            name="parameters_hash",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=64, verbose_name="بصمة المعلمات"
+            ),
+        ),
+        migrations.AddField(
+            model_name="savedreport",
+            name="generated_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="وقت التوليد"),
+        ),
+        migrations.AddField(
+            model_name="savedreport",
+            name="duration_ms",
+            field=models.PositiveIntegerField(default=0, verbose_name="مدة التوليد (ms)"),
+        ),
+        migrations.AddField(
+            model_name="savedreport",
+            name="schedule",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="snapshots",
+                to="reports.reportschedule",
+                verbose_name="الجدولة",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="savedreport",
+            index=models.Index(
+                fields=["report", "parameters_hash", "-generated_at"],
+                name="saved_report_snapshot_idx",
+            ),
+        ),
+    ]
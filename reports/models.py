@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -54,10 +55,25 @@ class SavedReport(models.Model):
         verbose_name=_("التقرير"),
     )
     name = models.CharField(_("اسم النتيجة المحفوظة"), max_length=200)
-    data = models.JSONField(_("بيانات التقرير"), default=dict)
+    data = models.JSONField(_("بيانات التقرير"), default=dict, encoder=DjangoJSONEncoder)
     parameters_used = models.JSONField(
         _("المعلمات المستخدمة"), default=dict, blank=True
     )
+    # لقطات محرك التقارير (reports.engine) — تُعرض بدلاً من إعادة الحساب
+    is_snapshot = models.BooleanField(_("لقطة تلقائية"), default=False)
+    parameters_hash = models.CharField(
+        _("بصمة المعلمات"), max_length=64, blank=True, db_index=True
+    )
+    generated_at = models.DateTimeField(_("وقت التوليد"), null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(_("مدة التوليد (ms)"), default=0)
+    schedule = models.ForeignKey(
+        "ReportSchedule",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="snapshots",
+        verbose_name=_("الجدولة"),
+    )
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -71,6 +87,12 @@ class SavedReport(models.Model):
         verbose_name = _("تقرير محفوظ")
         verbose_name_plural = _("التقارير المحفوظة")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["report", "parameters_hash", "-generated_at"],
+                name="saved_report_snapshot_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.report.title}"
@@ -102,6 +124,9 @@ class ReportSchedule(models.Model):
         verbose_name=_("المستلمون"),
     )
     is_active = models.BooleanField(_("نشط"), default=True)
+    last_run_at = models.DateTimeField(_("آخر تشغيل"), null=True, blank=True)
+    next_run_at = models.DateTimeField(_("التشغيل القادم"), null=True, blank=True)
+    last_error = models.TextField(_("آخر خطأ"), blank=True)
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
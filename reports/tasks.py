@@ -0,0 +1,35 @@
+"""
+مهام Celery لتطبيق التقارير
+"""
+
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    queue="maintenance",
+    name="reports.tasks.run_due_report_schedules",
+    soft_time_limit=1500,
+)
+def run_due_report_schedules():
+    """
+    تشغيل جدولات التقارير المستحقة وحفظ نتائجها كلقطات (reports.engine)
+    """
+    from django.core.cache import cache
+
+    from .engine import run_due_schedules
+
+    # منع تشغيلين متداخلين إذا استغرق تقرير كبير أطول من الفاصل الزمني
+    lock_key = "reports:schedules:lock"
+    if cache.add(lock_key, 1, 1800) is False:
+        return {"status": "skipped"}
+    try:
+        results = run_due_schedules()
+        if results["ran"] or results["failed"]:
+            logger.info(f"📊 جدولات التقارير: {results}")
+        return {"status": "success", **results}
+    finally:
+        cache.delete(lock_key)
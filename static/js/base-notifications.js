@@ -701,12 +701,27 @@
             }]);
         };
 
+        // عداد الإشعارات والقائمة يصلان مباشرة عبر WebSocket (live-events.js)
+        var liveEvents = window.LiveEvents;
+        if (liveEvents) {
+            liveEvents.on('notifications.unread', function (data) {
+                var badge = document.querySelector('#notification-count-badge');
+                if (badge) {
+                    badge.textContent = data.count;
+                    badge.style.display = data.count > 0 ? 'inline' : 'none';
+                }
+            });
+            liveEvents.on('notifications.new', liveEvents.debounce(updateRecentNotifications, 1000));
+        }
+
         // Periodic update every 60 seconds
         setInterval(function () {
-            updateNotificationCount();
+            if (!(liveEvents && liveEvents.isConnected())) {
+                updateNotificationCount();
+                updateRecentNotifications();
+            }
             updateComplaintsNotificationCount();
             updateAssignmentNotifications();
-            updateRecentNotifications();
             checkAssignedComplaints();
             checkEscalatedComplaints();
             checkTransferAlerts();
@@ -0,0 +1,152 @@
+/**
+ * live-events.js
+ * ================
+ * اتصال WebSocket واحد لكل تبويب بالأحداث الحية (core.realtime / ws/live/)
+ * بدلاً من setInterval في كل صفحة.
+ *
+ * الاستخدام:
+ *   LiveEvents.subscribe(['department:cutting'], function (msg) { ... }, {
+ *       fallbackInterval: 30000   // استطلاع احتياطي فقط عند انقطاع الاتصال
+ *   });
+ *   LiveEvents.on('notifications.unread', function (data) { ... });  // أحداث user:<id>
+ *
+ * msg = {topic, event, data}
+ * إذا تعذر الاتصال (لا يوجد ASGI/WebSocket) يُستدعى المعالج دورياً كما كان سابقاً.
+ */
+
+(function () {
+    'use strict';
+
+    if (window.LiveEvents) return;
+
+    var socket = null;
+    var connected = false;
+    var retryDelay = 2000;
+    var MAX_RETRY_DELAY = 60000;
+    var subscriptions = [];   // {topics, handler, fallbackInterval, timer}
+    var eventHandlers = {};   // event name → [handler]
+
+    function wsUrl() {
+        var protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        return protocol + '//' + window.location.host + '/ws/live/';
+    }
+
+    function allTopics() {
+        var topics = [];
+        subscriptions.forEach(function (sub) {
+            sub.topics.forEach(function (topic) {
+                if (topics.indexOf(topic) === -1) topics.push(topic);
+            });
+        });
+        return topics;
+    }
+
+    function sendSubscribe(topics) {
+        if (connected && topics.length) {
+            socket.send(JSON.stringify({ action: 'subscribe', topics: topics }));
+        }
+    }
+
+    function startFallback(sub) {
+        if (sub.fallbackInterval && !sub.timer) {
+            sub.timer = setInterval(function () { sub.handler(null); }, sub.fallbackInterval);
+        }
+    }
+
+    function stopFallback(sub) {
+        // بلا مواضيع (لا قسم ولا فرع مسموح) لا تصل أحداث: الاستطلاع يبقى
+        if (sub.timer && sub.topics.length) {
+            clearInterval(sub.timer);
+            sub.timer = null;
+        }
+    }
+
+    function dispatch(msg) {
+        subscriptions.forEach(function (sub) {
+            if (sub.topics.indexOf(msg.topic) !== -1) {
+                try { sub.handler(msg); } catch (e) { console.error(e); }
+            }
+        });
+        (eventHandlers[msg.event] || []).forEach(function (handler) {
+            try { handler(msg.data, msg); } catch (e) { console.error(e); }
+        });
+    }
+
+    function connect() {
+        if (!('WebSocket' in window)) {
+            subscriptions.forEach(startFallback);
+            return;
+        }
+
+        socket = new WebSocket(wsUrl());
+
+        socket.onopen = function () {
+            connected = true;
+            retryDelay = 2000;
+            subscriptions.forEach(stopFallback);
+            sendSubscribe(allTopics());
+        };
+
+        socket.onmessage = function (e) {
+            var msg;
+            try { msg = JSON.parse(e.data); } catch (err) { return; }
+            if (msg.type === 'event') {
+                dispatch(msg);
+            } else if (msg.type === 'subscribed' && msg.denied && msg.denied.length) {
+                // المواضيع المرفوضة تبقى على الاستطلاع الاحتياطي
+                subscriptions.forEach(function (sub) {
+                    if (sub.topics.some(function (t) { return msg.denied.indexOf(t) !== -1; })) {
+                        startFallback(sub);
+                    }
+                });
+            }
+        };
+
+        socket.onclose = function (e) {
+            connected = false;
+            subscriptions.forEach(startFallback);
+            // 4001 = غير مسجل الدخول — لا إعادة محاولة
+            if (e.code === 4001) return;
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+        };
+    }
+
+    window.LiveEvents = {
+        subscribe: function (topics, handler, options) {
+            var sub = {
+                topics: topics || [],
+                handler: handler,
+                fallbackInterval: (options && options.fallbackInterval) || 0,
+                timer: null
+            };
+            subscriptions.push(sub);
+            if (!sub.topics.length) {
+                startFallback(sub);
+            } else if (connected) {
+                sendSubscribe(sub.topics);
+            } else if (socket === null || socket.readyState === WebSocket.CLOSED) {
+                startFallback(sub);
+            }
+            return sub;
+        },
+
+        on: function (eventName, handler) {
+            (eventHandlers[eventName] = eventHandlers[eventName] || []).push(handler);
+        },
+
+        isConnected: function () { return connected; },
+
+        /** تأخير تجميعي: عدة أحداث متتالية → استدعاء واحد */
+        debounce: function (fn, wait) {
+            var timer = null;
+            return function () {
+                var args = arguments;
+                clearTimeout(timer);
+                timer = setTimeout(function () { fn.apply(null, args); }, wait || 1000);
+            };
+        }
+    };
+
+    connect();
+})();
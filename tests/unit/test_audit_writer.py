@@ -0,0 +1,39 @@
+"""
+اختبارات كاتب سجلات التدقيق المؤجَّل (core.audit_writer)
+"""
+
+import pytest
+
+from core.audit import AuditLog
+from core.audit_writer import AuditLogWriter
+
+
+@pytest.fixture
+def writer(monkeypatch, settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    writer = AuditLogWriter(max_queue_size=2, batch_size=10, flush_interval=0.1)
+    # الحفظ يتم يدوياً عبر flush داخل معاملة الاختبار بدلاً من الخيط الخلفي
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    return writer
+
+
+@pytest.mark.django_db
+class TestAuditLogWriter:
+    """اختبارات الطابور المحدود والحفظ الجماعي"""
+
+    def test_flush_bulk_creates_entries(self, writer):
+        writer.enqueue(AuditLog(action="UPDATE", description="أ"))
+        writer.enqueue(AuditLog(action="DELETE", description="ب"))
+
+        assert writer.flush() == 2
+        assert AuditLog.objects.count() == 2
+
+    def test_full_queue_drops_and_counts(self, writer):
+        assert writer.enqueue(AuditLog(action="UPDATE"))
+        assert writer.enqueue(AuditLog(action="UPDATE"))
+        assert not writer.enqueue(AuditLog(action="UPDATE"))
+
+        assert writer.stats()["dropped"] == 1
+        assert writer.flush() == 2
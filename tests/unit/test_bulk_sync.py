@@ -0,0 +1,127 @@
+"""
+اختبارات الاستيراد الجماعي من Google Sheets (odoo_db_manager.bulk_sync_service)
+"""
+
+from unittest import mock
+
+import pytest
+from django.db import IntegrityError
+
+from core.models import CustomerSearchDocument, NumberSequence, OrderSearchDocument
+from core.sequences import next_value
+from customers.models import Customer
+from inspections.models import Inspection
+from manufacturing.models import ManufacturingOrder
+from odoo_db_manager.advanced_sync_service import AdvancedSyncService
+from odoo_db_manager.bulk_sync_service import BulkSheetImporter
+from odoo_db_manager.google_sync_advanced import GoogleSheetMapping
+from orders.models import Order
+
+HEADERS = ["الاسم", "الهاتف", "النوع", "الفاتورة", "المعاينة"]
+
+
+@pytest.fixture
+def service(db):
+    mapping = GoogleSheetMapping.objects.create(
+        name="استيراد جماعي",
+        spreadsheet_id="sheet",
+        sheet_name="Sheet1",
+        column_mappings={
+            "الاسم": "customer_name",
+            "الهاتف": "customer_phone",
+            "النوع": "order_type",
+            "الفاتورة": "invoice_number",
+            "المعاينة": "inspection_date",
+        },
+    )
+    return AdvancedSyncService(mapping)
+
+
+@pytest.mark.django_db
+class TestBulkSheetImporter:
+    """الصفوف تُحل مسبقاً وتُنشأ جماعياً مع تقرير لكل صف"""
+
+    def test_rows_are_resolved_and_created_in_bulk(self, service):
+        existing = Customer.objects.create(name="عميل قديم", phone="0100000100", address="x")
+        sheet = [
+            HEADERS,
+            ["عميل جديد", "0100000200", "تركيب", "F-1", "2026-01-10"],
+            ["عميل جديد", "0100000200", "تركيب", "F-1", ""],
+            ["عميل قديم", "0100000100", "تفصيل", "F-2", ""],
+            ["", "0100000300", "تركيب", "F-3", ""],
+        ]
+
+        BulkSheetImporter(service).process(sheet)
+
+        assert Customer.objects.filter(phone="0100000200").count() == 1
+        new_customer = Customer.objects.get(phone="0100000200")
+        # الصف الثاني يطابق طلب الصف الأول (نفس النوع والفاتورة) فلا يُكرر
+        assert Order.objects.filter(
+            customer=new_customer, selected_types__contains=["installation"]
+        ).count() == 1
+        assert Order.objects.filter(customer=existing).count() == 1
+        assert ManufacturingOrder.objects.filter(order__customer=new_customer).count() == 1
+        assert Inspection.objects.filter(customer=new_customer).count() == 1
+
+        assert service.stats["successful_rows"] == 3
+        assert service.stats["customers_skipped"] == 1
+        assert [row["row"] for row in service.stats["detailed_errors"]] == [2, 3, 4, 5]
+
+    def test_numbers_come_from_shared_counters(self, service):
+        """الأرقام المستوردة تستهلك عدادات core.sequences فلا يكررها save() لاحقاً"""
+        existing = Customer.objects.create(name="عميل عداد", phone="0100000400", address="x")
+        prefix = f"{existing.code}-"
+        # عداد متقدم على البيانات (أرقام حُجزت في معاملات سابقة)
+        for _ in range(3):
+            next_value("orders.order_number", prefix)
+
+        BulkSheetImporter(service).process(
+            [HEADERS, ["عميل عداد", "0100000400", "تفصيل", "F-9", ""]]
+        )
+
+        order = Order.objects.get(customer=existing)
+        assert order.order_number == f"{prefix}0004"
+        assert (
+            NumberSequence.objects.get(scope="orders.order_number", prefix=prefix).last_value == 4
+        )
+        later = Order.objects.create(customer=existing)
+        assert later.order_number == f"{prefix}0005"
+
+    def test_imported_rows_get_search_documents(self, service):
+        BulkSheetImporter(service).process(
+            [HEADERS, ["عميل بحث مستورد", "0100000500", "تركيب", "F-10", ""]]
+        )
+
+        customer = Customer.objects.get(phone="0100000500")
+        order = Order.objects.get(customer=customer)
+        assert CustomerSearchDocument.objects.filter(customer=customer).exists()
+        assert "0100000500" in OrderSearchDocument.objects.get(order=order).document
+
+    def test_bad_row_does_not_fail_its_chunk(self, service):
+        """فشل حفظ صف واحد يعيد المحاولة صفاً صفاً والإحصاءات تعد المحفوظ فقط"""
+        manager_class = type(Customer.objects)
+        original_bulk_create = manager_class.bulk_create
+
+        def bulk_create(manager, objs, *args, **kwargs):
+            if any(getattr(obj, "phone", None) == "0100000799" for obj in objs):
+                raise IntegrityError("صف معطوب")
+            return original_bulk_create(manager, objs, *args, **kwargs)
+
+        with mock.patch.object(
+            manager_class, "bulk_create", autospec=True, side_effect=bulk_create
+        ):
+            BulkSheetImporter(service).process(
+                [
+                    HEADERS,
+                    ["عميل سليم", "0100000700", "تركيب", "F-20", ""],
+                    ["عميل معطوب", "0100000799", "تركيب", "F-21", ""],
+                ]
+            )
+
+        customer = Customer.objects.get(phone="0100000700")
+        assert Order.objects.filter(customer=customer).count() == 1
+        assert not Customer.objects.filter(phone="0100000799").exists()
+        assert service.stats["successful_rows"] == 1
+        assert service.stats["failed_rows"] == 1
+        assert service.stats["customers_created"] == 1
+        assert service.stats["orders_created"] == 1
@@ -0,0 +1,43 @@
+"""
+اختبارات تنظيف بيانات محرك الرفع الجماعي (inventory.bulk_upload_engine)
+"""
+
+import pandas as pd
+
+from inventory.bulk_upload_engine import normalize_frame, resolve_columns
+
+HEADER = ["اسم المنتج", "الكود", "السعر", "الكمية", "العرض", "الوحدة", "العملة"]
+
+
+class TestNormalizeFrame:
+    """التنظيف يتم بعمليات متجهة على الدفعة كاملة"""
+
+    def test_columns_are_resolved_by_header_then_template_order(self):
+        assert resolve_columns(HEADER)["price"] == 2
+        assert resolve_columns(["a", "b", "c", "d"])["code"] == 1
+
+    def test_values_are_normalised(self):
+        raw = pd.DataFrame(
+            [
+                ["قماش", 123.0, "١٥٠", 5, "280", "متر", "usd"],
+                ["  ", "00045", "0", None, "140 cm", "piece", "XYZ"],
+                [None, None, 10, 3, None, None, None],
+            ],
+            dtype=object,
+        )
+
+        frame = normalize_frame(raw, resolve_columns(HEADER), first_row_number=2)
+
+        # الصف الثالث بدون كود ولا اسم
+        assert list(frame["row_number"]) == [2, 3]
+        first, second = frame.iloc[0], frame.iloc[1]
+        assert first["code"] == "123"
+        assert first["price"] == 150
+        assert first["width"] == "280 cm"
+        assert first["unit"] == "meter"
+        assert first["currency"] == "USD"
+        assert second["code"] == "45"
+        assert pd.isna(second["name"])
+        assert pd.isna(second["price"])
+        assert second["quantity"] == 0
+        assert pd.isna(second["currency"])
@@ -0,0 +1,102 @@
+"""
+اختبارات مؤقتات SLA للشكاوى (complaints.sla)
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from complaints import sla
+from complaints.models import Complaint, ComplaintType
+from customers.models import Customer
+
+
+class FakePipeline:
+    def __init__(self):
+        self.calls = []
+
+    def zadd(self, key, mapping):
+        self.calls.append(("zadd", mapping))
+
+    def zrem(self, key, *members):
+        self.calls.append(("zrem", members))
+
+
+@pytest.fixture
+def complaint(db):
+    customer = Customer.objects.create(name="عميل شكوى", phone="0100000301", address="x")
+    complaint_type = ComplaintType.objects.create(name="شكوى مؤقتات")
+    return Complaint.objects.create(
+        customer=customer,
+        complaint_type=complaint_type,
+        title="تأخير",
+        description="وصف",
+        deadline=timezone.now() + timedelta(hours=48),
+    )
+
+
+class TestQueueTimers:
+    """جدولة مؤقتات شكوى واحدة"""
+
+    def test_open_complaint_gets_warning_and_due(self):
+        deadline = timezone.now() + timedelta(hours=48)
+        pipe = FakePipeline()
+        sla._queue_timers(pipe, 7, deadline, "new", warning_sent=False)
+
+        due_at = deadline.timestamp()
+        assert pipe.calls == [
+            ("zadd", {"due:7": due_at}),
+            ("zadd", {"warn:7": due_at - sla.WARNING_LEAD.total_seconds()}),
+        ]
+
+    def test_resolved_complaint_is_unscheduled(self):
+        pipe = FakePipeline()
+        sla._queue_timers(pipe, 7, timezone.now(), "resolved", warning_sent=False)
+        assert pipe.calls == [("zrem", ("warn:7", "due:7"))]
+
+
+@pytest.mark.django_db
+class TestSlaTransitions:
+    """الانتقال الجماعي وإرسال كل إشعار مرة واحدة"""
+
+    def test_overdue_transition_notifies_once(self, complaint):
+        Complaint.objects.filter(pk=complaint.pk).update(
+            deadline=timezone.now() - timedelta(minutes=5)
+        )
+
+        with mock.patch(
+            "complaints.services.notification_service.ComplaintNotificationService"
+        ) as service, mock.patch("notifications.signals.queue_notification") as queue:
+            assert sla.mark_overdue([complaint.pk]) == (1, 1)
+            assert sla.mark_overdue([complaint.pk]) == (0, 0)
+
+        service.return_value.notify_overdue.assert_called_once()
+        # إشعار مركز الإشعارات الموحد الذي كانت ترسله إشارة post_save
+        queue.assert_called_once()
+        assert queue.call_args.kwargs["notification_type"] == "complaint_overdue"
+        assert queue.call_args.kwargs["extra_data"]["old_status"] == "new"
+        complaint.refresh_from_db()
+        assert complaint.status == "overdue"
+        assert complaint.overdue_notified_at is not None
+
+    def test_warning_sent_once_and_rearmed_by_new_deadline(self, complaint):
+        Complaint.objects.filter(pk=complaint.pk).update(
+            deadline=timezone.now() + timedelta(hours=3)
+        )
+
+        with mock.patch(
+            "complaints.services.notification_service.ComplaintNotificationService"
+        ) as service:
+            assert sla.send_deadline_warnings([complaint.pk]) == 1
+            assert sla.send_deadline_warnings([complaint.pk]) == 0
+
+        service.return_value.notify_deadline_approaching.assert_called_once()
+
+        complaint = Complaint.objects.get(pk=complaint.pk)
+        assert complaint.deadline_warning_sent_at is not None
+        complaint.deadline = timezone.now() + timedelta(hours=72)
+        complaint.save(update_fields=["deadline"])
+        complaint.refresh_from_db()
+        assert complaint.deadline_warning_sent_at is None
@@ -0,0 +1,89 @@
+"""
+اختبارات توزيع أوامر التقطيع المؤجَّل (cutting.allocation)
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+from cutting import allocation
+from inventory.models import Product, StockTransaction, Warehouse
+
+
+@pytest.fixture
+def product(db):
+    return Product.objects.create(name="قماش توزيع", code="ALC-001", price=Decimal("80.00"))
+
+
+@pytest.fixture
+def warehouses(db):
+    return [
+        Warehouse.objects.create(name="مستودع أ", code="WH-ALC-A", is_active=True),
+        Warehouse.objects.create(name="مستودع ب", code="WH-ALC-B", is_active=True),
+    ]
+
+
+def _receive(product, warehouse, quantity):
+    return StockTransaction.objects.create(
+        product=product,
+        warehouse=warehouse,
+        transaction_type="in",
+        reason="other",
+        quantity=Decimal(quantity),
+    )
+
+
+class TestPickWarehouse:
+    """اختيار المستودع من الأرصدة المحملة"""
+
+    def test_largest_positive_balance_wins(self):
+        warehouses = {1: "أ", 2: "ب", 3: "ج"}
+        assert allocation.pick_warehouse({1: 5, 2: 12, 3: -4}, warehouses) == ("ب", 12)
+
+    def test_inactive_or_empty_is_skipped(self):
+        assert allocation.pick_warehouse({1: 0, 9: 50}, {1: "أ"}) == (None, 0)
+        assert allocation.pick_warehouse(None, {1: "أ"}) == (None, 0)
+
+    def test_ties_pick_lowest_id(self):
+        assert allocation.pick_warehouse({2: 7, 1: 7}, {1: "أ", 2: "ب"}) == ("أ", 7)
+
+
+@pytest.mark.django_db
+class TestCoalescedAllocation:
+    """حركات كثيرة في معاملة واحدة تُعالج مرة واحدة لكل منتج"""
+
+    def test_balances_loaded_in_one_query(
+        self, product, warehouses, django_assert_num_queries
+    ):
+        _receive(product, warehouses[0], "3")
+        _receive(product, warehouses[1], "9")
+
+        with django_assert_num_queries(1):
+            balances = allocation.load_balances([product.id])
+
+        assert balances[product.id] == {
+            warehouses[0].id: Decimal("3"),
+            warehouses[1].id: Decimal("9"),
+        }
+
+    def test_receipt_processed_once(
+        self, product, warehouses, django_capture_on_commit_callbacks
+    ):
+        with mock.patch.object(allocation, "process_products", return_value=0) as process:
+            with django_capture_on_commit_callbacks(execute=True):
+                for _ in range(5):
+                    _receive(product, warehouses[0], "10")
+
+        process.assert_called_once_with({product.id})
+
+    def test_bulk_mode_defers_until_exit(
+        self, product, warehouses, django_capture_on_commit_callbacks
+    ):
+        with mock.patch.object(allocation, "process_products", return_value=0) as process:
+            with django_capture_on_commit_callbacks(execute=True):
+                with allocation.bulk_allocation():
+                    _receive(product, warehouses[0], "4")
+                    _receive(product, warehouses[1], "6")
+
+        process.assert_called_once_with({product.id})
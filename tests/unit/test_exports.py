@@ -0,0 +1,70 @@
+"""
+اختبارات محرك التصدير (core.exports)
+"""
+
+from openpyxl import load_workbook
+
+from core.exports import write_workbook
+from manufacturing.exports import fabric_status_label
+
+
+class TestWriteWorkbook:
+    """الصفوف تُكتب من مولّد والمجاميع تُجمع أثناء الكتابة"""
+
+    def test_rows_totals_and_footer(self, tmp_path):
+        path = tmp_path / "report.xlsx"
+        rows = ({"name": f"طلب {i}", "meters": i} for i in range(1, 4))
+
+        written = write_workbook(
+            str(path),
+            [
+                {
+                    "title": "تقرير",
+                    "heading": "تقرير الاختبار",
+                    "columns": [
+                        {"header": "الاسم", "key": "name"},
+                        {"header": "الأمتار", "key": "meters", "number": True},
+                    ],
+                    "rows": rows,
+                    "totals": {"label": "المجموع", "keys": ["meters"]},
+                    "footer": lambda totals: [("إجمالي الأمتار", totals["meters"])],
+                }
+            ],
+        )
+
+        assert written == 3
+        values = [row for row in load_workbook(path).active.iter_rows(values_only=True)]
+        assert ("الاسم", "الأمتار") in values
+        assert ("طلب 3", 3) in values
+        assert ("المجموع", 6) in values
+        assert values[-2][0] == "إجمالي الأمتار"
+        assert values[-1][0] == 6
+
+    def test_header_row_is_frozen(self, tmp_path):
+        path = tmp_path / "frozen.xlsx"
+        write_workbook(
+            str(path),
+            [
+                {
+                    "title": "بطاقات",
+                    "heading": "تقرير",
+                    "subheading": "فرعي",
+                    "cards": [("الإجمالي", 2)],
+                    "columns": [{"header": "الاسم", "key": "name"}],
+                    "rows": [{"name": "طلب"}],
+                }
+            ],
+        )
+
+        sheet = load_workbook(path).active
+        # عنوان + فرعي + فاصل + بطاقتان + فاصل ← العناوين في الصف 7
+        assert sheet["A7"].value == "الاسم"
+        assert sheet.freeze_panes == "A8"
+
+
+class TestFabricStatusLabel:
+    def test_labels_match_list_badges(self):
+        assert fabric_status_label(3, 0, 3) == "بحاجة استلام"
+        assert fabric_status_label(3, 1, 3) == "ناقص"
+        assert fabric_status_label(3, 3, 3) == "كامل"
+        assert fabric_status_label(0, 0, 0) == "غير مقطوع"
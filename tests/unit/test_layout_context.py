@@ -0,0 +1,92 @@
+"""
+اختبارات خدمة سياق القالب الموحدة (core.layout_context)
+"""
+
+from unittest import mock
+
+import pytest
+from django.test import RequestFactory
+
+from core import layout_context
+from core.layout_context import (
+    LayoutSection,
+    bump_layout_version,
+    bump_user_layout_version,
+    resolve_sections,
+)
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
+@pytest.fixture
+def counting_section(monkeypatch):
+    calls = []
+
+    def build(request):
+        calls.append(request.path)
+        return {"layout_value": len(calls)}
+
+    section = LayoutSection("demo", "unused.path", timeout=60, versions=("demo",))
+    monkeypatch.setattr(section, "_builder", build)
+    return section, calls
+
+
+class TestLayoutContext:
+    """اختبارات الكاش والإلغاء بالإصدارات"""
+
+    def test_section_cached_until_version_bump(self, counting_section):
+        section, calls = counting_section
+        request = RequestFactory().get("/")
+
+        assert resolve_sections(request, [section])["demo"] == {"layout_value": 1}
+        assert resolve_sections(request, [section])["demo"] == {"layout_value": 1}
+        assert len(calls) == 1
+
+        bump_layout_version("demo")
+        assert resolve_sections(request, [section])["demo"] == {"layout_value": 2}
+
+    def test_build_time_is_recorded(self, counting_section):
+        section, _calls = counting_section
+        request = RequestFactory().get("/")
+
+        resolve_sections(request, [section])
+
+        assert "demo" in request._layout_timings
+        assert layout_context.cache.get(f"{layout_context.STATS_KEY_PREFIX}demo:builds") == 1
+
+    def test_user_version_bump_is_scoped_to_one_user(self, monkeypatch):
+        calls = []
+
+        def build(request):
+            calls.append(request.user.pk)
+            return {"unread": len(calls)}
+
+        section = LayoutSection(
+            "demo_user",
+            "unused.path",
+            timeout=60,
+            versions=("demo_user",),
+            user_versions=("demo_user",),
+            per_user=True,
+        )
+        monkeypatch.setattr(section, "_builder", build)
+
+        requests = {}
+        for user_id in (1, 2):
+            request = RequestFactory().get("/")
+            request.user = mock.Mock(
+                pk=user_id, is_authenticated=True, is_staff=False, is_superuser=False
+            )
+            requests[user_id] = request
+            resolve_sections(request, [section])
+
+        bump_user_layout_version(1, "demo_user")
+        resolve_sections(requests[1], [section])
+        resolve_sections(requests[2], [section])
+
+        assert calls == [1, 2, 1]
@@ -0,0 +1,76 @@
+"""
+اختبارات التجميعات اليومية والبدائل الحية للعروض المادية (core.order_rollups / core.materialized_views)
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from core import materialized_views
+from core.models import DailyOrderRollup
+from core.order_rollups import rebuild_rollup_day, refresh_daily_rollups
+from customers.models import Customer
+from inventory.models import Product
+from orders.models import Order, OrderItem
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
+@pytest.fixture
+def customer(db):
+    return Customer.objects.create(name="عميل التجميعات", phone="0100000401")
+
+
+@pytest.mark.django_db
+class TestDailyRollups:
+    """إعادة بناء يوم واحد تكتب صفاً واحداً لكل (فرع، حالة)"""
+
+    def test_rebuild_is_idempotent(self, customer):
+        Order.objects.create(customer=customer)
+        Order.objects.create(customer=customer)
+        today = timezone.localdate()
+
+        rebuild_rollup_day(today)
+        rebuild_rollup_day(today)
+
+        rows = DailyOrderRollup.objects.filter(day=today)
+        assert rows.count() == 1
+        assert rows.get().order_count == 2
+
+    def test_refresh_covers_requested_days(self, customer):
+        Order.objects.create(customer=customer)
+        today = timezone.localdate()
+
+        assert refresh_daily_rollups(days=[today]) == [today]
+        assert DailyOrderRollup.objects.filter(day=today).exists()
+
+
+@pytest.mark.django_db
+class TestTopProductsFallback:
+    """بدون العرض المادي تُحسب أفضل المنتجات باستعلام حي بنفس الأعمدة"""
+
+    def test_live_aggregate_when_view_missing(self, customer):
+        curtain = Product.objects.create(name="ستارة", code="MV-001", price=Decimal("50.00"))
+        fabric = Product.objects.create(name="قماش", code="MV-002", price=Decimal("20.00"))
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(
+            order=order, product=curtain, quantity=Decimal("3"), unit_price=Decimal("50.00")
+        )
+        OrderItem.objects.create(
+            order=order, product=fabric, quantity=Decimal("2"), unit_price=Decimal("20.00")
+        )
+
+        with mock.patch.object(materialized_views, "view_exists", return_value=False):
+            results = materialized_views.get_top_products(limit=5)
+
+        assert [row["product_code"] for row in results] == ["MV-001", "MV-002"]
+        assert results[0]["total_revenue"] == Decimal("150.00")
+        assert results[0]["times_ordered"] == 1
+        assert results[0]["total_quantity_sold"] == Decimal("3")
@@ -0,0 +1,86 @@
+"""
+اختبارات عدادات الإشعارات غير المقروءة (notifications.counters)
+"""
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from notifications.counters import (
+    get_unread_count,
+    mark_visibilities_read,
+    reconcile_unread_counters,
+)
+from notifications.models import NotificationVisibility
+from notifications.signals import create_notification
+from notifications.utils import mark_all_notifications_as_read, mark_notification_as_read
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _notify(user, title):
+    return create_notification(
+        title=title, message="رسالة", notification_type="general", recipients=[user]
+    )
+
+
+@pytest.mark.django_db
+class TestUnreadCounters:
+    """العداد يتبع التوزيع والقراءة بدون COUNT على الجدول"""
+
+    def test_counter_follows_fan_out_and_reads(self, django_capture_on_commit_callbacks):
+        user = User.objects.create_user(username="counter_user", password="x")
+        assert get_unread_count(user.pk) == 0
+
+        with django_capture_on_commit_callbacks(execute=True):
+            first = _notify(user, "الأول")
+            _notify(user, "الثاني")
+        assert get_unread_count(user.pk) == 2
+
+        with django_capture_on_commit_callbacks(execute=True):
+            mark_notification_as_read(first, user)
+        assert get_unread_count(user.pk) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            mark_all_notifications_as_read(user)
+        assert get_unread_count(user.pk) == 0
+
+    def test_bulk_read_and_delete_follow_counter(self, django_capture_on_commit_callbacks):
+        user = User.objects.create_user(username="bulk_counter_user", password="x")
+        other = User.objects.create_user(username="bulk_counter_other", password="x")
+        with django_capture_on_commit_callbacks(execute=True):
+            _notify(user, "الأول")
+            second = _notify(user, "الثاني")
+            _notify(other, "الآخر")
+        assert get_unread_count(user.pk) == 2
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert mark_visibilities_read(
+                NotificationVisibility.objects.exclude(notification=second)
+            ) == 2
+        assert get_unread_count(user.pk) == 1
+        assert get_unread_count(other.pk) == 0
+
+        with django_capture_on_commit_callbacks(execute=True):
+            second.delete()
+        assert get_unread_count(user.pk) == 0
+
+    def test_reconcile_corrects_drift(self, django_capture_on_commit_callbacks):
+        user = User.objects.create_user(username="drift_user", password="x")
+        with django_capture_on_commit_callbacks(execute=True):
+            _notify(user, "إشعار")
+        assert get_unread_count(user.pk) == 1
+
+        # تعديل مباشر لا يمر بالعدادات
+        NotificationVisibility.objects.filter(user=user).update(is_read=True)
+        assert get_unread_count(user.pk) == 1
+
+        assert reconcile_unread_counters() == 1
+        assert get_unread_count(user.pk) == 0
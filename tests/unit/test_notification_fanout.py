@@ -0,0 +1,98 @@
+"""
+اختبارات توزيع الإشعارات غير المتزامن (notifications.signals.queue_notification)
+"""
+
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from accounts.models import Branch
+from customers.models import Customer
+from notifications.models import Notification, NotificationVisibility
+from notifications.signals import create_notification, queue_notification
+from notifications.utils import ROLE_INDEX_CACHE_KEY, resolve_recipient_ids
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def branch(db):
+    return Branch.objects.create(code="FO1", name="فرع التوزيع")
+
+
+@pytest.fixture
+def customer(branch):
+    return Customer.objects.create(name="عميل الإشعارات", phone="0100000301", branch=branch)
+
+
+@pytest.mark.django_db
+class TestRoleIndex:
+    """المستلمون من فهرس الأدوار المخزن والفهرس يُمسح عند تعديل المستخدمين"""
+
+    def test_branch_managers_resolved_and_index_invalidated(
+        self, branch, customer, django_capture_on_commit_callbacks
+    ):
+        manager = User.objects.create_user(
+            username="fo_manager", password="x", branch=branch, is_branch_manager=True
+        )
+        assert manager.pk in resolve_recipient_ids("customer_created", customer)
+        assert cache.get(ROLE_INDEX_CACHE_KEY) is not None
+
+        with django_capture_on_commit_callbacks(execute=True):
+            seller = User.objects.create_user(
+                username="fo_seller", password="x", branch=branch, is_salesperson=True
+            )
+
+        assert cache.get(ROLE_INDEX_CACHE_KEY) is None
+        assert seller.pk in resolve_recipient_ids("customer_created", customer)
+
+
+@pytest.mark.django_db
+class TestQueueNotification:
+    """الإشعار يُنشأ بعد تأكيد المعاملة ويُمنع تكراره بمفتاح الكاش"""
+
+    def test_event_dispatched_after_commit(self, customer, django_capture_on_commit_callbacks):
+        user = User.objects.create_user(username="fo_target", password="x")
+
+        with mock.patch("notifications.tasks.fan_out_notification.delay") as delay:
+            with django_capture_on_commit_callbacks(execute=False) as callbacks:
+                queue_notification(
+                    title="عميل جديد",
+                    message="رسالة",
+                    notification_type="customer_created",
+                    related_object=customer,
+                    recipients=[user],
+                )
+            assert not delay.called
+            for callback in callbacks:
+                callback()
+
+        event = delay.call_args.args[0]
+        assert event["object_id"] == customer.pk
+        assert event["recipient_ids"] == [user.pk]
+
+    def test_duplicate_within_window_is_skipped(self, customer):
+        user = User.objects.create_user(username="fo_dup", password="x")
+        kwargs = dict(
+            title="عميل جديد",
+            message="رسالة",
+            notification_type="customer_created",
+            related_object=customer,
+            recipients=[user],
+        )
+
+        first = create_notification(**kwargs)
+        second = create_notification(**kwargs)
+
+        assert second == first
+        assert Notification.objects.count() == 1
+        assert NotificationVisibility.objects.filter(user=user).count() == 1
@@ -0,0 +1,48 @@
+"""
+اختبارات إعادة حساب الطلبات المؤجَّلة (orders.recompute)
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+from customers.models import Customer
+from inventory.models import Product
+from orders.models import Order, OrderItem
+
+
+@pytest.fixture
+def order(db):
+    customer = Customer.objects.create(name="عميل إعادة الحساب", phone="0100000001")
+    return Order.objects.create(customer=customer)
+
+
+@pytest.fixture
+def product(db):
+    return Product.objects.create(name="قماش ستائر", code="RC-001", price=Decimal("100.00"))
+
+
+@pytest.mark.django_db
+class TestDirtyOrders:
+    """البنود المتعددة في معاملة واحدة تعيد حساب الطلب مرة واحدة"""
+
+    def test_items_in_one_transaction_recompute_once(
+        self, order, product, django_capture_on_commit_callbacks
+    ):
+        with mock.patch.object(
+            Order, "calculate_final_price", autospec=True, side_effect=Order.calculate_final_price
+        ) as calculate:
+            with django_capture_on_commit_callbacks(execute=True):
+                for quantity in ("1", "2", "3"):
+                    OrderItem.objects.create(
+                        order=order,
+                        product=product,
+                        quantity=Decimal(quantity),
+                        unit_price=Decimal("100.00"),
+                    )
+
+        assert calculate.call_count == 1
+        order.refresh_from_db()
+        assert order.total_amount == Decimal("600.00")
+        assert order.final_price == Decimal("600.00")
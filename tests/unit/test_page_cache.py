@@ -0,0 +1,58 @@
+"""
+اختبارات كاش الصفحات المعتمد على الوسوم (core.page_cache)
+"""
+
+import re
+
+import pytest
+
+from core.page_cache import (
+    DEFAULT_PAGE_CACHE_RULES,
+    cached_fragment,
+    get_tag_versions,
+    invalidate_tags,
+)
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
+class TestPageCacheTags:
+    """اختبارات إصدارات الوسوم وإلغاء الأجزاء المخزّنة"""
+
+    def test_invalidate_bumps_version(self):
+        before = get_tag_versions(["orders"])["orders"]
+        invalidate_tags("orders")
+        assert get_tag_versions(["orders"])["orders"] == before + 1
+
+    def test_fragment_rebuilt_after_invalidation(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return f"v{len(calls)}"
+
+        assert cached_fragment("stats", ("orders",), 60, build) == "v1"
+        assert cached_fragment("stats", ("orders",), 60, build) == "v1"
+
+        invalidate_tags("orders")
+        assert cached_fragment("stats", ("orders",), 60, build) == "v2"
+        assert len(calls) == 2
+
+
+class TestPageCacheRules:
+    """صفحات التصنيع التي تتغير خارج الوسوم لا تُخزَّن"""
+
+    @staticmethod
+    def _cached(path):
+        return any(re.match(pattern, path) for pattern, _, _ in DEFAULT_PAGE_CACHE_RULES)
+
+    def test_only_manufacturing_list_is_cached(self):
+        assert self._cached("/manufacturing/orders/")
+        assert not self._cached("/manufacturing/orders/15/")
+        assert not self._cached("/manufacturing/fabric-receipt/")
+        assert not self._cached("/manufacturing/receive-item/7/")
@@ -0,0 +1,46 @@
+"""
+اختبارات تخزين ملفات PDF حسب المحتوى (core.pdf_service)
+"""
+
+from unittest import mock
+
+from core import pdf_service
+
+
+class TestFingerprint:
+    """نفس المستند ← نفس البصمة"""
+
+    def test_stable_and_content_sensitive(self):
+        token = pdf_service.fingerprint("<p>طلب</p>", "a{}", "http://x/")
+
+        assert token == pdf_service.fingerprint("<p>طلب</p>", "a{}", "http://x/")
+        assert len(token) == 64
+        assert token != pdf_service.fingerprint("<p>طلب 2</p>", "a{}", "http://x/")
+        assert token != pdf_service.fingerprint("<p>طلب</p>", "", "http://x/")
+
+
+class TestRenderCached:
+    """إعادة طباعة نفس المستند لا تعيد التوليد"""
+
+    def test_second_render_served_from_cache(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pdf_service, "PDF_CACHE_ROOT", str(tmp_path))
+        with mock.patch("core.pdf_service.build_pdf", return_value=b"%PDF-1.7") as build:
+            first = pdf_service.render_cached("<p>خط الإنتاج</p>")
+            second = pdf_service.render_cached("<p>خط الإنتاج</p>")
+
+        assert first == second == b"%PDF-1.7"
+        assert build.call_count == 1
+        assert pdf_service.cleanup_pdf_cache(max_age=-1) == 1
+
+
+class TestDocumentKey:
+    """مفتاح القالب والبيانات لا يتأثر بوقت الطباعة في HTML"""
+
+    def test_key_depends_on_template_and_data_only(self):
+        key = pdf_service.document_key("line.html", 3, [("status", ["pending"])], {"count": 2})
+
+        assert key == pdf_service.document_key(
+            "line.html", 3, [("status", ["pending"])], {"count": 2}
+        )
+        assert key != pdf_service.document_key("line.html", 3, [], {"count": 2})
+        assert key != pdf_service.document_key("other.html", 3, [("status", ["pending"])], {"count": 2})
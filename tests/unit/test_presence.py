@@ -0,0 +1,56 @@
+"""
+اختبارات نقل الحضور من المخزن السريع إلى قاعدة البيانات (user_activity.presence)
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from user_activity.models import OnlineUser, UserSession
+from user_activity.presence import _flush_online_users, _flush_sessions
+
+
+@pytest.fixture
+def staff_user(db):
+    return get_user_model().objects.create_user(username="presence_user", password="x")
+
+
+def _record(user, session_key, hits, seconds_ago=0):
+    seen = timezone.now() - timedelta(seconds=seconds_ago)
+    return {
+        "user_id": user.pk,
+        "session_key": session_key,
+        "ip": "10.0.0.1",
+        "user_agent": "Mozilla/5.0 (Windows NT 10.0) Chrome/120.0",
+        "accept_language": "ar",
+        "path": "/orders/",
+        "first_seen": seen,
+        "last_seen": seen,
+        "hits": hits,
+        "actions": 0,
+    }
+
+
+@pytest.mark.django_db
+class TestPresenceFlush:
+    """اختبارات الكتابة الجماعية للجلسات والمستخدمين النشطين"""
+
+    def test_creates_then_updates_rows(self, staff_user):
+        records = [_record(staff_user, "s1", 3, seconds_ago=30), _record(staff_user, "s2", 2)]
+
+        assert _flush_sessions(records) == 2
+        assert _flush_online_users(records) == 1
+
+        session = UserSession.objects.get(session_key="s1")
+        assert session.browser == "Chrome"
+        assert session.device_type == "desktop"
+
+        online = OnlineUser.objects.get(user=staff_user)
+        assert online.session_key == "s2"
+        assert online.pages_visited == 5
+
+        _flush_online_users([_record(staff_user, "s2", 4)])
+        online.refresh_from_db()
+        assert online.pages_visited == 9
@@ -0,0 +1,107 @@
+"""
+اختبارات تجميع المخزون لصفحات المنتجات (Product.objects.with_stock / attach_stock_info)
+"""
+
+from decimal import Decimal
+
+import pytest
+from django.db.models import F
+
+from inventory.managers import attach_stock_info
+from inventory.models import Product, StockTransaction, Warehouse
+
+
+@pytest.fixture
+def warehouses(db):
+    return {
+        "main": Warehouse.objects.create(name="أ - رئيسي", code="WH-ANN-A", is_active=True),
+        "branch": Warehouse.objects.create(name="ب - فرعي", code="WH-ANN-B", is_active=True),
+        "closed": Warehouse.objects.create(name="ج - مغلق", code="WH-ANN-C", is_active=False),
+    }
+
+
+def _product(code, minimum_stock=0):
+    return Product.objects.create(
+        name=f"منتج {code}", code=code, price=Decimal("10.00"), minimum_stock=minimum_stock
+    )
+
+
+def _receive(product, warehouse, quantity):
+    StockTransaction.objects.create(
+        product=product,
+        warehouse=warehouse,
+        transaction_type="in",
+        reason="other",
+        quantity=Decimal(quantity),
+    )
+
+
+@pytest.mark.django_db
+class TestWithStock:
+    """تجميع صفحة كاملة من المنتجات بعدد ثابت من الاستعلامات"""
+
+    def test_totals_ignore_inactive_warehouses(self, warehouses):
+        product = _product("ANN-001")
+        _receive(product, warehouses["main"], "4")
+        _receive(product, warehouses["branch"], "6")
+        _receive(product, warehouses["closed"], "100")
+
+        annotated = Product.objects.with_stock().get(pk=product.pk)
+
+        assert annotated.stock_total == Decimal("10")
+        assert annotated.stock_by_warehouse == [
+            (warehouses["main"], Decimal("4")),
+            (warehouses["branch"], Decimal("6")),
+        ]
+
+    def test_product_without_balances_is_zero(self, warehouses):
+        product = _product("ANN-002")
+
+        annotated = Product.objects.with_stock(per_warehouse=False).get(pk=product.pk)
+
+        assert annotated.stock_total == 0
+        assert str(annotated.stock_status) == "غير متوفر"
+
+    def test_query_count_is_independent_of_page_size(
+        self, warehouses, django_assert_num_queries
+    ):
+        for index in range(5):
+            product = _product(f"ANN-1{index}")
+            _receive(product, warehouses["main"], "2")
+            _receive(product, warehouses["branch"], "1")
+
+        with django_assert_num_queries(2):
+            products = list(Product.objects.filter(code__startswith="ANN-1").with_stock())
+            assert [p.current_stock for p in products] == [Decimal("3")] * 5
+            assert all(p.warehouses_with_stock for p in products)
+
+    def test_stock_total_is_filterable(self, warehouses):
+        low = _product("ANN-201", minimum_stock=5)
+        empty = _product("ANN-202", minimum_stock=5)
+        _receive(low, warehouses["main"], "2")
+
+        codes = Product.objects.with_stock(per_warehouse=False).filter(
+            code__startswith="ANN-2"
+        )
+
+        assert list(codes.filter(stock_total__lte=0).values_list("pk", flat=True)) == [empty.pk]
+        assert list(
+            codes.filter(stock_total__gt=0, stock_total__lte=F("minimum_stock")).values_list(
+                "pk", flat=True
+            )
+        ) == [low.pk]
+
+
+@pytest.mark.django_db
+class TestAttachStockInfo:
+    """إرفاق المخزون بقوائم محمّلة مسبقاً باستعلام واحد"""
+
+    def test_single_query_for_loaded_list(self, warehouses, django_assert_num_queries):
+        first = _product("ANN-301")
+        second = _product("ANN-302")
+        _receive(first, warehouses["main"], "7")
+        loaded = list(Product.objects.filter(pk__in=[first.pk, second.pk]).order_by("code"))
+
+        with django_assert_num_queries(1):
+            attach_stock_info(loaded + [None])
+            assert [p.current_stock for p in loaded] == [Decimal("7"), 0]
@@ -0,0 +1,111 @@
+"""
+اختبارات الأحداث الحية (core.realtime)
+"""
+
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from accounts.models import Branch
+from core.realtime import can_subscribe, live_topics, order_event, publish
+from customers.models import Customer
+from manufacturing.models import ManufacturingOrder
+from orders.models import Order
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCanSubscribe:
+    """الاشتراك في المواضيع يتبع صلاحيات المستخدم"""
+
+    def test_branch_and_department_topics(self):
+        branch = Branch.objects.create(code="RT1", name="فرع البث")
+        other = Branch.objects.create(code="RT2", name="فرع آخر")
+        user = User.objects.create_user(
+            username="rt_installer", password="x", branch=branch, is_installation_manager=True
+        )
+
+        assert can_subscribe(user, f"user:{user.pk}")
+        assert not can_subscribe(user, f"user:{user.pk + 1}")
+        assert can_subscribe(user, f"branch:{branch.pk}")
+        assert not can_subscribe(user, f"branch:{other.pk}")
+        assert can_subscribe(user, "department:installations")
+        assert not can_subscribe(user, "department:cutting")
+        assert not can_subscribe(user, "department:unknown")
+        assert not can_subscribe(user, "branch:1; DROP")
+
+    def test_branch_manager_uses_branch_topic_for_departments(self):
+        branch = Branch.objects.create(code="RT6", name="فرع مدير الأقسام")
+        manager = User.objects.create_user(
+            username="rt_department_branch_manager",
+            password="x",
+            branch=branch,
+            is_branch_manager=True,
+        )
+        installer = User.objects.create_user(
+            username="rt_department_installer",
+            password="x",
+            branch=branch,
+            is_installation_manager=True,
+        )
+
+        with mock.patch.object(User, "has_perm", return_value=True):
+            assert not can_subscribe(manager, "department:installations")
+            assert not can_subscribe(manager, "department:manufacturing")
+            assert live_topics(manager, ("installations", "manufacturing")) == [
+                f"branch:{branch.pk}"
+            ]
+        assert can_subscribe(manager, f"branch:{branch.pk}")
+        assert live_topics(installer, ("installations",)) == ["department:installations"]
+
+    def test_salesperson_gets_own_orders_only(self):
+        branch = Branch.objects.create(code="RT3", name="فرع البائع")
+        seller = User.objects.create_user(
+            username="rt_seller", password="x", branch=branch, is_salesperson=True
+        )
+        customer = Customer.objects.create(name="عميل البث", phone="0100000701", branch=branch)
+        order = Order.objects.create(customer=customer, branch=branch, created_by=seller)
+
+        assert not can_subscribe(seller, "department:orders")
+        assert not can_subscribe(seller, f"branch:{branch.pk}")
+        topics, _, _ = order_event(order)
+        assert f"user:{seller.pk}" in topics
+
+    def test_manufacturing_object_follows_order_branch(self):
+        branch = Branch.objects.create(code="RT4", name="فرع المدير")
+        other = Branch.objects.create(code="RT5", name="فرع آخر")
+        manager = User.objects.create_user(
+            username="rt_branch_manager", password="x", branch=branch, is_branch_manager=True
+        )
+        factory = User.objects.create_user(
+            username="rt_factory", password="x", is_factory_manager=True
+        )
+        customer = Customer.objects.create(name="عميل فرع آخر", phone="0100000702", branch=other)
+        order = Order.objects.create(customer=customer, branch=other)
+        manufacturing_order = ManufacturingOrder.objects.create(
+            order=order, status="pending", contract_number="RT-001"
+        )
+        topic = f"object:manufacturing.manufacturingorder:{manufacturing_order.pk}"
+
+        with mock.patch.object(User, "has_perm", return_value=True):
+            assert not can_subscribe(manager, topic)
+        assert can_subscribe(factory, topic)
+
+
+@pytest.mark.django_db
+class TestPublish:
+    """الحفظ المتكرر لنفس الكائن في معاملة واحدة يُرسل مرة واحدة بآخر حالة"""
+
+    def test_events_coalesced_until_commit(self, django_capture_on_commit_callbacks):
+        with mock.patch("core.realtime.send_now") as send_now:
+            with django_capture_on_commit_callbacks(execute=True):
+                publish(["department:cutting"], "cutting_order.changed", {"id": 1, "status": "a"})
+                publish(["department:cutting"], "cutting_order.changed", {"id": 1, "status": "b"})
+                publish(["department:cutting"], "cutting_order.changed", {"id": 2, "status": "a"})
+                assert not send_now.called
+
+        assert send_now.call_count == 2
+        sent = {call.args[2]["id"]: call.args[2]["status"] for call in send_now.call_args_list}
+        assert sent == {1: "b", 2: "a"}
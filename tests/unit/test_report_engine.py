@@ -0,0 +1,75 @@
+"""
+اختبارات محرك التقارير (reports.engine)
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.http import QueryDict
+from django.utils import timezone
+
+from reports import engine
+from reports.models import Report, ReportSchedule
+
+
+def _fake_engines(compute):
+    resolve, _, fields = engine.REPORT_ENGINES["production"]
+    return {"production": (resolve, compute, fields)}
+
+
+class TestResolveParameters:
+    """المعلمات تُحسم بشكل ثابت حتى تتطابق البصمة لنفس الطلب"""
+
+    def test_query_overrides_saved_and_is_normalized(self):
+        query = QueryDict("date_from=2026-07-01&date_to=2026-09-30&warehouses=3&warehouses=1")
+        params = engine.resolve_production_parameters({"order_types": ["custom"]}, query)
+
+        assert params == {
+            "date_from": "2026-07-01",
+            "date_to": "2026-09-30",
+            "order_types": ["custom"],
+            "view_mode": "all",
+            "production_line": None,
+            "warehouses": [1, 3],
+        }
+
+    def test_default_range_ends_today(self):
+        params = engine.resolve_production_parameters({}, default_days=7)
+        today = timezone.now().date()
+        assert params["date_to"] == today.isoformat()
+        assert params["date_from"] == (today - timedelta(days=7)).isoformat()
+
+
+@pytest.mark.django_db
+class TestSnapshots:
+    """الصفحة تعرض اللقطة المحفوظة ولا تعيد الحساب إلا بطلب صريح"""
+
+    def test_snapshot_reused_until_refresh(self):
+        report = Report.objects.create(title="إنتاج الربع", report_type="production")
+        query = QueryDict("date_from=2026-07-01&date_to=2026-09-30")
+        compute = mock.Mock(return_value={"date_from": "2026-07-01", "incoming_total": 4})
+
+        with mock.patch.object(engine, "REPORT_ENGINES", _fake_engines(compute)):
+            data, first = engine.get_report_data(report, query)
+            _, second = engine.get_report_data(report, query)
+            _, refreshed = engine.get_report_data(report, query, refresh=True)
+
+        assert compute.call_count == 2
+        assert first.pk == second.pk != refreshed.pk
+        assert data["incoming_total"] == 4
+        assert data["date_from"] == timezone.datetime(2026, 7, 1).date()
+
+    def test_due_schedule_runs_and_advances(self):
+        report = Report.objects.create(title="إنتاج يومي", report_type="production")
+        schedule = ReportSchedule.objects.create(report=report, name="يومي", frequency="daily")
+        compute = mock.Mock(return_value={"incoming_total": 0})
+        now = timezone.now()
+
+        with mock.patch.object(engine, "REPORT_ENGINES", _fake_engines(compute)):
+            assert engine.run_due_schedules(now)["ran"] == 1
+            assert engine.run_due_schedules(now)["ran"] == 0
+
+        schedule.refresh_from_db()
+        assert schedule.next_run_at == now + timedelta(days=1)
+        assert schedule.snapshots.count() == 1
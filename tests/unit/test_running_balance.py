@@ -0,0 +1,147 @@
+"""
+اختبارات إعادة حساب الرصيد المتحرك جماعياً (inventory.running_balance)
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.db import transaction
+from django.utils import timezone
+
+from inventory import running_balance
+from inventory.models import Product, StockTransaction, Warehouse
+
+
+@pytest.fixture
+def product(db):
+    return Product.objects.create(name="قماش رصيد متحرك", code="RUN-001", price=Decimal("40.00"))
+
+
+@pytest.fixture
+def warehouse(db):
+    return Warehouse.objects.create(name="مستودع الرصيد المتحرك", code="WH-RUN", is_active=True)
+
+
+def _move(product, warehouse, transaction_type, quantity, days_ago=0):
+    return StockTransaction.objects.create(
+        product=product,
+        warehouse=warehouse,
+        transaction_type=transaction_type,
+        reason="other",
+        quantity=Decimal(quantity),
+        transaction_date=timezone.now() - timedelta(days=days_ago),
+    )
+
+
+def _balances(product, warehouse):
+    return list(
+        StockTransaction.objects.filter(product=product, warehouse=warehouse)
+        .order_by("transaction_date", "id")
+        .values_list("running_balance", flat=True)
+    )
+
+
+class TestPairsNormalization:
+    """السلاسل الناقصة تُتجاهل دون استعلامات"""
+
+    def test_missing_ids_are_ignored(self):
+        assert running_balance.recalculate_running_balances([(None, 1), (1, None)]) == 0
+
+
+@pytest.mark.django_db
+class TestRecalculation:
+    """الأرصدة الناتجة تطابق مجموع الحركات بالترتيب الزمني"""
+
+    def test_backdated_rows_reorder_series(self, product, warehouse):
+        _move(product, warehouse, "in", "10", days_ago=1)
+        _move(product, warehouse, "out", "4", days_ago=0)
+        _move(product, warehouse, "in", "5", days_ago=5)
+        StockTransaction.objects.filter(product=product).update(running_balance=Decimal("0"))
+
+        running_balance.recalculate_running_balances([(product.id, warehouse.id)])
+
+        assert _balances(product, warehouse) == [Decimal("5"), Decimal("15"), Decimal("11")]
+
+    def test_bulk_update_fallback_matches(self, product, warehouse):
+        _move(product, warehouse, "in", "7", days_ago=2)
+        _move(product, warehouse, "out", "3", days_ago=1)
+        StockTransaction.objects.filter(product=product).update(running_balance=Decimal("0"))
+
+        changed = running_balance._recalculate_with_bulk_update(
+            {(product.id, warehouse.id)}, batch_size=100
+        )
+
+        assert changed == 2
+        assert _balances(product, warehouse) == [Decimal("7"), Decimal("4")]
+
+    def test_legacy_uppercase_types_are_normalized(self, product, warehouse):
+        txn = _move(product, warehouse, "in", "9")
+        StockTransaction.objects.filter(pk=txn.pk).update(
+            transaction_type="IN", running_balance=Decimal("0")
+        )
+
+        running_balance.recalculate_running_balances([(product.id, warehouse.id)])
+
+        txn.refresh_from_db()
+        assert txn.transaction_type == "in"
+        assert txn.running_balance == Decimal("9")
+
+
+@pytest.mark.django_db
+class TestDeferredRecalculation:
+    """التسجيلات المتكررة في معاملة واحدة تُدمج في حساب واحد لكل سلسلة"""
+
+    def test_pending_series_flushed_once(
+        self, product, warehouse, django_capture_on_commit_callbacks
+    ):
+        other = Warehouse.objects.create(name="مستودع آخر", code="WH-RUN-2", is_active=True)
+
+        with mock.patch.object(
+            running_balance, "recalculate_running_balances", return_value=0
+        ) as recalculate:
+            with django_capture_on_commit_callbacks(execute=True):
+                for _ in range(3):
+                    running_balance.schedule_running_balance_recalculation(
+                        product.id, warehouse.id
+                    )
+                running_balance.schedule_running_balance_recalculation(product.id, other.id)
+
+        recalculate.assert_called_once_with(
+            {(product.id, warehouse.id), (product.id, other.id)}
+        )
+
+    def test_rolled_back_series_are_dropped(
+        self, product, warehouse, django_capture_on_commit_callbacks
+    ):
+        other = Warehouse.objects.create(name="مستودع متراجع", code="WH-RUN-3", is_active=True)
+
+        with mock.patch.object(
+            running_balance, "recalculate_running_balances", return_value=0
+        ) as recalculate:
+            with django_capture_on_commit_callbacks(execute=True):
+                with pytest.raises(RuntimeError):
+                    with transaction.atomic():
+                        running_balance.schedule_running_balance_recalculation(
+                            product.id, other.id
+                        )
+                        raise RuntimeError("تراجع")
+                running_balance.schedule_running_balance_recalculation(
+                    product.id, warehouse.id
+                )
+
+        recalculate.assert_called_once_with({(product.id, warehouse.id)})
+
+    def test_failed_series_marked_for_rebuild(
+        self, product, warehouse, django_capture_on_commit_callbacks
+    ):
+        with mock.patch.object(
+            running_balance, "recalculate_running_balances", side_effect=RuntimeError("فشل")
+        ), mock.patch.object(running_balance, "mark_series_dirty") as mark_dirty:
+            with django_capture_on_commit_callbacks(execute=True):
+                running_balance.schedule_running_balance_recalculation(
+                    product.id, warehouse.id
+                )
+
+        mark_dirty.assert_called_once_with({(product.id, warehouse.id)})
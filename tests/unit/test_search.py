@@ -0,0 +1,76 @@
+"""
+اختبارات البحث المفهرس (core.search)
+"""
+
+import pytest
+
+from core.search import customer_search_q, normalize_search_text, order_search_q, search_terms
+from customers.models import Customer
+from orders.models import Order
+
+
+class TestNormalizeSearchText:
+    """التطبيع يوحّد أشكال الحروف والأرقام"""
+
+    def test_arabic_letters_and_digits_folded(self):
+        assert normalize_search_text("أحمد إبراهيم آمنة") == "احمد ابراهيم امنه"
+        assert normalize_search_text("مصطفى") == "مصطفي"
+        assert normalize_search_text("مُحَمَّـد") == "محمد"
+        assert normalize_search_text("٠١٠٠۱۲۳") == "0100123"
+        assert normalize_search_text("ORD-ABC") == "ord-abc"
+
+    def test_search_terms(self):
+        assert search_terms("  أحمد   ٠١٠٠ ") == ["احمد", "0100"]
+        assert search_terms("") == []
+        # أقل من 3 أحرف لا يخدمها فهرس trigram
+        assert search_terms("احمد ب 12") == ["احمد"]
+
+
+@pytest.mark.django_db
+class TestSearchDocuments:
+    """حفظ الطلب/العميل يبني المستند بعد التأكيد ويجده البحث بأي شكل للحروف"""
+
+    def test_order_found_by_folded_customer_name(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            customer = Customer.objects.create(name="أحمد مصطفى", phone="0100000201", address="x")
+            order = Order.objects.create(customer=customer)
+
+        found = Order.objects.filter(order_search_q("احمد مصطفي"))
+        assert list(found.values_list("pk", flat=True)) == [order.pk]
+        assert Customer.objects.filter(customer_search_q("٠١٠٠٠٠٠٢٠١")).get() == customer
+        assert not Order.objects.filter(order_search_q("احمد غير_موجود")).exists()
+
+    def test_customer_rename_refreshes_order_documents(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            customer = Customer.objects.create(name="عميل قديم", phone="0100000202", address="x")
+            order = Order.objects.create(customer=customer)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            customer.name = "عميلة جديدة"
+            customer.save()
+
+        assert Order.objects.filter(order_search_q("جديده")).get() == order
+        assert not Order.objects.filter(order_search_q("قديم")).exists()
+
+    def test_short_query_matches_identifiers_exactly(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            customer = Customer.objects.create(name="عميل قصير", phone="12", address="x")
+            Customer.objects.create(name="عميل 12 آخر", phone="0100000203", address="x")
+
+        assert list(Customer.objects.filter(customer_search_q("١٢"))) == [customer]
+
+    def test_short_query_matches_contract_and_invoice(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            customer = Customer.objects.create(name="عميل عقد", phone="0100000204", address="x")
+            by_contract = Order.objects.create(customer=customer, contract_number="77")
+            by_invoice = Order.objects.create(customer=customer, invoice_number_2="78")
+
+        assert list(Order.objects.filter(order_search_q("77"))) == [by_contract]
+        assert list(Order.objects.filter(order_search_q("٧٨"))) == [by_invoice]
+
+    def test_short_terms_narrow_mixed_query(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            first = Customer.objects.create(name="سامي ب", phone="0100000205", address="x")
+            Customer.objects.create(name="سامي ج", phone="0100000206", address="x")
+
+        assert list(Customer.objects.filter(customer_search_q("سامي ب"))) == [first]
@@ -0,0 +1,60 @@
+"""
+اختبارات مُخصِّص الأرقام التسلسلية (core.sequences)
+"""
+
+import pytest
+
+from core.models import NumberSequence
+from core.sequences import allocate, next_value
+from customers.models import Customer
+from orders.models import Order
+
+
+@pytest.mark.django_db
+class TestNextValue:
+    """العداد يبدأ من أكبر رقم موجود ثم يزيد بعبارة واحدة"""
+
+    def test_seeded_once_then_incremented(self):
+        seeds = []
+
+        def seed():
+            seeds.append(1)
+            return 9
+
+        assert next_value("tests.scope", "A-", seed) == 10
+        assert next_value("tests.scope", "A-", seed) == 11
+        assert next_value("tests.scope", "B-", seed) == 10
+        assert len(seeds) == 2
+        assert NumberSequence.objects.get(scope="tests.scope", prefix="A-").last_value == 11
+
+    def test_taken_value_resyncs_counter(self):
+        """أرقام أُسندت خارج العداد (استيراد) تُتخطى بمزامنة واحدة"""
+        assert next_value("tests.taken", "X-") == 1
+        used = {"X-0002", "X-0003"}
+
+        value = allocate(
+            "tests.taken",
+            "X-",
+            render=lambda n: f"X-{n:04d}",
+            seed=lambda: 3,
+            taken=lambda v: v in used,
+        )
+
+        assert value == "X-0004"
+
+
+@pytest.mark.django_db
+class TestOrderNumbers:
+    """أرقام الطلبات تُقارن رقمياً (-0010 بعد -0009) ولا تتكرر"""
+
+    def test_numeric_order_after_existing_numbers(self):
+        customer = Customer.objects.create(name="عميل التسلسل", phone="0100000301", address="x")
+        prefix = f"{customer.code}-"
+        Order.objects.create(customer=customer, order_number=f"{prefix}0009")
+        Order.objects.create(customer=customer, order_number=f"{prefix}0010")
+
+        first = Order.objects.create(customer=customer)
+        second = Order.objects.create(customer=customer)
+
+        assert first.order_number == f"{prefix}0011"
+        assert second.order_number == f"{prefix}0012"
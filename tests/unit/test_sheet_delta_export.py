@@ -0,0 +1,61 @@
+"""
+اختبارات اكتشاف السجلات المتغيرة للتصدير التزايدي (odoo_db_manager.sheet_delta_export)
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from django.utils import timezone
+
+from customers.models import Customer
+from inventory.models import Product
+from odoo_db_manager.sheet_delta_export import WATERMARK_OVERLAP, _changed_ids
+from orders.models import Order, OrderItem, Payment
+
+
+@pytest.fixture
+def order(db):
+    customer = Customer.objects.create(name="عميل تصدير تزايدي", phone="0100000601")
+    return Order.objects.create(customer=customer)
+
+
+def _exported(order):
+    """حالة تصدير سابق شمل الطلب — تحديثه التالي فقط يعيده"""
+    exported_at = timezone.now()
+    Order.objects.filter(pk=order.pk).update(
+        updated_at=exported_at - WATERMARK_OVERLAP - timedelta(minutes=1)
+    )
+    return SimpleNamespace(watermark=exported_at, last_id=order.pk)
+
+
+@pytest.mark.django_db
+class TestChangedIds:
+    """الكتابات المباشرة على الطلب (update/bulk_update) تظهر في التصدير التالي"""
+
+    def test_unchanged_order_is_skipped(self, order):
+        state = _exported(order)
+        assert _changed_ids(Order.objects.all(), state, ()) == []
+
+    def test_payment_marks_order_changed(self, order):
+        state = _exported(order)
+
+        Payment.objects.create(order=order, customer=order.customer, amount=Decimal("50.00"))
+
+        assert _changed_ids(Order.objects.all(), state, ()) == [order.pk]
+        order.refresh_from_db()
+        assert order.paid_amount == Decimal("50.00")
+
+    def test_recomputed_totals_mark_order_changed(
+        self, order, django_capture_on_commit_callbacks
+    ):
+        product = Product.objects.create(name="قماش تصدير", code="DX-001", price=Decimal("80.00"))
+        state = _exported(order)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            OrderItem.objects.create(
+                order=order, product=product, quantity=Decimal("2"), unit_price=Decimal("80.00")
+            )
+
+        assert _changed_ids(Order.objects.all(), state, ()) == [order.pk]
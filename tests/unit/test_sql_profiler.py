@@ -0,0 +1,44 @@
+"""
+اختبارات مُحلِّل الاستعلامات بالعيّنات (core.sql_profiler)
+"""
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core.sql_profiler import RequestProfile, fingerprint_sql
+
+
+class TestFingerprint:
+    """الاستعلامات المتشابهة تحمل البصمة نفسها"""
+
+    def test_literals_and_in_lists_are_normalized(self):
+        first, _ = fingerprint_sql("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'")
+        second, normalized = fingerprint_sql(
+            "SELECT *  FROM t WHERE id IN (%s, %s, %s) AND name = 'bb'"
+        )
+
+        assert first == second
+        assert normalized == "SELECT * FROM t WHERE id IN (...) AND name = ?"
+
+
+@pytest.mark.django_db
+class TestRequestProfile:
+    """تسجيل الاستعلامات المكررة مع مصدرها"""
+
+    def test_records_duplicates_with_origin(self):
+        users = [
+            get_user_model().objects.create_user(username=f"prof_{i}", password="x")
+            for i in range(3)
+        ]
+        profile = RequestProfile(stack_depth=4)
+
+        with connection.execute_wrapper(profile):
+            for user in users:
+                get_user_model().objects.filter(pk=user.pk).exists()
+
+        duplicates = profile.duplicates(threshold=3)
+        assert profile.query_count == 3
+        assert list(duplicates.values()) == [3]
+        fingerprint = next(iter(duplicates))
+        assert any("test_sql_profiler.py" in frame for frame in profile.origins[fingerprint])
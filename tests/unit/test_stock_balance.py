@@ -0,0 +1,130 @@
+"""
+اختبارات جدول أرصدة المخزون StockBalance
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from inventory.models import Product, StockBalance, StockTransaction, Warehouse
+
+
+@pytest.fixture
+def product(db):
+    return Product.objects.create(name="قماش تجريبي", code="BAL-001", price=Decimal("50.00"))
+
+
+@pytest.fixture
+def warehouse(db):
+    return Warehouse.objects.create(name="مستودع الأرصدة", code="WH-BAL", is_active=True)
+
+
+def _move(product, warehouse, transaction_type, quantity):
+    return StockTransaction.objects.create(
+        product=product,
+        warehouse=warehouse,
+        transaction_type=transaction_type,
+        reason="other",
+        quantity=Decimal(quantity),
+    )
+
+
+@pytest.mark.django_db
+class TestStockBalance:
+    """اختبارات تحديث الرصيد المجمّع مع حركات المخزون"""
+
+    def test_balance_follows_transactions(self, product, warehouse):
+        _move(product, warehouse, "in", "10")
+        _move(product, warehouse, "out", "3")
+
+        balance = StockBalance.objects.get(product=product, warehouse=warehouse)
+        assert balance.quantity == Decimal("7")
+        assert Product.objects.get(pk=product.pk).current_stock == Decimal("7")
+
+    def test_update_and_delete_adjust_balance(self, product, warehouse):
+        txn = _move(product, warehouse, "in", "10")
+        txn.quantity = Decimal("4")
+        txn.save()
+        assert StockBalance.objects.get(product=product).quantity == Decimal("4")
+
+        txn.delete()
+        assert StockBalance.objects.get(product=product).quantity == Decimal("0")
+
+    def test_rebuild_matches_ledger(self, product, warehouse):
+        _move(product, warehouse, "in", "8")
+        _move(product, warehouse, "out", "2")
+        StockBalance.objects.all().update(quantity=Decimal("999"))
+
+        StockBalance.rebuild(product_ids=[product.id])
+
+        assert StockBalance.objects.get(product=product).quantity == Decimal("6")
+
+
+@pytest.mark.django_db
+class TestRunningBalanceRecalculation:
+    """اختبارات إعادة حساب الرصيد المتحرك جماعياً"""
+
+    def test_backdated_insert_recalculates_once_on_commit(
+        self, product, warehouse, django_capture_on_commit_callbacks
+    ):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        later = _move(product, warehouse, "in", "10")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            StockTransaction.objects.create(
+                product=product,
+                warehouse=warehouse,
+                transaction_type="in",
+                reason="other",
+                quantity=Decimal("5"),
+                transaction_date=timezone.now() - timedelta(days=3),
+            )
+
+        later.refresh_from_db()
+        assert later.running_balance == Decimal("15")
+        assert StockBalance.objects.get(product=product).quantity == Decimal("15")
+
+    def test_recalculate_running_balances_rewrites_series(self, product, warehouse):
+        from inventory.running_balance import recalculate_running_balances
+
+        first = _move(product, warehouse, "in", "10")
+        second = _move(product, warehouse, "out", "4")
+        StockTransaction.objects.filter(pk__in=[first.pk, second.pk]).update(
+            running_balance=Decimal("0")
+        )
+
+        recalculate_running_balances([(product.id, warehouse.id)])
+
+        second.refresh_from_db()
+        assert second.running_balance == Decimal("6")
+
+
+@pytest.mark.django_db
+class TestProductStockAnnotation:
+    """اختبارات واجهة with_stock لتجميع المخزون لصفحة منتجات"""
+
+    def test_with_stock_attaches_totals_and_warehouses(
+        self, product, warehouse, django_assert_num_queries
+    ):
+        _move(product, warehouse, "in", "12")
+
+        with django_assert_num_queries(2):
+            products = list(Product.objects.filter(pk=product.pk).with_stock())
+            annotated = products[0]
+            assert annotated.current_stock == Decimal("12")
+            assert str(annotated.stock_status) == "متوفر"
+            assert annotated.warehouses_with_stock == warehouse.name
+
+    def test_attach_stock_info_on_loaded_products(self, product, warehouse):
+        from inventory.managers import attach_stock_info
+
+        _move(product, warehouse, "in", "3")
+        loaded = Product.objects.get(pk=product.pk)
+
+        attach_stock_info([loaded])
+
+        assert loaded.current_stock == Decimal("3")
+        assert loaded.stock_by_warehouse == [(warehouse, Decimal("3"))]
@@ -0,0 +1,118 @@
+"""
+اختبارات طابور مزامنة Cloudflare (public.sync_outbox)
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.utils import timezone
+
+from inventory.models import BaseProduct
+from public import sync_outbox
+from public.cloudflare_sync import SEND_FAILED, SEND_OK
+from public.models import CloudflareSettings, CloudflareSyncOutbox
+
+
+class FakeSync:
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.sent = []
+
+    def is_configured(self):
+        return True
+
+    def format_base_product(self, base_product):
+        return {"code": base_product.code, "name": base_product.name}
+
+    def format_product(self, product):
+        return {"code": product.code, "name": product.name}
+
+    def send_batch(self, data):
+        self.sent.append(data)
+        return self.results.pop(0) if self.results else SEND_OK
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+
+
+def _base_product(code, synced=False):
+    return BaseProduct.objects.create(name=f"منتج {code}", code=code, cloudflare_synced=synced)
+
+
+def _queued(base_product, content_hash="", enqueued_at=None):
+    return CloudflareSyncOutbox.objects.create(
+        code=base_product.code,
+        action="sync",
+        model="base_product",
+        object_id=base_product.pk,
+        enqueued_at=enqueued_at or timezone.now(),
+        content_hash=content_hash,
+    )
+
+
+def _drain(sync):
+    settings_row = mock.Mock(is_enabled=True)
+    with mock.patch(
+        "public.cloudflare_sync.get_cloudflare_sync", return_value=sync
+    ), mock.patch.object(CloudflareSettings, "get_settings", return_value=settings_row):
+        return sync_outbox.drain_outbox()
+
+
+@pytest.mark.django_db
+class TestDrainSyncs:
+    """البيانات غير المتغيرة لا تُرسل لكنها تُعلَّم متزامنة"""
+
+    def test_unchanged_payload_restores_synced_flag(self):
+        sync = FakeSync()
+        base_product = _base_product("CF-001")
+        payload = sync.format_base_product(base_product)
+        row = _queued(base_product, content_hash=sync_outbox._payload_hash(payload))
+        stats = {"sent": 0, "unchanged": 0, "dropped": 0}
+
+        assert sync_outbox._drain_syncs(sync, [row], stats) == SEND_OK
+
+        assert sync.sent == []
+        assert stats["unchanged"] == 1
+        base_product.refresh_from_db()
+        assert base_product.cloudflare_synced is True
+        row.refresh_from_db()
+        assert row.pending is False
+
+
+@pytest.mark.django_db
+class TestDrainOutbox:
+    """الصفوف الفاشلة تؤجَّل فلا تحجز ما خلفها"""
+
+    def test_failed_rows_are_deferred(self):
+        earlier = timezone.now() - timedelta(minutes=5)
+        failing = _queued(_base_product("CF-101"), enqueued_at=earlier)
+
+        stats = _drain(FakeSync([SEND_FAILED]))
+
+        assert stats["status"] == "failed"
+        failing.refresh_from_db()
+        assert failing.pending is True
+        assert failing.attempts == 1
+        assert failing.next_attempt_at > timezone.now()
+
+        waiting = _queued(_base_product("CF-102"))
+        sync = FakeSync()
+        stats = _drain(sync)
+
+        assert stats["status"] == "success"
+        batches = [data for data in sync.sent if data["action"] == "sync_all"]
+        assert [data["products"][0]["code"] for data in batches] == ["CF-102"]
+        waiting.refresh_from_db()
+        assert waiting.pending is False
+        failing.refresh_from_db()
+        assert failing.pending is True
+
+    def test_retry_delay_grows_and_is_capped(self):
+        assert sync_outbox._retry_delay(1) == sync_outbox.RETRY_BASE
+        assert sync_outbox._retry_delay(2) == sync_outbox.RETRY_BASE * 2
+        assert sync_outbox._retry_delay(30) == sync_outbox.RETRY_MAX
@@ -7,15 +7,18 @@ from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
 from .models import OnlineUser, UserSession
+from .presence import record_presence
+from .utils import parse_user_agent
 
-# Throttle interval in seconds — only write to DB once per this interval per session
+# Throttle interval in seconds — للمسار الاحتياطي فقط (عند عدم توفر Redis)
 SESSION_TRACKING_THROTTLE = 60
 
 
 class UserSessionTrackingMiddleware(MiddlewareMixin):
     """
     Middleware لتتبع وتحديث جلسات المستخدمين النشطين
-    محسّن: يكتب في قاعدة البيانات مرة واحدة كل 60 ثانية بدلاً من كل request
+    ✅ يكتب في مخزن الحضور (Redis) برحلة واحدة، وتنقله مهمة دورية إلى قاعدة البيانات دفعات.
+    عند عدم توفر Redis: يكتب في قاعدة البيانات مرة واحدة كل 60 ثانية لكل جلسة.
     """
 
     # المسارات التي لا تحتاج تتبع (AJAX, API, static)
@@ -35,6 +38,9 @@ class UserSessionTrackingMiddleware(MiddlewareMixin):
         if not session_key:
             return None
 
+        if record_presence(request):
+            return None
+
         # Throttle: فقط كتابة في DB مرة كل 60 ثانية لكل جلسة
         cache_key = f"session_track_{session_key}"
         if cache.get(cache_key):
@@ -72,49 +78,14 @@ class UserSessionTrackingMiddleware(MiddlewareMixin):
     @staticmethod
     def get_device_type(request):
         """تحديد نوع الجهاز"""
-        user_agent = request.META.get("HTTP_USER_AGENT", "").lower()
-
-        if "mobile" in user_agent or "android" in user_agent or "iphone" in user_agent:
-            return "mobile"
-        elif "tablet" in user_agent or "ipad" in user_agent:
-            return "tablet"
-        elif "windows" in user_agent or "mac" in user_agent or "linux" in user_agent:
-            return "desktop"
-
-        return "unknown"
+        return parse_user_agent(request.META.get("HTTP_USER_AGENT", ""))["device_type"]
 
     @staticmethod
     def get_browser(request):
         """تحديد نوع المتصفح"""
-        user_agent = request.META.get("HTTP_USER_AGENT", "").lower()
-
-        if "edg" in user_agent or "edge" in user_agent:
-            return "Edge"
-        elif "chrome" in user_agent:
-            return "Chrome"
-        elif "firefox" in user_agent:
-            return "Firefox"
-        elif "safari" in user_agent:
-            return "Safari"
-        elif "opera" in user_agent or "opr" in user_agent:
-            return "Opera"
-
-        return "Unknown"
+        return parse_user_agent(request.META.get("HTTP_USER_AGENT", ""))["browser"]
 
     @staticmethod
     def get_os(request):
         """تحديد نظام التشغيل"""
-        user_agent = request.META.get("HTTP_USER_AGENT", "").lower()
-
-        if "windows" in user_agent:
-            return "Windows"
-        elif "mac" in user_agent:
-            return "macOS"
-        elif "linux" in user_agent:
-            return "Linux"
-        elif "android" in user_agent:
-            return "Android"
-        elif "iphone" in user_agent or "ipad" in user_agent:
-            return "iOS"
-
-        return "Unknown"
+        return parse_user_agent(request.META.get("HTTP_USER_AGENT", ""))["operating_system"]
@@ -411,6 +411,13 @@ class OnlineUser(models.Model):
     @classmethod
     def get_online_users(cls):
         """الحصول على المستخدمين المتصلين حالياً"""
+        from .presence import get_online_user_ids
+
+        # ✅ القراءة من مخزن الحضور السريع (Redis) — بدون حذف في كل استدعاء
+        online_ids = get_online_user_ids()
+        if online_ids is not None:
+            return cls.objects.filter(user_id__in=online_ids).select_related("user")
+
         # تنظيف المستخدمين غير المتصلين أولاً
         cls.cleanup_offline_users()
 
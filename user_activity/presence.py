@@ -0,0 +1,307 @@
+"""
+مخزن الحضور السريع (Presence Store) في Redis — كتابة مؤجلة (write-behind)
+
+الميدلوير يسجّل كل زيارة بعملية واحدة (pipeline) في Redis بدلاً من
+update_or_create على UserSession و OnlineUser داخل الطلب، ثم تقوم مهمة
+دورية (flush_presence_task) بنقل التغييرات إلى قاعدة البيانات دفعات.
+
+المفاتيح:
+- presence:users       ZSET  user_id → آخر ظهور (timestamp)
+- presence:sessions    ZSET  session_key → آخر ظهور
+- presence:session:<k> HASH  بيانات الجلسة (user_id, ip, ua, path, hits, ...)
+- presence:dirty       SET   الجلسات التي تغيّرت منذ آخر نقل
+
+عند عدم توفر Redis تعيد الدوال None/False ويعود الميدلوير للمسار القديم.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "crm:presence:"
+USERS_KEY = f"{KEY_PREFIX}users"
+SESSIONS_KEY = f"{KEY_PREFIX}sessions"
+DIRTY_KEY = f"{KEY_PREFIX}dirty"
+
+# المستخدم يُعتبر متصلاً إذا ظهر خلال آخر 15 دقيقة (نفس منطق OnlineUser.is_online)
+ONLINE_WINDOW_SECONDS = 900
+SESSION_HASH_TTL = 24 * 3600
+
+ACTION_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+def _session_key(session_key):
+    return f"{KEY_PREFIX}session:{session_key}"
+
+
+def get_presence_client():
+    """اتصال Redis الخام للكاش الافتراضي، أو None إن لم يكن متاحاً"""
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def record_presence(request):
+    """
+    تسجيل زيارة في مخزن الحضور — O(1) ورحلة واحدة إلى Redis.
+    يعيد True عند النجاح، و False ليستخدم المستدعي المسار الاحتياطي.
+    """
+    client = get_presence_client()
+    if client is None:
+        return False
+
+    from .utils import get_client_ip_from_request
+
+    session_key = request.session.session_key
+    now = time.time()
+    session_hash = _session_key(session_key)
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zadd(USERS_KEY, {request.user.pk: now})
+        pipe.zadd(SESSIONS_KEY, {session_key: now})
+        pipe.hsetnx(session_hash, "first_seen", now)
+        pipe.hset(
+            session_hash,
+            mapping={
+                "user_id": request.user.pk,
+                "session_key": session_key,
+                "ip": get_client_ip_from_request(request),
+                "user_agent": request.META.get("HTTP_USER_AGENT", "")[:500],
+                "accept_language": request.META.get("HTTP_ACCEPT_LANGUAGE", "")[:200],
+                "path": request.path[:500],
+                "last_seen": now,
+            },
+        )
+        pipe.hincrby(session_hash, "hits", 1)
+        if request.method in ACTION_METHODS:
+            pipe.hincrby(session_hash, "actions", 1)
+        pipe.expire(session_hash, SESSION_HASH_TTL)
+        pipe.sadd(DIRTY_KEY, session_key)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ فشل تسجيل الحضور في Redis: {e}")
+        return False
+
+
+def forget_session(user_id, session_key=None):
+    """إزالة المستخدم/الجلسة من مخزن الحضور (عند تسجيل الخروج)"""
+    client = get_presence_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zrem(USERS_KEY, user_id)
+        if session_key:
+            pipe.zrem(SESSIONS_KEY, session_key)
+            pipe.srem(DIRTY_KEY, session_key)
+            pipe.delete(_session_key(session_key))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ فشل إزالة الحضور من Redis: {e}")
+
+
+def get_online_user_ids(window_seconds=ONLINE_WINDOW_SECONDS):
+    """معرفات المستخدمين المتصلين خلال النافذة، أو None إن لم يكن المخزن متاحاً"""
+    client = get_presence_client()
+    if client is None:
+        return None
+    try:
+        members = client.zrangebyscore(USERS_KEY, time.time() - window_seconds, "+inf")
+    except Exception as e:
+        logger.warning(f"⚠️ فشل قراءة الحضور من Redis: {e}")
+        return None
+    return [int(member) for member in members]
+
+
+def _decode(raw):
+    return {
+        (key.decode() if isinstance(key, bytes) else key): (
+            value.decode() if isinstance(value, bytes) else value
+        )
+        for key, value in raw.items()
+    }
+
+
+def _to_datetime(timestamp):
+    return datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+
+
+def _read_dirty_sessions(client, batch_size):
+    """سحب دفعة من الجلسات المتغيّرة وتصفير عدّاداتها ذرّياً"""
+    keys = client.spop(DIRTY_KEY, batch_size) or []
+    keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+    if not keys:
+        return []
+
+    pipe = client.pipeline(transaction=True)
+    for key in keys:
+        pipe.hgetall(_session_key(key))
+        pipe.hset(_session_key(key), mapping={"hits": 0, "actions": 0})
+        pipe.expire(_session_key(key), SESSION_HASH_TTL)
+    results = pipe.execute()
+
+    records = []
+    for raw in results[0::3]:
+        data = _decode(raw)
+        if not data.get("user_id") or not data.get("session_key"):
+            continue
+        records.append(
+            {
+                "user_id": int(data["user_id"]),
+                "session_key": data["session_key"],
+                "ip": data.get("ip") or "0.0.0.0",
+                "user_agent": data.get("user_agent", ""),
+                "accept_language": data.get("accept_language", ""),
+                "path": data.get("path", ""),
+                "first_seen": _to_datetime(data.get("first_seen") or data["last_seen"]),
+                "last_seen": _to_datetime(data["last_seen"]),
+                "hits": int(data.get("hits") or 0),
+                "actions": int(data.get("actions") or 0),
+            }
+        )
+    return records
+
+
+def _flush_sessions(records):
+    from .models import UserSession
+    from .utils import parse_user_agent
+
+    existing = {
+        session.session_key: session
+        for session in UserSession.objects.filter(
+            session_key__in=[record["session_key"] for record in records]
+        )
+    }
+
+    to_update, to_create = [], []
+    for record in records:
+        session = existing.get(record["session_key"])
+        if session is None:
+            to_create.append(
+                UserSession(
+                    user_id=record["user_id"],
+                    session_key=record["session_key"],
+                    ip_address=record["ip"],
+                    user_agent=record["user_agent"],
+                    last_activity=record["last_seen"],
+                    is_active=True,
+                    **parse_user_agent(record["user_agent"]),
+                )
+            )
+            continue
+        session.last_activity = record["last_seen"]
+        session.ip_address = record["ip"]
+        session.is_active = True
+        to_update.append(session)
+
+    UserSession.objects.bulk_update(
+        to_update, ["last_activity", "ip_address", "is_active"], batch_size=500
+    )
+    UserSession.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    return len(to_update) + len(to_create)
+
+
+def _flush_online_users(records):
+    from .models import OnlineUser
+
+    # أحدث جلسة لكل مستخدم + مجموع العدّادات عبر جلساته
+    latest = {}
+    for record in sorted(records, key=lambda r: r["last_seen"]):
+        previous = latest.get(record["user_id"])
+        if previous:
+            record = {
+                **record,
+                "hits": record["hits"] + previous["hits"],
+                "actions": record["actions"] + previous["actions"],
+            }
+        latest[record["user_id"]] = record
+
+    existing = {
+        online.user_id: online
+        for online in OnlineUser.objects.filter(user_id__in=list(latest))
+    }
+
+    to_update, to_create = [], []
+    for user_id, record in latest.items():
+        online = existing.get(user_id)
+        if online is None:
+            to_create.append(
+                OnlineUser(
+                    user_id=user_id,
+                    ip_address=record["ip"],
+                    session_key=record["session_key"],
+                    login_time=record["first_seen"],
+                    current_page=record["path"],
+                    device_info={
+                        "user_agent": record["user_agent"],
+                        "accept_language": record["accept_language"],
+                    },
+                    pages_visited=record["hits"],
+                    actions_performed=record["actions"],
+                )
+            )
+            continue
+        online.last_seen = record["last_seen"]
+        online.ip_address = record["ip"]
+        online.session_key = record["session_key"]
+        online.current_page = record["path"]
+        online.pages_visited += record["hits"]
+        online.actions_performed += record["actions"]
+        to_update.append(online)
+
+    OnlineUser.objects.bulk_update(
+        to_update,
+        [
+            "last_seen",
+            "ip_address",
+            "session_key",
+            "current_page",
+            "pages_visited",
+            "actions_performed",
+        ],
+        batch_size=500,
+    )
+    OnlineUser.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    return len(to_update) + len(to_create)
+
+
+def flush_presence(batch_size=1000):
+    """
+    نقل الحضور المتراكم من Redis إلى UserSession و OnlineUser دفعات.
+    يعيد إحصائيات ما تم نقله.
+    """
+    client = get_presence_client()
+    if client is None:
+        return {"sessions": 0, "online_users": 0, "available": False}
+
+    stats = {"sessions": 0, "online_users": 0, "available": True}
+    while True:
+        records = _read_dirty_sessions(client, batch_size)
+        if not records:
+            break
+        try:
+            with transaction.atomic():
+                stats["sessions"] += _flush_sessions(records)
+                stats["online_users"] += _flush_online_users(records)
+        except Exception as e:
+            # إعادة الجلسات لمجموعة التغييرات لتُنقل في الدورة التالية
+            client.sadd(DIRTY_KEY, *[record["session_key"] for record in records])
+            logger.error(f"❌ فشل نقل الحضور إلى قاعدة البيانات: {e}")
+            break
+        if len(records) < batch_size:
+            break
+
+    # تنظيف الإدخالات القديمة من المجموعات المرتبة
+    stale_before = time.time() - SESSION_HASH_TTL
+    client.zremrangebyscore(USERS_KEY, "-inf", stale_before)
+    client.zremrangebyscore(SESSIONS_KEY, "-inf", stale_before)
+    return stats
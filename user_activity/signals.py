@@ -9,6 +9,7 @@ from django.dispatch import receiver
 from django.utils import timezone
 
 from .models import OnlineUser, UserActivityLog, UserLoginHistory, UserSession
+from .presence import forget_session
 
 User = get_user_model()
 
@@ -44,6 +45,10 @@ def handle_user_logout(sender, request, user, **kwargs):
     """معالجة تسجيل خروج المستخدم"""
     try:
         if user:
+            # إزالة المستخدم من مخزن الحضور السريع
+            session = getattr(request, "session", None) if request else None
+            forget_session(user.pk, getattr(session, "session_key", None))
+
             # إنهاء سجل المستخدم النشط
             try:
                 online_user = OnlineUser.objects.get(user=user)
@@ -104,6 +109,7 @@ def handle_user_deletion(sender, instance, **kwargs):
 
         # تنظيف سجلات المستخدم النشط
         OnlineUser.objects.filter(user=instance).delete()
+        forget_session(instance.pk)
 
     except Exception as e:
         print(f"خطأ في معالجة حذف المستخدم: {e}")
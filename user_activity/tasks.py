@@ -0,0 +1,35 @@
+"""
+مهام Celery لنشاط المستخدمين
+"""
+
+import logging
+
+from celery import shared_task
+
+from .presence import flush_presence
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    bind=True,
+    max_retries=1,
+    default_retry_delay=30,
+    queue="maintenance",
+    name="user_activity.tasks.flush_presence_task",
+)
+def flush_presence_task(self):
+    """
+    نقل الحضور المتراكم في Redis إلى UserSession و OnlineUser
+    بعمليات bulk بدلاً من update_or_create في كل طلب
+    """
+    try:
+        stats = flush_presence()
+        if stats["sessions"] or stats["online_users"]:
+            logger.info(
+                f"✅ نقل الحضور: {stats['sessions']} جلسة، {stats['online_users']} مستخدم نشط"
+            )
+        return stats
+    except Exception as exc:
+        logger.error(f"❌ فشل نقل الحضور: {exc}")
+        raise self.retry(exc=exc)
@@ -33,3 +33,52 @@ def get_client_ip_from_request(request):
 
     # اتصال مباشر
     return request.META.get("REMOTE_ADDR", "0.0.0.0")
+
+
+def parse_user_agent(user_agent):
+    """
+    استخراج نوع الجهاز والمتصفح ونظام التشغيل من نص User Agent.
+    يعيد: {"device_type", "browser", "operating_system"}
+    """
+    user_agent = (user_agent or "").lower()
+
+    if "mobile" in user_agent or "android" in user_agent or "iphone" in user_agent:
+        device_type = "mobile"
+    elif "tablet" in user_agent or "ipad" in user_agent:
+        device_type = "tablet"
+    elif "windows" in user_agent or "mac" in user_agent or "linux" in user_agent:
+        device_type = "desktop"
+    else:
+        device_type = "unknown"
+
+    if "edg" in user_agent or "edge" in user_agent:
+        browser = "Edge"
+    elif "chrome" in user_agent:
+        browser = "Chrome"
+    elif "firefox" in user_agent:
+        browser = "Firefox"
+    elif "safari" in user_agent:
+        browser = "Safari"
+    elif "opera" in user_agent or "opr" in user_agent:
+        browser = "Opera"
+    else:
+        browser = "Unknown"
+
+    if "windows" in user_agent:
+        operating_system = "Windows"
+    elif "mac" in user_agent:
+        operating_system = "macOS"
+    elif "linux" in user_agent:
+        operating_system = "Linux"
+    elif "android" in user_agent:
+        operating_system = "Android"
+    elif "iphone" in user_agent or "ipad" in user_agent:
+        operating_system = "iOS"
+    else:
+        operating_system = "Unknown"
+
+    return {
+        "device_type": device_type,
+        "browser": browser,
+        "operating_system": operating_system,
+    }